@@ -23,6 +23,7 @@ App Settings
 """
 
 # Standard Library
+from enum import Enum
 from functools import lru_cache
 
 # Third Party
@@ -47,6 +48,31 @@ def get_lbs_settings() -> LbsSettings:
 # -------------------------------------------------------------------
 
 
+class InsertEngine(str, Enum):
+    """Strategy used to store multiple rows in a table"""
+
+    executemany = "executemany"
+    copy = "copy"
+
+
+class SensorsStorage(str, Enum):
+    """Storage of the data of the sensors information"""
+
+    jsonb = "jsonb"
+    typed = "typed"
+
+
+class TraceStorage(str, Enum):
+    """
+    Storage of the positions of the journeys: a row per position, a compressed
+    blob per journey or both while migrating from rows to blobs
+    """
+
+    rows = "rows"
+    blob = "blob"
+    both = "both"
+
+
 class DatabaseSettings(BaseSettings):
     postgres_user: str
     postgres_pwd: str
@@ -54,6 +80,15 @@ class DatabaseSettings(BaseSettings):
     postgres_host: str
     postgres_port: int
     connection_number: int
+    insert_engine: InsertEngine = InsertEngine.copy
+    sensors_storage: SensorsStorage = SensorsStorage.jsonb
+    trace_storage: TraceStorage = TraceStorage.rows
+    statement_cache_size: int = 1024
+    backfill_batch_rows: int = 10000
+    cursor_chunk_rows: int = 5000
+    partition_months_ahead: int = 3
+    partition_maintenance_interval: float = 3600.0
+    tenant_partitions: bool = False
 
     class Config:
         env_file = ".env"
@@ -67,6 +102,121 @@ def get_database_settings() -> DatabaseSettings:
 # -------------------------------------------------------------------
 
 
+class IngestSettings(BaseSettings):
+    batch_max_journeys: int = 1000
+    batch_transaction_journeys: int = 100
+    stream_chunk_rows: int = 5000
+    batch_max_observations: int = 5000
+    iot_micro_batch: bool = False
+    iot_micro_batch_observations: int = 500
+    iot_micro_batch_delay: float = 0.005
+    write_behind: bool = False
+    write_behind_queue_size: int = 10000
+    write_behind_flush_journeys: int = 200
+    write_behind_flush_interval: float = 0.5
+    spool: bool = False
+    spool_directory: str = "spool"
+    spool_segment_size: int = 64 * 1024 * 1024
+    spool_fsync_interval: float = 0.05
+    spool_latency_budget: float = 5.0
+    spool_replay_interval: float = 5.0
+    spool_replay_journeys: int = 100
+
+    class Config:
+        env_file = ".env"
+
+
+@lru_cache(maxsize=1)
+def get_ingest_settings() -> IngestSettings:
+    return IngestSettings()
+
+
+# -------------------------------------------------------------------
+
+
+class CacheSettings(BaseSettings):
+    extraction_cache: bool = False
+    extraction_cache_size: int = 64 * 1024 * 1024
+    extraction_cache_ttl: float = 60.0
+
+    class Config:
+        env_file = ".env"
+
+
+@lru_cache(maxsize=1)
+def get_cache_settings() -> CacheSettings:
+    return CacheSettings()
+
+
+# -------------------------------------------------------------------
+
+
+class PageSettings(BaseSettings):
+    page_cursor_key: str
+    page_size_max: int = 1000
+
+    class Config:
+        env_file = ".env"
+
+
+@lru_cache(maxsize=1)
+def get_page_settings() -> PageSettings:
+    return PageSettings()
+
+
+# -------------------------------------------------------------------
+
+
+class PseudonymScope(str, Enum):
+    """
+    Extractions that share the pseudonyms of the journeys: the identical
+    requests or every request of the same source_app and company_code
+    """
+
+    request = "request"
+    consumer = "consumer"
+
+
+class PseudonymSettings(BaseSettings):
+    pseudonym_key: str
+    pseudonym_scope: PseudonymScope = PseudonymScope.request
+    pseudonym_rotation: int = 86400
+
+    class Config:
+        env_file = ".env"
+
+
+@lru_cache(maxsize=1)
+def get_pseudonym_settings() -> PseudonymSettings:
+    return PseudonymSettings()
+
+
+# -------------------------------------------------------------------
+
+
+class RetentionSettings(BaseSettings):
+    retention: bool = False
+    retention_interval: float = 86400.0
+    retention_journeys_days: int = 0
+    retention_positions_days: int = 0
+    retention_sensors_days: int = 0
+    retention_iot_days: int = 0
+    retention_rollups_days: int = 0
+    retention_batch_keys: int = 1000
+    retention_batch_seconds: float = 0.5
+
+    class Config:
+        env_file = ".env"
+
+
+@lru_cache(maxsize=1)
+def get_retention_settings() -> RetentionSettings:
+    return RetentionSettings()
+
+
+# -------------------------------------------------------------------
+
+
 class LoggerSettings(BaseSettings):
     loglevel: str
 
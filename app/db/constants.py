@@ -33,6 +33,7 @@ INSERT_USER_DATA_QUERY = """
                 company_trip_type,
                 distance,
                 elapsed_time,
+                duration,
                 end_date,
                 id,
                 main_type_space,
@@ -41,8 +42,10 @@ INSERT_USER_DATA_QUERY = """
                 start_lat,
                 start_lon,
                 end_lat,
-                end_lon
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15);"""
+                end_lon,
+                start_cells,
+                end_cells
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18);"""
 """Query to store User_Data in the database"""
 
 # ---------------------------------------------------------------------------------------------------------
@@ -51,12 +54,13 @@ INSERT_USER_DATA_QUERY = """
 INSERT_USER_POSITIONS_QUERY = """
                 INSERT INTO "user_positions"(
                 journey_id,
+                start_date,
                 time,
                 authenticity,
                 lat,
                 lon,
                 partial_distance
-                ) VALUES ($1, $2, $3, $4, $5, $6);"""
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7);"""
 """Query to store User_Positions in the database"""
 
 # ---------------------------------------------------------------------------------------------------------
@@ -65,6 +69,7 @@ INSERT_USER_POSITIONS_QUERY = """
 INSERT_USER_BEHAVIOURS_QUERY = """
                 INSERT INTO "user_behaviours"(
                 journey_id,
+                start_date,
                 source_app,
                 mode,
                 pos,
@@ -81,7 +86,7 @@ INSERT_USER_BEHAVIOURS_QUERY = """
                 end_lon,
                 end_partial_distance,
                 end_time 
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17);"""
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18);"""
 """Query to store User_Behaviours in the database"""
 
 # ---------------------------------------------------------------------------------------------------------
@@ -90,12 +95,45 @@ INSERT_USER_BEHAVIOURS_QUERY = """
 INSERT_USER_SENSORS_QUERY = """
                 INSERT INTO "user_sensors"(
                 journey_id,
+                start_date,
                 time,
                 name,
                 data
-                ) VALUES ($1, $2, $3, $4) ON CONFLICT(journey_id, time, name) DO NOTHING;"""
+                ) VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT(journey_id, time, name, start_date) DO NOTHING;"""
 """Query to store User_Sensors in the database"""
 
+INSERT_USER_SENSORS_TYPED_QUERY = """
+                INSERT INTO "user_sensors"(
+                journey_id,
+                start_date,
+                time,
+                name,
+                kind,
+                v1,
+                v2,
+                v3
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT(journey_id, time, name, start_date) DO NOTHING;"""
+"""Query to store User_Sensors in the typed columns of the database"""
+
+# ---------------------------------------------------------------------------------------------------------
+
+
+INSERT_USER_TRACES_QUERY = """
+                INSERT INTO "user_traces"(
+                journey_id,
+                points,
+                start_time,
+                end_time,
+                trace
+                ) VALUES ($1, $2, $3, $4, $5);"""
+"""Query to store User_Traces in the database"""
+
+STORED_JOURNEYS_QUERY = """
+                SELECT journey_id FROM "user_data" WHERE journey_id = ANY($1::text[]);"""
+"""Query to find which of the journeys are already stored"""
+
 # ---------------------------------------------------------------------------------------------------------
 
 INSERT_IOT_DATA_QUERY = """
@@ -114,4 +152,785 @@ INSERT_IOT_DATA_QUERY = """
                 ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11);"""
 """Query to store IoT_Data in the database"""
 
+INSERT_IOT_DATA_BATCH_QUERY = """
+                INSERT INTO "iot_data"(
+                result_time,
+                datastream,
+                feature_of_interest,
+                phenomenon_time,
+                observation_gep_id,
+                result_auth,
+                value_type,
+                position_type,
+                position_lat,
+                position_lon,
+                response_value
+                ) SELECT * FROM unnest(
+                $1::timestamptz[],
+                $2::int[],
+                $3::int[],
+                $4::timestamptz[],
+                $5::text[],
+                $6::int[],
+                $7::text[],
+                $8::text[],
+                $9::float[],
+                $10::float[],
+                $11::float[]
+                ) ON CONFLICT(observation_gep_id) DO NOTHING
+                RETURNING observation_gep_id;"""
+"""Query to store many IoT_Data in a single statement, it returns the stored ones"""
+
+# ---------------------------------------------------------------------------------------------------------
+
+
+USER_DATA_COLUMNS = (
+    "journey_id",
+    "source_app",
+    "company_code",
+    "company_trip_type",
+    "distance",
+    "elapsed_time",
+    "duration",
+    "end_date",
+    "id",
+    "main_type_space",
+    "main_type_time",
+    "start_date",
+    "start_lat",
+    "start_lon",
+    "end_lat",
+    "end_lon",
+    "start_cells",
+    "end_cells",
+)
+"""Columns of User_Data in the same order of the generated rows"""
+
+USER_POSITIONS_COLUMNS = (
+    "journey_id",
+    "start_date",
+    "time",
+    "authenticity",
+    "lat",
+    "lon",
+    "partial_distance",
+)
+"""Columns of User_Positions in the same order of the generated rows"""
+
+USER_BEHAVIOURS_COLUMNS = (
+    "journey_id",
+    "start_date",
+    "source_app",
+    "mode",
+    "pos",
+    "type",
+    "meters",
+    "accuracy",
+    "start_auth",
+    "start_lat",
+    "start_lon",
+    "start_partial_distance",
+    "start_time",
+    "end_auth",
+    "end_lat",
+    "end_lon",
+    "end_partial_distance",
+    "end_time",
+)
+"""Columns of User_Behaviours in the same order of the generated rows"""
+
+USER_SENSORS_COLUMNS = ("journey_id", "start_date", "time", "name", "data")
+"""Columns of User_Sensors in the same order of the generated rows"""
+
+USER_TRACES_COLUMNS = ("journey_id", "points", "start_time", "end_time", "trace")
+"""Columns of User_Traces in the same order of the generated rows"""
+
+USER_SENSORS_TYPED_COLUMNS = (
+    "journey_id",
+    "start_date",
+    "time",
+    "name",
+    "kind",
+    "v1",
+    "v2",
+    "v3",
+)
+"""Typed columns of User_Sensors in the same order of the generated rows"""
+
+# ---------------------------------------------------------------------------------------------------------
+
+
+CREATE_USER_SENSORS_STAGING_QUERY = """
+                CREATE TEMPORARY TABLE IF NOT EXISTS "user_sensors_staging"
+                (LIKE "user_sensors") ON COMMIT DELETE ROWS;"""
+"""Query to create the session table used to COPY User_Sensors before the merge"""
+
+MERGE_USER_SENSORS_STAGING_QUERY = """
+                WITH staged AS (DELETE FROM "user_sensors_staging" RETURNING *)
+                INSERT INTO "user_sensors"(
+                journey_id,
+                start_date,
+                time,
+                name,
+                data
+                ) SELECT journey_id, start_date, time, name, data FROM staged
+                ON CONFLICT(journey_id, time, name, start_date) DO NOTHING;"""
+"""Query to merge the copied User_Sensors keeping the ON CONFLICT semantic"""
+
+MERGE_USER_SENSORS_TYPED_STAGING_QUERY = """
+                WITH staged AS (DELETE FROM "user_sensors_staging" RETURNING *)
+                INSERT INTO "user_sensors"(
+                journey_id,
+                start_date,
+                time,
+                name,
+                kind,
+                v1,
+                v2,
+                v3
+                ) SELECT journey_id, start_date, time, name, kind, v1, v2, v3 FROM staged
+                ON CONFLICT(journey_id, time, name, start_date) DO NOTHING;"""
+"""Query to merge the copied User_Sensors stored in the typed columns"""
+
+# ---------------------------------------------------------------------------------------------------------
+
+
+CREATE_USER_DATA_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_data" (
+                journey_id text,
+                source_app text,
+                company_code text,
+                PRIMARY KEY (journey_id),
+                company_trip_type text,
+                distance integer,
+                elapsed_time text,
+                duration integer,
+                end_date bigint,
+                id text,
+                main_type_space text,
+                main_type_time text,
+                start_date bigint,
+                start_lat float,
+                start_lon float,
+                end_lat float,
+                end_lon float,
+                start_cells bigint[],
+                end_cells bigint[]
+                );"""
+"""Query to create the table of User_Data"""
+
+CREATE_USER_POSITIONS_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_positions" (
+                journey_id text,
+                time bigint,
+                PRIMARY KEY (journey_id, time),
+                authenticity integer,
+                lat float,
+                lon float,
+                partial_distance integer
+                );"""
+"""Query to create the table of User_Positions"""
+
+CREATE_USER_SENSORS_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_sensors" (
+                journey_id text,
+                time bigint,
+                name text,
+                data jsonb,
+                kind smallint,
+                v1 float,
+                v2 float,
+                v3 float,
+                PRIMARY KEY (journey_id, time, name)
+                );"""
+"""Query to create the table of User_Sensors"""
+
+CREATE_USER_TRACES_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_traces" (
+                journey_id text,
+                points integer,
+                start_time bigint,
+                end_time bigint,
+                trace bytea,
+                PRIMARY KEY (journey_id)
+                );"""
+"""Query to create the table of the compressed positions of the journeys"""
+
+CREATE_USER_BEHAVIOURS_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_behaviours" (
+                journey_id text,
+                source_app text,
+                mode text,
+                pos integer,
+                type text,
+                PRIMARY KEY (journey_id, mode, pos),
+                meters integer,
+                accuracy float,
+                start_auth integer,
+                start_lat float,
+                start_lon float,
+                start_partial_distance integer,
+                start_time bigint,
+                end_auth float,
+                end_lat float,
+                end_lon float,
+                end_partial_distance integer,
+                end_time bigint
+                );"""
+"""Query to create the table of User_Behaviours"""
+
+CREATE_IOT_DATA_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "iot_data" (
+                result_time timestamp with time zone,
+                datastream int,
+                feature_of_interest int,
+                phenomenon_time timestamp with time zone,
+                observation_gep_id text,
+                result_auth integer,
+                value_type text,
+                position_type text,
+                position_lat float,
+                position_lon float,
+                response_value float,
+                PRIMARY KEY (observation_gep_id)
+                );"""
+"""Query to create the table of IoT_Data"""
+
+UPDATE_USER_SENSORS_QUERY = """
+                ALTER TABLE "user_sensors"
+                ADD COLUMN IF NOT EXISTS kind smallint,
+                ADD COLUMN IF NOT EXISTS v1 float,
+                ADD COLUMN IF NOT EXISTS v2 float,
+                ADD COLUMN IF NOT EXISTS v3 float;"""
+"""Query to add the typed columns to User_Sensors tables created before them"""
+
+CREATE_USER_SENSORS_DECODED_VIEW_QUERY = """
+                CREATE OR REPLACE VIEW "user_sensors_decoded" AS
+                SELECT journey_id, time, name, COALESCE(
+                data,
+                CASE kind
+                WHEN 1 THEN jsonb_build_object('x', v1, 'y', v2, 'z', v3)
+                WHEN 2 THEN jsonb_build_object('azimut', v1, 'pitch', v2, 'roll', v3)
+                END
+                ) AS data FROM "user_sensors";"""
+"""Query to read User_Sensors as jsonb whatever storage has been used to store them"""
+
+UPDATE_USER_DATA_QUERY = """
+                ALTER TABLE "user_data" ADD COLUMN IF NOT EXISTS duration integer;"""
+"""Query to add the duration to User_Data tables created before it"""
+
+CREATE_GRID_CELLS_FUNCTION_QUERY = """
+                CREATE OR REPLACE FUNCTION grid_cells(lat float, lon float)
+                RETURNS bigint[] AS $$
+                SELECT array_agg(
+                (level::bigint << 48)
+                | (greatest(least(floor((lat + 90) / 180 * (1 << level)), (1 << level) - 1), 0)::bigint << 24)
+                | greatest(least(floor((lon + 180) / 360 * (1 << level)), (1 << level) - 1), 0)::bigint
+                ORDER BY level)
+                FROM unnest(ARRAY[10, 12, 14, 16]) AS level;
+                $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE;"""
+"""Query to create the function that computes the cells of a point at every level
+of GRID_LEVELS, in the same way of grid_cells"""
+
+UPDATE_USER_DATA_CELLS_QUERY = """
+                ALTER TABLE "user_data"
+                ADD COLUMN IF NOT EXISTS start_cells bigint[],
+                ADD COLUMN IF NOT EXISTS end_cells bigint[];"""
+"""Query to add the grid cells to User_Data tables created before them"""
+
+BACKFILL_USER_DATA_DURATION_QUERY = r"""
+                WITH batch AS (
+                SELECT journey_id FROM "user_data"
+                WHERE journey_id > $1 AND duration IS NULL
+                ORDER BY journey_id LIMIT $2
+                ), elapsed AS (
+                SELECT journey_id, CASE
+                WHEN elapsed_time ~ '^[0-9]+:[0-5]?[0-9]:[0-5]?[0-9](\.[0-9]+)?$'
+                THEN split_part(elapsed_time, ':', 1)::numeric * 3600
+                + split_part(elapsed_time, ':', 2)::numeric * 60
+                + floor(split_part(elapsed_time, ':', 3)::numeric)
+                WHEN end_date >= start_date THEN (end_date - start_date) / 1000
+                END AS seconds
+                FROM "user_data" JOIN batch USING (journey_id)
+                ) UPDATE "user_data" SET duration = CASE
+                WHEN elapsed.seconds <= 2147483647 THEN elapsed.seconds::integer
+                END FROM elapsed WHERE "user_data".journey_id = elapsed.journey_id
+                RETURNING "user_data".journey_id;"""
+"""Query to compute the duration of a batch of User_Data stored before it, in the
+same way of UserFeedBase.duration. The numeric arithmetic can't overflow, the
+durations that don't fit the column are left NULL"""
+
+BACKFILL_USER_DATA_CELLS_QUERY = """
+                WITH batch AS (
+                SELECT journey_id FROM "user_data"
+                WHERE journey_id > $1 AND start_cells IS NULL AND end_cells IS NULL
+                ORDER BY journey_id LIMIT $2
+                ) UPDATE "user_data" SET
+                start_cells = grid_cells(start_lat, start_lon),
+                end_cells = grid_cells(end_lat, end_lon)
+                FROM batch WHERE "user_data".journey_id = batch.journey_id
+                RETURNING "user_data".journey_id;"""
+"""Query to compute the grid cells of a batch of User_Data stored before them"""
+
+
+CREATE_USER_DATA_ROLLUP_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_data_rollup" (
+                source_app text,
+                company_code text,
+                company_trip_type text,
+                day bigint,
+                main_type_space text,
+                main_type_time text,
+                tracks bigint,
+                PRIMARY KEY (source_app, company_code, company_trip_type, day,
+                main_type_space, main_type_time)
+                );"""
+"""Query to create the rollup of the journeys of every day"""
+
+CREATE_USER_BEHAVIOURS_ROLLUP_QUERY = """
+                CREATE TABLE IF NOT EXISTS "user_behaviours_rollup" (
+                source_app text,
+                company_code text,
+                company_trip_type text,
+                day bigint,
+                type text,
+                mode text,
+                behaviours bigint,
+                meters bigint,
+                minutes bigint,
+                PRIMARY KEY (source_app, company_code, company_trip_type, day, type, mode)
+                );"""
+"""Query to create the rollup of the behaviours of the journeys of every day"""
+
+FILL_USER_DATA_ROLLUP_QUERY = """
+                INSERT INTO "user_data_rollup"
+                SELECT source_app, company_code, company_trip_type,
+                start_date - start_date % 86400000,
+                main_type_space, main_type_time, count(*)
+                FROM "user_data"
+                WHERE source_app IS NOT NULL AND company_code IS NOT NULL
+                AND company_trip_type IS NOT NULL AND start_date IS NOT NULL
+                AND main_type_space IS NOT NULL AND main_type_time IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5, 6
+                ON CONFLICT DO NOTHING;"""
+"""Query to aggregate in the rollup the journeys stored before it, keeping the
+groups already maintained by the stores"""
+
+FILL_USER_BEHAVIOURS_ROLLUP_QUERY = """
+                INSERT INTO "user_behaviours_rollup"
+                SELECT d.source_app, d.company_code, d.company_trip_type,
+                d.start_date - d.start_date % 86400000,
+                b.type, b.mode, count(*), coalesce(sum(b.meters), 0),
+                coalesce(sum((b.end_time - b.start_time)/60000), 0)
+                FROM "user_behaviours" AS b JOIN "user_data" AS d
+                ON b.journey_id = d.journey_id
+                WHERE d.source_app IS NOT NULL AND d.company_code IS NOT NULL
+                AND d.company_trip_type IS NOT NULL AND d.start_date IS NOT NULL
+                AND b.type IS NOT NULL AND b.mode IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5, 6
+                ON CONFLICT DO NOTHING;"""
+"""Query to aggregate in the rollup the behaviours stored before it, keeping the
+groups already maintained by the stores"""
+
+UPSERT_USER_DATA_ROLLUP_QUERY = """
+                INSERT INTO "user_data_rollup"(
+                source_app,
+                company_code,
+                company_trip_type,
+                day,
+                main_type_space,
+                main_type_time,
+                tracks
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7)
+                ON CONFLICT (source_app, company_code, company_trip_type, day,
+                main_type_space, main_type_time)
+                DO UPDATE SET tracks = "user_data_rollup".tracks + EXCLUDED.tracks;"""
+"""Query to add the journeys stored to their rollup"""
+
+UPSERT_USER_BEHAVIOURS_ROLLUP_QUERY = """
+                INSERT INTO "user_behaviours_rollup"(
+                source_app,
+                company_code,
+                company_trip_type,
+                day,
+                type,
+                mode,
+                behaviours,
+                meters,
+                minutes
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                ON CONFLICT (source_app, company_code, company_trip_type, day, type, mode)
+                DO UPDATE SET
+                behaviours = "user_behaviours_rollup".behaviours + EXCLUDED.behaviours,
+                meters = "user_behaviours_rollup".meters + EXCLUDED.meters,
+                minutes = "user_behaviours_rollup".minutes + EXCLUDED.minutes;"""
+"""Query to add the behaviours stored to their rollup"""
+
+SCHEMA_MIGRATIONS_LOCK_QUERY = (
+    """SELECT pg_try_advisory_lock(hashtext('schema_migrations'));"""
+)
+"""Query to elect the worker that applies the migrations, the others wait for it"""
+
+SCHEMA_MIGRATIONS_UNLOCK_QUERY = (
+    """SELECT pg_advisory_unlock(hashtext('schema_migrations'));"""
+)
+"""Query to release the migrations"""
+
+CREATE_SCHEMA_MIGRATIONS_QUERY = """
+                CREATE TABLE IF NOT EXISTS "schema_migrations" (
+                version integer PRIMARY KEY,
+                name text,
+                applied_at timestamp with time zone DEFAULT now()
+                );"""
+"""Query to create the table of the migrations applied to the database"""
+
+SCHEMA_MIGRATIONS_EXIST_QUERY = (
+    """SELECT to_regclass('schema_migrations') IS NOT NULL;"""
+)
+"""Query to check if any migration was applied to the database"""
+
+SCHEMA_MIGRATIONS_QUERY = """SELECT version FROM "schema_migrations";"""
+"""Query to read the versions of the migrations applied to the database"""
+
+TABLE_EXISTS_QUERY = """SELECT to_regclass($1) IS NOT NULL;"""
+"""Query to check if a table exists"""
+
+TABLE_HAS_ROWS_QUERY = """SELECT EXISTS (SELECT 1 FROM "{table}");"""
+"""Query to check if a table has any row"""
+
+INSERT_SCHEMA_MIGRATION_QUERY = """
+                INSERT INTO "schema_migrations"(version, name) VALUES ($1, $2);"""
+"""Query to record a migration applied to the database"""
+
+INVALID_INDEX_QUERY = """
+                SELECT NOT indisvalid FROM pg_index
+                WHERE indexrelid = to_regclass($1);"""
+"""Query to check if the concurrent build of an index failed, leaving it invalid"""
+
+CREATE_INDEX_CONCURRENTLY_QUERY = (
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON "{table}" {columns};"""
+)
+"""Query to build an index without locking the writes of its table"""
+
+DROP_INDEX_CONCURRENTLY_QUERY = """DROP INDEX CONCURRENTLY IF EXISTS {name};"""
+"""Query to drop an index without locking the writes of its table"""
+
+PARTITIONED_QUERY = """
+                SELECT relkind IN ('p', 'I') FROM pg_class WHERE oid = to_regclass($1);"""
+"""Query to check if a table or an index is partitioned"""
+
+CREATE_PARTITIONED_INDEX_QUERY = (
+    """CREATE INDEX IF NOT EXISTS {name} ON ONLY "{table}" {columns};"""
+)
+"""Query to create the index of a partitioned table without the indexes of its
+partitions, it stays invalid until every partition attaches its own"""
+
+PARTITIONS_INDEXES_QUERY = """
+                SELECT c.relname FROM pg_inherits AS i
+                JOIN pg_index AS x ON x.indexrelid = i.inhrelid
+                JOIN pg_class AS c ON c.oid = x.indrelid
+                WHERE i.inhparent = to_regclass($1);"""
+"""Query to read the partitions that attached their index to a partitioned index"""
+
+ATTACH_PARTITION_INDEX_QUERY = (
+    """ALTER INDEX {name} ATTACH PARTITION {partition_index};"""
+)
+"""Query to attach the index of a partition to the partitioned index"""
+
+DROP_INDEX_QUERY = """DROP INDEX IF EXISTS {name};"""
+"""Query to drop a partitioned index with the indexes of every partition"""
+
+PARTITION_TABLE_QUERY = """
+                DO $$ DECLARE index regclass; BEGIN
+                IF (SELECT relkind FROM pg_class WHERE oid = '"{table}"'::regclass) = 'r' THEN
+                ALTER TABLE "{table}" RENAME TO "{table}_unpartitioned";
+                ALTER INDEX "{table}_pkey" RENAME TO "{table}_unpartitioned_pkey";
+                FOR index IN SELECT indexrelid::regclass FROM pg_index
+                WHERE indrelid = '"{table}_unpartitioned"'::regclass AND NOT indisprimary LOOP
+                EXECUTE 'DROP INDEX ' || index;
+                END LOOP;
+                CREATE TABLE "{table}" (LIKE "{table}_unpartitioned" INCLUDING DEFAULTS{columns},
+                PRIMARY KEY ({primary_key})) PARTITION BY RANGE (start_date);
+                CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT;
+                END IF;
+                END $$;"""
+"""Query to replace a table with a table partitioned by the start_date of the journeys,
+the rows are moved by the backfills from the table renamed as unpartitioned"""
+
+CREATE_USER_DATA_PARTITIONED_INDEXES_QUERY = """
+                CREATE INDEX IF NOT EXISTS user_data_duration ON "user_data" (duration);
+                CREATE INDEX IF NOT EXISTS user_data_page
+                ON "user_data" (source_app, company_code, start_date, journey_id);
+                CREATE INDEX IF NOT EXISTS user_data_start_cells ON "user_data" USING gin (start_cells);
+                CREATE INDEX IF NOT EXISTS user_data_end_cells ON "user_data" USING gin (end_cells);
+                CREATE INDEX IF NOT EXISTS user_data_end
+                ON "user_data" (source_app, company_code, end_date);"""
+"""Query to create the indexes of the partitioned User_Data, built in the transaction that
+creates it since it's still empty and the indexes of a partitioned table can't be built
+concurrently"""
+
+CREATE_MONTH_PARTITION_FUNCTION_QUERY = """
+                CREATE OR REPLACE FUNCTION create_month_partition(parent text, month date)
+                RETURNS boolean AS $$
+                DECLARE
+                partition text := parent || '_' || to_char(month, 'YYYYMM');
+                lower bigint := extract(epoch FROM month::timestamp AT TIME ZONE 'UTC') * 1000;
+                upper bigint := extract(epoch FROM (month + interval '1 month') AT TIME ZONE 'UTC') * 1000;
+                BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('partitions'));
+                IF to_regclass(quote_ident(partition)) IS NOT NULL THEN
+                RETURN false;
+                END IF;
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition, parent);
+                EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE start_date >= %s AND start_date < %s RETURNING *)
+                INSERT INTO %I SELECT * FROM moved',
+                parent || '_default', lower, upper, partition);
+                EXECUTE format(
+                'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+                parent, partition, lower, upper);
+                RETURN true;
+                END $$ LANGUAGE plpgsql;"""
+"""Query to create the function that creates the partition of a month, named after the
+table and the month, moving to it the rows of the month stored in the default partition"""
+
+CREATE_UNPARTITIONED_MONTHS_PARTITIONS_QUERY = """
+                DO $$ DECLARE month date; BEGIN
+                IF to_regclass('"user_data_unpartitioned"') IS NOT NULL THEN
+                FOR month IN SELECT DISTINCT
+                date_trunc('month', to_timestamp(start_date / 1000.0) AT TIME ZONE 'UTC')::date
+                FROM "user_data_unpartitioned" WHERE start_date IS NOT NULL LOOP
+                PERFORM create_month_partition('user_data', month);
+                PERFORM create_month_partition('user_positions', month);
+                PERFORM create_month_partition('user_behaviours', month);
+                PERFORM create_month_partition('user_sensors', month);
+                END LOOP;
+                END IF;
+                END $$;"""
+"""Query to create the partitions of the months of the journeys stored before them,
+so their rows are moved straight to their partition"""
+
+MOVE_USER_DATA_UNPARTITIONED_QUERY = """
+                WITH batch AS (
+                SELECT journey_id FROM "user_data_unpartitioned"
+                WHERE journey_id > $1 ORDER BY journey_id LIMIT $2
+                ), moved AS (
+                DELETE FROM "user_data_unpartitioned" AS u USING batch
+                WHERE u.journey_id = batch.journey_id RETURNING u.*
+                ), copied AS (
+                INSERT INTO "user_data" SELECT * FROM moved
+                ) SELECT journey_id FROM batch;"""
+"""Query to move a batch of User_Data to the partitioned table"""
+
+MOVE_UNPARTITIONED_ROWS_QUERY = """
+                WITH batch AS (
+                SELECT journey_id, start_date FROM "user_data"
+                WHERE journey_id > $1 ORDER BY journey_id LIMIT $2
+                ), moved AS (
+                DELETE FROM "{table}_unpartitioned" AS u USING batch
+                WHERE u.journey_id = batch.journey_id RETURNING u.*, batch.start_date
+                ), copied AS (
+                INSERT INTO "{table}" SELECT * FROM moved
+                ) SELECT journey_id FROM batch;"""
+"""Query to move the rows of a batch of journeys to the partitioned table, adding the
+start_date of their journey"""
+
+DROP_UNPARTITIONED_TABLE_QUERY = """DROP TABLE IF EXISTS "{table}_unpartitioned";"""
+"""Query to drop a table whose rows were moved to the partitioned one, with the rows
+of the journeys missing from User_Data that no extraction can read"""
+
+CREATE_MONTH_PARTITION_QUERY = """SELECT create_month_partition($1, $2);"""
+"""Query to create the partition of a month, false if it already exists"""
+
+PARTITIONS_QUERY = """
+                SELECT c.relname FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass($1);"""
+"""Query to read the partitions of a table"""
+
+DROP_PARTITION_QUERY = """DROP TABLE IF EXISTS "{partition}";"""
+"""Query to drop the partition of a month with every row it contains"""
+
+TENANT_KEYS_QUERY = """
+                UPDATE "user_data" SET source_app = '' WHERE source_app IS NULL;
+                UPDATE "user_behaviours" AS b SET source_app = d.source_app FROM "user_data" AS d
+                WHERE b.source_app IS NULL AND b.journey_id = d.journey_id
+                AND b.start_date = d.start_date;
+                DELETE FROM "user_behaviours" WHERE source_app IS NULL;
+                ALTER TABLE "user_data" ALTER COLUMN source_app SET NOT NULL,
+                DROP CONSTRAINT "user_data_pkey",
+                ADD PRIMARY KEY (journey_id, start_date, source_app);
+                ALTER TABLE "user_behaviours" ALTER COLUMN source_app SET NOT NULL,
+                DROP CONSTRAINT "user_behaviours_pkey",
+                ADD PRIMARY KEY (journey_id, mode, pos, start_date, source_app);"""
+"""Query to add the source_app to the primary keys of the tables that can be partitioned
+by it, the behaviours without a source_app take the one of their journey"""
+
+CREATE_PARTITION_TENANTS_TABLE_QUERY = """
+                CREATE TABLE IF NOT EXISTS "partition_tenants" (
+                source_app text,
+                id serial UNIQUE,
+                PRIMARY KEY (source_app)
+                );"""
+"""Query to create the table of the source_app that have their own partitions, the id
+names the partitions"""
+
+CREATE_TENANT_PARTITION_FUNCTION_QUERY = """
+                CREATE OR REPLACE FUNCTION create_tenant_partition(
+                partition text, tenant integer, app text
+                ) RETURNS boolean AS $$
+                DECLARE
+                sub_partition text := partition || '_t' || tenant;
+                BEGIN
+                IF to_regclass(quote_ident(sub_partition)) IS NOT NULL THEN
+                RETURN false;
+                END IF;
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', sub_partition, partition);
+                EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE source_app = %L RETURNING *)
+                INSERT INTO %I SELECT * FROM moved',
+                partition || '_default', app, sub_partition);
+                EXECUTE format(
+                'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES IN (%L)',
+                partition, sub_partition, app);
+                RETURN true;
+                END $$ LANGUAGE plpgsql;"""
+"""Query to create the function that creates the partition of a source_app in the
+partition of a month, moving to it the rows of the source_app stored in the default one"""
+
+CREATE_TENANT_MONTH_PARTITION_FUNCTION_QUERY = """
+                CREATE OR REPLACE FUNCTION create_tenant_month_partition(parent text, month date)
+                RETURNS boolean AS $$
+                DECLARE
+                partition text := parent || '_' || to_char(month, 'YYYYMM');
+                lower bigint := extract(epoch FROM month::timestamp AT TIME ZONE 'UTC') * 1000;
+                upper bigint := extract(epoch FROM (month + interval '1 month') AT TIME ZONE 'UTC') * 1000;
+                kind "char";
+                created boolean := false;
+                tenant record;
+                BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('partitions'));
+                SELECT relkind INTO kind FROM pg_class WHERE oid = to_regclass(quote_ident(partition));
+                IF kind IS NULL THEN
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition || '_default', parent);
+                EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE start_date >= %s AND start_date < %s RETURNING *)
+                INSERT INTO %I SELECT * FROM moved',
+                parent || '_default', lower, upper, partition || '_default');
+                created := true;
+                ELSIF kind = 'r' THEN
+                -- The checked bounds spare the scan of the rows attaching them again
+                EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I CHECK (start_date >= %s AND start_date < %s)',
+                partition, partition || '_month', lower, upper);
+                EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, partition);
+                EXECUTE format('ALTER TABLE %I RENAME TO %I', partition, partition || '_default');
+                created := true;
+                END IF;
+                IF created THEN
+                EXECUTE format(
+                'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS) PARTITION BY LIST (source_app)',
+                partition, parent);
+                EXECUTE format(
+                'ALTER TABLE %I ATTACH PARTITION %I DEFAULT', partition, partition || '_default');
+                EXECUTE format(
+                'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+                parent, partition, lower, upper);
+                END IF;
+                FOR tenant IN SELECT id, source_app FROM "partition_tenants" LOOP
+                created := create_tenant_partition(partition, tenant.id, tenant.source_app)
+                OR created;
+                END LOOP;
+                RETURN created;
+                END $$ LANGUAGE plpgsql;"""
+"""Query to create the function that creates the partition of a month list partitioned
+by source_app, or turns into it the existing one, with a partition for every source_app
+and a default one"""
+
+CREATE_TENANT_PARTITIONS_FUNCTION_QUERY = """
+                CREATE OR REPLACE FUNCTION create_tenant_partitions(app text)
+                RETURNS integer AS $$
+                DECLARE
+                tenant integer;
+                partition record;
+                created integer := 0;
+                BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('partitions'));
+                INSERT INTO "partition_tenants" (source_app) VALUES (app) ON CONFLICT DO NOTHING;
+                SELECT id INTO tenant FROM "partition_tenants" WHERE source_app = app;
+                FOR partition IN SELECT c.relname FROM pg_inherits AS i
+                JOIN pg_class AS c ON c.oid = i.inhrelid
+                WHERE i.inhparent IN ('"user_data"'::regclass, '"user_behaviours"'::regclass)
+                AND c.relkind = 'p' LOOP
+                IF create_tenant_partition(partition.relname, tenant, app) THEN
+                created := created + 1;
+                END IF;
+                END LOOP;
+                RETURN created;
+                END $$ LANGUAGE plpgsql;"""
+"""Query to create the function that registers a source_app and creates its partitions
+in every month list partitioned by source_app"""
+
+CREATE_TENANT_MONTH_PARTITION_QUERY = (
+    """SELECT create_tenant_month_partition($1, $2);"""
+)
+"""Query to create the partition of a month list partitioned by source_app, false if it
+already exists with the partitions of every source_app"""
+
+CREATE_TENANT_PARTITIONS_QUERY = """SELECT create_tenant_partitions($1);"""
+"""Query to create the partitions of a source_app, the number of partitions created"""
+
+PARTITION_TENANTS_QUERY = """SELECT source_app FROM "partition_tenants";"""
+"""Query to read the source_app that have their own partitions"""
+
+# ---------------------------------------------------------------------------------------------------------
+
+
+RETENTION_LOCK_QUERY = """SELECT pg_try_advisory_lock(hashtext('retention'));"""
+"""Query to elect the worker that deletes the expired data, the lock is held by its
+connection until it closes"""
+
+RETENTION_LOCK_TIMEOUT_QUERY = """SET LOCAL lock_timeout = {timeout};"""
+"""Query to give up a batch of the retention instead of waiting for the locks of the
+table, milliseconds"""
+
+DELETE_EXPIRED_ROWS_QUERY = """
+                WITH batch AS (
+                SELECT DISTINCT {key} FROM "{table}"
+                WHERE {column} < {bound} AND {key} > $2 ORDER BY {key} LIMIT $3
+                ), deleted AS (
+                DELETE FROM "{table}" AS t USING batch
+                WHERE t.{key} = batch.{key} AND t.{column} < {bound}
+                RETURNING pg_column_size(t.*) AS bytes
+                ) SELECT (SELECT count(*) FROM deleted) AS rows,
+                (SELECT COALESCE(sum(bytes), 0) FROM deleted)::bigint AS bytes,
+                (SELECT max({key}) FROM batch) AS last;"""
+"""Query to delete the expired rows of a batch of keys, following the last key of the
+previous batch: $1 the oldest time kept, $2 the last key and $3 the keys of the batch.
+The bytes of the rows deleted can be reused once the table is vacuumed"""
+
+TABLE_BYTES_QUERY = """
+                SELECT COALESCE(sum(pg_total_relation_size(relid)), 0)::bigint
+                FROM pg_partition_tree(to_regclass($1)) WHERE isleaf;"""
+"""Query to read the bytes of a table and of its indexes, summed over its partitions"""
+
+VACUUM_RUNNING_QUERY = """
+                SELECT EXISTS (
+                SELECT 1 FROM pg_stat_progress_vacuum AS v
+                JOIN pg_partition_tree(to_regclass($1)) AS p ON p.relid = v.relid
+                );"""
+"""Query to check if a table or one of its partitions is being vacuumed"""
+
+VACUUM_QUERY = """VACUUM (ANALYZE, SKIP_LOCKED) "{table}";"""
+"""Query to vacuum a table, the pages left all visible by the previous vacuums are skipped"""
+
+# ---------------------------------------------------------------------------------------------------------
+
+
+EXTRACTION_CACHE_CHANNEL = "extraction_cache"
+"""Channel notified with the source_app and company_code of the stored journeys"""
+
+NOTIFY_EXTRACTION_CACHE_QUERY = """
+                SELECT pg_notify('extraction_cache', tenant) FROM unnest($1::text[]) AS tenant;"""
+"""Query to invalidate, once the transaction commits, the extractions cached by every worker"""
+
 # ---------------------------------------------------------------------------------------------------------
@@ -0,0 +1,469 @@
+"""
+Schema migrations module
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+from typing import List, NamedTuple, Tuple
+
+# Third Party
+from asyncpg import connect, Connection
+
+# Internal
+from .constants import (
+    CREATE_USER_DATA_TABLE_QUERY,
+    CREATE_USER_POSITIONS_TABLE_QUERY,
+    CREATE_USER_SENSORS_TABLE_QUERY,
+    CREATE_USER_TRACES_TABLE_QUERY,
+    CREATE_USER_BEHAVIOURS_TABLE_QUERY,
+    CREATE_IOT_DATA_TABLE_QUERY,
+    UPDATE_USER_SENSORS_QUERY,
+    CREATE_USER_SENSORS_DECODED_VIEW_QUERY,
+    UPDATE_USER_DATA_QUERY,
+    BACKFILL_USER_DATA_DURATION_QUERY,
+    CREATE_USER_DATA_ROLLUP_QUERY,
+    CREATE_USER_BEHAVIOURS_ROLLUP_QUERY,
+    FILL_USER_DATA_ROLLUP_QUERY,
+    FILL_USER_BEHAVIOURS_ROLLUP_QUERY,
+    UPDATE_USER_DATA_CELLS_QUERY,
+    CREATE_GRID_CELLS_FUNCTION_QUERY,
+    BACKFILL_USER_DATA_CELLS_QUERY,
+    SCHEMA_MIGRATIONS_LOCK_QUERY,
+    SCHEMA_MIGRATIONS_UNLOCK_QUERY,
+    CREATE_SCHEMA_MIGRATIONS_QUERY,
+    SCHEMA_MIGRATIONS_EXIST_QUERY,
+    SCHEMA_MIGRATIONS_QUERY,
+    TABLE_EXISTS_QUERY,
+    TABLE_HAS_ROWS_QUERY,
+    INSERT_SCHEMA_MIGRATION_QUERY,
+    INVALID_INDEX_QUERY,
+    CREATE_INDEX_CONCURRENTLY_QUERY,
+    DROP_INDEX_CONCURRENTLY_QUERY,
+    PARTITIONED_QUERY,
+    CREATE_PARTITIONED_INDEX_QUERY,
+    PARTITIONS_INDEXES_QUERY,
+    ATTACH_PARTITION_INDEX_QUERY,
+    DROP_INDEX_QUERY,
+    PARTITIONS_QUERY,
+    PARTITION_TABLE_QUERY,
+    CREATE_USER_DATA_PARTITIONED_INDEXES_QUERY,
+    CREATE_MONTH_PARTITION_FUNCTION_QUERY,
+    CREATE_UNPARTITIONED_MONTHS_PARTITIONS_QUERY,
+    MOVE_USER_DATA_UNPARTITIONED_QUERY,
+    MOVE_UNPARTITIONED_ROWS_QUERY,
+    DROP_UNPARTITIONED_TABLE_QUERY,
+    TENANT_KEYS_QUERY,
+    CREATE_PARTITION_TENANTS_TABLE_QUERY,
+    CREATE_TENANT_PARTITION_FUNCTION_QUERY,
+    CREATE_TENANT_MONTH_PARTITION_FUNCTION_QUERY,
+    CREATE_TENANT_PARTITIONS_FUNCTION_QUERY,
+)
+from .partitions import PARTITIONED_TABLES
+from ..config import get_database_settings
+
+# --------------------------------------------------------------------------------------------
+
+
+class OnlineIndex(NamedTuple):
+    """Index built concurrently, without locking the writes of its table"""
+
+    name: str
+    table: str
+    columns: str
+    """Method and columns of the index"""
+
+
+class Migration(NamedTuple):
+    """
+    Version of the schema. Its steps are idempotent, so the databases created
+    before the migrations reach the same schema, and they run in order: the
+    schema in a single transaction, the backfills a batch at a time, then the
+    indexes are built and dropped concurrently. The workers don't start until
+    the migrations are applied, the ones that move the rows of a table are
+    applied offline by running this module before deploying them
+    """
+
+    version: int
+    name: str
+    schema: Tuple[str, ...] = ()
+    """Statements applied in a single transaction"""
+    backfills: Tuple[str, ...] = ()
+    """Queries that fill a batch of User_Data: last journey_id and rows of the batch"""
+    indexes: Tuple[OnlineIndex, ...] = ()
+    """Indexes built concurrently"""
+    dropped_indexes: Tuple[str, ...] = ()
+    """Indexes dropped concurrently"""
+    offline: Tuple[str, ...] = ()
+    """Tables whose rows are moved, the workers refuse to start if they have any"""
+
+
+MIGRATIONS = (
+    Migration(
+        1,
+        "tables",
+        schema=(
+            CREATE_USER_DATA_TABLE_QUERY,
+            CREATE_USER_POSITIONS_TABLE_QUERY,
+            CREATE_USER_SENSORS_TABLE_QUERY,
+            CREATE_USER_TRACES_TABLE_QUERY,
+            CREATE_USER_BEHAVIOURS_TABLE_QUERY,
+            CREATE_IOT_DATA_TABLE_QUERY,
+        ),
+    ),
+    Migration(
+        2,
+        "user_sensors_typed",
+        schema=(UPDATE_USER_SENSORS_QUERY, CREATE_USER_SENSORS_DECODED_VIEW_QUERY),
+    ),
+    Migration(
+        3,
+        "user_data_duration",
+        schema=(UPDATE_USER_DATA_QUERY,),
+        backfills=(BACKFILL_USER_DATA_DURATION_QUERY,),
+        indexes=(OnlineIndex("user_data_duration", "user_data", "(duration)"),),
+    ),
+    Migration(
+        4,
+        "rollups",
+        schema=(
+            CREATE_USER_DATA_ROLLUP_QUERY,
+            CREATE_USER_BEHAVIOURS_ROLLUP_QUERY,
+            FILL_USER_DATA_ROLLUP_QUERY,
+            FILL_USER_BEHAVIOURS_ROLLUP_QUERY,
+        ),
+    ),
+    Migration(
+        5,
+        "user_data_page",
+        indexes=(
+            OnlineIndex(
+                "user_data_page",
+                "user_data",
+                "(source_app, company_code, start_date, journey_id)",
+            ),
+        ),
+    ),
+    Migration(
+        6,
+        "user_data_cells",
+        schema=(UPDATE_USER_DATA_CELLS_QUERY, CREATE_GRID_CELLS_FUNCTION_QUERY),
+        backfills=(BACKFILL_USER_DATA_CELLS_QUERY,),
+        indexes=(
+            OnlineIndex(
+                "user_data_start_cells", "user_data", "USING gin (start_cells)"
+            ),
+            OnlineIndex("user_data_end_cells", "user_data", "USING gin (end_cells)"),
+        ),
+    ),
+    Migration(
+        7,
+        "filters_indexes",
+        # The starting filters are served by user_data_page
+        indexes=(
+            OnlineIndex(
+                "user_data_end", "user_data", "(source_app, company_code, end_date)"
+            ),
+        ),
+        # The behaviours and the positions are always joined by their primary key
+        dropped_indexes=(
+            "user_data_index_b_tree",
+            "user_positions_index_b_tree",
+            "user_behaviours_index_b_tree",
+            "user_data_source_app",
+            "user_data_company_code",
+            "user_data_company_trip_type",
+            "user_data_main_type_space",
+            "user_data_main_type_time",
+            "user_behaviours_source_app",
+            "user_behaviours_mode",
+            "user_behaviours_type",
+        ),
+    ),
+    Migration(
+        8,
+        "time_partitions",
+        # The tables of the journeys are partitioned by month of their start_date.
+        # Every journey is moved while the other workers would wait for the lock,
+        # and the extractions can't read the journeys not moved yet: the workers
+        # don't start until it's applied with python -m app.db.migrations
+        schema=(
+            PARTITION_TABLE_QUERY.format(
+                table="user_data", columns="", primary_key="journey_id, start_date"
+            ),
+            PARTITION_TABLE_QUERY.format(
+                table="user_positions",
+                columns=", start_date bigint",
+                primary_key="journey_id, time, start_date",
+            ),
+            PARTITION_TABLE_QUERY.format(
+                table="user_behaviours",
+                columns=", start_date bigint",
+                primary_key="journey_id, mode, pos, start_date",
+            ),
+            PARTITION_TABLE_QUERY.format(
+                table="user_sensors",
+                columns=", start_date bigint",
+                primary_key="journey_id, time, name, start_date",
+            ),
+            CREATE_USER_DATA_PARTITIONED_INDEXES_QUERY,
+            CREATE_USER_SENSORS_DECODED_VIEW_QUERY,
+            CREATE_MONTH_PARTITION_FUNCTION_QUERY,
+            CREATE_UNPARTITIONED_MONTHS_PARTITIONS_QUERY,
+        ),
+        # User_Data first, the other tables take the start_date of its journeys
+        backfills=(
+            MOVE_USER_DATA_UNPARTITIONED_QUERY,
+            *(
+                MOVE_UNPARTITIONED_ROWS_QUERY.format(table=table)
+                for table in PARTITIONED_TABLES[1:]
+            ),
+        ),
+        offline=("user_data", "user_data_unpartitioned"),
+    ),
+    Migration(
+        9,
+        "drop_unpartitioned",
+        schema=tuple(
+            DROP_UNPARTITIONED_TABLE_QUERY.format(table=table)
+            for table in PARTITIONED_TABLES
+        ),
+    ),
+    Migration(
+        10,
+        "tenant_partitions",
+        # The months can be list partitioned by the source_app of the journeys
+        schema=(
+            TENANT_KEYS_QUERY,
+            CREATE_PARTITION_TENANTS_TABLE_QUERY,
+            CREATE_TENANT_PARTITION_FUNCTION_QUERY,
+            CREATE_TENANT_MONTH_PARTITION_FUNCTION_QUERY,
+            CREATE_TENANT_PARTITIONS_FUNCTION_QUERY,
+        ),
+    ),
+)
+"""Migrations of the schema, in order of version"""
+
+LOCK_DELAY = 0.5
+"""Seconds to wait before trying again to elect the worker that migrates"""
+
+# --------------------------------------------------------------------------------------------
+
+
+async def applied_migrations(conn: Connection) -> List[int]:
+    """
+    :param conn: connection to the database
+    :return: versions of the migrations applied to the database
+    """
+    if not await conn.fetchval(SCHEMA_MIGRATIONS_EXIST_QUERY):
+        return []
+    return [record["version"] for record in await conn.fetch(SCHEMA_MIGRATIONS_QUERY)]
+
+
+async def migrate(conn: Connection, offline: bool = False) -> List[int]:
+    """
+    Apply the migrations missing from the database, one worker at a time. The
+    other workers poll the lock instead of waiting for it in a statement, since
+    the concurrent builds of the indexes wait for every open transaction
+
+    :param conn: connection to the database, outside of any transaction
+    :param offline: True to apply the offline migrations too
+    :return: versions of the migrations applied
+    :raise RuntimeError: if an offline migration has rows to move
+    """
+    applied = set(await applied_migrations(conn))
+    if all(migration.version in applied for migration in MIGRATIONS):
+        return []
+
+    if not offline:
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            # A new database has no row to move, it's migrated by the workers
+            for table in migration.offline:
+                if await has_rows(conn, table):
+                    raise RuntimeError(
+                        f"Migration {migration.version} {migration.name} moves "
+                        f"the rows of {table}, apply it before starting the "
+                        "workers with python -m app.db.migrations"
+                    )
+
+    while not await conn.fetchval(SCHEMA_MIGRATIONS_LOCK_QUERY):
+        await asyncio.sleep(LOCK_DELAY)
+    try:
+        await conn.execute(CREATE_SCHEMA_MIGRATIONS_QUERY)
+        # Another worker could have migrated while waiting for the lock
+        applied = set(await applied_migrations(conn))
+        migrated = []
+        for migration in MIGRATIONS:
+            if migration.version not in applied:
+                await apply_migration(conn, migration)
+                migrated.append(migration.version)
+        return migrated
+    finally:
+        await conn.execute(SCHEMA_MIGRATIONS_UNLOCK_QUERY)
+
+
+async def has_rows(conn: Connection, table: str) -> bool:
+    """
+    :param conn: connection to the database
+    :param table: table that could be missing
+    :return: True if the table exists and has any row
+    """
+    if not await conn.fetchval(TABLE_EXISTS_QUERY, table):
+        return False
+    return await conn.fetchval(TABLE_HAS_ROWS_QUERY.format(table=table))
+
+
+async def apply_migration(conn: Connection, migration: Migration) -> None:
+    """
+    Apply every step of a migration and record it, a failed migration is applied
+    again by the next startup
+
+    :param conn: connection to the database, outside of any transaction
+    :param migration: migration to apply
+    """
+    async with conn.transaction():
+        for statement in migration.schema:
+            await conn.execute(statement)
+
+    for backfill in migration.backfills:
+        await backfill_batches(conn, backfill)
+
+    for index in migration.indexes:
+        await build_index(conn, index)
+
+    for name in migration.dropped_indexes:
+        await drop_index(conn, name)
+
+    await conn.execute(INSERT_SCHEMA_MIGRATION_QUERY, migration.version, migration.name)
+
+
+async def backfill_batches(conn: Connection, backfill: str) -> None:
+    """
+    Fill the rows of User_Data a batch at a time, every batch in its own
+    transaction so the rows are never locked for long
+
+    :param conn: connection to the database, outside of any transaction
+    :param backfill: query that fills a batch and returns its journey_id
+    """
+    batch_rows = get_database_settings().backfill_batch_rows
+    last_journey_id = ""
+    while True:
+        filled = await conn.fetch(backfill, last_journey_id, batch_rows)
+        if len(filled) < batch_rows:
+            return
+        last_journey_id = max(record["journey_id"] for record in filled)
+
+
+async def build_index(conn: Connection, index: OnlineIndex) -> None:
+    """
+    Build an index concurrently, an index left invalid by a failed build is
+    dropped and built again
+
+    :param conn: connection to the database, outside of any transaction
+    :param index: index to build
+    """
+    if await conn.fetchval(PARTITIONED_QUERY, index.table):
+        await build_partitioned_index(conn, index)
+        return
+
+    if await conn.fetchval(INVALID_INDEX_QUERY, index.name):
+        await conn.execute(DROP_INDEX_CONCURRENTLY_QUERY.format(name=index.name))
+    await conn.execute(
+        CREATE_INDEX_CONCURRENTLY_QUERY.format(
+            name=index.name, table=index.table, columns=index.columns
+        )
+    )
+
+
+async def build_partitioned_index(conn: Connection, index: OnlineIndex) -> None:
+    """
+    Build the index of a partitioned table, that can't be built concurrently:
+    it's created without the indexes of the partitions, then the index of every
+    partition is built concurrently and attached to it. It becomes valid once
+    every partition attached its own, the partitions created meanwhile build it
+    when they are attached to the table
+
+    :param conn: connection to the database, outside of any transaction
+    :param index: index to build
+    """
+    await conn.execute(
+        CREATE_PARTITIONED_INDEX_QUERY.format(
+            name=index.name, table=index.table, columns=index.columns
+        )
+    )
+    attached = {
+        record["relname"]
+        for record in await conn.fetch(PARTITIONS_INDEXES_QUERY, index.name)
+    }
+    for record in await conn.fetch(PARTITIONS_QUERY, index.table):
+        partition = record["relname"]
+        if partition in attached:
+            continue
+        # Named after the index and the partition, like user_data_end_202101
+        partition_index = index.name + partition[len(index.table) :]
+        await build_index(conn, OnlineIndex(partition_index, partition, index.columns))
+        await conn.execute(
+            ATTACH_PARTITION_INDEX_QUERY.format(
+                name=index.name, partition_index=partition_index
+            )
+        )
+
+
+async def drop_index(conn: Connection, name: str) -> None:
+    """
+    Drop an index concurrently, a partitioned index can't be: it's dropped
+    together with the indexes of the partitions
+
+    :param conn: connection to the database, outside of any transaction
+    :param name: index to drop
+    """
+    if await conn.fetchval(PARTITIONED_QUERY, name):
+        await conn.execute(DROP_INDEX_QUERY.format(name=name))
+    else:
+        await conn.execute(DROP_INDEX_CONCURRENTLY_QUERY.format(name=name))
+
+
+async def migrate_offline() -> List[int]:
+    """
+    Apply the migrations missing from the database before deploying the workers,
+    so they start without waiting for the offline ones
+
+    :return: versions of the migrations applied
+    """
+    settings = get_database_settings()
+    conn = await connect(
+        user=settings.postgres_user,
+        password=settings.postgres_pwd,
+        database=settings.postgres_db,
+        host=settings.postgres_host,
+        port=settings.postgres_port,
+    )
+    try:
+        return await migrate(conn, offline=True)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    print({"migrated": asyncio.run(migrate_offline())})
@@ -0,0 +1,164 @@
+"""
+Partitions module
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+
+# Standard Library
+from datetime import date, datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+# Third Party
+from asyncpg import Connection
+
+# Internal
+from .constants import (
+    CREATE_MONTH_PARTITION_QUERY,
+    PARTITIONS_QUERY,
+    DROP_PARTITION_QUERY,
+    CREATE_TENANT_MONTH_PARTITION_QUERY,
+    CREATE_TENANT_PARTITIONS_QUERY,
+    PARTITION_TENANTS_QUERY,
+)
+
+# --------------------------------------------------------------------------------------------
+
+PARTITIONED_TABLES = ("user_data", "user_positions", "user_behaviours", "user_sensors")
+"""
+Tables range partitioned by the start_date of their journeys, a partition every
+month named after it, like user_data_202101. The rows of the months without a
+partition are stored in the default partition, like user_data_default
+"""
+
+TENANT_PARTITIONED_TABLES = ("user_data", "user_behaviours")
+"""
+Tables whose months are list partitioned by source_app in the tenant layout, a
+partition every source_app named after its id, like user_data_202101_t1, and
+a default one, like user_data_202101_default. The positions and the sensors
+don't store the source_app: they are read by journey through their primary key
+"""
+
+
+def add_months(month: date, months: int) -> date:
+    """
+    :param month: first day of a month
+    :param months: months to add
+    :return: first day of the month
+    """
+    months += month.year * 12 + month.month - 1
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def month_start(month: date) -> int:
+    """
+    :param month: first day of a month
+    :return: first ms of the month, the lower bound of its partitions
+    """
+    return (
+        int(datetime(month.year, month.month, 1, tzinfo=timezone.utc).timestamp())
+        * 1000
+    )
+
+
+def partition_month(partition: str) -> Optional[date]:
+    """
+    :param partition: name of a partition
+    :return: month of the partition, None if it isn't the partition of a month
+    """
+    suffix = partition.rsplit("_", 1)[-1]
+    if len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+async def create_partitions(
+    conn: Connection, months_ahead: int, tenants: bool = False
+) -> List[str]:
+    """
+    Create the partitions of the current month and of the next ones, so the
+    journeys are never stored in the default partitions. The workers create
+    them one at a time, every month in its own transaction. In the tenant layout
+    the existing partitions of these months are list partitioned by source_app
+    too, the previous months keep their layout
+
+    :param conn: connection to the database, outside of any transaction
+    :param months_ahead: months after the current one
+    :param tenants: True to list partition the months by source_app
+    :return: partitions created
+    """
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    created = []
+    for month in (add_months(current, months) for months in range(months_ahead + 1)):
+        async with conn.transaction():
+            for table in PARTITIONED_TABLES:
+                query = CREATE_MONTH_PARTITION_QUERY
+                if tenants and table in TENANT_PARTITIONED_TABLES:
+                    query = CREATE_TENANT_MONTH_PARTITION_QUERY
+                if await conn.fetchval(query, table, month):
+                    created.append(f"{table}_{month:%Y%m}")
+    return created
+
+
+async def create_tenant_partitions(conn: Connection, source_app: str) -> int:
+    """
+    Create the partitions of a source_app in every month list partitioned by
+    source_app, before storing its first journeys. The journeys stored without
+    them end up in the default partitions and are moved once they are created
+
+    :param conn: connection to the database, outside of any transaction
+    :param source_app: source of the journeys
+    :return: number of partitions created
+    """
+    return await conn.fetchval(CREATE_TENANT_PARTITIONS_QUERY, source_app)
+
+
+async def partition_tenants(conn: Connection) -> Set[str]:
+    """
+    :param conn: connection to the database
+    :return: source_app that have their own partitions
+    """
+    return {
+        record["source_app"] for record in await conn.fetch(PARTITION_TENANTS_QUERY)
+    }
+
+
+async def drop_partitions(
+    conn: Connection, before: int, tables: Tuple[str, ...] = PARTITIONED_TABLES
+) -> List[str]:
+    """
+    Drop the partitions of the months that ended before a time, the whole
+    journeys of a month are dropped together without deleting their rows
+
+    :param conn: connection to the database
+    :param before: time in ms
+    :param tables: partitioned tables whose partitions are dropped
+    :return: partitions dropped
+    """
+    dropped = []
+    for table in tables:
+        for record in await conn.fetch(PARTITIONS_QUERY, table):
+            month = partition_month(record["relname"])
+            if month is None or month_start(add_months(month, 1)) > before:
+                continue
+            await conn.execute(DROP_PARTITION_QUERY.format(partition=record["relname"]))
+            dropped.append(record["relname"])
+    return dropped
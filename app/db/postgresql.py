@@ -23,59 +23,146 @@ Database utility functions
 """
 
 # Standard library
+import asyncio
+import time
 from functools import lru_cache
-from typing import List
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 # Third party
+import orjson
 from asyncpg import create_pool, connect, Connection
 from asyncpg.exceptions import (
     PostgresError,
+    DataError,
     DuplicateDatabaseError,
     InvalidCatalogNameError,
+    InterfaceError,
+    PostgresConnectionError,
+    CannotConnectNowError,
+    TooManyConnectionsError,
+    AdminShutdownError,
 )
 from asyncpg.pool import Pool
 from fastapi import status, HTTPException
 
 # Internal
+from .migrations import migrate
+from .partitions import (
+    create_partitions,
+    create_tenant_partitions,
+    partition_tenants,
+)
+from .statements import get_statement_stats
 from .constants import (
     INSERT_USER_DATA_QUERY,
     INSERT_USER_SENSORS_QUERY,
     INSERT_USER_POSITIONS_QUERY,
     INSERT_USER_BEHAVIOURS_QUERY,
+    INSERT_USER_TRACES_QUERY,
     INSERT_IOT_DATA_QUERY,
+    INSERT_IOT_DATA_BATCH_QUERY,
+    USER_DATA_COLUMNS,
+    USER_POSITIONS_COLUMNS,
+    USER_BEHAVIOURS_COLUMNS,
+    USER_SENSORS_COLUMNS,
+    USER_TRACES_COLUMNS,
+    CREATE_USER_SENSORS_STAGING_QUERY,
+    MERGE_USER_SENSORS_STAGING_QUERY,
+    INSERT_USER_SENSORS_TYPED_QUERY,
+    USER_SENSORS_TYPED_COLUMNS,
+    MERGE_USER_SENSORS_TYPED_STAGING_QUERY,
+    NOTIFY_EXTRACTION_CACHE_QUERY,
+    STORED_JOURNEYS_QUERY,
+    UPSERT_USER_DATA_ROLLUP_QUERY,
+    UPSERT_USER_BEHAVIOURS_ROLLUP_QUERY,
 )
 
-from ..config import get_database_settings
+from ..config import (
+    get_cache_settings,
+    get_database_settings,
+    get_ingest_settings,
+    InsertEngine,
+    TraceStorage,
+)
 from ..internals.database import (
     partial_mobility_format,
-    all_positions_and_complete_mobility_format,
-    user_data_generation,
-    user_positions_generation,
-    user_sensors_generation,
+    journeys_within_radius,
+    statistics_format,
+    user_data_stream_generation,
+    position_row_generation,
+    sensor_row_generation,
+    sensor_typed_row_generation,
+    user_sensors_table,
+    user_traces_generation,
+    user_traces_positions,
+    rows_chunks_generation,
     user_behaviours_generation,
+    user_rows_generation,
+    user_rollups_generation,
     iot_data_generation,
 )
 
+from ..internals.extraction_cache import get_extraction_cache
 from ..internals.logger import get_logger
+from ..internals.page_cursor import encode_page_cursor
+from ..internals.pseudonyms import JourneyPseudonyms
 from ..models.user_feed.behaviour import Behaviour
 from ..models.track import RequestType
 from ..models.iot_feed.iot import IotInput
-from ..models.user_feed.user import UserFeedInternal
+from ..models.user_feed.position import TraceInformation
+from ..models.user_feed.user import UserFeedInternal, UserFeedStream
 
 # ---------------------------------------------------------------------------------------
 
 
+DATABASE_UNAVAILABLE_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    InterfaceError,
+    PostgresConnectionError,
+    CannotConnectNowError,
+    TooManyConnectionsError,
+    AdminShutdownError,
+)
+"""Errors raised when the database can't be reached, rather than refusing the data"""
+
+
+def database_unavailable(error: Exception) -> bool:
+    """
+    :param error: error raised storing data
+    :return: True if the data could be stored once the database is reachable again,
+    False if the database or the validation refused them
+    """
+    if isinstance(error, HTTPException):
+        return error.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    return isinstance(error, DATABASE_UNAVAILABLE_ERRORS)
+
+
 class DataBase:
     pool: Pool = None
     """Connection pool to the database"""
+    partition_maintenance: Optional[asyncio.Task] = None
+    """Background task that creates the partitions of the next months"""
+    tenants: Set[str] = set()
+    """source_app whose partitions exist in the tenant layout"""
 
     format_user_extraction = {
         RequestType.partial_mobility: partial_mobility_format,
-        RequestType.all_positions: all_positions_and_complete_mobility_format,
-        RequestType.complete_mobility: all_positions_and_complete_mobility_format,
     }
     """Format methods for user extraction"""
 
+    pseudonymize_user_extraction = {
+        RequestType.all_positions: JourneyPseudonyms,
+        RequestType.complete_mobility: JourneyPseudonyms,
+    }
+    """
+    Format of the user extractions whose journeys are pseudonymized, built with
+    the key of every extraction and kept by every chunk of the streamed ones
+    """
+
+    STREAM_TRACES_JOURNEYS = 10
+    """Traces decoded at a time by a stream, every trace holds a whole journey"""
+
     no_format_user_extraction_needed = {
         RequestType.stats_num_tracks,
         RequestType.stats_avg_space,
@@ -83,6 +170,12 @@ class DataBase:
     }
     """No methods for format needed"""
 
+    statistics_buckets = {
+        RequestType.inter_modality_space: "distance",
+        RequestType.inter_modality_time: "time",
+    }
+    """Name of the buckets of the statistics"""
+
     _store_single_row = {
         "user_data": INSERT_USER_DATA_QUERY,
         "iot_data": INSERT_IOT_DATA_QUERY,
@@ -90,12 +183,43 @@ class DataBase:
     """Query to insert a single row to a specific table"""
 
     _store_multiple_rows = {
+        "user_data": INSERT_USER_DATA_QUERY,
         "user_positions": INSERT_USER_POSITIONS_QUERY,
         "user_behaviours": INSERT_USER_BEHAVIOURS_QUERY,
         "user_sensors": INSERT_USER_SENSORS_QUERY,
+        "user_sensors_typed": INSERT_USER_SENSORS_TYPED_QUERY,
+        "user_traces": INSERT_USER_TRACES_QUERY,
     }
     """Query to insert multiple rows to a specific table"""
 
+    _upsert_rollup_rows = {
+        "user_data_rollup": UPSERT_USER_DATA_ROLLUP_QUERY,
+        "user_behaviours_rollup": UPSERT_USER_BEHAVIOURS_ROLLUP_QUERY,
+    }
+    """Query to add rows to a specific rollup table"""
+
+    _copy_multiple_rows = {
+        "user_data": ("user_data", USER_DATA_COLUMNS),
+        "user_positions": ("user_positions", USER_POSITIONS_COLUMNS),
+        "user_behaviours": ("user_behaviours", USER_BEHAVIOURS_COLUMNS),
+        "user_sensors": ("user_sensors_staging", USER_SENSORS_COLUMNS),
+        "user_sensors_typed": ("user_sensors_staging", USER_SENSORS_TYPED_COLUMNS),
+        "user_traces": ("user_traces", USER_TRACES_COLUMNS),
+    }
+    """Table and columns used to COPY multiple rows to a specific table"""
+
+    _merge_copied_rows = {
+        "user_sensors": (
+            CREATE_USER_SENSORS_STAGING_QUERY,
+            MERGE_USER_SENSORS_STAGING_QUERY,
+        ),
+        "user_sensors_typed": (
+            CREATE_USER_SENSORS_STAGING_QUERY,
+            MERGE_USER_SENSORS_TYPED_STAGING_QUERY,
+        ),
+    }
+    """Staging queries of the tables that need an ON CONFLICT clause"""
+
     @classmethod
     async def connect(cls) -> None:
         """
@@ -112,11 +236,10 @@ class DataBase:
                 host=settings.postgres_host,
                 port=settings.postgres_port,
                 max_size=settings.connection_number,
+                statement_cache_size=settings.statement_cache_size,
             )
 
         except InvalidCatalogNameError:
-            # Flag that indicates if the tables must be created
-            create_tables = True
             # Connect to Database template
             sys_conn = await connect(
                 host=settings.postgres_host,
@@ -131,8 +254,8 @@ class DataBase:
                     f'CREATE DATABASE "{settings.postgres_db}" OWNER "{settings.postgres_user}";'
                 )
             except DuplicateDatabaseError:
-                # Another process created the database so set create_tables to False
-                create_tables = False
+                # Another process created the database
+                pass
 
             finally:
                 # Disconnect from database template
@@ -146,189 +269,23 @@ class DataBase:
                 host=settings.postgres_host,
                 port=settings.postgres_port,
                 max_size=settings.connection_number,
+                statement_cache_size=settings.statement_cache_size,
             )
 
-            # Check if the tables must be created
-            if create_tables:
-                async with cls.pool.acquire() as connection:
-                    # Create tables
-                    await cls.__create_table_user_data(connection)
-                    await cls.__create_table_user_positions(connection)
-                    await cls.__create_table_user_sensors(connection)
-                    await cls.__create_table_user_behaviours(connection)
-                    await cls.__create_table_iot_data(connection)
-
-    @staticmethod
-    async def __create_table_user_data(sys_conn: Connection):
-        """
-        Create a table to store user data
-
-        :param sys_conn: connection to the database
-        """
-        await sys_conn.execute(
-            """
-               CREATE TABLE IF NOT EXISTS "user_data" (
-               journey_id text,
-               source_app text,
-               company_code text,
-               PRIMARY KEY (journey_id),
-               company_trip_type text,
-               distance integer,
-               elapsed_time text,
-               end_date bigint,
-               id text,
-               main_type_space text,
-               main_type_time text,
-               start_date bigint,
-               start_lat float,
-               start_lon float,
-               end_lat float,
-               end_lon float
-               );
-                """
-        )
-
-        await sys_conn.execute(
-            """CREATE INDEX user_data_index_b_tree on "user_data" (
-            distance,
-            elapsed_time,
-            start_lat,
-            start_lon,
-            end_lat,
-            end_lon,
-            start_date,
-            end_date);"""
-        )
-        for hash_key in (
-            "source_app",
-            "company_code",
-            "company_trip_type",
-            "main_type_space",
-            "main_type_time",
-        ):
-            await sys_conn.execute(
-                f"""CREATE INDEX user_data_{hash_key} on "user_data" USING hash ({hash_key});"""
+        # Create the tables or bring them to the last version of the schema
+        async with cls.pool.acquire() as connection:
+            await migrate(connection)
+            await create_partitions(
+                connection, settings.partition_months_ahead, settings.tenant_partitions
             )
-
-    @staticmethod
-    async def __create_table_user_positions(sys_conn: Connection):
-        """
-        Create a table to store user positions
-
-        :param sys_conn: connection to the database
-        """
-        await sys_conn.execute(
-            """CREATE TABLE IF NOT EXISTS "user_positions" (
-               journey_id text,
-               time bigint,
-               PRIMARY KEY (journey_id, time),
-               authenticity integer,
-               lat float,
-               lon float,
-               partial_distance integer
-               );
-                """
-        )
-
-        await sys_conn.execute(
-            """CREATE INDEX user_positions_index_b_tree on "user_positions" (
-            time,
-            lat,
-            lon,
-            partial_distance);"""
-        )
-
-    @staticmethod
-    async def __create_table_user_sensors(sys_conn: Connection):
-        """
-        Create a table to store user sensors
-
-        :param sys_conn: connection to the database
-        """
-        await sys_conn.execute(
-            """
-               CREATE TABLE IF NOT EXISTS "user_sensors" (
-               journey_id text,
-               time bigint,
-               name text,
-               data jsonb,
-               PRIMARY KEY (journey_id, time, name)
-               );
-                """
-        )
-
-    @staticmethod
-    async def __create_table_user_behaviours(sys_conn: Connection):
-        """
-        Create a table to store user behaviours
-
-        :param sys_conn: connection to the database
-        """
-        await sys_conn.execute(
-            """
-               CREATE TABLE IF NOT EXISTS "user_behaviours" (
-               journey_id text,
-               source_app text,
-               mode text,
-               pos integer,
-               type text,
-               PRIMARY KEY (journey_id, mode, pos),
-               meters integer,
-               accuracy float,
-               start_auth integer,
-               start_lat float,
-               start_lon float,
-               start_partial_distance integer,
-               start_time bigint,
-               end_auth float,
-               end_lat float,
-               end_lon float,
-               end_partial_distance integer,
-               end_time bigint 
-               );
-                """
-        )
-
-        await sys_conn.execute(
-            """CREATE INDEX user_behaviours_index_b_tree on "user_behaviours" (
-            meters,
-            start_lat,
-            start_lon,
-            end_lat,
-            end_lon,
-            start_time,
-            end_time);"""
-        )
-
-        for hash_key in ("source_app", "mode", "type"):
-            await sys_conn.execute(
-                f"""CREATE INDEX user_behaviours_{hash_key} on "user_behaviours" USING hash ({hash_key});"""
+            if settings.tenant_partitions:
+                cls.tenants = await partition_tenants(connection)
+        cls.partition_maintenance = asyncio.create_task(
+            cls.__maintain_partitions(
+                settings.partition_months_ahead,
+                settings.partition_maintenance_interval,
+                settings.tenant_partitions,
             )
-
-    @staticmethod
-    async def __create_table_iot_data(sys_conn: Connection):
-        """
-        Create a table to store iot data
-
-        :param sys_conn: connection to the database
-        """
-        await sys_conn.execute(
-            """
-               CREATE TABLE IF NOT EXISTS "iot_data" (
-               result_time timestamp with time zone,
-               datastream int,
-               feature_of_interest int,
-               phenomenon_time timestamp with time zone,
-               observation_gep_id text,
-               result_auth integer,
-               value_type text,
-               position_type text,
-               position_lat float,
-               position_lon float,
-               response_value float,
-               PRIMARY KEY (observation_gep_id)
-               );
-                """
         )
 
     @classmethod
@@ -336,49 +293,148 @@ class DataBase:
         """
         Disconnect from the database
         """
+        if cls.partition_maintenance is not None:
+            cls.partition_maintenance.cancel()
+            try:
+                await cls.partition_maintenance
+            except asyncio.CancelledError:
+                pass
+            cls.partition_maintenance = None
         await cls.pool.close()
 
+    @classmethod
+    async def __maintain_partitions(
+        cls, months_ahead: int, interval: float, tenants: bool
+    ) -> None:
+        """
+        Keep creating the partitions of the next months while the worker runs
+
+        :param months_ahead: months after the current one
+        :param interval: seconds between two checks
+        :param tenants: True to list partition the months by source_app
+        """
+        logger = get_logger()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with cls.pool.acquire() as connection:
+                    created = await create_partitions(connection, months_ahead, tenants)
+            except (PostgresError, *DATABASE_UNAVAILABLE_ERRORS) as error:
+                await logger.warning(
+                    msg={"partitions": "creation failed", "error": repr(error)}
+                )
+                continue
+            if created:
+                await logger.info(msg={"partitions": "created", "tables": created})
+
     @classmethod
     async def store_user(cls, user_feed: UserFeedInternal) -> dict:
         """
         Store user info in the database
         :param user_feed: data to store
         """
+        # Generate every row before acquiring a connection, so the transaction
+        # lasts only the time needed to send them
+        user_rows = user_rows_generation([user_feed])
+        rollup_rows = user_rollups_generation([user_feed])
+
         try:
             async with cls.pool.acquire() as conn:
+                await cls.__create_tenant_partitions(conn, [user_feed])
+                # One transaction: the journey costs a single commit and a failure
+                # doesn't leave a user_data row without its positions
+                async with conn.transaction():
+                    await cls.insert_user_rows(user_rows, conn)
+                    await cls.update_rollups(rollup_rows, conn)
+                    await cls.__notify_stored(conn, [user_feed])
+
+        except DATABASE_UNAVAILABLE_ERRORS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"resource": "USER", "status": "Database unavailable"},
+            )
+        except PostgresError:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={
+                    "resource": "USER",
+                    "status": "Something went wrong storing the data",
+                },
+            )
+        get_extraction_cache().invalidate(cls.__tenants([user_feed]))
+        return {"resource": "USER", "status": "Stored"}
 
-                # Store User Data
-                await cls.insert_single_row(
-                    user_data_generation(user_feed), conn, "user_data"
-                )
-
-                # Store User Positions
-                await cls.insert_multiple_rows(
-                    user_positions_generation(
-                        user_feed.trace_information, user_feed.journey_id
-                    ),
-                    conn,
-                    "user_positions",
-                )
+    @classmethod
+    async def store_user_stream(cls, user_feed: UserFeedStream) -> dict:
+        """
+        Store user info in the database converting positions and sensors
+        information in rows chunk by chunk, in a single transaction
 
-                # Store User Sensors
-                await cls.insert_multiple_rows(
-                    user_sensors_generation(
-                        user_feed.sensors_information, user_feed.journey_id
-                    ),
-                    conn,
-                    "user_sensors",
-                )
+        :param user_feed: data to store
+        :raise HTTPException: 422 if a position or a sensor information isn't valid
+        """
+        chunk_rows = get_ingest_settings().stream_chunk_rows
+        trace_storage = get_database_settings().trace_storage
+        # Positions collected to be compressed in a single blob
+        trace = TraceInformation()
+        user_sensors = user_sensors_table()
+        sensor_rows = {
+            "user_sensors": sensor_row_generation,
+            "user_sensors_typed": sensor_typed_row_generation,
+        }
+        user_data = user_data_stream_generation(user_feed)
+        user_behaviours = user_behaviours_generation(
+            user_feed.behaviour,
+            user_feed.journey_id,
+            user_feed.startDate,
+            user_feed.source_app,
+        )
 
-                # Store User Behaviours
-                await cls.insert_multiple_rows(
-                    user_behaviours_generation(
-                        user_feed.behaviour, user_feed.journey_id, user_feed.source_app
-                    ),
-                    conn,
-                    "user_behaviours",
-                )
+        try:
+            async with cls.pool.acquire() as conn:
+                await cls.__create_tenant_partitions(conn, [user_feed])
+                # An invalid element found while storing rolls back the journey
+                async with conn.transaction():
+                    await cls.insert_multiple_rows([user_data], conn, "user_data")
+                    for rows in rows_chunks_generation(
+                        user_feed.trace_information,
+                        position_row_generation,
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                        chunk_rows,
+                        "trace_information",
+                    ):
+                        if trace_storage != TraceStorage.blob:
+                            await cls.insert_multiple_rows(rows, conn, "user_positions")
+                        if trace_storage != TraceStorage.rows:
+                            trace.extend(row[2:] for row in rows)
+                    if trace_storage != TraceStorage.rows:
+                        await cls.insert_multiple_rows(
+                            [user_traces_generation(trace, user_feed.journey_id)],
+                            conn,
+                            "user_traces",
+                        )
+
+                    for rows in rows_chunks_generation(
+                        user_feed.sensors_information,
+                        sensor_rows[user_sensors],
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                        chunk_rows,
+                        "sensors_information",
+                    ):
+                        await cls.insert_multiple_rows(rows, conn, user_sensors)
+                    await cls.insert_multiple_rows(
+                        user_behaviours, conn, "user_behaviours"
+                    )
+                    await cls.update_rollups(user_rollups_generation([user_feed]), conn)
+                    await cls.__notify_stored(conn, [user_feed])
 
+        except DATABASE_UNAVAILABLE_ERRORS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"resource": "USER", "status": "Database unavailable"},
+            )
         except PostgresError:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -387,8 +443,208 @@ class DataBase:
                     "status": "Something went wrong storing the data",
                 },
             )
+        get_extraction_cache().invalidate(cls.__tenants([user_feed]))
         return {"resource": "USER", "status": "Stored"}
 
+    @classmethod
+    async def store_user_batch(cls, user_feeds: List[UserFeedInternal]) -> List[dict]:
+        """
+        Store a batch of user info in the database using set-based inserts, one
+        transaction every batch_transaction_journeys journeys.
+        If a transaction fails its journeys are stored one by one, so a bad
+        journey doesn't prevent the others from being stored
+
+        :param user_feeds: data to store
+        :return: outcome of every journey, in the same order of user_feeds
+        :raise HTTPException: 503 if the database can't be reached
+        """
+        transaction_journeys = get_ingest_settings().batch_transaction_journeys
+        outcomes = []
+
+        try:
+            async with cls.pool.acquire() as conn:
+                await cls.__create_tenant_partitions(conn, user_feeds)
+                for start in range(0, len(user_feeds), transaction_journeys):
+                    chunk = user_feeds[start : start + transaction_journeys]
+                    try:
+                        async with conn.transaction():
+                            await cls.insert_user_rows(
+                                user_rows_generation(chunk), conn
+                            )
+                            await cls.update_rollups(
+                                user_rollups_generation(chunk), conn
+                            )
+                            await cls.__notify_stored(conn, chunk)
+
+                    except DATABASE_UNAVAILABLE_ERRORS:
+                        raise
+                    except Exception:
+                        # Isolate the journeys that made the set-based insert fail,
+                        # or whose rows couldn't be generated
+                        if len(chunk) == 1:
+                            outcomes.append(cls.__user_outcome(chunk[0], stored=False))
+                            continue
+
+                        for user_feed in chunk:
+                            try:
+                                async with conn.transaction():
+                                    await cls.insert_user_rows(
+                                        user_rows_generation([user_feed]), conn
+                                    )
+                                    await cls.update_rollups(
+                                        user_rollups_generation([user_feed]), conn
+                                    )
+                                    await cls.__notify_stored(conn, [user_feed])
+                                outcomes.append(
+                                    cls.__user_outcome(user_feed, stored=True)
+                                )
+                            except DATABASE_UNAVAILABLE_ERRORS:
+                                raise
+                            except Exception:
+                                outcomes.append(
+                                    cls.__user_outcome(user_feed, stored=False)
+                                )
+
+                    else:
+                        outcomes.extend(
+                            cls.__user_outcome(user_feed, stored=True)
+                            for user_feed in chunk
+                        )
+
+        except DATABASE_UNAVAILABLE_ERRORS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"resource": "USER", "status": "Database unavailable"},
+            )
+        finally:
+            # The journeys stored before a failure invalidate the cache as well
+            get_extraction_cache().invalidate(cls.__tenants(user_feeds))
+
+        return outcomes
+
+    @classmethod
+    async def stored_journeys(cls, journey_ids: List[str]) -> Set[str]:
+        """
+        :param journey_ids: identifiers of the journeys
+        :return: identifiers of the journeys already stored
+        """
+        if not journey_ids:
+            return set()
+
+        async with cls.pool.acquire() as conn:
+            rows = await conn.fetch(STORED_JOURNEYS_QUERY, journey_ids)
+        return {row["journey_id"] for row in rows}
+
+    @staticmethod
+    def __tenants(user_feeds: Iterable[UserFeedInternal]) -> Set[Tuple[str, str]]:
+        """
+        :param user_feeds: stored journeys
+        :return: source_app and company_code of the journeys
+        """
+        return {
+            (user_feed.source_app, user_feed.company_code) for user_feed in user_feeds
+        }
+
+    @classmethod
+    async def __create_tenant_partitions(
+        cls, conn: Connection, user_feeds: Iterable[UserFeedInternal]
+    ) -> None:
+        """
+        Create the partitions of the source_app storing their first journeys in
+        the tenant layout, outside of the transaction that stores them. If they
+        can't be created the journeys are stored in the default partitions
+
+        :param conn: connection that stores the journeys, outside of any transaction
+        :param user_feeds: journeys to store
+        """
+        if not get_database_settings().tenant_partitions:
+            return
+
+        for source_app in {user_feed.source_app for user_feed in user_feeds}:
+            if source_app in cls.tenants:
+                continue
+            try:
+                created = await create_tenant_partitions(conn, source_app)
+            except DATABASE_UNAVAILABLE_ERRORS:
+                raise
+            except PostgresError as error:
+                await get_logger().warning(
+                    msg={"partitions": "tenant creation failed", "error": repr(error)}
+                )
+                continue
+            cls.tenants.add(source_app)
+            if created:
+                await get_logger().info(
+                    msg={"partitions": "tenant created", "source_app": source_app}
+                )
+
+    @classmethod
+    async def __notify_stored(
+        cls, conn: Connection, user_feeds: Iterable[UserFeedInternal]
+    ) -> None:
+        """
+        Notify the tenants of the journeys stored by the transaction, so the
+        extraction cache of every worker drops their results once it commits
+
+        :param conn: connection that stores the journeys
+        :param user_feeds: stored journeys
+        """
+        if not get_cache_settings().extraction_cache:
+            return
+
+        await conn.execute(
+            NOTIFY_EXTRACTION_CACHE_QUERY,
+            [orjson.dumps(tenant).decode() for tenant in cls.__tenants(user_feeds)],
+        )
+
+    @staticmethod
+    def __user_outcome(user_feed: UserFeedInternal, stored: bool) -> dict:
+        """
+        Outcome of a journey stored in a batch
+
+        :param user_feed: journey
+        :param stored: True if the journey was stored
+        """
+        return {
+            "journey_id": user_feed.journey_id,
+            "status": "Stored" if stored else "Something went wrong storing the data",
+        }
+
+    @classmethod
+    async def insert_user_rows(
+        cls, user_rows: Dict[str, List[tuple]], conn: Connection
+    ):
+        """
+        Insert the rows of every user table
+
+        :param user_rows: table name associated to its rows
+        :param conn: a connection taken from the connection pool of the db
+        """
+        for table_name, data_to_store in user_rows.items():
+            await cls.insert_multiple_rows(data_to_store, conn, table_name)
+
+    @classmethod
+    async def update_rollups(
+        cls, rollup_rows: Dict[str, List[tuple]], conn: Connection
+    ):
+        """
+        Add the journeys stored by the transaction to the rollups of the statistics
+
+        :param rollup_rows: rollup table name associated to its rows
+        :param conn: a connection taken from the connection pool of the db
+        """
+        logger = get_logger()
+        for table_name, data_to_store in rollup_rows.items():
+            if not data_to_store:
+                continue
+            try:
+                await conn.executemany(
+                    cls._upsert_rollup_rows[table_name], data_to_store
+                )
+            except PostgresError as error:
+                await logger.warning(msg=error.as_dict())
+                raise error
+
     @classmethod
     async def insert_single_row(
         cls, data_to_store: tuple, conn: Connection, table_name: str
@@ -418,13 +674,73 @@ class DataBase:
         :param conn: a connection taken from the connection pool of the db
         :param table_name: table that will contain the data
         """
+        if not data_to_store:
+            return
+
         logger = get_logger()
         try:
-            await conn.executemany(cls._store_multiple_rows[table_name], data_to_store)
+            if get_database_settings().insert_engine == InsertEngine.copy:
+                await cls.copy_multiple_rows(data_to_store, conn, table_name)
+            else:
+                await conn.executemany(
+                    cls._store_multiple_rows[table_name], data_to_store
+                )
         except PostgresError as error:
             await logger.warning(msg=error.as_dict())
             raise error
 
+    @classmethod
+    async def copy_multiple_rows(
+        cls, data_to_store: List[tuple], conn: Connection, table_name: str
+    ):
+        """
+        Insert multiple rows in a specific table using the binary COPY protocol.
+        COPY doesn't support ON CONFLICT, so the rows of the tables that need it
+        are copied in a staging table and then merged in the same transaction,
+        opened here only if the caller didn't already open one
+
+        :param data_to_store: data of interests
+        :param conn: a connection taken from the connection pool of the db
+        :param table_name: table that will contain the data
+        """
+        destination, columns = cls._copy_multiple_rows[table_name]
+
+        if table_name not in cls._merge_copied_rows:
+            await cls.__copy_records(conn, destination, data_to_store, columns)
+            return
+
+        create_staging, merge_staging = cls._merge_copied_rows[table_name]
+        if not conn.is_in_transaction():
+            async with conn.transaction():
+                await cls.copy_multiple_rows(data_to_store, conn, table_name)
+            return
+
+        await conn.execute(create_staging)
+        await cls.__copy_records(conn, destination, data_to_store, columns)
+        await conn.execute(merge_staging)
+
+    @staticmethod
+    async def __copy_records(
+        conn: Connection, destination: str, records: List[tuple], columns: tuple
+    ):
+        """
+        Copy the rows in a table through the binary COPY protocol. The values
+        that can't be encoded raise DataError, as they do with executemany
+
+        :param conn: a connection taken from the connection pool of the db
+        :param destination: table that will contain the data
+        :param records: rows to copy
+        :param columns: columns of the rows
+        """
+        try:
+            await conn.copy_records_to_table(
+                destination, records=records, columns=columns
+            )
+        except InterfaceError:
+            raise
+        except (OverflowError, ValueError, TypeError) as error:
+            raise DataError(f"invalid input for {destination}: {error}") from error
+
     @classmethod
     async def update_user(cls, behaviours: Behaviour):
         """
@@ -435,18 +751,107 @@ class DataBase:
         pass
 
     @classmethod
-    async def extract_user(cls, request: RequestType, query: str) -> list:
+    async def __fetch(
+        cls, conn: Connection, request: RequestType, query: str, args: tuple
+    ) -> list:
+        """
+        Fetch the result of an extraction query keeping track of its statement
+
+        :param conn: connection that executes the query
+        :param request: type of request
+        :param query: text of the query
+        :param args: arguments bound to the query
+        :return: list of records
+        """
+        start = time.perf_counter()
+        result = await conn.fetch(query, *args)
+        get_statement_stats().record(
+            conn.get_server_pid(), request, query, time.perf_counter() - start
+        )
+        return result
+
+    @classmethod
+    async def __radius_journeys(
+        cls,
+        conn: Connection,
+        request: RequestType,
+        radius_query: Optional[str],
+        radius_args: tuple,
+        radius_filters: tuple,
+    ) -> Optional[Set[str]]:
+        """
+        Fetch the points of the journeys within the boxes of the circles of an
+        extraction and check them against the circles
+
+        :param conn: connection that executes the query
+        :param request: type of request
+        :param radius_query: query of the points of the journeys
+        :param radius_args: arguments bound to radius_query
+        :param radius_filters: circles that must contain the points of the journeys
+        :return: journeys within the circles, None if the extraction has no circle
+        """
+        if not radius_query:
+            return None
+        records = await cls.__fetch(conn, request, radius_query, radius_args)
+        # The check of a column of points doesn't block the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, journeys_within_radius, records, radius_filters
+        )
+
+    @classmethod
+    def __format_user(
+        cls, request: RequestType, result: list, pseudonym_key: Optional[bytes]
+    ) -> list:
+        """
+        :param request: type of request
+        :param result: data extracted
+        :param pseudonym_key: key of the pseudonyms of the journeys
+        :return: formatted data
+        """
+        if request in cls.pseudonymize_user_extraction:
+            return cls.pseudonymize_user_extraction[request](pseudonym_key)(result)
+        return cls.format_user_extraction[request](result)
+
+    @classmethod
+    async def extract_user(
+        cls,
+        request: RequestType,
+        query: str,
+        args: tuple = (),
+        query_traces: Optional[str] = None,
+        radius_query: Optional[str] = None,
+        radius_args: tuple = (),
+        radius_filters: tuple = (),
+        pseudonym_key: Optional[bytes] = None,
+    ) -> list:
         """
         Extract user data from the database
 
         :param request: type of request
         :param query: query for the extraction
+        :param args: arguments bound to the queries
+        :param query_traces: query of the compressed traces, decoded in positions
+        :param radius_query: query of the points of the journeys within the circles
+        :param radius_args: arguments bound to radius_query
+        :param radius_filters: circles that must contain the points of the journeys
+        :param pseudonym_key: key of the pseudonyms of the journeys, random if not set
         :return: list of data
         """
         logger = get_logger()
         async with cls.pool.acquire() as conn:
             try:
-                result = await conn.fetch(query)
+                journeys = await cls.__radius_journeys(
+                    conn, request, radius_query, radius_args, radius_filters
+                )
+                result = await cls.__fetch(conn, request, query, args)
+                if query_traces:
+                    result.extend(
+                        user_traces_positions(
+                            await cls.__fetch(conn, request, query_traces, args)
+                        )
+                    )
+                if journeys is not None:
+                    result = [res for res in result if res["journey_id"] in journeys]
                 if len(result) == 0:
                     raise HTTPException(
                         status_code=status.HTTP_404_NOT_FOUND,
@@ -459,9 +864,7 @@ class DataBase:
                 if request in cls.no_format_user_extraction_needed:
                     return result
 
-                return cls.format_user_extraction[request](
-                    [dict(res) for res in result]
-                )
+                return cls.__format_user(request, result, pseudonym_key)
             except PostgresError as error:
                 await logger.warning(msg={"query": query, "error": error.as_dict()})
                 raise HTTPException(
@@ -474,299 +877,250 @@ class DataBase:
                 )
 
     @classmethod
-    async def extract_mobility_statistics(
-        cls, request: RequestType, conditions: str
-    ) -> list:
-        """
-        Extract mobility statistics from the database
-
-        :param request: type of statistics
-        :param conditions: requested conditions
-        :return: list of data
-        """
-        if request == RequestType.inter_modality_space:
-            return await cls.extract_space_statistics(conditions)
-        else:
-            return await cls.extract_time_statistics(conditions)
-
-    @classmethod
-    async def extract_space_statistics(cls, conditions: str) -> list:
+    async def extract_user_page(
+        cls,
+        request: RequestType,
+        query: str,
+        args: tuple,
+        query_traces: Optional[str],
+        page_query: str,
+        page_args: tuple,
+        page_size: int,
+        radius_query: Optional[str] = None,
+        radius_args: tuple = (),
+        radius_filters: tuple = (),
+        page_next: Optional[Callable[[Tuple[int, str]], tuple]] = None,
+        pseudonym_key: Optional[bytes] = None,
+    ) -> dict:
         """
-        Extract space statistics from the database
+        Extract a page of journeys of user data from the database, the queries read
+        the same snapshot of the database so the page is consistent with its cursor.
+        The journeys outside the circles are replaced by the ones that follow them,
+        so only the last page can be shorter than page_size
 
-        :param conditions: requested conditions
-        :return: list of data
+        :param request: type of request
+        :param query: query for the extraction of the journeys of the page
+        :param args: arguments bound to the queries
+        :param query_traces: query of the compressed traces, decoded in positions
+        :param page_query: query of the keys of the journeys of the page
+        :param page_args: arguments bound to page_query
+        :param page_size: journeys of the page
+        :param radius_query: query of the points of the journeys within the circles
+        :param radius_args: arguments bound to radius_query
+        :param radius_filters: circles that must contain the points of the journeys
+        :param page_next: query, args, query_traces, page_query, page_args,
+            radius_query and radius_args of the journeys that follow a journey
+        :param pseudonym_key: key of the pseudonyms of the journeys, random if not set
+        :return: data of the page and cursor of the next one, None if it's the last
         """
         logger = get_logger()
+        window = (
+            query,
+            args,
+            query_traces,
+            page_query,
+            page_args,
+            radius_query,
+            radius_args,
+        )
+        page, result = [], []
         async with cls.pool.acquire() as conn:
             try:
-                # generate first part of the first row
-                result_1 = await conn.fetch(
-                    f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
-                    from (Select count(journey_id) as n_mobility_type
-                    from user_behaviours,
-                    (select journey_id as x
-                    from user_data
-                    where distance < 5000 and {conditions} ) as nested
-                    where journey_id = nested.x group by journey_id) as aggregated;"""
-                )
-                # The list of data will always have length 1
-                result_1 = dict(result_1[0])
-
-                # Check if there is at least one mobility
-                if result_1["sum"] is None:
-                    result_1["avg"] = 0
-                    result_1_2 = []
-
-                else:
-                    # generate second part of the first row
-                    result_1_2 = await conn.fetch(
-                        f"""Select distinct(aggregated.type),((sum(aggregated.n_mobility_type)/{int(result_1["sum"])})*100) as perc
-                        from
-                        (
-                        Select count(journey_id) as n_mobility_type, type
-                        from user_behaviours,
+                async with conn.transaction(isolation="repeatable_read", readonly=True):
+                    while True:
                         (
-                        select journey_id as x
-                        from user_data
-                        where distance < 5000 and {conditions} ) as nested
-                        where journey_id = nested.x group by type) as aggregated
-                        group by aggregated.type;"""
-                    )
+                            query,
+                            args,
+                            query_traces,
+                            page_query,
+                            page_args,
+                            radius_query,
+                            radius_args,
+                        ) = window
+                        keys = await cls.__fetch(conn, request, page_query, page_args)
+                        if len(keys) == 0:
+                            break
+
+                        journeys = await cls.__radius_journeys(
+                            conn, request, radius_query, radius_args, radius_filters
+                        )
+                        # The page query reads a journey more than the page to know
+                        # if it's the last, the points of the circles are read only
+                        # for the journeys of the page
+                        if journeys is None:
+                            found = keys
+                        else:
+                            found = [
+                                key
+                                for key in keys[:page_size]
+                                if key["journey_id"] in journeys
+                            ]
+                        if found:
+                            page.extend(found)
+                            result.extend(await cls.__fetch(conn, request, query, args))
+                            if query_traces:
+                                result.extend(
+                                    user_traces_positions(
+                                        await cls.__fetch(
+                                            conn, request, query_traces, args
+                                        )
+                                    )
+                                )
+
+                        # A journey more than the page is found to know if it's
+                        # the last even when the circles discard some of them
+                        if (
+                            len(page) > page_size
+                            or len(keys) <= page_size
+                            or page_next is None
+                        ):
+                            break
+                        last = keys[page_size - 1]
+                        window = page_next((last["start_date"], last["journey_id"]))
 
-                # first row complete
-                first_row = {
-                    "distance": "< 5 Km",
-                    "mob_type_per_journey": result_1["avg"],
-                    "mob_type": result_1_2,
-                }
-
-                # generate first part of the second row
-                result_2 = await conn.fetch(
-                    f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
-                    from (Select count(journey_id) as n_mobility_type
-                    from user_behaviours,
-                    (select journey_id as x
-                    from user_data
-                    where distance BETWEEN 10000 AND 5000 and {conditions} ) as nested
-                    where journey_id = nested.x group by journey_id) as aggregated;"""
+            except PostgresError as error:
+                await logger.warning(msg={"query": query, "error": error.as_dict()})
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail={
+                        "resource": "USER",
+                        "request": request,
+                        "status": "Something went wrong extracting data",
+                    },
                 )
-                # The list of data will always have length 1
-                result_2 = dict(result_2[0])
-
-                # Check if there is at least one mobility
-                if result_2["sum"] is None:
-                    result_2["avg"] = 0
-                    result_2_2 = []
-
-                else:
-                    # generate second part of the second row
-                    result_2_2 = await conn.fetch(
-                        f"""Select distinct(aggregated.type),((sum(aggregated.n_mobility_type)/{int(result_2["sum"])})*100) as perc
-                        from
-                        (
-                        Select count(journey_id) as n_mobility_type, type
-                        from user_behaviours,
-                        (
-                        select journey_id as x
-                        from user_data
-                        where distance BETWEEN 10000 AND 5000 and {conditions} ) as nested
-                        where journey_id = nested.x group by type) as aggregated
-                        group by aggregated.type;"""
-                    )
 
-                # second row complete
-                second_row = {
-                    "distance": "5 Km - 10 Km",
-                    "mob_type_per_journey": result_2["avg"],
-                    "mob_type": result_2_2,
-                }
+        if len(page) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "resource": "USER",
+                    "status": "Info requested not found",
+                },
+            )
 
-                # generate first part of the third row
-                result_3 = await conn.fetch(
-                    f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
-                    from (Select count(journey_id) as n_mobility_type
-                    from user_behaviours,
-                    (select journey_id as x
-                    from user_data
-                    where distance > 10000 and {conditions} ) as nested
-                    where journey_id = nested.x group by journey_id) as aggregated;"""
-                )
-                # The list of data will always have length 1
-                result_3 = dict(result_3[0])
-
-                # Check if there is at least one mobility
-                if result_3["sum"] is None:
-                    result_3["avg"] = 0
-                    result_3_2 = []
-
-                else:
-                    # generate second part of the third row
-                    result_3_2 = await conn.fetch(
-                        f"""Select distinct(aggregated.type),
-                        ((sum(aggregated.n_mobility_type)/{int(result_3["sum"])})*100) as perc
-                        from
-                        (
-                        Select count(journey_id) as n_mobility_type, type
-                        from user_behaviours,
-                        (
-                        select journey_id as x
-                        from user_data
-                        where distance > 10000 and {conditions} ) as nested
-                        where journey_id = nested.x group by type) as aggregated
-                        group by aggregated.type;"""
-                    )
+        next_page_cursor = None
+        if len(page) > page_size:
+            last = page[page_size - 1]
+            next_page_cursor = encode_page_cursor(
+                (last["start_date"], last["journey_id"])
+            )
+        if radius_filters:
+            journeys = {key["journey_id"] for key in page[:page_size]}
+            result = [res for res in result if res["journey_id"] in journeys]
 
-                # third row complete
-                third_row = {
-                    "distance": "> 10 Km",
-                    "mob_type_per_journey": result_3["avg"],
-                    "mob_type": result_3_2,
-                }
+        # The journeys of the page could not match the behaviours
+        return {
+            "data": cls.__format_user(request, result, pseudonym_key) if result else [],
+            "next_page_cursor": next_page_cursor,
+        }
+
+    @classmethod
+    async def stream_user(
+        cls,
+        request: RequestType,
+        query: str,
+        args: tuple = (),
+        query_traces: Optional[str] = None,
+        radius_query: Optional[str] = None,
+        radius_args: tuple = (),
+        radius_filters: tuple = (),
+        pseudonym_key: Optional[bytes] = None,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Extract user data from the database a chunk at a time through server-side
+        cursors, so the memory needed doesn't depend on the size of the result.
+        Both queries read the same snapshot of the database
+
+        :param request: type of request
+        :param query: query for the extraction
+        :param args: arguments bound to the queries
+        :param query_traces: query of the compressed traces, decoded in positions
+        :param radius_query: query of the points of the journeys within the circles
+        :param radius_args: arguments bound to radius_query
+        :param radius_filters: circles that must contain the points of the journeys
+        :param pseudonym_key: key of the pseudonyms of the journeys, random if not set
+        :return: chunks of formatted data
+        :raise HTTPException: 404 before the first chunk if nothing is found
+        """
+        logger = get_logger()
+        chunk_rows = get_database_settings().cursor_chunk_rows
+        format_chunk = cls.pseudonymize_user_extraction[request](pseudonym_key)
+        cursors = [(query, chunk_rows, None)]
+        if query_traces:
+            cursors.append(
+                (query_traces, cls.STREAM_TRACES_JOURNEYS, user_traces_positions)
+            )
 
-                return [first_row, second_row, third_row]
+        async with cls.pool.acquire() as conn:
+            try:
+                async with conn.transaction(isolation="repeatable_read", readonly=True):
+                    found = False
+                    journeys = await cls.__radius_journeys(
+                        conn, request, radius_query, radius_args, radius_filters
+                    )
+                    for cursor_query, rows, decode in cursors:
+                        cursor = await conn.cursor(cursor_query, *args)
+                        while True:
+                            records = await cursor.fetch(rows)
+                            if not records:
+                                break
+                            chunk = decode(records) if decode else records
+                            if journeys is not None:
+                                chunk = [
+                                    row
+                                    for row in chunk
+                                    if row["journey_id"] in journeys
+                                ]
+                            # A trace could have no position within its behaviours
+                            if chunk:
+                                found = True
+                                yield format_chunk(chunk)
+
+                    if not found:
+                        raise HTTPException(
+                            status_code=status.HTTP_404_NOT_FOUND,
+                            detail={
+                                "resource": "USER",
+                                "status": "Info requested not found",
+                            },
+                        )
 
             except PostgresError as error:
-                await logger.warning(msg=error.as_dict())
+                await logger.warning(msg={"query": query, "error": error.as_dict()})
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail={
                         "resource": "USER",
-                        "request": RequestType.inter_modality_space,
+                        "request": request,
                         "status": "Something went wrong extracting data",
                     },
                 )
 
     @classmethod
-    async def extract_time_statistics(cls, conditions: str) -> list:
+    async def extract_mobility_statistics(
+        cls,
+        request: RequestType,
+        query: str,
+        args: tuple = (),
+        labels: Optional[List[str]] = None,
+    ) -> list:
         """
-        Extract time statistics from the database
+        Extract mobility statistics from the database, every bucket is aggregated
+        in a single scan
 
-        :param conditions: requested conditions
+        :param request: type of statistics
+        :param query: query of the statistics
+        :param args: arguments bound to the query
+        :param labels: label of every bucket
         :return: list of data
         """
         logger = get_logger()
         async with cls.pool.acquire() as conn:
             try:
-                # generate first part of the first row
-                result_1 = await conn.fetch(
-                    f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
-                    from (Select count(journey_id) as n_mobility_type
-                    from user_behaviours,
-                    (select journey_id as x from user_data
-                    where elapsed_time::interval < '15 minutes'::interval and {conditions} ) as nested
-                    where journey_id = nested.x group by journey_id) as aggregated;"""
-                )
-                # The list of data will always have length 1
-                result_1 = dict(result_1[0])
-
-                # Check if there is at least one mobility
-                if result_1["sum"] is None:
-                    result_1["avg"] = 0
-                    result_1_2 = []
-
-                else:
-                    # generate second part of the first row
-                    result_1_2 = await conn.fetch(
-                        f"""Select distinct(aggregated.type),((sum(aggregated.n_mobility_type)/{result_1["sum"]})*100) as perc
-                        from (Select count(journey_id) as n_mobility_type, type 
-                        from user_behaviours,
-                        ( select journey_id as x from user_data where elapsed_time::interval < '15 minutes'::interval 
-                        and {conditions} ) as nested
-                        where journey_id = nested.x group by type) as aggregated
-                        group by aggregated.type;"""
-                    )
-
-                # first row complete
-                first_row = {
-                    "time": "< 15 min",
-                    "mob_type_per_journey": result_1["avg"],
-                    "mob_type": result_1_2,
-                }
-
-                # generate first part of the second row
-                result_2 = await conn.fetch(
-                    f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
-                    from
-                    (Select count(journey_id) as n_mobility_type
-                    from user_behaviours,
-                    (select journey_id as x
-                    from user_data
-                    where elapsed_time::interval <= '30 minutes'::interval and elapsed_time::interval >= '15 minutes'::interval
-                    and {conditions} ) as nested
-                    where journey_id = nested.x group by journey_id) as aggregated;"""
-                )
-                # The list of data will always have length 1
-                result_2 = dict(result_2[0])
-
-                # Check if there is at least one mobility
-                if result_2["sum"] is None:
-                    result_2["avg"] = 0
-                    result_2_2 = []
-
-                else:
-                    # generate second part of the second row
-                    result_2_2 = await conn.fetch(
-                        f"""Select distinct(aggregated.type),((sum(aggregated.n_mobility_type)/{int(result_2["sum"])})*100) as perc
-                            from
-                            (
-                            Select count(journey_id) as n_mobility_type, type
-                            from user_behaviours,
-                            (
-                            select journey_id as x
-                            from user_data
-                            where elapsed_time::interval <= '30 minutes'::interval and elapsed_time::interval >= '15 minutes'::interval
-                            and {conditions} ) as nested
-                            where journey_id = nested.x group by type) as aggregated group by aggregated.type;"""
-                    )
-
-                # second row complete
-                second_row = {
-                    "time": "15 - 30 min",
-                    "mob_type_per_journey": result_2["avg"],
-                    "mob_type": result_2_2,
-                }
-
-                # generate first part of the third row
-                result_3 = await conn.fetch(
-                    f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
-                    from (Select count(journey_id) as n_mobility_type
-                    from user_behaviours,
-                    (select journey_id as x from user_data
-                    where elapsed_time::interval > '30 minutes'::interval and {conditions} ) as nested
-                    where journey_id = nested.x group by journey_id) as aggregated;"""
+                result = await cls.__fetch(conn, request, query, args)
+                return statistics_format(
+                    result, labels, cls.statistics_buckets[request]
                 )
-                # The list of data will always have length 1
-                result_3 = dict(result_3[0])
-
-                # Check if there is at least one mobility
-                if result_3["sum"] is None:
-                    result_3["avg"] = 0
-                    result_3_2 = []
-
-                else:
-                    # generate second part of the third row
-                    result_3_2 = await conn.fetch(
-                        f"""Select distinct(aggregated.type),((sum(aggregated.n_mobility_type)/{result_1["sum"]})*100) as perc
-                        from 
-                        (Select count(journey_id) as n_mobility_type, type
-                        from user_behaviours,
-                        (select journey_id as x
-                        from user_data
-                        where elapsed_time::interval > '30 minutes'::interval and {conditions}
-                        ) as nested
-                        where journey_id = nested.x group by type) as aggregated
-                        group by aggregated.type;"""
-                    )
-
-                # third row complete
-                third_row = {
-                    "time": "> 30 min",
-                    "mob_type_per_journey": result_3["avg"],
-                    "mob_type": result_3_2,
-                }
-
-                return [first_row, second_row, third_row]
 
             except PostgresError as error:
                 await logger.warning(msg=error.as_dict())
@@ -774,7 +1128,7 @@ class DataBase:
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail={
                         "resource": "USER",
-                        "request": RequestType.inter_modality_time,
+                        "request": request,
                         "status": "Something went wrong extracting data",
                     },
                 )
@@ -792,6 +1146,11 @@ class DataBase:
                     iot_data_generation(iot_feed), conn, "iot_data"
                 )
 
+        except DATABASE_UNAVAILABLE_ERRORS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"resource": "IOT", "status": "Database unavailable"},
+            )
         except PostgresError:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -802,6 +1161,56 @@ class DataBase:
             )
         return {"resource": "IOT", "status": "Stored"}
 
+    @classmethod
+    async def store_iot_batch(cls, iot_feeds: List[IotInput]) -> List[dict]:
+        """
+        Store many iot info in the database with a single statement
+
+        :param iot_feeds: data to store
+        :return: outcome of every observation, in the same order of iot_feeds
+        :raise HTTPException: 503 if the database can't be reached
+        """
+        if not iot_feeds:
+            return []
+
+        rows = [iot_data_generation(iot_feed) for iot_feed in iot_feeds]
+        logger = get_logger()
+
+        try:
+            async with cls.pool.acquire() as conn:
+                # One array for every column, the rows are rebuilt by unnest
+                stored = await conn.fetch(INSERT_IOT_DATA_BATCH_QUERY, *zip(*rows))
+
+        except DATABASE_UNAVAILABLE_ERRORS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"resource": "IOT", "status": "Database unavailable"},
+            )
+        except PostgresError as error:
+            await logger.warning(msg=error.as_dict())
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={
+                    "resource": "IOT",
+                    "status": "Something went wrong storing the data",
+                },
+            )
+
+        # Only the first of the observations with the same id can be the stored one
+        stored = {record["observation_gep_id"] for record in stored}
+        outcomes = []
+        for iot_feed in iot_feeds:
+            outcomes.append(
+                {
+                    "observation_gep_id": iot_feed.observationGEPid,
+                    "status": "Stored"
+                    if iot_feed.observationGEPid in stored
+                    else "Already stored",
+                }
+            )
+            stored.discard(iot_feed.observationGEPid)
+        return outcomes
+
     @classmethod
     async def extract_iot(cls, observation_gep_id: str) -> dict:
         """
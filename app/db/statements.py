@@ -0,0 +1,149 @@
+"""
+Prepared statements package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict
+
+# Internal
+from ..config import get_database_settings
+
+# --------------------------------------------------------------------------------------------
+
+
+class StatementCounter:
+    """Executions of the statements prepared and reused by the connections"""
+
+    def __init__(self):
+        self.prepared = 0
+        self.reused = 0
+        self.prepared_latency_total = 0.0
+        self.prepared_latency_max = 0.0
+        self.reused_latency_total = 0.0
+        self.reused_latency_max = 0.0
+
+    def record(self, reused: bool, latency: float) -> None:
+        """
+        :param reused: True if the statement was already prepared
+        :param latency: seconds spent executing the statement
+        """
+        if reused:
+            self.reused += 1
+            self.reused_latency_total += latency
+            self.reused_latency_max = max(self.reused_latency_max, latency)
+        else:
+            self.prepared += 1
+            self.prepared_latency_total += latency
+            self.prepared_latency_max = max(self.prepared_latency_max, latency)
+
+    def stats(self) -> dict:
+        executions = self.prepared + self.reused
+        return {
+            "executions": executions,
+            "prepared": self.prepared,
+            "reused": self.reused,
+            "hit_rate": self.reused / executions if executions else 0.0,
+            "prepared_latency_ms": {
+                "max": self.prepared_latency_max * 1000,
+                "avg": self.prepared_latency_total * 1000 / self.prepared
+                if self.prepared
+                else 0.0,
+            },
+            "reused_latency_ms": {
+                "max": self.reused_latency_max * 1000,
+                "avg": self.reused_latency_total * 1000 / self.reused
+                if self.reused
+                else 0.0,
+            },
+        }
+
+
+class StatementStats:
+    """
+    Estimate how often the extraction queries reuse a prepared statement.
+    asyncpg keeps in every connection an LRU cache of the statements keyed by the
+    text of the query, so the same LRU is mirrored for every backend
+    """
+
+    MAX_CONNECTIONS = 256
+    """Backends tracked at most, the pool could reconnect with new backends"""
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        """Statements kept by every connection"""
+        self.connections: Dict[int, OrderedDict] = OrderedDict()
+        """Queries prepared by every backend"""
+        self.total = StatementCounter()
+        self.requests: Dict[str, StatementCounter] = {}
+
+    def record(self, pid: int, request: str, query: str, latency: float) -> None:
+        """
+        :param pid: backend of the connection that executed the query
+        :param request: type of request that executed the query
+        :param query: text of the query
+        :param latency: seconds spent executing the query
+        """
+        statements = self.connections.get(pid)
+        if statements is None:
+            statements = self.connections[pid] = OrderedDict()
+            if len(self.connections) > self.MAX_CONNECTIONS:
+                self.connections.popitem(last=False)
+        else:
+            self.connections.move_to_end(pid)
+
+        reused = query in statements
+        if reused:
+            statements.move_to_end(query)
+        elif self.cache_size > 0:
+            statements[query] = None
+            if len(statements) > self.cache_size:
+                statements.popitem(last=False)
+
+        self.total.record(reused, latency)
+        counter = self.requests.get(request)
+        if counter is None:
+            counter = self.requests[request] = StatementCounter()
+        counter.record(reused, latency)
+
+    def stats(self) -> dict:
+        """
+        Metrics of the prepared statements
+        """
+        return {
+            "cache_size": self.cache_size,
+            **self.total.stats(),
+            "requests": {
+                request: counter.stats() for request, counter in self.requests.items()
+            },
+        }
+
+
+# --------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_statement_stats() -> StatementStats:
+    """Obtain as a singleton the prepared statements metrics of the worker"""
+    return StatementStats(get_database_settings().statement_cache_size)
@@ -0,0 +1,200 @@
+"""
+Batch reader dependences
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from typing import AsyncIterator, List, Optional
+
+# Third Party
+import orjson
+from fastapi import status, HTTPException, Request
+from pydantic import parse_obj_as, ValidationError
+
+# Internal
+from ..config import get_ingest_settings
+from ..models.iot_feed.iot import IotInput
+from ..models.model import OrjsonModel
+from ..models.user_feed.user import UserFeedInternal
+
+# ---------------------------------------------------------------------------------------------
+
+
+NDJSON_MEDIA_TYPES = {
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+    "application/x-jsonlines",
+}
+"""Media types of a batch sent as newline delimited json"""
+
+
+class UserFeedBatch(OrjsonModel):
+    """UserFeed batch Model"""
+
+    journeys: List[UserFeedInternal]
+    """Valid journeys"""
+    outcomes: List[Optional[dict]]
+    """Outcome of every journey in the order of the request, None if it's valid"""
+
+
+class UserFeedBatchReader:
+    """
+    Read a JSON array or a NDJSON stream of journeys, validating them one by one,
+    so an invalid journey doesn't invalidate the whole batch
+    """
+
+    async def __call__(self, request: Request) -> UserFeedBatch:
+        """Called by the Depends class from FastApi to inspect the request body"""
+        max_journeys = get_ingest_settings().batch_max_journeys
+        batch = UserFeedBatch.construct(journeys=[], outcomes=[])
+        journey_ids = set()
+
+        async for journey in decode_batch(request, "USER"):
+            if len(batch.outcomes) == max_journeys:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail={
+                        "resource": "USER",
+                        "status": f"A batch can contain at most {max_journeys} journeys",
+                    },
+                )
+
+            try:
+                user_feed = UserFeedInternal.parse_obj(journey)
+            except ValidationError as err:
+                batch.outcomes.append(
+                    {
+                        "journey_id": journey.get("journey_id")
+                        if isinstance(journey, dict)
+                        else None,
+                        "status": "Invalid",
+                        "detail": err.errors(),
+                    }
+                )
+                continue
+
+            if user_feed.journey_id in journey_ids:
+                batch.outcomes.append(
+                    {"journey_id": user_feed.journey_id, "status": "Duplicated"}
+                )
+                continue
+
+            journey_ids.add(user_feed.journey_id)
+            batch.journeys.append(user_feed)
+            batch.outcomes.append(None)
+
+        return batch
+
+
+class IotFeedBatchReader:
+    """
+    Read a JSON array or a NDJSON stream of IoT data, counting the observations
+    before validating them, so a batch too large is refused without validating it.
+    An invalid observation invalidates the whole batch
+    """
+
+    async def __call__(self, request: Request) -> List[IotInput]:
+        """Called by the Depends class from FastApi to inspect the request body"""
+        max_observations = get_ingest_settings().batch_max_observations
+        observations = []
+
+        async for observation in decode_batch(request, "IOT"):
+            if len(observations) == max_observations:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail={
+                        "resource": "IOT",
+                        "status": f"A batch can contain at most {max_observations} observations",
+                    },
+                )
+            observations.append(observation)
+
+        try:
+            return parse_obj_as(List[IotInput], observations)
+        except ValidationError as err:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=err.errors()
+            )
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def decode_batch(request: Request, resource: str) -> AsyncIterator[object]:
+    """
+    Decode the elements of the batch in the request body.
+    A NDJSON stream is decoded line by line while it's received,
+    a line that isn't valid json is yielded as None
+
+    :param request: incoming request
+    :param resource: resource of the batch, USER or IOT
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if media_type not in NDJSON_MEDIA_TYPES:
+        try:
+            elements = orjson.loads(await request.body())
+        except orjson.JSONDecodeError:
+            elements = None
+
+        if not isinstance(elements, list):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "resource": resource,
+                    "status": "The batch must be a JSON array or a NDJSON stream",
+                },
+            )
+
+        for element in elements:
+            yield element
+        return
+
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        end = buffer.rfind(b"\n")
+        if end == -1:
+            continue
+
+        lines = buffer[:end].split(b"\n")
+        del buffer[: end + 1]
+        for line in lines:
+            if line.strip():
+                yield decode_line(line)
+
+    if buffer.strip():
+        yield decode_line(buffer)
+
+
+def decode_line(line: bytearray) -> object:
+    """
+    Decode a line of a NDJSON stream
+
+    :param line: line to decode
+    :return: decoded line or None if it isn't valid json
+    """
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
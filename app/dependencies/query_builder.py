@@ -22,11 +22,17 @@ Query builder dependence
     limitations under the License.
 """
 
+# Standard Library
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+
 # Third Party
 from fastapi import status, Body, HTTPException
 from pydantic import ValidationError
 
 # Internal
+from ..config import get_database_settings, get_page_settings, TraceStorage
+from ..internals.page_cursor import decode_page_cursor
 from ..models.model import OrjsonModel
 from ..models.extraction.data_extraction.all_positions import AllPositions
 from ..models.extraction.data_extraction.complete_mobility import CompleteMobility
@@ -37,7 +43,7 @@ from ..models.extraction.data_extraction.partial_mobility import PartialMobility
 from ..models.extraction.data_extraction.stats_num_tracks import StatsNumTracks
 from ..models.extraction.data_extraction.stats_avg_space import StatsAvgSpace
 from ..models.extraction.data_extraction.stats_avg_time import StatsAvgTime
-from ..models.track import RequestType
+from ..models.track import RequestType, StreamFormat
 
 
 # ---------------------------------------------------------------------------------------------
@@ -48,6 +54,31 @@ class Query(OrjsonModel):
 
     request: RequestType
     query: str
+    args: tuple = ()
+    """Arguments bound to query and query_traces"""
+    query_traces: Optional[str] = None
+    """Query of the compressed traces, extracted together with query"""
+    labels: Optional[List[str]] = None
+    """Label of every bucket of the statistics"""
+    stream: Optional[StreamFormat] = None
+    """Format of the chunks of a streamed extraction"""
+    page_query: Optional[str] = None
+    """Query of the keys of the journeys of a page, extracted together with query"""
+    page_args: tuple = ()
+    """Arguments bound to page_query"""
+    page_size: Optional[int] = None
+    """Journeys of a page"""
+    radius_query: Optional[str] = None
+    """Query of the points of the journeys, extracted together with query"""
+    radius_args: tuple = ()
+    """Arguments bound to radius_query"""
+    radius_filters: tuple = ()
+    """Circles that must contain the points of the journeys"""
+    page_next: Optional[Callable[[Tuple[int, str]], tuple]] = None
+    """Queries and arguments of the journeys that follow a journey, to refill a page"""
+    source_app: str = ""
+    company_code: str = ""
+    """Journeys read by the query, their storage invalidates its cached result"""
 
 
 # noinspection PyProtectedMember
@@ -65,19 +96,181 @@ class QueryBuilder:
     }
     """Request associated to a Model"""
 
+    query_rollup = {
+        RequestType.stats_num_tracks,
+        RequestType.stats_avg_space,
+        RequestType.stats_avg_time,
+    }
+    """Requests answered by the rollups when their filters can be expressed at their grain"""
+
+    query_stream = {RequestType.all_positions, RequestType.complete_mobility}
+    """Requests that can be streamed"""
+
+    query_page = {
+        RequestType.partial_mobility,
+        RequestType.complete_mobility,
+        RequestType.all_positions,
+    }
+    """Requests that can be returned a page of journeys at a time"""
+
     async def __call__(self, extraction: InputJSONExtraction = Body(...)) -> Query:
         """Called by the Depends class from FastApi to inspect InputJSONExtraction Body"""
+        data = extraction.dict()
+        if extraction.page_size or extraction.page_cursor:
+            self.__check_page(extraction)
+            if extraction.page_cursor:
+                try:
+                    data["page_after"] = decode_page_cursor(extraction.page_cursor)
+                except ValueError:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail={
+                            "resource": "USER",
+                            "request": extraction.request,
+                            "status": "Invalid page cursor",
+                        },
+                    )
         try:
-            query = Query.construct(
-                **{
-                    "request": extraction.request,
-                    "query": self.query_select[extraction.request]
-                    .parse_obj(extraction.dict())
-                    ._query_select,
-                }
-            )
+            model = self.query_select[extraction.request].parse_obj(data)
         except ValidationError as err:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=err.errors()
             )
-        return query
+        if extraction.stream and extraction.request not in self.query_stream:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "resource": "USER",
+                    "request": extraction.request,
+                    "status": "Request that can't be streamed",
+                },
+            )
+
+        if extraction.request == RequestType.inter_modality_space:
+            return Query.construct(
+                request=extraction.request,
+                source_app=extraction.source_app,
+                company_code=extraction.company_code,
+                query=model._query_select,
+                args=model._query_args,
+                labels=model._distance_labels,
+            )
+
+        if extraction.request == RequestType.inter_modality_time:
+            return Query.construct(
+                request=extraction.request,
+                source_app=extraction.source_app,
+                company_code=extraction.company_code,
+                query=model._query_select,
+                args=model._query_args,
+                labels=model._duration_labels,
+            )
+
+        if extraction.request in self.query_rollup and model._query_rollup:
+            return Query.construct(
+                request=extraction.request,
+                source_app=extraction.source_app,
+                company_code=extraction.company_code,
+                query=model._query_rollup,
+                args=model._query_rollup_args,
+                query_traces=None,
+            )
+
+        if extraction.request in self.query_page:
+            return self.__journeys_query(extraction, data, model)
+        return Query.construct(
+            request=extraction.request,
+            source_app=extraction.source_app,
+            company_code=extraction.company_code,
+            query=model._query_select,
+            args=model._query_args,
+            query_traces=None,
+        )
+
+    def __journeys_query(
+        self, extraction: InputJSONExtraction, data: dict, model
+    ) -> Query:
+        """
+        :param extraction: extraction of journeys, returned a page at a time if
+            page_size is set
+        :param data: fields of the extraction
+        :param model: model of the extraction
+        :return: query of the extraction
+        """
+        query, query_traces = model._query_select, None
+        if (
+            extraction.request == RequestType.all_positions
+            and get_database_settings().trace_storage == TraceStorage.blob
+        ):
+            # The journeys stored before switching to blobs are still in user_positions
+            query, query_traces = model._query_select_untraced, model._query_traces
+
+        page_next = None
+        if model._query_page and model._radius_filters:
+            # The circles can discard journeys of the page after its LIMIT
+            page_next = partial(self.__page_next, extraction, data)
+
+        return Query.construct(
+            request=extraction.request,
+            source_app=extraction.source_app,
+            company_code=extraction.company_code,
+            query=query,
+            args=model._query_args,
+            query_traces=query_traces,
+            stream=extraction.stream,
+            page_query=model._query_page,
+            page_args=model._query_page_args,
+            page_size=extraction.page_size,
+            radius_query=model._query_radius,
+            radius_args=model._query_radius_args,
+            radius_filters=model._radius_filters,
+            page_next=page_next,
+        )
+
+    def __page_next(
+        self, extraction: InputJSONExtraction, data: dict, page_after: Tuple[int, str]
+    ) -> tuple:
+        """
+        :param extraction: extraction returned a page at a time
+        :param data: fields of the extraction
+        :param page_after: start_date and journey_id of the last journey checked
+        :return: query, args, query_traces, page_query, page_args, radius_query and
+            radius_args of the journeys that follow it
+        """
+        model = self.query_select[extraction.request].parse_obj(
+            {**data, "page_after": page_after}
+        )
+        query = self.__journeys_query(extraction, data, model)
+        return (
+            query.query,
+            query.args,
+            query.query_traces,
+            query.page_query,
+            query.page_args,
+            query.radius_query,
+            query.radius_args,
+        )
+
+    def __check_page(self, extraction: InputJSONExtraction) -> None:
+        """
+        :param extraction: extraction returned a page at a time
+        :raise HTTPException: 422 if the request can't be paged
+        """
+        if extraction.request not in self.query_page or extraction.stream:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "resource": "USER",
+                    "request": extraction.request,
+                    "status": "Request that can't be paged",
+                },
+            )
+        if (extraction.page_size or 0) > get_page_settings().page_size_max:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "resource": "USER",
+                    "request": extraction.request,
+                    "status": "page_size exceeds the maximum size of a page",
+                },
+            )
@@ -0,0 +1,110 @@
+"""
+User feed stream reader dependence
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Third Party
+import orjson
+from fastapi import status, HTTPException, Request
+from pydantic import ValidationError
+
+# Internal
+from ..internals.database import position_row_generation
+from ..models.user_feed.user import UserFeedStream
+
+# ---------------------------------------------------------------------------------------------
+
+
+class UserFeedStreamReader:
+    """
+    Read a journey without building a model for every position and sensor
+    information, they are validated while they are converted in rows
+    """
+
+    async def __call__(self, request: Request) -> UserFeedStream:
+        """Called by the Depends class from FastApi to inspect the request body"""
+        # Collect the body in a single buffer, released as soon as it's decoded
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+
+        try:
+            user_feed = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            user_feed = None
+        del body
+
+        return self.parse(user_feed)
+
+    @staticmethod
+    def parse(user_feed: object) -> UserFeedStream:
+        """
+        Validate a decoded journey, its positions and sensors information
+        are validated only when they are converted in rows
+
+        :param user_feed: decoded journey
+        :return: validated journey
+        """
+        if not isinstance(user_feed, dict):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"resource": "USER", "status": "The body must be a JSON object"},
+            )
+
+        try:
+            user_feed = UserFeedStream.parse_obj(user_feed)
+        except ValidationError as err:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=err.errors()
+            )
+
+        if not user_feed.trace_information:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=[
+                    {
+                        "loc": ("trace_information",),
+                        "msg": "ensure this value has at least 1 items",
+                        "type": "value_error.list.min_items",
+                        "ctx": {"limit_value": 1},
+                    }
+                ],
+            )
+
+        # Validate now the positions needed by user_data, the others are
+        # validated while they are stored
+        trace_information = user_feed.trace_information
+        for index in {0, len(trace_information) - 1}:
+            try:
+                position_row_generation(
+                    trace_information[index], user_feed.journey_id, user_feed.startDate
+                )
+            except ValidationError as err:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=[
+                        {**error, "loc": ("trace_information", index, *error["loc"])}
+                        for error in err.errors()
+                    ],
+                )
+
+        return user_feed
@@ -23,80 +23,114 @@ Database internals package
 """
 
 # Standard Library
-from typing import List
+from array import array
+from collections import defaultdict
+from itertools import repeat
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Union
 
 # Third Party
-from fastuuid import uuid4
+import orjson
+from asyncpg import Record
+from fastapi import status, HTTPException
+from pydantic import ValidationError
 
 # Internal
+from ..config import get_database_settings, SensorsStorage, TraceStorage
+from ..models.extraction.grid import grid_cells
+from ..models.extraction.position_alteration_detection import within_radius
+from ..models.extraction.radius import RadiusFilter
+from ..models.extraction.rollup import ROLLUP_DAY
 from ..models.iot_feed.iot import IotInput
+from ..models.user_feed.position import position_values, TraceInformation
+from ..models.user_feed.sensor import sensor_values, SENSOR_DATA_FIELDS
+from ..models.user_feed.trace_codec import trace_positions
 from ..models.user_feed.user import (
     UserFeedInternal,
+    UserFeedStream,
     Behaviour,
     SensorInformation,
-    PositionObject,
 )
 
 # --------------------------------------------------------------------------------------
 
 
-def partial_mobility_format(record_list: List[dict]) -> list:
+ExtractedRow = Union[Record, dict]
+"""Row extracted from the database or decoded from a trace"""
+
+
+def partial_mobility_format(record_list: List[ExtractedRow]) -> list:
     """
-    Convert data extracted from the database  in partial_mobility_format
+    Convert data extracted from the database  in partial_mobility_format,
+    grouping the behaviours of every journey in a single pass: only the first
+    row of a journey is copied, the following ones add their type to it
 
     :param record_list: data to convert
     :return: converted data
     """
-    journey_id = record_list[0]["journey_id"]
-    del record_list[0]["journey_id"]
+    journeys: Dict[str, dict] = {}
+    for record in record_list:
+        journey = journeys.get(record["journey_id"])
+        if journey is None:
+            journey = journeys[record["journey_id"]] = dict(record.items())
+            del journey["journey_id"]
+            journey["type"] = [journey["type"]]
+        else:
+            journey["type"].append(record["type"])
 
-    temp_obj = {journey_id: record_list[0]}
-    temp_obj[journey_id]["type"] = [temp_obj[journey_id]["type"]]
+    return list(journeys.values())
 
-    for pos in range(1, len(record_list)):
 
-        if record_list[pos]["journey_id"] in temp_obj.keys():
-            temp_obj[record_list[pos]["journey_id"]]["type"].append(
-                record_list[pos]["type"]
-            )
-        else:
-            journey_id = record_list[pos]["journey_id"]
-            object_to_add = record_list[pos]
-            del object_to_add["journey_id"]
+# --------------------------------------------------------------------------------------
 
-            temp_obj[journey_id] = object_to_add
-            temp_obj[journey_id]["type"] = [temp_obj[journey_id]["type"]]
 
-    return [temp_obj[key] for key in temp_obj.keys()]
+def journeys_within_radius(
+    record_list: List[Record], radius_filters: Iterable[RadiusFilter]
+) -> Set[str]:
+    """
+    Check the points of the journeys within the boxes of the circles against the
+    circles, a column of points at a time
+
+    :param record_list: journey_id and points of the journeys
+    :param radius_filters: circles that must contain the points of the journeys
+    :return: journeys within every circle
+    """
+    masks = [
+        within_radius(
+            array("d", [record[f"{circle.point}_lat"] for record in record_list]),
+            array("d", [record[f"{circle.point}_lon"] for record in record_list]),
+            circle.lat,
+            circle.lon,
+            circle.radius,
+        )
+        for circle in radius_filters
+    ]
+    return {
+        record["journey_id"]
+        for record, *within in zip(record_list, *masks)
+        if all(within)
+    }
 
 
 # --------------------------------------------------------------------------------------
 
 
-def all_positions_and_complete_mobility_format(record_list: List[dict]) -> list:
+def statistics_format(record_list: List[Record], labels: List[str], key: str) -> list:
     """
-    Convert data extracted from the database  in a format compatible with
-    all positions and complete_mobility
+    Convert the buckets extracted from the database in a row for every bucket
 
-    :param record_list: data to convert
+    :param record_list: totals and types of every bucket, ordered by bucket
+    :param labels: label of every bucket
+    :param key: name of the label in the row
     :return: converted data
     """
-    journey_id = record_list[0]["journey_id"]
-    record_list[0]["journey_id"] = str(uuid4())
-    temp_obj = {journey_id: record_list[0]}
-
-    for pos in range(1, len(record_list)):
-
-        if record_list[pos]["journey_id"] in temp_obj.keys():
-            journey_id = record_list[pos]["journey_id"]
-            record_list[pos]["journey_id"] = temp_obj[journey_id]["journey_id"]
-            temp_obj[str(uuid4())] = record_list[pos]
+    rows = [{key: label, "mob_type_per_journey": 0, "mob_type": []} for label in labels]
+    for record in record_list:
+        row = rows[record["bucket"]]
+        if record["total"]:
+            row["mob_type_per_journey"] = record["avg"]
         else:
-            journey_id = record_list[pos]["journey_id"]
-            record_list[pos]["journey_id"] = str(uuid4())
-            temp_obj[journey_id] = record_list[pos]
-
-    return [temp_obj[key] for key in temp_obj.keys()]
+            row["mob_type"].append({"type": record["type"], "perc": record["perc"]})
+    return rows
 
 
 # --------------------------------------------------------------------------------------
@@ -113,15 +147,58 @@ def user_data_generation(user_feed: UserFeedInternal) -> tuple:
         user_feed.company_trip_type,
         user_feed.distance,
         user_feed.elapsedTime,
+        user_feed.duration,
+        user_feed.endDate,
+        user_feed.id,
+        user_feed.mainTypeSpace,
+        user_feed.mainTypeTime,
+        user_feed.startDate,
+        user_feed.trace_information.lat[0],
+        user_feed.trace_information.lon[0],
+        user_feed.trace_information.lat[-1],
+        user_feed.trace_information.lon[-1],
+        grid_cells(
+            user_feed.trace_information.lat[0], user_feed.trace_information.lon[0]
+        ),
+        grid_cells(
+            user_feed.trace_information.lat[-1], user_feed.trace_information.lon[-1]
+        ),
+    )
+
+
+# --------------------------------------------------------------------------------------
+
+
+def user_data_stream_generation(user_feed: UserFeedStream) -> tuple:
+    """
+    Convert user_feed in a tuple of user_data, its first and last positions
+    must be still available
+    """
+    first_position = position_row_generation(
+        user_feed.trace_information[0], user_feed.journey_id, user_feed.startDate
+    )
+    last_position = position_row_generation(
+        user_feed.trace_information[-1], user_feed.journey_id, user_feed.startDate
+    )
+    return (
+        user_feed.journey_id,
+        user_feed.source_app,
+        user_feed.company_code,
+        user_feed.company_trip_type,
+        user_feed.distance,
+        user_feed.elapsedTime,
+        user_feed.duration,
         user_feed.endDate,
         user_feed.id,
         user_feed.mainTypeSpace,
         user_feed.mainTypeTime,
         user_feed.startDate,
-        user_feed.trace_information[0].lat,
-        user_feed.trace_information[0].lon,
-        user_feed.trace_information[-1].lat,
-        user_feed.trace_information[-1].lon,
+        first_position[4],
+        first_position[5],
+        last_position[4],
+        last_position[5],
+        grid_cells(first_position[4], first_position[5]),
+        grid_cells(last_position[4], last_position[5]),
     )
 
 
@@ -129,35 +206,93 @@ def user_data_generation(user_feed: UserFeedInternal) -> tuple:
 
 
 def user_positions_generation(
-    trace_information: List[PositionObject], journey_id: str
+    trace_information: TraceInformation, journey_id: str, start_date: int
 ) -> List[tuple]:
     """
     Convert trace_information in a list of user_positions data
     """
-    return [
-        (
-            journey_id,
-            position.time,
-            position.authenticity,
-            position.lat,
-            position.lon,
-            position.partialDistance,
+    return list(
+        zip(
+            repeat(journey_id, len(trace_information)),
+            repeat(start_date, len(trace_information)),
+            trace_information.time,
+            trace_information.authenticity,
+            trace_information.lat,
+            trace_information.lon,
+            trace_information.partialDistance,
         )
-        for position in trace_information
-    ]
+    )
+
+
+# --------------------------------------------------------------------------------------
+
+
+def position_row_generation(
+    position: object, journey_id: str, start_date: int
+) -> tuple:
+    """
+    Convert a decoded position in a row of user_positions
+
+    :raise ValidationError: if the position isn't valid
+    """
+    return (journey_id, start_date, *position_values(position))
+
+
+# --------------------------------------------------------------------------------------
+
+
+def user_traces_generation(
+    trace_information: TraceInformation, journey_id: str
+) -> tuple:
+    """
+    Convert trace_information in a row of user_traces, the positions are
+    compressed in a single blob
+    """
+    if not trace_information:
+        return journey_id, 0, None, None, trace_information.encode()
+    return (
+        journey_id,
+        len(trace_information),
+        min(trace_information.time),
+        max(trace_information.time),
+        trace_information.encode(),
+    )
+
+
+def user_traces_positions(record_list: List[Record]) -> List[dict]:
+    """
+    Decode the traces extracted from the database in the positions of every
+    behaviour, as they were extracted from user_positions
+
+    :param record_list: journeys with their trace and behaviours
+    :return: positions between the start and end time of every behaviour
+    """
+    positions = []
+    for record in record_list:
+        positions.extend(
+            trace_positions(
+                record["trace"],
+                record["journey_id"],
+                record["types"],
+                record["modes"],
+                record["start_times"],
+                record["end_times"],
+            )
+        )
+    return positions
 
 
 # --------------------------------------------------------------------------------------
 
 
 def user_sensors_generation(
-    sensors_information: List[SensorInformation], journey_id: str
+    sensors_information: List[SensorInformation], journey_id: str, start_date: int
 ) -> List[tuple]:
     """
     Convert sensors_information data in a list of user_sensors data
     """
     return [
-        (journey_id, sensor.time, sensor.name, sensor.data.json())
+        (journey_id, start_date, sensor.time, sensor.name, sensor.data.json())
         for sensor in sensors_information
     ]
 
@@ -165,24 +300,118 @@ def user_sensors_generation(
 # --------------------------------------------------------------------------------------
 
 
+def sensor_row_generation(sensor: object, journey_id: str, start_date: int) -> tuple:
+    """
+    Convert a decoded sensor information in a row of user_sensors
+
+    :raise ValidationError: if the sensor information isn't valid
+    """
+    time, name, kind, *values = sensor_values(sensor)
+    return (
+        journey_id,
+        start_date,
+        time,
+        name,
+        orjson.dumps(dict(zip(SENSOR_DATA_FIELDS[kind], values))).decode(),
+    )
+
+
+def sensor_typed_row_generation(
+    sensor: object, journey_id: str, start_date: int
+) -> tuple:
+    """
+    Convert a decoded sensor information in a row of user_sensors that stores
+    its data in the typed columns
+
+    :raise ValidationError: if the sensor information isn't valid
+    """
+    return (journey_id, start_date, *sensor_values(sensor))
+
+
+def user_sensors_typed_generation(
+    sensors_information: List[SensorInformation], journey_id: str, start_date: int
+) -> List[tuple]:
+    """
+    Convert sensors_information data in a list of user_sensors data stored in
+    the typed columns
+    """
+    return [
+        sensor_typed_row_generation(sensor, journey_id, start_date)
+        for sensor in sensors_information
+    ]
+
+
+def user_sensors_table() -> str:
+    """
+    Name used for the user_sensors rows generated in the configured storage
+    """
+    if get_database_settings().sensors_storage == SensorsStorage.typed:
+        return "user_sensors_typed"
+    return "user_sensors"
+
+
+# --------------------------------------------------------------------------------------
+
+
+def rows_chunks_generation(
+    elements: list,
+    row_generation: Callable[[object, str, int], tuple],
+    journey_id: str,
+    start_date: int,
+    chunk_rows: int,
+    field: str,
+) -> Iterator[List[tuple]]:
+    """
+    Convert decoded elements in chunks of rows.
+    Every element is released once converted, so only the rows of a chunk are
+    kept in memory
+
+    :param elements: decoded elements
+    :param row_generation: function that converts an element in a row
+    :param journey_id: journey of the elements
+    :param start_date: start_date of the journey
+    :param chunk_rows: rows of every chunk
+    :param field: name of the field that contains the elements
+    :raise HTTPException: 422 if an element isn't valid
+    """
+    for start in range(0, len(elements), chunk_rows):
+        chunk = []
+        for index in range(start, min(start + chunk_rows, len(elements))):
+            try:
+                chunk.append(row_generation(elements[index], journey_id, start_date))
+            except ValidationError as err:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=[
+                        {**error, "loc": (field, index, *error["loc"])}
+                        for error in err.errors()
+                    ],
+                )
+            elements[index] = None
+        yield chunk
+
+
+# --------------------------------------------------------------------------------------
+
+
+BEHAVIOUR_MODES = ("user_defined", "tpv_defined", "app_defined")
+"""Detection modes of the behaviours, stored in the mode column"""
+
+
 def user_behaviours_generation(
-    behaviour_defined: Behaviour, journey_id: str, source_app: str
+    behaviour_defined: Behaviour, journey_id: str, start_date: int, source_app: str
 ) -> List[tuple]:
     """
     Convert behaviour_defined in a list of user_behaviours data
     """
 
     def __analyze_behaviour() -> List[tuple]:
-        for behaviour_and_mode in (
-            (behaviour_defined.user_defined, "user_defined"),
-            (behaviour_defined.tpv_defined, "tpv_defined"),
-            (behaviour_defined.app_defined, "app_defined"),
-        ):
-            behaviour = behaviour_and_mode[0]
-            mode = behaviour_and_mode[1]
+        for mode in BEHAVIOUR_MODES:
+            behaviour = getattr(behaviour_defined, mode)
             for pos in range(len(behaviour)):
                 yield (
                     journey_id,
+                    start_date,
                     source_app,
                     mode,
                     pos,
@@ -207,6 +436,106 @@ def user_behaviours_generation(
 # --------------------------------------------------------------------------------------
 
 
+def user_rows_generation(user_feeds: List[UserFeedInternal]) -> Dict[str, List[tuple]]:
+    """
+    Convert a list of user_feed in the rows to store in every user table.
+    user_data comes first so the other tables can reference its journeys
+
+    :param user_feeds: data to convert
+    :return: table name associated to its rows
+    """
+    trace_storage = get_database_settings().trace_storage
+    user_sensors = user_sensors_table()
+    sensors_generation = (
+        user_sensors_typed_generation
+        if user_sensors == "user_sensors_typed"
+        else user_sensors_generation
+    )
+    user_rows = {
+        "user_data": [],
+        "user_positions": [],
+        "user_traces": [],
+        user_sensors: [],
+        "user_behaviours": [],
+    }
+    for user_feed in user_feeds:
+        user_rows["user_data"].append(user_data_generation(user_feed))
+        if trace_storage != TraceStorage.blob:
+            user_rows["user_positions"].extend(
+                user_positions_generation(
+                    user_feed.trace_information,
+                    user_feed.journey_id,
+                    user_feed.startDate,
+                )
+            )
+        if trace_storage != TraceStorage.rows:
+            user_rows["user_traces"].append(
+                user_traces_generation(
+                    user_feed.trace_information, user_feed.journey_id
+                )
+            )
+        user_rows[user_sensors].extend(
+            sensors_generation(
+                user_feed.sensors_information,
+                user_feed.journey_id,
+                user_feed.startDate,
+            )
+        )
+        user_rows["user_behaviours"].extend(
+            user_behaviours_generation(
+                user_feed.behaviour,
+                user_feed.journey_id,
+                user_feed.startDate,
+                user_feed.source_app,
+            )
+        )
+    return user_rows
+
+
+# --------------------------------------------------------------------------------------
+
+
+def user_rollups_generation(
+    user_feeds: Iterable[Union[UserFeedInternal, UserFeedStream]]
+) -> Dict[str, List[tuple]]:
+    """
+    Aggregate a list of user_feed in the rows to add to every rollup table, sorted
+    by key so concurrent transactions lock the rows of the rollups in the same order
+
+    :param user_feeds: data to aggregate
+    :return: rollup table name associated to its rows
+    """
+    tracks = defaultdict(int)
+    behaviours = defaultdict(lambda: [0, 0, 0])
+    for user_feed in user_feeds:
+        journey = (
+            user_feed.source_app,
+            user_feed.company_code,
+            user_feed.company_trip_type,
+            user_feed.startDate - user_feed.startDate % ROLLUP_DAY,
+        )
+        tracks[(*journey, user_feed.mainTypeSpace, user_feed.mainTypeTime)] += 1
+        for mode in BEHAVIOUR_MODES:
+            for segment in getattr(user_feed.behaviour, mode):
+                # Minutes truncated towards zero like the integer division of Postgres
+                elapsed = segment.end.time - segment.start.time
+                minutes = abs(elapsed) // 60000 * (1 if elapsed >= 0 else -1)
+                rollup = behaviours[(*journey, segment.type, mode)]
+                rollup[0] += 1
+                rollup[1] += segment.meters
+                rollup[2] += minutes
+
+    return {
+        "user_data_rollup": [(*key, tracks[key]) for key in sorted(tracks)],
+        "user_behaviours_rollup": [
+            (*key, *behaviours[key]) for key in sorted(behaviours)
+        ],
+    }
+
+
+# --------------------------------------------------------------------------------------
+
+
 def iot_data_generation(iot_feed: IotInput) -> tuple:
     """
     Convert IoTInput in iot_data
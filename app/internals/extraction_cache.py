@@ -0,0 +1,345 @@
+"""
+Extraction cache package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+# Third Party
+import orjson
+from asyncpg import connect, Connection
+
+# Internal
+from .logger import get_logger
+from .pseudonyms import pseudonym_epoch
+from ..config import get_cache_settings, get_database_settings
+from ..db.constants import EXTRACTION_CACHE_CHANNEL
+from ..dependencies.query_builder import Query
+
+# --------------------------------------------------------------------------------------------
+
+Tenant = Tuple[str, str]
+"""source_app and company_code of the journeys read by an extraction"""
+
+
+class CacheEntry(NamedTuple):
+    """Result of an extraction serialized in the body of the response"""
+
+    body: bytes
+    tenant: Tenant
+    expires: float
+    """Monotonic time after which the entry is stale"""
+
+
+class ExtractionCache:
+    """
+    LRU cache of the serialized results of the extractions, bounded by
+    extraction_cache_size bytes, whose entries expire after extraction_cache_ttl.
+    The journeys stored by any worker invalidate the entries of their source_app
+    and company_code: the store transaction notifies them and a dedicated connection
+    listens to the notifications. While it is disconnected the cache isn't used,
+    because the invalidations could be lost
+    """
+
+    RECONNECT_DELAY = 1.0
+    """Seconds to wait before reconnecting the listener"""
+
+    def __init__(self):
+        self.entries: Dict[bytes, CacheEntry] = OrderedDict()
+        """Entries from the least to the most recently used"""
+        self.tenants: Dict[Tenant, Set[bytes]] = {}
+        """Keys of the entries of every tenant"""
+        self.generations: Dict[Tenant, int] = {}
+        """Invalidations of every tenant"""
+        self.epoch = 0
+        """Times the whole cache was cleared"""
+        self.size = 0
+        """Bytes of the cached entries"""
+        self.budget = 0
+        """Bytes that the cached entries can't exceed"""
+        self.ttl = 0.0
+        """Seconds after which an entry is stale"""
+
+        self.listener: Optional[asyncio.Task] = None
+        """Background task that receives the invalidations"""
+        self.listening = False
+        """Flag that indicates that no invalidation can be lost"""
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.notifications = 0
+        self.discarded = 0
+
+    @property
+    def running(self) -> bool:
+        """True if the cache can be used"""
+        return self.listener is not None and self.listening
+
+    async def start(self) -> None:
+        """
+        Start listening to the invalidations if the cache is enabled
+        """
+        settings = get_cache_settings()
+        if not settings.extraction_cache:
+            return
+
+        self.budget = settings.extraction_cache_size
+        self.ttl = settings.extraction_cache_ttl
+        try:
+            connection = await self.__connect()
+        except Exception as error:
+            await get_logger().warning(
+                msg={"extraction_cache": "listener failed", "error": repr(error)}
+            )
+            connection = None
+        self.listener = asyncio.create_task(self.__listen_loop(connection))
+
+    async def stop(self) -> None:
+        """
+        Stop listening to the invalidations and drop every entry
+        """
+        if self.listener is None:
+            return
+
+        self.listener.cancel()
+        try:
+            await self.listener
+        except asyncio.CancelledError:
+            pass
+        self.listener = None
+        self.clear()
+
+    @staticmethod
+    def key(extraction: Query) -> bytes:
+        """
+        Canonical key of an extraction: the compiled query and its arguments,
+        so the requests that differ only by fields ignored by the query share it.
+        The period of the keys of the pseudonyms drops the results whose
+        pseudonyms rotated
+
+        :param extraction: query of the extraction
+        """
+        return orjson.dumps(
+            [
+                extraction.request,
+                extraction.query,
+                extraction.args,
+                extraction.query_traces,
+                extraction.labels,
+                pseudonym_epoch(),
+            ]
+        )
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """
+        :param key: key of the extraction
+        :return: body of the cached result, None if it isn't cached or is stale
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires <= time.monotonic():
+            self.expirations += 1
+            self.misses += 1
+            self.__drop(key)
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry.body
+
+    def generation(self, tenant: Tenant) -> Tuple[int, int]:
+        """
+        Version of the data of a tenant, to be taken before extracting them
+
+        :param tenant: source_app and company_code of the extraction
+        """
+        return self.epoch, self.generations.get(tenant, 0)
+
+    def put(
+        self, key: bytes, tenant: Tenant, body: bytes, generation: Tuple[int, int]
+    ) -> None:
+        """
+        Cache the result of an extraction, unless its tenant was invalidated
+        while the result was extracted
+
+        :param key: key of the extraction
+        :param tenant: source_app and company_code of the extraction
+        :param body: serialized result
+        :param generation: version of the data taken before the extraction
+        """
+        if generation != self.generation(tenant):
+            self.discarded += 1
+            return
+
+        size = len(key) + len(body)
+        if size > self.budget:
+            return
+
+        if key in self.entries:
+            self.__drop(key)
+        while self.size + size > self.budget:
+            self.evictions += 1
+            self.__drop(next(iter(self.entries)))
+
+        self.entries[key] = CacheEntry(body, tenant, time.monotonic() + self.ttl)
+        self.tenants.setdefault(tenant, set()).add(key)
+        self.size += size
+
+    def invalidate(self, tenants: Iterable[Tenant]) -> None:
+        """
+        Drop the entries of the tenants whose data changed
+
+        :param tenants: source_app and company_code of the stored journeys
+        """
+        if not self.budget:
+            return
+
+        for tenant in tenants:
+            self.generations[tenant] = self.generations.get(tenant, 0) + 1
+            for key in tuple(self.tenants.get(tenant, ())):
+                self.invalidations += 1
+                self.__drop(key)
+
+    def clear(self) -> None:
+        """
+        Drop every entry
+        """
+        self.epoch += 1
+        self.entries.clear()
+        self.tenants.clear()
+        self.generations.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Metrics of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.running,
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "budget_bytes": self.budget,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "notifications": self.notifications,
+            "discarded": self.discarded,
+        }
+
+    def __drop(self, key: bytes) -> None:
+        """
+        :param key: key of the entry to drop
+        """
+        entry = self.entries.pop(key)
+        self.size -= len(key) + len(entry.body)
+        keys = self.tenants[entry.tenant]
+        keys.discard(key)
+        if not keys:
+            del self.tenants[entry.tenant]
+
+    # ----------------------------------------------------------------------------------------
+
+    async def __connect(self) -> Connection:
+        """
+        Open the connection that listens to the invalidations
+        """
+        settings = get_database_settings()
+        connection = await connect(
+            user=settings.postgres_user,
+            password=settings.postgres_pwd,
+            database=settings.postgres_db,
+            host=settings.postgres_host,
+            port=settings.postgres_port,
+        )
+        await connection.add_listener(EXTRACTION_CACHE_CHANNEL, self.__notified)
+        return connection
+
+    async def __listen_loop(self, connection: Optional[Connection]) -> None:
+        """
+        Keep the listener connected, the cache is cleared whenever it disconnects
+
+        :param connection: connection already listening, if any
+        """
+        logger = get_logger()
+        while True:
+            if connection is None:
+                await asyncio.sleep(self.RECONNECT_DELAY)
+                try:
+                    connection = await self.__connect()
+                except Exception as error:
+                    await logger.warning(
+                        msg={
+                            "extraction_cache": "listener failed",
+                            "error": repr(error),
+                        }
+                    )
+                    continue
+
+            terminated = asyncio.Event()
+            connection.add_termination_listener(lambda _: terminated.set())
+            self.listening = True
+            try:
+                if not connection.is_closed():
+                    await terminated.wait()
+                await logger.warning(msg={"extraction_cache": "listener disconnected"})
+            finally:
+                self.listening = False
+                self.clear()
+                await connection.close()
+            connection = None
+
+    def __notified(
+        self, connection: Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        """
+        Invalidate the tenant notified by a store transaction
+
+        :param payload: source_app and company_code serialized as a JSON array
+        """
+        self.notifications += 1
+        source_app, company_code = orjson.loads(payload)
+        self.invalidate([(source_app, company_code)])
+
+
+# --------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_extraction_cache() -> ExtractionCache:
+    """Obtain as a singleton the extraction cache of the worker"""
+    return ExtractionCache()
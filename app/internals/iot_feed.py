@@ -22,7 +22,12 @@ IoT internals package
     limitations under the License.
 """
 
+# Standard Library
+from typing import List
+
 # Internal
+from .iot_micro_batch import get_iot_micro_batcher
+from .spool import store_or_spool, RecordKind
 from ..db.postgresql import get_database
 from ..models.iot_feed.iot import IotInput
 
@@ -31,12 +36,31 @@ from ..models.iot_feed.iot import IotInput
 
 async def store_iot_feed(iot_feed: IotInput) -> dict:
     """
-    Store UserFeed data in the anonymizer
+    Store IoT data in the anonymizer, spooling them if the database is unavailable
 
     :param iot_feed: data to store
     """
+    micro_batcher = get_iot_micro_batcher()
+    if micro_batcher.running:
+        store = micro_batcher.store(iot_feed)
+    else:
+        store = get_database().store_iot(iot_feed)
+    return await store_or_spool(store, RecordKind.iot, iot_feed)
+
+
+async def store_iot_feed_batch(iot_feeds: List[IotInput]) -> dict:
+    """
+    Store a batch of IoT data in the anonymizer
+
+    :param iot_feeds: observations to store
+    :return: outcome of every observation of the batch
+    """
     database = get_database()
-    return await database.store_iot(iot_feed)
+    return {
+        "resource": "IOT",
+        "status": "Processed",
+        "observations": await database.store_iot_batch(iot_feeds),
+    }
 
 
 async def extract_iot_info(observation_gep_id: str) -> dict:
@@ -0,0 +1,224 @@
+"""
+IoT micro-batching package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Third Party
+from fastapi import status, HTTPException
+
+# Internal
+from ..config import get_ingest_settings
+from ..db.postgresql import get_database
+from ..models.iot_feed.iot import IotInput
+
+# --------------------------------------------------------------------------------------------
+
+
+class IotMicroBatcher:
+    """
+    Collect the observations received at the same time by the worker and store them
+    with a single statement, flushed when iot_micro_batch_observations are waiting
+    or iot_micro_batch_delay expires.
+    Every caller is answered only once its observation is committed
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        """Observations waiting to be stored with their callers"""
+        self.flusher: Optional[asyncio.Task] = None
+        """Background task that stores the observations"""
+        self.stopping = False
+        """Flag that indicates that the worker is shutting down"""
+
+        self.observations = 0
+        self.flushes = 0
+        self.flush_latency_total = 0.0
+        self.flush_latency_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        """True if the observations are micro-batched"""
+        return self.flusher is not None and not self.stopping
+
+    async def start(self) -> None:
+        """
+        Start the flusher if the micro-batching is enabled
+        """
+        settings = get_ingest_settings()
+        if not settings.iot_micro_batch:
+            return
+
+        self.stopping = False
+        self.queue = asyncio.Queue()
+        self.flusher = asyncio.create_task(
+            self.__flush_loop(
+                settings.iot_micro_batch_observations,
+                settings.iot_micro_batch_delay,
+            )
+        )
+
+    async def stop(self) -> None:
+        """
+        Stop micro-batching and wait until every waiting observation is stored
+        """
+        if not self.running:
+            return
+
+        self.stopping = True
+        await self.queue.put(None)
+        await self.flusher
+        self.flusher = None
+
+    async def store(self, iot_feed: IotInput) -> dict:
+        """
+        Store an observation together with the others received meanwhile
+
+        :param iot_feed: data to store
+        :return: the same outcome of DataBase.store_iot
+        """
+        if not self.running:
+            # Stopped meanwhile, the observation is stored by itself
+            return await get_database().store_iot(iot_feed)
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((iot_feed, future))
+        return await future
+
+    def stats(self) -> dict:
+        """
+        Metrics of the micro-batches
+        """
+        return {
+            "enabled": self.running,
+            "observations": self.observations,
+            "flushes": self.flushes,
+            "observations_per_flush": self.observations / self.flushes
+            if self.flushes
+            else 0.0,
+            "flush_latency_ms": {
+                "max": self.flush_latency_max * 1000,
+                "avg": self.flush_latency_total * 1000 / self.flushes
+                if self.flushes
+                else 0.0,
+            },
+        }
+
+    async def __flush_loop(self, flush_observations: int, flush_delay: float) -> None:
+        """
+        Collect the observations in micro-batches and store them
+
+        :param flush_observations: observations that trigger a flush
+        :param flush_delay: seconds after the first observation that trigger a flush
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            waiting = await self.queue.get()
+            if waiting is None:
+                return
+
+            batch = [waiting]
+            deadline = loop.time() + flush_delay
+            stop = False
+
+            while len(batch) < flush_observations:
+                # Take without waiting what's already queued
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        waiting = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    waiting = self.queue.get_nowait()
+
+                if waiting is None:
+                    stop = True
+                    break
+                batch.append(waiting)
+
+            await self.__flush(batch)
+            if stop:
+                return
+
+    async def __flush(self, batch: List[Tuple[IotInput, asyncio.Future]]) -> None:
+        """
+        Store a micro-batch and answer its callers
+
+        :param batch: observations to store with their callers
+        """
+        # The observations of the callers gone meanwhile aren't acknowledged to
+        # anyone, so they aren't stored
+        batch = [(iot_feed, future) for iot_feed, future in batch if not future.done()]
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            outcomes = await get_database().store_iot_batch(
+                [iot_feed for iot_feed, _ in batch]
+            )
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), outcome in zip(batch, outcomes):
+            # The caller could be gone while the batch was stored
+            if future.done():
+                continue
+            if outcome["status"] == "Stored":
+                future.set_result({"resource": "IOT", "status": "Stored"})
+            else:
+                # Same answer of an observation stored by itself
+                future.set_exception(
+                    HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail={
+                            "resource": "IOT",
+                            "status": "Something went wrong storing the data",
+                        },
+                    )
+                )
+
+        latency = time.perf_counter() - start
+        self.observations += len(batch)
+        self.flushes += 1
+        self.flush_latency_total += latency
+        self.flush_latency_max = max(self.flush_latency_max, latency)
+
+
+# --------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_iot_micro_batcher() -> IotMicroBatcher:
+    """Obtain as a singleton the IoT micro-batcher of the worker"""
+    return IotMicroBatcher()
@@ -0,0 +1,47 @@
+"""
+Metrics internals package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Internal
+from ..db.statements import get_statement_stats
+from .extraction_cache import get_extraction_cache
+from .iot_micro_batch import get_iot_micro_batcher
+from .retention import get_retention_job
+from .spool import get_spool
+from .write_behind import get_write_behind
+
+# --------------------------------------------------------------------------------------------
+
+
+def collect_metrics() -> dict:
+    """
+    Collect the metrics of the worker components
+    """
+    return {
+        "write_behind": get_write_behind().stats(),
+        "spool": get_spool().stats(),
+        "iot_micro_batch": get_iot_micro_batcher().stats(),
+        "statements": get_statement_stats().stats(),
+        "extraction_cache": get_extraction_cache().stats(),
+        "retention": get_retention_job().stats(),
+    }
@@ -0,0 +1,97 @@
+"""
+Page cursor package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import base64
+import binascii
+import os
+from functools import lru_cache
+from typing import Tuple
+
+# Third Party
+import orjson
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Internal
+from ..config import get_page_settings
+
+# --------------------------------------------------------------------------------------------
+
+PageKey = Tuple[int, str]
+"""start_date and journey_id of the last journey of a page"""
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+
+@lru_cache(maxsize=1)
+def page_cursor_cipher() -> AESGCM:
+    """
+    :return: AES-GCM cipher that encrypts and authenticates the cursors, with a key
+    derived from the secret
+    """
+    key = HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None, info=b"page cursor"
+    ).derive(get_page_settings().page_cursor_key.encode())
+    return AESGCM(key)
+
+
+def encode_page_cursor(key: PageKey) -> str:
+    """
+    Build the opaque cursor of the next page, the journey_id is encrypted so
+    the cursor doesn't disclose the journeys behind the pseudonyms
+
+    :param key: start_date and journey_id of the last journey of a page
+    :return: url safe cursor
+    """
+    nonce = os.urandom(NONCE_SIZE)
+    ciphertext = page_cursor_cipher().encrypt(nonce, orjson.dumps(key), None)
+    return base64.urlsafe_b64encode(nonce + ciphertext).decode()
+
+
+def decode_page_cursor(cursor: str) -> PageKey:
+    """
+    :param cursor: cursor returned with the previous page
+    :return: start_date and journey_id of the last journey of the previous page
+    :raise ValueError: if the cursor wasn't built by encode_page_cursor
+    """
+    try:
+        token = base64.urlsafe_b64decode(cursor.encode())
+    except (binascii.Error, ValueError):
+        raise ValueError("invalid page cursor")
+    if len(token) <= NONCE_SIZE + TAG_SIZE:
+        raise ValueError("invalid page cursor")
+
+    try:
+        payload = page_cursor_cipher().decrypt(
+            token[:NONCE_SIZE], token[NONCE_SIZE:], None
+        )
+    except InvalidTag:
+        raise ValueError("invalid page cursor")
+
+    start_date, journey_id = orjson.loads(payload)
+    return start_date, journey_id
@@ -0,0 +1,142 @@
+"""
+Pseudonyms package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import hashlib
+import hmac
+import os
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+# Third Party
+import orjson
+from asyncpg import Record
+
+# Internal
+from ..config import get_pseudonym_settings, PseudonymScope
+from ..dependencies.query_builder import Query
+
+# --------------------------------------------------------------------------------------------
+
+KEY_SIZE = 32
+
+
+def pseudonym_epoch() -> int:
+    """
+    :return: period of pseudonym_rotation seconds of the current keys, 0 if they
+        never rotate
+    """
+    rotation = get_pseudonym_settings().pseudonym_rotation
+    return int(time.time()) // rotation if rotation > 0 else 0
+
+
+@lru_cache(maxsize=1024)
+def pseudonym_key(scope: bytes, epoch: int) -> bytes:
+    """
+    :param scope: extractions that share the pseudonyms
+    :param epoch: period of the key
+    :return: key of the pseudonyms of the scope, derived from the secret
+    """
+    secret = get_pseudonym_settings().pseudonym_key.encode()
+    return hmac.new(
+        secret, b"journey pseudonyms" + epoch.to_bytes(8, "big") + scope, hashlib.sha256
+    ).digest()
+
+
+def extraction_pseudonym_key(extraction: Query) -> bytes:
+    """
+    Key of the pseudonyms of an extraction: the identical requests, or the
+    requests of the same source_app and company_code, obtain the same pseudonyms
+    until the key rotates
+
+    :param extraction: query of the extraction
+    """
+    if get_pseudonym_settings().pseudonym_scope == PseudonymScope.consumer:
+        scope = orjson.dumps([extraction.source_app, extraction.company_code])
+    else:
+        scope = orjson.dumps(
+            [
+                extraction.request,
+                extraction.query,
+                extraction.args,
+                extraction.query_traces,
+            ]
+        )
+    return pseudonym_key(scope, pseudonym_epoch())
+
+
+# --------------------------------------------------------------------------------------------
+
+
+class JourneyPseudonyms:
+    """
+    Format compatible with all positions and complete_mobility: every journey_id
+    is replaced by its keyed BLAKE2b, formatted as a UUID. The pseudonym of every
+    journey is derived once per batch of rows and kept for the following ones,
+    so the chunks of a stream share them too
+    """
+
+    def __init__(self, key: Optional[bytes] = None):
+        """
+        :param key: key of the pseudonyms, random if not set
+        """
+        self.key = key or os.urandom(KEY_SIZE)
+        """Key of the pseudonyms"""
+        self.pseudonyms: Dict[str, str] = {}
+        """Pseudonym of every journey extracted"""
+
+    def pseudonym(self, journey_id: str) -> str:
+        """
+        :param journey_id: id of the journey
+        :return: pseudonym of the journey
+        """
+        digest = hashlib.blake2b(
+            journey_id.encode(), key=self.key, digest_size=16
+        ).hexdigest()
+        return (
+            f"{digest[:8]}-{digest[8:12]}-{digest[12:16]}-"
+            f"{digest[16:20]}-{digest[20:]}"
+        )
+
+    def __call__(self, record_list: List[Union[Record, dict]]) -> List[dict]:
+        """
+        Copy every record in a row once, the rows decoded from the traces are
+        already dicts and are converted in place
+
+        :param record_list: batch of data to convert
+        :return: converted data
+        """
+        pseudonyms = self.pseudonyms
+        rows = []
+        for record in record_list:
+            row = record if type(record) is dict else dict(record.items())
+            pseudonym = pseudonyms.get(row["journey_id"])
+            if pseudonym is None:
+                pseudonym = pseudonyms[row["journey_id"]] = self.pseudonym(
+                    row["journey_id"]
+                )
+            row["journey_id"] = pseudonym
+            rows.append(row)
+        return rows
@@ -0,0 +1,362 @@
+"""
+Retention package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+import time
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Third Party
+from asyncpg import connect, Connection
+from asyncpg.exceptions import LockNotAvailableError, PostgresError
+
+# Internal
+from .logger import get_logger
+from ..config import get_database_settings, get_retention_settings
+from ..db.constants import (
+    RETENTION_LOCK_QUERY,
+    RETENTION_LOCK_TIMEOUT_QUERY,
+    DELETE_EXPIRED_ROWS_QUERY,
+    PARTITIONS_QUERY,
+    TABLE_BYTES_QUERY,
+    VACUUM_RUNNING_QUERY,
+    VACUUM_QUERY,
+)
+from ..db.partitions import drop_partitions, PARTITIONED_TABLES
+from ..db.postgresql import DATABASE_UNAVAILABLE_ERRORS
+
+# --------------------------------------------------------------------------------------------
+
+DAY = 86400_000
+"""Milliseconds of a day"""
+
+
+class RetentionTable(NamedTuple):
+    """Table whose expired rows are deleted a batch of keys at a time"""
+
+    name: str
+    key: str
+    """Column that splits the rows in batches, the first one of the primary key"""
+    column: str
+    """Time of the rows compared with the retention"""
+    bound: str = "$1"
+    """Oldest time kept, $1 is in ms"""
+
+
+RETENTION_TABLES = (
+    RetentionTable("user_sensors", "journey_id", "start_date"),
+    RetentionTable("user_positions", "journey_id", "start_date"),
+    RetentionTable("user_traces", "journey_id", "start_time"),
+    RetentionTable("user_behaviours", "journey_id", "start_date"),
+    RetentionTable("user_data", "journey_id", "start_date"),
+    RetentionTable("user_behaviours_rollup", "source_app", "day"),
+    RetentionTable("user_data_rollup", "source_app", "day"),
+    RetentionTable(
+        "iot_data",
+        "observation_gep_id",
+        "result_time",
+        "to_timestamp($1::bigint / 1000.0)",
+    ),
+)
+"""
+Tables with a retention, in the order their rows are deleted: the journeys after
+the rest of their data. The rollups have their own retention, by default they
+keep the statistics of the journeys deleted forever
+"""
+
+
+class RetentionJob:
+    """
+    Background job of a single worker, elected by a lock held by its connection,
+    that deletes the data older than their retention every retention_interval.
+    The expired months of the partitioned tables are dropped, the remaining rows
+    are deleted in batches short enough to keep them locked at most for
+    retention_batch_seconds. Then the tables are vacuumed, unless autovacuum is
+    already vacuuming them, and every run reports the rows deleted, the bytes
+    reclaimed and the size the tables are left with
+    """
+
+    RETRY_DELAY = 5.0
+    """Seconds to wait before connecting again after a failure"""
+
+    def __init__(self):
+        self.job: Optional[asyncio.Task] = None
+        """Background task that elects the worker and runs the job"""
+        self.elected = False
+        """Flag that indicates that this worker runs the job"""
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Dict[str, dict] = {}
+        """Report of the last run of every table"""
+
+    @property
+    def running(self) -> bool:
+        """True if the job is enabled"""
+        return self.job is not None
+
+    async def start(self) -> None:
+        """
+        Start competing to run the job if the retention is enabled
+        """
+        settings = get_retention_settings()
+        if not settings.retention:
+            return
+
+        self.job = asyncio.create_task(self.__job_loop(settings.retention_interval))
+
+    async def stop(self) -> None:
+        """
+        Stop the job, the lock is released with its connection
+        """
+        if self.job is None:
+            return
+
+        self.job.cancel()
+        try:
+            await self.job
+        except asyncio.CancelledError:
+            pass
+        self.job = None
+
+    @staticmethod
+    def retention() -> Dict[str, Optional[int]]:
+        """
+        :return: oldest time kept in ms of every table, None to keep its rows forever.
+        The data of the journeys are never kept longer than the journeys. The
+        journeys and the rollups are deleted a whole day at a time, the grain of
+        the rollups, so with the same retention their statistics agree
+        """
+        settings = get_retention_settings()
+        now = int(time.time() * 1000)
+
+        def oldest(*days: int) -> Optional[int]:
+            days = [day for day in days if day > 0]
+            return now - min(days) * DAY if days else None
+
+        def oldest_day(days: int) -> Optional[int]:
+            time_kept = oldest(days)
+            return None if time_kept is None else time_kept - time_kept % DAY
+
+        journeys = settings.retention_journeys_days
+        journeys_day = oldest_day(journeys)
+        rollups_day = oldest_day(settings.retention_rollups_days)
+        return {
+            "user_sensors": oldest(settings.retention_sensors_days, journeys),
+            "user_positions": oldest(settings.retention_positions_days, journeys),
+            "user_traces": oldest(settings.retention_positions_days, journeys),
+            "user_behaviours": journeys_day,
+            "user_data": journeys_day,
+            "user_behaviours_rollup": rollups_day,
+            "user_data_rollup": rollups_day,
+            "iot_data": oldest(settings.retention_iot_days),
+        }
+
+    async def run(self, conn: Connection) -> Dict[str, dict]:
+        """
+        Delete the data older than their retention
+
+        :param conn: connection to the database, outside of any transaction
+        :return: rows deleted, partitions dropped, bytes reclaimed and bytes left of
+        every table, completed is False if the locks of the table stopped the run.
+        The bytes reclaimed are those of the partitions dropped and of the rows
+        deleted, that the vacuum makes reusable without shrinking the table
+        """
+        retention = self.retention()
+        lock_timeout = RETENTION_LOCK_TIMEOUT_QUERY.format(
+            timeout=int(get_retention_settings().retention_batch_seconds * 1000)
+        )
+        report = {}
+        for table in RETENTION_TABLES:
+            oldest = retention[table.name]
+            if oldest is None:
+                continue
+
+            partitions = []
+            partitions_bytes = 0
+            dropped = True
+            if table.name in PARTITIONED_TABLES:
+                # Dropping a partition locks the whole table, the next run tries again
+                try:
+                    async with conn.transaction():
+                        await conn.execute(lock_timeout)
+                        sizes = await self.__partitions_bytes(conn, table.name)
+                        partitions = await drop_partitions(conn, oldest, (table.name,))
+                    partitions_bytes = sum(sizes[partition] for partition in partitions)
+                except LockNotAvailableError:
+                    dropped = False
+            rows, rows_bytes, completed = await self.__delete_batches(
+                conn, table, oldest, lock_timeout
+            )
+            vacuumed = False
+            if rows:
+                vacuumed = await self.__vacuum(conn, table.name)
+            report[table.name] = {
+                "rows": rows,
+                "partitions": partitions,
+                "bytes_reclaimed": partitions_bytes + rows_bytes,
+                "size_bytes": await conn.fetchval(TABLE_BYTES_QUERY, table.name),
+                "completed": dropped and completed,
+                "vacuumed": vacuumed,
+            }
+
+        self.runs += 1
+        self.last_run = report
+        return report
+
+    def stats(self) -> dict:
+        """
+        Metrics of the job
+        """
+        return {
+            "enabled": self.running,
+            "elected": self.elected,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+        }
+
+    # ----------------------------------------------------------------------------------------
+
+    @staticmethod
+    async def __delete_batches(
+        conn: Connection, table: RetentionTable, oldest: int, lock_timeout: str
+    ) -> Tuple[int, int, bool]:
+        """
+        Delete the expired rows a batch of keys at a time, every batch in its own
+        transaction. The batches that take longer than retention_batch_seconds are
+        halved, the faster ones doubled up to retention_batch_keys
+
+        :param conn: connection to the database, outside of any transaction
+        :param table: table to clean up
+        :param oldest: oldest time kept in ms
+        :param lock_timeout: query that limits the wait for the locks of the table
+        :return: rows deleted, their bytes and False if a lock stopped the deletion
+        """
+        settings = get_retention_settings()
+        query = DELETE_EXPIRED_ROWS_QUERY.format(
+            table=table.name, key=table.key, column=table.column, bound=table.bound
+        )
+        keys = settings.retention_batch_keys
+        last_key = ""
+        rows = 0
+        rows_bytes = 0
+        while True:
+            started = time.monotonic()
+            try:
+                async with conn.transaction():
+                    await conn.execute(lock_timeout)
+                    deleted = await conn.fetchrow(query, oldest, last_key, keys)
+            except LockNotAvailableError:
+                # The next run goes on
+                return rows, rows_bytes, False
+            elapsed = time.monotonic() - started
+
+            rows += deleted["rows"]
+            rows_bytes += deleted["bytes"]
+            if deleted["last"] is None:
+                return rows, rows_bytes, True
+            last_key = deleted["last"]
+            if elapsed > settings.retention_batch_seconds:
+                keys = max(keys // 2, 1)
+            elif elapsed < settings.retention_batch_seconds / 2:
+                keys = min(keys * 2, settings.retention_batch_keys)
+
+    @staticmethod
+    async def __partitions_bytes(conn: Connection, table: str) -> Dict[str, int]:
+        """
+        :param conn: connection to the database
+        :param table: partitioned table
+        :return: bytes of every partition of the table, with its indexes
+        """
+        return {
+            record["relname"]: await conn.fetchval(TABLE_BYTES_QUERY, record["relname"])
+            for record in await conn.fetch(PARTITIONS_QUERY, table)
+        }
+
+    @staticmethod
+    async def __vacuum(conn: Connection, table: str) -> bool:
+        """
+        Vacuum a table to reuse the space of the deleted rows
+
+        :param conn: connection to the database, outside of any transaction
+        :param table: table to vacuum
+        :return: False if autovacuum is already vacuuming it
+        """
+        if await conn.fetchval(VACUUM_RUNNING_QUERY, table):
+            return False
+        await conn.execute(VACUUM_QUERY.format(table=table))
+        return True
+
+    async def __connect(self) -> Connection:
+        """
+        Open the connection that holds the lock of the job
+        """
+        settings = get_database_settings()
+        return await connect(
+            user=settings.postgres_user,
+            password=settings.postgres_pwd,
+            database=settings.postgres_db,
+            host=settings.postgres_host,
+            port=settings.postgres_port,
+        )
+
+    async def __job_loop(self, interval: float) -> None:
+        """
+        Try to be elected every interval, then run the job every interval
+
+        :param interval: seconds between two runs
+        """
+        logger = get_logger()
+        while True:
+            try:
+                connection = await self.__connect()
+                try:
+                    while not await connection.fetchval(RETENTION_LOCK_QUERY):
+                        await asyncio.sleep(interval)
+                    self.elected = True
+                    while True:
+                        report = await self.run(connection)
+                        await logger.info(msg={"retention": "run", "tables": report})
+                        await asyncio.sleep(interval)
+                finally:
+                    self.elected = False
+                    await connection.close()
+
+            except (PostgresError, OSError, *DATABASE_UNAVAILABLE_ERRORS) as error:
+                self.failures += 1
+                await logger.warning(
+                    msg={"retention": "run failed", "error": repr(error)}
+                )
+                await asyncio.sleep(self.RETRY_DELAY)
+
+
+# --------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_retention_job() -> RetentionJob:
+    """Obtain as a singleton the retention job of the worker"""
+    return RetentionJob()
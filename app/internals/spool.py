@@ -0,0 +1,720 @@
+"""
+Disk spool package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import time
+import zlib
+from enum import IntEnum
+from functools import lru_cache
+from typing import Awaitable, Iterator, List, Optional, Tuple, Union
+
+# Third Party
+import orjson
+from fastapi import status, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+
+# Internal
+from .logger import get_logger
+from ..config import get_ingest_settings
+from ..db.postgresql import database_unavailable, get_database
+from ..models.iot_feed.iot import IotInput
+from ..models.model import OrjsonModel
+from ..models.user_feed.user import UserFeedInternal
+
+# --------------------------------------------------------------------------------------------
+
+
+class RecordKind(IntEnum):
+    """Kind of data stored in a spool record"""
+
+    user = 1
+    iot = 2
+
+
+RECORD_HEADER = struct.Struct("<IIqB")
+"""Header of a spool record: payload length, payload crc32, UTC append time in ms, kind"""
+
+
+def read_records(
+    view: Union[bytes, mmap.mmap], offset: int = 0
+) -> Iterator[Tuple[int, RecordKind, int, bytes]]:
+    """
+    Read the records of a segment.
+    The reading stops at the first truncated or corrupted record, that can be
+    left by a worker killed while it was writing
+
+    :param view: content of the segment
+    :param offset: position of the first record to read
+    :return: iterator of (offset of the next record, kind, append time in ms, payload)
+    """
+    size = len(view)
+    while offset + RECORD_HEADER.size <= size:
+        length, crc, appended_at, kind = RECORD_HEADER.unpack_from(view, offset)
+        start = offset + RECORD_HEADER.size
+        end = start + length
+        if end > size:
+            return
+
+        payload = view[start:end]
+        if zlib.crc32(payload) != crc or kind not in (RecordKind.user, RecordKind.iot):
+            return
+
+        offset = end
+        yield offset, RecordKind(kind), appended_at, payload
+
+
+class Spool:
+    """
+    Append-only log of the data that couldn't be stored in the database.
+    Every worker appends to the segments of its own slot directory, the records are
+    flushed to disk together every spool_fsync_interval and a background task
+    replays the sealed segments in the database once it's reachable again
+    """
+
+    LOCK = "lock"
+    """File locked by the worker that owns a slot"""
+
+    CHECKPOINT = "checkpoint"
+    """File with the position of the first record not replayed yet"""
+
+    def __init__(self):
+        self.root: Optional[str] = None
+        """Directory that contains the slot of every worker"""
+        self.directory: Optional[str] = None
+        """Slot of the worker"""
+        self.slot_lock: Optional[int] = None
+        """Descriptor of the locked file of the slot"""
+        self.segment = 0
+        """Sequence number of the segment where the records are appended"""
+        self.fd: Optional[int] = None
+        """Descriptor of the segment where the records are appended"""
+        self.segment_bytes = 0
+        self.segment_size = 0
+        self.fsync_interval = 0.0
+
+        self.lock: Optional[asyncio.Lock] = None
+        """Serialize appends, segment rolls and fsyncs"""
+        self.sync_future: Optional[asyncio.Future] = None
+        """Resolved when the records appended since the last fsync are on disk"""
+        self.syncer: Optional[asyncio.Task] = None
+        self.replayer: Optional[asyncio.Task] = None
+
+        self.appended_records = 0
+        self.replayed_records = 0
+        self.dropped_records = 0
+        self.segment_oldest: Optional[int] = None
+        """UTC time in ms of the first record of the active segment"""
+        self.replay_oldest: Optional[int] = None
+        """UTC time in ms of the first record of the sealed segments not replayed yet"""
+        self.replay_throughput = 0.0
+
+    @property
+    def running(self) -> bool:
+        """True if the spool accepts records"""
+        return self.fd is not None
+
+    async def start(self) -> None:
+        """
+        Claim a slot and start the replay if the spool is enabled
+        """
+        settings = get_ingest_settings()
+        if not settings.spool:
+            return
+
+        self.root = settings.spool_directory
+        self.segment_size = settings.spool_segment_size
+        self.fsync_interval = settings.spool_fsync_interval
+        self.lock = asyncio.Lock()
+        self.directory, self.slot_lock = self.claim_slot(self.root)
+
+        # The segments left by a previous run are sealed, the replay will store them
+        segments = self.segments(self.directory)
+        self.__open_segment(segments[-1] + 1 if segments else 0)
+
+        self.replayer = asyncio.create_task(
+            self.__replay_loop(
+                settings.spool_replay_interval, settings.spool_replay_journeys
+            )
+        )
+
+    async def stop(self) -> None:
+        """
+        Stop the replay and flush to disk the appended records
+        """
+        if not self.running:
+            return
+
+        self.replayer.cancel()
+        try:
+            await self.replayer
+        except asyncio.CancelledError:
+            pass
+
+        async with self.lock:
+            await self.__sync_now()
+            os.close(self.fd)
+            self.fd = None
+            if not self.segment_bytes:
+                os.remove(self.segment_path(self.directory, self.segment))
+
+        # Closing the descriptor releases the slot
+        os.close(self.slot_lock)
+        self.slot_lock = None
+
+    async def append(self, kind: RecordKind, payload: bytes) -> None:
+        """
+        Append a record and wait until it's on disk
+
+        :param kind: kind of data
+        :param payload: data serialized as json
+        """
+        if not self.running:
+            raise OSError("The spool is not running")
+
+        appended_at = int(time.time() * 1000)
+        record = (
+            RECORD_HEADER.pack(len(payload), zlib.crc32(payload), appended_at, kind)
+            + payload
+        )
+
+        async with self.lock:
+            if not self.running:
+                # Stopped while waiting for the lock
+                raise OSError("The spool is not running")
+            if (
+                self.segment_bytes
+                and self.segment_bytes + len(record) > self.segment_size
+            ):
+                await self.__roll()
+
+            view = memoryview(record)
+            while view:
+                view = view[os.write(self.fd, view) :]
+
+            self.segment_bytes += len(record)
+            self.appended_records += 1
+            if self.segment_oldest is None:
+                self.segment_oldest = appended_at
+
+            if self.sync_future is None:
+                self.sync_future = asyncio.get_running_loop().create_future()
+                self.syncer = asyncio.create_task(self.__sync_later(self.sync_future))
+            future = self.sync_future
+
+        # Every record appended in the same interval shares the same fsync
+        await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        """
+        Metrics of the spool and of the replay
+        """
+        size = 0
+        if self.root and os.path.isdir(self.root):
+            for slot in os.scandir(self.root):
+                if slot.is_dir():
+                    size += sum(
+                        entry.stat().st_size
+                        for entry in os.scandir(slot.path)
+                        if entry.name.endswith(".log")
+                    )
+
+        oldest = [
+            appended_at
+            for appended_at in (self.replay_oldest, self.segment_oldest)
+            if appended_at is not None
+        ]
+        return {
+            "enabled": self.running,
+            "size_bytes": size,
+            "appended_records": self.appended_records,
+            "replayed_records": self.replayed_records,
+            "dropped_records": self.dropped_records,
+            "replay_lag_s": time.time() - min(oldest) / 1000 if oldest else 0.0,
+            "replay_throughput": self.replay_throughput,
+        }
+
+    # ----------------------------------------------------------------------------------------
+
+    @classmethod
+    def claim_slot(cls, root: str) -> Tuple[str, int]:
+        """
+        Lock the first slot directory not used by another worker
+
+        :param root: directory that contains the slots
+        :return: slot directory and descriptor of its locked file
+        """
+        index = 0
+        while True:
+            directory = os.path.join(root, f"worker-{index}")
+            os.makedirs(directory, exist_ok=True)
+            slot_lock = cls.lock_slot(directory)
+            if slot_lock is not None:
+                return directory, slot_lock
+            index += 1
+
+    @classmethod
+    def lock_slot(cls, directory: str) -> Optional[int]:
+        """
+        Try to lock a slot directory
+
+        :param directory: slot directory
+        :return: descriptor of its locked file or None if another worker owns it
+        """
+        slot_lock = os.open(os.path.join(directory, cls.LOCK), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(slot_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(slot_lock)
+            return None
+        return slot_lock
+
+    @staticmethod
+    def segments(directory: str) -> List[int]:
+        """
+        Sequence numbers of the segments of a slot, in order
+
+        :param directory: slot directory
+        """
+        return sorted(
+            int(name[:-4])
+            for name in os.listdir(directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+
+    @staticmethod
+    def segment_path(directory: str, segment: int) -> str:
+        """
+        Path of a segment
+
+        :param directory: slot directory
+        :param segment: sequence number of the segment
+        """
+        return os.path.join(directory, f"{segment:020d}.log")
+
+    def __open_segment(self, segment: int) -> None:
+        """
+        Open a new segment where the records are appended
+
+        :param segment: sequence number of the segment
+        """
+        self.segment = segment
+        self.segment_bytes = 0
+        self.fd = os.open(
+            self.segment_path(self.directory, segment),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o600,
+        )
+
+    async def __roll(self) -> None:
+        """
+        Seal the active segment and open the next one, must be called holding the lock
+        """
+        await self.__sync_now()
+        os.close(self.fd)
+        self.__open_segment(self.segment + 1)
+
+        if self.replay_oldest is None:
+            self.replay_oldest = self.segment_oldest
+        self.segment_oldest = None
+
+    async def __sync_now(self) -> None:
+        """
+        Flush to disk the active segment, must be called holding the lock
+        """
+        await asyncio.get_running_loop().run_in_executor(None, os.fsync, self.fd)
+        if self.sync_future is not None:
+            self.sync_future.set_result(None)
+            self.sync_future = None
+
+    async def __sync_later(self, future: asyncio.Future) -> None:
+        """
+        Flush to disk the active segment after spool_fsync_interval
+
+        :param future: resolved when the records are on disk
+        """
+        await asyncio.sleep(self.fsync_interval)
+        async with self.lock:
+            if future is not self.sync_future:
+                # Already flushed by a roll or by the shutdown
+                return
+            self.sync_future = None
+            # The duplicated descriptor stays valid even if the segment is rolled meanwhile
+            fd = os.dup(self.fd)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, fd)
+        except OSError as error:
+            future.set_exception(error)
+        else:
+            future.set_result(None)
+        finally:
+            os.close(fd)
+
+    # ----------------------------------------------------------------------------------------
+
+    async def __replay_loop(self, interval: float, journeys: int) -> None:
+        """
+        Replay the spool every interval seconds
+
+        :param interval: seconds between two replays
+        :param journeys: journeys stored in the same batch
+        """
+        logger = get_logger()
+        while True:
+            try:
+                await self.__replay(journeys)
+            except Exception as error:
+                await logger.warning(
+                    msg={"spool": "replay failed", "error": repr(error)}
+                )
+            await asyncio.sleep(interval)
+
+    async def __replay(self, journeys: int) -> None:
+        """
+        Store in the database the sealed segments of the worker and of the slots
+        left by the workers that don't exist anymore
+
+        :param journeys: journeys stored in the same batch
+        """
+        async with self.lock:
+            if self.segment_bytes:
+                await self.__roll()
+            last_sealed = self.segment
+
+        start = time.perf_counter()
+        replayed = self.replayed_records + self.dropped_records
+        try:
+            if not await self.__replay_slot(self.directory, last_sealed, journeys):
+                return
+            self.replay_oldest = None
+
+            for slot in os.scandir(self.root):
+                if not slot.is_dir() or slot.path == self.directory:
+                    continue
+                slot_lock = self.lock_slot(slot.path)
+                if slot_lock is None:
+                    continue
+                try:
+                    if not await self.__replay_slot(slot.path, None, journeys):
+                        return
+                finally:
+                    os.close(slot_lock)
+        finally:
+            replayed = self.replayed_records + self.dropped_records - replayed
+            if replayed:
+                self.replay_throughput = replayed / (time.perf_counter() - start)
+
+    async def __replay_slot(
+        self, directory: str, last_sealed: Optional[int], journeys: int
+    ) -> bool:
+        """
+        Replay the segments of a slot, removing them once they are stored
+
+        :param directory: slot directory
+        :param last_sealed: first segment that must not be replayed, None for every segment
+        :param journeys: journeys stored in the same batch
+        :return: True if every segment has been replayed
+        """
+        for segment in self.segments(directory):
+            if last_sealed is not None and segment >= last_sealed:
+                break
+            if not await self.__replay_segment(directory, segment, journeys):
+                return False
+            os.remove(self.segment_path(directory, segment))
+            self.__save_checkpoint(directory, segment + 1, 0)
+        return True
+
+    async def __replay_segment(
+        self, directory: str, segment: int, journeys: int
+    ) -> bool:
+        """
+        Replay the records of a segment starting from its checkpoint
+
+        :param directory: slot directory
+        :param segment: sequence number of the segment
+        :param journeys: journeys stored in the same batch
+        :return: True if every record has been replayed
+        """
+        offset = self.__load_checkpoint(directory, segment)
+        path = self.segment_path(directory, segment)
+
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size <= offset:
+                return True
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                user_feeds: List[bytes] = []
+                first_appended_at = None
+
+                for end, kind, appended_at, payload in read_records(view, offset):
+                    if first_appended_at is None:
+                        first_appended_at = appended_at
+
+                    if kind is RecordKind.user:
+                        user_feeds.append(payload)
+                        if len(user_feeds) < journeys:
+                            continue
+                        replayed = await self.__replay_user_feeds(user_feeds)
+                    else:
+                        # Keep the order of the records
+                        replayed = not user_feeds or await self.__replay_user_feeds(
+                            user_feeds
+                        )
+                        replayed = replayed and await self.__replay_iot_feed(payload)
+
+                    if not replayed:
+                        self.replay_oldest = first_appended_at
+                        return False
+                    user_feeds.clear()
+                    first_appended_at = None
+                    offset = end
+                    self.__save_checkpoint(directory, segment, offset)
+
+                if user_feeds:
+                    if not await self.__replay_user_feeds(user_feeds):
+                        self.replay_oldest = first_appended_at
+                        return False
+                    offset = end
+
+        if offset < size:
+            await get_logger().warning(
+                msg={
+                    "spool": "truncated segment",
+                    "segment": path,
+                    "lost_bytes": size - offset,
+                }
+            )
+        return True
+
+    async def __replay_user_feeds(self, payloads: List[bytes]) -> bool:
+        """
+        Store a batch of spooled journeys, skipping those already stored by a store
+        that committed after exceeding the latency budget. The records that can't
+        be stored are dropped one at a time, retrying them would block the replay
+        forever
+
+        :param payloads: journeys serialized as json
+        :return: False if the database is still unavailable
+        """
+        logger = get_logger()
+        database = get_database()
+        user_feeds = []
+        for payload in payloads:
+            try:
+                user_feeds.append(UserFeedInternal.parse_raw(payload))
+            except ValidationError as error:
+                await logger.warning(
+                    msg={"spool": "record dropped", "error": repr(error)}
+                )
+                self.dropped_records += 1
+
+        try:
+            stored = await database.stored_journeys(
+                [user_feed.journey_id for user_feed in user_feeds]
+            )
+            replayed = len(user_feeds)
+            user_feeds = [
+                user_feed
+                for user_feed in user_feeds
+                if user_feed.journey_id not in stored
+            ]
+            replayed -= len(user_feeds)
+            outcomes = await self.__store_user_feeds(user_feeds)
+        except Exception as error:
+            if database_unavailable(error):
+                return False
+            await logger.warning(
+                msg={
+                    "spool": "journeys dropped",
+                    "journey_ids": [user_feed.journey_id for user_feed in user_feeds],
+                    "error": repr(error),
+                }
+            )
+            self.dropped_records += len(user_feeds)
+            return True
+
+        dropped = [
+            outcome["journey_id"]
+            for outcome in outcomes
+            if outcome["status"] != "Stored"
+        ]
+        if dropped:
+            await logger.warning(
+                msg={"spool": "journeys dropped", "journey_ids": dropped}
+            )
+        self.replayed_records += replayed + len(outcomes) - len(dropped)
+        self.dropped_records += len(dropped)
+        return True
+
+    @classmethod
+    async def __store_user_feeds(cls, user_feeds: List[UserFeedInternal]) -> List[dict]:
+        """
+        Store a batch of spooled journeys, one at a time if the batch fails, so a
+        journey that can't be stored doesn't drop the others
+
+        :param user_feeds: journeys to store
+        :return: outcome of every journey
+        :raise Exception: if the database is unavailable
+        """
+        try:
+            return await get_database().store_user_batch(user_feeds)
+        except Exception as error:
+            if database_unavailable(error):
+                raise
+            if len(user_feeds) > 1:
+                outcomes = []
+                for user_feed in user_feeds:
+                    outcomes.extend(await cls.__store_user_feeds([user_feed]))
+                return outcomes
+
+            await get_logger().warning(
+                msg={
+                    "spool": "journey refused",
+                    "journey_id": user_feeds[0].journey_id,
+                    "error": repr(error),
+                }
+            )
+            return [{"journey_id": user_feeds[0].journey_id, "status": "Refused"}]
+
+    async def __replay_iot_feed(self, payload: bytes) -> bool:
+        """
+        Store a spooled IoT data, unless it's already stored. The records that can't
+        be stored are dropped, retrying them would block the replay forever
+
+        :param payload: IoT data serialized as json
+        :return: False if the database is still unavailable
+        """
+        logger = get_logger()
+        try:
+            iot_feed = IotInput.parse_raw(payload)
+        except ValidationError as error:
+            await logger.warning(msg={"spool": "record dropped", "error": repr(error)})
+            self.dropped_records += 1
+            return True
+
+        try:
+            await get_database().store_iot_batch([iot_feed])
+        except Exception as error:
+            if database_unavailable(error):
+                return False
+            await logger.warning(
+                msg={
+                    "spool": "iot data dropped",
+                    "observation_gep_id": iot_feed.observationGEPid,
+                    "error": repr(error),
+                }
+            )
+            self.dropped_records += 1
+            return True
+
+        self.replayed_records += 1
+        return True
+
+    def __load_checkpoint(self, directory: str, segment: int) -> int:
+        """
+        Position of the first record of a segment not replayed yet
+
+        :param directory: slot directory
+        :param segment: sequence number of the segment
+        """
+        try:
+            with open(os.path.join(directory, self.CHECKPOINT), "rb") as file:
+                checkpoint = orjson.loads(file.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return 0
+        return checkpoint["offset"] if checkpoint["segment"] == segment else 0
+
+    def __save_checkpoint(self, directory: str, segment: int, offset: int) -> None:
+        """
+        Atomically save the position of the first record not replayed yet
+
+        :param directory: slot directory
+        :param segment: sequence number of the segment
+        :param offset: position of the record in the segment
+        """
+        path = os.path.join(directory, self.CHECKPOINT)
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(orjson.dumps({"segment": segment, "offset": offset}))
+        os.replace(f"{path}.tmp", path)
+
+
+# --------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_spool() -> Spool:
+    """Obtain as a singleton the spool of the worker"""
+    return Spool()
+
+
+async def store_or_spool(
+    store: Awaitable[dict], kind: RecordKind, feed: OrjsonModel
+) -> Union[dict, ORJSONResponse]:
+    """
+    Store data in the database, spooling them if the database is unavailable
+    or doesn't answer within spool_latency_budget. A store that exceeds the budget
+    isn't cancelled, it could have already committed: the replay skips its data
+    if it's stored
+
+    :param store: coroutine that stores the data
+    :param kind: kind of data
+    :param feed: data to store
+    :return: outcome of the store or 202 if the data have been spooled
+    """
+    spool = get_spool()
+    if not spool.running:
+        return await store
+
+    resource = "USER" if kind is RecordKind.user else "IOT"
+    task = asyncio.ensure_future(store)
+    try:
+        return await asyncio.wait_for(
+            asyncio.shield(task), get_ingest_settings().spool_latency_budget
+        )
+    except HTTPException as error:
+        if error.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+            raise
+    except asyncio.TimeoutError:
+        # Nobody waits for the outcome of the store anymore
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    try:
+        await spool.append(kind, feed.json().encode())
+    except OSError as error:
+        await get_logger().error(msg={"spool": "append failed", "error": repr(error)})
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"resource": resource, "status": "Database unavailable"},
+        )
+    return ORJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"resource": resource, "status": "Spooled"},
+    )
@@ -25,10 +25,22 @@ UserFeed utilities package
 # Standard Library
 import asyncio
 import time
+from typing import AsyncIterator, List, Optional, Union
+
+# Third Party
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 
 # Internal
-from ..models.track import RequestType
-from ..models.user_feed.user import UserFeedInternal
+from .extraction_cache import get_extraction_cache
+from .pseudonyms import extraction_pseudonym_key
+from .spool import store_or_spool, RecordKind
+from .write_behind import get_write_behind
+from ..dependencies.batch_reader import UserFeedBatch
+from ..dependencies.query_builder import Query
+from ..models.track import RequestType, StreamFormat
+from ..models.user_feed.user import UserFeedInternal, UserFeedStream
 from ..db.postgresql import get_database
 
 # --------------------------------------------------------------------------------------------
@@ -36,31 +48,227 @@ from ..db.postgresql import get_database
 
 async def store_user_feed(user_feed: UserFeedInternal) -> dict:
     """
-    Store UserFeed data in the anonymizer
+    Store UserFeed data in the anonymizer, spooling them if the database is unavailable
+
+    :param user_feed: data to store
+    """
+    database = get_database()
+    return await store_or_spool(
+        database.store_user(user_feed), RecordKind.user, user_feed
+    )
+
+
+async def store_user_feed_stream(user_feed: UserFeedStream) -> dict:
+    """
+    Store UserFeed data in the anonymizer converting them in rows chunk by chunk
+
+    :param user_feed: data to store
+    """
+    database = get_database()
+    return await database.store_user_stream(user_feed)
+
+
+def enqueue_user_feed(user_feed: UserFeedInternal) -> dict:
+    """
+    Accept UserFeed data that will be stored in background by the write-behind queue
 
     :param user_feed: data to store
     """
+    get_write_behind().put(user_feed)
+    return {"resource": "USER", "status": "Accepted"}
+
+
+async def store_user_feed_batch(batch: UserFeedBatch) -> dict:
+    """
+    Store a batch of UserFeed data in the anonymizer
+
+    :param batch: journeys to store
+    :return: outcome of every journey of the batch
+    """
     database = get_database()
-    return await database.store_user(user_feed)
+    stored = iter(await database.store_user_batch(batch.journeys))
+    return {
+        "resource": "USER",
+        "status": "Processed",
+        "journeys": [
+            next(stored) if outcome is None else outcome for outcome in batch.outcomes
+        ],
+    }
 
 
-async def extract_user_info(request: RequestType, query: str) -> list:
+async def extract_user_info(
+    request: RequestType,
+    query: str,
+    args: tuple = (),
+    query_traces: Optional[str] = None,
+    radius_query: Optional[str] = None,
+    radius_args: tuple = (),
+    radius_filters: tuple = (),
+    pseudonym_key: Optional[bytes] = None,
+) -> list:
     """
     Extract user info from the database
 
     :param request: requested info
     :param query: database query
+    :param args: arguments bound to the queries
+    :param query_traces: database query of the compressed traces
+    :param radius_query: database query of the points of the journeys
+    :param radius_args: arguments bound to radius_query
+    :param radius_filters: circles that must contain the points of the journeys
+    :param pseudonym_key: key of the pseudonyms of the journeys
+    """
+    database = get_database()
+    return await database.extract_user(
+        request,
+        query,
+        args,
+        query_traces,
+        radius_query,
+        radius_args,
+        radius_filters,
+        pseudonym_key,
+    )
+
+
+async def extract_user_page(extraction: Query) -> dict:
+    """
+    Extract a page of journeys of user info from the database
+
+    :param extraction: query of the extraction and of its page
     """
     database = get_database()
-    return await database.extract_user(request, query)
+    return await database.extract_user_page(
+        extraction.request,
+        extraction.query,
+        extraction.args,
+        extraction.query_traces,
+        extraction.page_query,
+        extraction.page_args,
+        extraction.page_size,
+        extraction.radius_query,
+        extraction.radius_args,
+        extraction.radius_filters,
+        extraction.page_next,
+        extraction_pseudonym_key(extraction),
+    )
 
 
-async def extract_statistics(request: RequestType, conditions: str) -> list:
+async def extract_statistics(
+    request: RequestType,
+    query: str,
+    args: tuple = (),
+    labels: Optional[List[str]] = None,
+) -> list:
     """
     Extract statistics from the database
 
     :param request: requested statistics
-    :param conditions: requested conditions
+    :param query: database query
+    :param args: arguments bound to the query
+    :param labels: label of every bucket of the statistics
     """
     database = get_database()
-    return await database.extract_mobility_statistics(request, conditions)
+    return await database.extract_mobility_statistics(request, query, args, labels)
+
+
+async def extract_data(extraction: Query) -> Union[list, dict]:
+    """
+    Extract the data requested from the database
+
+    :param extraction: query of the extraction
+    """
+    if extraction.request in (
+        RequestType.inter_modality_space,
+        RequestType.inter_modality_time,
+    ):
+        return await extract_statistics(
+            extraction.request, extraction.query, extraction.args, extraction.labels
+        )
+
+    if extraction.page_query:
+        return await extract_user_page(extraction)
+
+    return await extract_user_info(
+        extraction.request,
+        extraction.query,
+        extraction.args,
+        extraction.query_traces,
+        extraction.radius_query,
+        extraction.radius_args,
+        extraction.radius_filters,
+        extraction_pseudonym_key(extraction),
+    )
+
+
+async def extract_data_cached(extraction: Query) -> bytes:
+    """
+    Extract the data requested from the extraction cache, or from the database
+    caching the result
+
+    :param extraction: query of the extraction
+    :return: result serialized in the body of the response
+    """
+    cache = get_extraction_cache()
+    key = cache.key(extraction)
+    body = cache.get(key)
+    if body is None:
+        tenant = (extraction.source_app, extraction.company_code)
+        generation = cache.generation(tenant)
+        result = await extract_data(extraction)
+        body = ORJSONResponse(jsonable_encoder(result)).body
+        cache.put(key, tenant, body, generation)
+    return body
+
+
+async def extract_data_stream(extraction: Query) -> AsyncIterator[bytes]:
+    """
+    Extract the data requested from the database a chunk at a time
+
+    :param extraction: query of the extraction
+    :return: chunks of the body of the response
+    :raise HTTPException: 404 if nothing is found, before the response starts
+    """
+    database = get_database()
+    chunks = database.stream_user(
+        extraction.request,
+        extraction.query,
+        extraction.args,
+        extraction.query_traces,
+        extraction.radius_query,
+        extraction.radius_args,
+        extraction.radius_filters,
+        extraction_pseudonym_key(extraction),
+    )
+    first = await chunks.__anext__()
+    return serialize_chunks(first, chunks, extraction.stream)
+
+
+async def serialize_chunks(
+    first: List[dict], chunks: AsyncIterator[List[dict]], stream: StreamFormat
+) -> AsyncIterator[bytes]:
+    """
+    Serialize the chunks of a streamed extraction as a JSON array or as NDJSON
+
+    :param first: first chunk, already extracted
+    :param chunks: following chunks
+    :param stream: format of the stream
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    try:
+        if stream == StreamFormat.ndjson:
+            yield b"".join(orjson.dumps(row, option=option) + b"\n" for row in first)
+            async for chunk in chunks:
+                yield b"".join(
+                    orjson.dumps(row, option=option) + b"\n" for row in chunk
+                )
+            return
+
+        # Every chunk is a JSON array whose brackets are replaced by the separators
+        yield b"[" + orjson.dumps(first, option=option)[1:-1]
+        async for chunk in chunks:
+            yield b"," + orjson.dumps(chunk, option=option)[1:-1]
+        yield b"]"
+    finally:
+        # Release the connection even if the client disconnected
+        await chunks.aclose()
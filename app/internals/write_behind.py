@@ -0,0 +1,283 @@
+"""
+Write-behind ingest package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+# Third Party
+from fastapi import status, HTTPException
+
+# Internal
+from .logger import get_logger
+from .spool import get_spool, RecordKind
+from ..config import get_ingest_settings
+from ..db.postgresql import database_unavailable, get_database
+from ..models.user_feed.user import UserFeedInternal
+
+# --------------------------------------------------------------------------------------------
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of the journeys accepted by a worker.
+    A background flusher merges them in large set-based batches, flushed when
+    write_behind_flush_journeys are waiting or write_behind_flush_interval expires
+    """
+
+    RETRY_DELAY = 1.0
+    """Seconds to wait before retrying a flush that couldn't reach the database"""
+
+    SHUTDOWN_RETRIES = 5
+    """Attempts made to store a batch while the worker is shutting down"""
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        """Journeys accepted but not stored yet"""
+        self.flusher: Optional[asyncio.Task] = None
+        """Background task that stores the journeys"""
+        self.stopping = False
+        """Flag that indicates that the worker is shutting down"""
+
+        self.accepted_journeys = 0
+        self.rejected_journeys = 0
+        self.stored_journeys = 0
+        self.failed_journeys = 0
+        self.spooled_journeys = 0
+        self.flushes = 0
+        self.flush_latency_total = 0.0
+        self.flush_latency_last = 0.0
+        self.flush_latency_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        """True if the queue accepts journeys"""
+        return self.flusher is not None and not self.stopping
+
+    async def start(self) -> None:
+        """
+        Start the flusher if the write-behind mode is enabled
+        """
+        settings = get_ingest_settings()
+        if not settings.write_behind:
+            return
+
+        self.stopping = False
+        self.queue = asyncio.Queue(maxsize=settings.write_behind_queue_size)
+        self.flusher = asyncio.create_task(
+            self.__flush_loop(
+                settings.write_behind_flush_journeys,
+                settings.write_behind_flush_interval,
+            )
+        )
+
+    async def stop(self) -> None:
+        """
+        Stop accepting journeys and wait until every accepted journey is stored
+        """
+        if not self.running:
+            return
+
+        self.stopping = True
+        # Wake up the flusher, it will exit after storing every journey before this
+        await self.queue.put(None)
+        await self.flusher
+        self.flusher = None
+
+    def put(self, user_feed: UserFeedInternal) -> None:
+        """
+        Accept a journey that will be stored by the flusher
+
+        :param user_feed: data to store
+        """
+        if not self.running:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"resource": "USER", "status": "Not accepting data"},
+            )
+
+        try:
+            self.queue.put_nowait(user_feed)
+        except asyncio.QueueFull:
+            self.rejected_journeys += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail={"resource": "USER", "status": "Too many data waiting"},
+                headers={"Retry-After": f"{int(self.RETRY_DELAY)}"},
+            )
+        self.accepted_journeys += 1
+
+    def stats(self) -> dict:
+        """
+        Metrics of the queue and of the flusher
+        """
+        return {
+            "enabled": self.running,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue.maxsize if self.queue else 0,
+            "accepted_journeys": self.accepted_journeys,
+            "rejected_journeys": self.rejected_journeys,
+            "stored_journeys": self.stored_journeys,
+            "failed_journeys": self.failed_journeys,
+            "spooled_journeys": self.spooled_journeys,
+            "flushes": self.flushes,
+            "flush_latency_ms": {
+                "last": self.flush_latency_last * 1000,
+                "max": self.flush_latency_max * 1000,
+                "avg": self.flush_latency_total * 1000 / self.flushes
+                if self.flushes
+                else 0.0,
+            },
+        }
+
+    async def __flush_loop(self, flush_journeys: int, flush_interval: float) -> None:
+        """
+        Collect the journeys in batches and store them
+
+        :param flush_journeys: journeys that trigger a flush
+        :param flush_interval: seconds after the first journey of a batch that trigger a flush
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            user_feed = await self.queue.get()
+            if user_feed is None:
+                return
+
+            user_feeds = [user_feed]
+            deadline = loop.time() + flush_interval
+            stop = False
+
+            while len(user_feeds) < flush_journeys:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    user_feed = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if user_feed is None:
+                    stop = True
+                    break
+                user_feeds.append(user_feed)
+
+            await self.__flush(user_feeds)
+            if stop:
+                return
+
+    async def __flush(self, user_feeds: List[UserFeedInternal]) -> None:
+        """
+        Store a batch of journeys, retrying while the database can't be reached.
+        If the spool is enabled the journeys are spooled instead of being retried.
+        Any other failure of a batch flushes its journeys one at a time, and only
+        the ones that fail on their own are dropped, since retrying would block
+        the queue forever
+
+        :param user_feeds: data to store
+        """
+        logger = get_logger()
+        database = get_database()
+        start = time.perf_counter()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                outcomes = await database.store_user_batch(user_feeds)
+                break
+            except Exception as error:
+                await logger.warning(
+                    msg={"write_behind": "flush failed", "error": repr(error)}
+                )
+                unavailable = database_unavailable(error)
+                if not unavailable and len(user_feeds) > 1:
+                    # Isolate the journeys that made the batch fail
+                    for user_feed in user_feeds:
+                        await self.__flush([user_feed])
+                    return
+                if unavailable and await self.__spool(user_feeds):
+                    return
+                if not unavailable or (
+                    self.stopping and attempt >= self.SHUTDOWN_RETRIES
+                ):
+                    self.failed_journeys += len(user_feeds)
+                    await logger.error(
+                        msg={
+                            "write_behind": "journeys not stored",
+                            "journey_ids": [feed.journey_id for feed in user_feeds],
+                        }
+                    )
+                    return
+                await asyncio.sleep(self.RETRY_DELAY)
+
+        failed = [
+            outcome["journey_id"]
+            for outcome in outcomes
+            if outcome["status"] != "Stored"
+        ]
+        if failed:
+            await logger.warning(
+                msg={"write_behind": "journeys not stored", "journey_ids": failed}
+            )
+
+        latency = time.perf_counter() - start
+        self.flushes += 1
+        self.stored_journeys += len(outcomes) - len(failed)
+        self.failed_journeys += len(failed)
+        self.flush_latency_last = latency
+        self.flush_latency_total += latency
+        self.flush_latency_max = max(self.flush_latency_max, latency)
+
+    async def __spool(self, user_feeds: List[UserFeedInternal]) -> bool:
+        """
+        Spool a batch of journeys that couldn't be stored
+
+        :param user_feeds: data to spool
+        :return: True if the journeys have been spooled
+        """
+        spool = get_spool()
+        if not spool.running:
+            return False
+
+        try:
+            for user_feed in user_feeds:
+                await spool.append(RecordKind.user, user_feed.json().encode())
+        except OSError as error:
+            await get_logger().error(
+                msg={"write_behind": "spool failed", "error": repr(error)}
+            )
+            return False
+
+        self.spooled_journeys += len(user_feeds)
+        return True
+
+
+# --------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_write_behind() -> WriteBehindQueue:
+    """Obtain as a singleton the write-behind queue of the worker"""
+    return WriteBehindQueue()
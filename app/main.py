@@ -27,18 +27,29 @@ from fastapi import FastAPI
 
 # Internal
 from .db.postgresql import get_database
+from .internals.extraction_cache import get_extraction_cache
+from .internals.iot_micro_batch import get_iot_micro_batcher
 from .internals.logger import get_logger
-from .routers import user_feed, iot
+from .internals.retention import get_retention_job
+from .internals.spool import get_spool
+from .internals.write_behind import get_write_behind
+from .routers import user_feed, iot, metrics
 
 # --------------------------------------------------------------------------------------------
 
 # Instantiate
 database = get_database()
+write_behind = get_write_behind()
+spool = get_spool()
+iot_micro_batcher = get_iot_micro_batcher()
+extraction_cache = get_extraction_cache()
+retention_job = get_retention_job()
 app = FastAPI(redoc_url=None, openapi_url=None)
 
 # Include routers
 app.include_router(user_feed.router)
 app.include_router(iot.router)
+app.include_router(metrics.router)
 
 
 # Configure logger
@@ -46,11 +57,22 @@ app.include_router(iot.router)
 async def startup_logger_and_sessions():
     get_logger()
     await database.connect()
+    await spool.start()
+    await write_behind.start()
+    await iot_micro_batcher.start()
+    await extraction_cache.start()
+    await retention_job.start()
 
 
 # Shutdown logger
 @app.on_event("shutdown")
 async def shutdown_logger_and_sessions():
     logger = get_logger()
+    await retention_job.stop()
+    # Store the journeys accepted but not stored yet
+    await write_behind.stop()
+    await iot_micro_batcher.stop()
+    await spool.stop()
+    await extraction_cache.stop()
     await database.disconnect()
     await logger.shutdown()
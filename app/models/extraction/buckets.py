@@ -0,0 +1,120 @@
+"""
+Buckets Model
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from typing import List, Optional
+
+# Third Party
+from pydantic import conlist, conint, validator
+
+# Internal
+from ..model import OrjsonModel
+
+# --------------------------------------------------------------------------------------------
+
+DEFAULT_DISTANCE_BUCKETS = [5000, 10000]
+"""Edges in meters of the distance buckets"""
+
+DEFAULT_DURATION_BUCKETS = [900, 1800]
+"""Edges in seconds of the duration buckets"""
+
+MAX_BUCKETS_EDGES = 20
+
+
+def check_edges(edges: Optional[List[int]]) -> Optional[List[int]]:
+    """
+    :param edges: edges of the buckets
+    :raise ValueError: if the edges aren't strictly increasing
+    """
+    if edges and any(low >= high for low, high in zip(edges, edges[1:])):
+        raise ValueError("the edges of the buckets must be strictly increasing")
+    return edges
+
+
+def edge_label(edge: int, unit: int, decimals: int) -> str:
+    """
+    :param edge: edge of a bucket
+    :param unit: edges in a unit of the label
+    :param decimals: decimals kept at most
+    :return: edge in the unit of the label, without exponent and trailing zeros
+    """
+    return f"{edge / unit:.{decimals}f}".rstrip("0").rstrip(".")
+
+
+# --------------------------------------------------------------------------------------------
+
+
+class DistanceBucketsExtraction(OrjsonModel):
+    distance_buckets: Optional[
+        conlist(conint(gt=0), min_items=1, max_items=MAX_BUCKETS_EDGES)
+    ] = None
+    """Edges in meters of the distance buckets example=[5000, 10000]"""
+
+    _distance_labels: List[str] = []
+    """Label of every distance bucket"""
+
+    _validate_distance_buckets = validator("distance_buckets", allow_reuse=True)(
+        check_edges
+    )
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if self.distance_buckets is None:
+            self.distance_buckets = DEFAULT_DISTANCE_BUCKETS
+        kilometers = [
+            f"{edge_label(edge, 1000, 3)} Km" for edge in self.distance_buckets
+        ]
+        self._distance_labels = [
+            f"< {kilometers[0]}",
+            *(f"{low} - {high}" for low, high in zip(kilometers, kilometers[1:])),
+            f"> {kilometers[-1]}",
+        ]
+
+
+# --------------------------------------------------------------------------------------------
+
+
+class DurationBucketsExtraction(OrjsonModel):
+    duration_buckets: Optional[
+        conlist(conint(gt=0), min_items=1, max_items=MAX_BUCKETS_EDGES)
+    ] = None
+    """Edges in seconds of the duration buckets example=[900, 1800]"""
+
+    _duration_labels: List[str] = []
+    """Label of every duration bucket"""
+
+    _validate_duration_buckets = validator("duration_buckets", allow_reuse=True)(
+        check_edges
+    )
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if self.duration_buckets is None:
+            self.duration_buckets = DEFAULT_DURATION_BUCKETS
+        minutes = [edge_label(edge, 60, 2) for edge in self.duration_buckets]
+        self._duration_labels = [
+            f"< {minutes[0]} min",
+            *(f"{low} - {high} min" for low, high in zip(minutes, minutes[1:])),
+            f"> {minutes[-1]} min",
+        ]
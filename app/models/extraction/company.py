@@ -26,6 +26,7 @@ Company model
 from typing import Optional
 
 # Internal
+from .template import SqlFragment
 from ..model import OrjsonModel
 from ..track import TypeOfTrack
 
@@ -39,11 +40,31 @@ class CompanyExtraction(OrjsonModel):
 
     company_trip_type: Optional[TypeOfTrack] = None
 
-    _query_company_extraction: str = ""
+    _query_company_extraction: SqlFragment = SqlFragment("")
 
     def __init__(self, **data):
         super().__init__(**data)
         if self.company_trip_type:
-            self._query_company_extraction = f"source_app = '{self.source_app}' AND company_code = '{self.company_code}' AND company_trip_type = '{self.company_trip_type}'"
+            self._query_company_extraction = SqlFragment(
+                "source_app = {} AND company_code = {} AND company_trip_type = {}",
+                (self.source_app, self.company_code, self.company_trip_type),
+            )
         else:
-            self._query_company_extraction = f"source_app = '{self.source_app}' AND company_code = '{self.company_code}' "
+            self._query_company_extraction = SqlFragment(
+                "source_app = {} AND company_code = {}",
+                (self.source_app, self.company_code),
+            )
+
+    def tenant_partitions(self, *tables: str) -> SqlFragment:
+        """
+        Condition on the source_app of the rows joined with the journeys, the same
+        of their journey, so only the partitions of the source_app are read in the
+        tenant layout. Every table binds the same argument
+
+        :param tables: tables or aliases joined with the journeys
+        :return: condition
+        """
+        return SqlFragment(
+            " AND ".join(f"{table}.source_app = {{0}}" for table in tables),
+            (self.source_app,),
+        )
@@ -29,11 +29,19 @@ from typing import Optional
 from pydantic import validator, confloat
 
 # Internal
+from .grid import grid_cover
 from .position_alteration_detection import reversed_haversine
+from .template import SqlFragment
 from ..model import OrjsonModel
 
 # --------------------------------------------------------------------------------------------
 
+RADIUS_QUERY = """2 * 6378137 * asin(least(sqrt(
+    power(sin(radians({0}_lat - {{}}) / 2), 2)
+    + cos(radians({{}})) * cos(radians({0}_lat)) * power(sin(radians({0}_lon - {{}}) / 2), 2)
+    ), 1)) <= {{}}"""
+"""Great-circle distance of a point within a radius, like within_radius"""
+
 
 class StartCoordinatesExtraction(OrjsonModel):
     start_lat: Optional[float] = None
@@ -43,7 +51,9 @@ class StartCoordinatesExtraction(OrjsonModel):
     start_radius: Optional[confloat(ge=100, le=20000)] = None
     """Starting radius with specified center in meters example=123.35161"""
 
-    _query_start_coordinate_extraction: Optional[str] = None
+    _query_start_coordinate_extraction: Optional[SqlFragment] = None
+    _query_start_radius_extraction: Optional[SqlFragment] = None
+    """Exact circle, for the queries whose journeys can't be filtered by within_radius"""
 
     @validator("start_radius", always=True)
     def both_start_radius_lat_lon_must_be_set_or_none(cls, v, values):
@@ -65,7 +75,16 @@ class StartCoordinatesExtraction(OrjsonModel):
             lat0, lat1, lon0, lon1 = reversed_haversine(
                 self.start_lat, self.start_lon, self.start_radius
             )
-            self._query_start_coordinate_extraction = f"start_lat BETWEEN {lat0} AND {lat1} AND start_lon BETWEEN {lon0} AND {lon1}"
+            # The indexed cells select the journeys, the box refines them
+            self._query_start_coordinate_extraction = SqlFragment(
+                "start_cells && {} AND start_lat BETWEEN {} AND {} "
+                "AND start_lon BETWEEN {} AND {}",
+                (grid_cover(lat0, lat1, lon0, lon1), lat0, lat1, lon0, lon1),
+            )
+            self._query_start_radius_extraction = SqlFragment(
+                RADIUS_QUERY.format("start"),
+                (self.start_lat, self.start_lat, self.start_lon, self.start_radius),
+            )
 
 
 # --------------------------------------------------------------------------------------------
@@ -79,7 +98,9 @@ class EndCoordinatesExtraction(OrjsonModel):
     end_radius: Optional[confloat(ge=100, le=20000)] = None
     """Ending radius with specified center in meters example=123.35161"""
 
-    _query_end_coordinate_extraction: Optional[str] = None
+    _query_end_coordinate_extraction: Optional[SqlFragment] = None
+    _query_end_radius_extraction: Optional[SqlFragment] = None
+    """Exact circle, for the queries whose journeys can't be filtered by within_radius"""
 
     @validator("end_radius", always=True)
     def both_end_radius_lat_lon_must_be_set_or_none(cls, v, values):
@@ -99,4 +120,13 @@ class EndCoordinatesExtraction(OrjsonModel):
             lat0, lat1, lon0, lon1 = reversed_haversine(
                 self.end_lat, self.end_lon, self.end_radius
             )
-            self._query_end_coordinate_extraction = f"end_lat BETWEEN {lat0} AND {lat1} AND end_lon BETWEEN {lon0} AND {lon1}"
+            # The indexed cells select the journeys, the box refines them
+            self._query_end_coordinate_extraction = SqlFragment(
+                "end_cells && {} AND end_lat BETWEEN {} AND {} "
+                "AND end_lon BETWEEN {} AND {}",
+                (grid_cover(lat0, lat1, lon0, lon1), lat0, lat1, lon0, lon1),
+            )
+            self._query_end_radius_extraction = SqlFragment(
+                RADIUS_QUERY.format("end"),
+                (self.end_lat, self.end_lat, self.end_lon, self.end_radius),
+            )
@@ -23,7 +23,7 @@ All_Positions model
 """
 
 # Standard Library
-from typing import Optional
+from typing import Optional, Tuple
 
 # Third Party
 from pydantic import PrivateAttr
@@ -32,6 +32,9 @@ from pydantic import PrivateAttr
 from ..company import CompanyExtraction
 from ..coordinates import StartCoordinatesExtraction, EndCoordinatesExtraction
 from ..detection import TypeDetectionExtraction
+from ..page import PageExtraction
+from ..radius import RadiusExtraction, RadiusFilter
+from ..template import QueryTemplate, SqlFragment
 from ..time import StartTimeExtraction, EndTimeExtraction
 from ...track import MobilityType
 
@@ -39,6 +42,8 @@ from ...track import MobilityType
 
 
 class AllPositions(
+    RadiusExtraction,
+    PageExtraction,
     StartTimeExtraction,
     EndTimeExtraction,
     StartCoordinatesExtraction,
@@ -46,13 +51,22 @@ class AllPositions(
     CompanyExtraction,
     TypeDetectionExtraction,
 ):
-    _query_start_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_start_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_company_extraction: str = PrivateAttr("")
-    _query_type_detection_extraction: Optional[str] = PrivateAttr(None)
-    _query_type_mobility_extract: Optional[str] = PrivateAttr(None)
+    _query_start_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_company_extraction: SqlFragment = PrivateAttr(SqlFragment(""))
+    _query_type_detection_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_type_mobility_extract: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page_order: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page: Optional[str] = PrivateAttr(None)
+    _query_page_args: tuple = PrivateAttr(())
+    _radius_filters: Tuple[RadiusFilter, ...] = PrivateAttr(())
+    _query_radius: Optional[str] = PrivateAttr(None)
+    _query_radius_args: tuple = PrivateAttr(())
     _query_select: str = PrivateAttr(
         """
         SELECT nested_pos.y as journey_id,
@@ -64,59 +78,132 @@ class AllPositions(
         nested_pos.partial_distance
         FROM
         (
-        SELECT type, mode, journey_id, start_time, end_time
+        SELECT type, mode, journey_id, start_date, source_app, start_time, end_time
         FROM "user_behaviours"
         ) AS nested_behaviour,
         (
-        SELECT journey_id AS y, lat, lon, time, partial_distance
+        SELECT journey_id AS y, start_date, lat, lon, time, partial_distance
         FROM "user_positions"
         ) AS nested_pos,
         (
-        SELECT journey_id AS x
+        SELECT journey_id AS x, start_date AS w1
         FROM "user_data" WHERE"""
     )
     _query_external: str = PrivateAttr(
         """) AS nested WHERE nested.x = nested_pos.y 
+                                   AND nested.w1 = nested_pos.start_date
                                    AND nested_pos.y = nested_behaviour.journey_id
+                                   AND nested_pos.start_date = nested_behaviour.start_date
                                    AND nested_behaviour.start_time <= nested_pos.time
                                    AND nested_behaviour.end_time >= nested_pos.time"""
     )
+    _query_untraced: str = PrivateAttr(
+        """AND NOT EXISTS (
+        SELECT 1 FROM "user_traces" WHERE "user_traces".journey_id = nested_pos.y
+        )"""
+    )
+    """Condition that skips the journeys stored in user_traces"""
+    _query_select_untraced: str = PrivateAttr("")
+    """Positions of the journeys stored in user_positions only"""
+    _query_traces: str = PrivateAttr(
+        """
+        SELECT t.journey_id,
+        t.trace,
+        b.types,
+        b.modes,
+        b.start_times,
+        b.end_times
+        FROM "user_traces" AS t,
+        (
+        SELECT nested_behaviour.journey_id,
+        array_agg(nested_behaviour.type) AS types,
+        array_agg(nested_behaviour.mode) AS modes,
+        array_agg(nested_behaviour.start_time) AS start_times,
+        array_agg(nested_behaviour.end_time) AS end_times
+        FROM
+        (
+        SELECT type, mode, journey_id, start_date, source_app, start_time, end_time
+        FROM "user_behaviours"
+        ) AS nested_behaviour,
+        (
+        SELECT journey_id AS x, start_date AS w1
+        FROM "user_data" WHERE"""
+    )
+    """Compressed traces of the journeys with their behaviours"""
+    _query_traces_external: str = PrivateAttr(
+        """) AS nested WHERE nested.x = nested_behaviour.journey_id
+        AND nested.w1 = nested_behaviour.start_date"""
+    )
+    _query_traces_group: str = PrivateAttr(
+        """GROUP BY nested_behaviour.journey_id
+        ) AS b WHERE t.journey_id = b.journey_id"""
+    )
+    _query_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_select, _query_select_untraced and _query_traces"""
     type_mobility: Optional[MobilityType] = None
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._query_select = f"{self._query_select} {self._query_company_extraction}"
-        if self._query_start_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_time_extraction}"
-            )
-
-        if self._query_end_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_time_extraction}"
-            )
-
-        if self._query_start_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_coordinate_extraction}"
-            )
-
-        if self._query_end_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_coordinate_extraction}"
-            )
-
+        type_mobility = SqlFragment('{} = "type"', (self.type_mobility,))
+        behaviour_conditions = []
         if self.type_mobility and self._query_type_detection_extraction:
-            self._query_external = f"""{self._query_external} AND '{self.type_mobility}' = "type" AND {self._query_type_detection_extraction}"""
+            behaviour_conditions = [
+                type_mobility,
+                self._query_type_detection_extraction,
+            ]
 
         elif self.type_mobility:
-            self._query_external = (
-                f"""{self._query_external} AND '{self.type_mobility}' = "type" """
-            )
+            behaviour_conditions = [type_mobility]
 
         elif self._query_type_detection_extraction:
-            self._query_external = (
-                f"""{self._query_external} AND '{self.type_mobility}' = "type" """
-            )
-
-        self._query_select = f"{self._query_select} {self._query_external};"
+            behaviour_conditions = [type_mobility]
+
+        # Both queries bind the same arguments in the same order
+        query_select = self.__template(
+            self._query_select,
+            self._query_external,
+            [
+                *behaviour_conditions,
+                self.start_time_partitions("nested_pos", "nested_behaviour"),
+                self.tenant_partitions("nested_behaviour"),
+            ],
+        )
+        query_traces = self.__template(
+            self._query_traces,
+            self._query_traces_external,
+            [
+                *behaviour_conditions,
+                self.start_time_partitions("nested_behaviour"),
+                self.tenant_partitions("nested_behaviour"),
+            ],
+        )
+        self._query_select, self._query_args = query_select.compile()
+        self._query_select_untraced, _ = query_select.add(
+            self._query_untraced
+        ).compile()
+        self._query_traces, _ = query_traces.add(self._query_traces_group).compile()
+
+    def __template(
+        self, query: str, external: str, behaviour_conditions: list
+    ) -> QueryTemplate:
+        """
+        :param query: select of the query
+        :param external: join with the journeys that match the conditions
+        :param behaviour_conditions: conditions on the behaviours
+        :return: template of the query
+        """
+        template = QueryTemplate(query).add(self._query_company_extraction)
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_page_extraction,
+        ):
+            template.add(condition, "AND")
+
+        template.add(self._query_page_order)
+        template.add(external)
+        for condition in behaviour_conditions:
+            template.add(condition, "AND")
+        return template
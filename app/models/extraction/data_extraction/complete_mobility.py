@@ -23,7 +23,7 @@ Complete_Mobility model
 """
 
 # Standard Library
-from typing import Optional
+from typing import Optional, Tuple
 
 # Third Party
 from pydantic import PrivateAttr
@@ -32,6 +32,9 @@ from pydantic import PrivateAttr
 from ..company import CompanyExtraction
 from ..coordinates import StartCoordinatesExtraction, EndCoordinatesExtraction
 from ..detection import TypeDetectionExtraction
+from ..page import PageExtraction
+from ..radius import RadiusExtraction, RadiusFilter
+from ..template import QueryTemplate, SqlFragment
 from ..time import StartTimeExtraction, EndTimeExtraction
 from ...track import MobilityType
 
@@ -39,6 +42,8 @@ from ...track import MobilityType
 
 
 class CompleteMobility(
+    RadiusExtraction,
+    PageExtraction,
     StartTimeExtraction,
     EndTimeExtraction,
     StartCoordinatesExtraction,
@@ -46,13 +51,22 @@ class CompleteMobility(
     CompanyExtraction,
     TypeDetectionExtraction,
 ):
-    _query_start_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_start_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_company_extraction: str = PrivateAttr("")
-    _query_type_detection_extraction: Optional[str] = PrivateAttr(None)
-    _query_type_mobility_extract: Optional[str] = PrivateAttr(None)
+    _query_start_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_company_extraction: SqlFragment = PrivateAttr(SqlFragment(""))
+    _query_type_detection_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_type_mobility_extract: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page_order: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page: Optional[str] = PrivateAttr(None)
+    _query_page_args: tuple = PrivateAttr(())
+    _radius_filters: Tuple[RadiusFilter, ...] = PrivateAttr(())
+    _query_radius: Optional[str] = PrivateAttr(None)
+    _query_radius_args: tuple = PrivateAttr(())
     _query_select: str = PrivateAttr(
         """
         SELECT journey_id,
@@ -77,43 +91,38 @@ class CompleteMobility(
         end_date AS w2
         FROM "user_data" WHERE"""
     )
-    _query_external: str = PrivateAttr(") AS nested WHERE nested.x = journey_id")
+    _query_external: str = PrivateAttr(
+        ") AS nested WHERE nested.x = journey_id AND nested.w1 = start_date"
+    )
+    _query_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_select"""
     type_mobility: Optional[MobilityType] = None
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._query_select = f"{self._query_select} {self._query_company_extraction}"
-        if self._query_start_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_time_extraction}"
-            )
-
-        if self._query_end_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_time_extraction}"
-            )
-
-        if self._query_start_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_coordinate_extraction}"
-            )
-
-        if self._query_end_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_coordinate_extraction}"
-            )
-
+        template = QueryTemplate(self._query_select).add(self._query_company_extraction)
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_page_extraction,
+        ):
+            template.add(condition, "AND")
+
+        template.add(self._query_page_order)
+        template.add(self._query_external)
+        template.add(self.start_time_partitions('"user_behaviours"'), "AND")
+        template.add(self.tenant_partitions('"user_behaviours"'), "AND")
+        type_mobility = SqlFragment('{} = "type"', (self.type_mobility,))
         if self.type_mobility and self._query_type_detection_extraction:
-            self._query_external = f"""{self._query_external} AND '{self.type_mobility}' = "type" AND {self._query_type_detection_extraction}"""
+            template.add(type_mobility, "AND")
+            template.add(self._query_type_detection_extraction, "AND")
 
         elif self.type_mobility:
-            self._query_external = (
-                f"""{self._query_external} AND '{self.type_mobility}' = "type" """
-            )
+            template.add(type_mobility, "AND")
 
         elif self._query_type_detection_extraction:
-            self._query_external = (
-                f"""{self._query_external} AND '{self.type_mobility}' = "type" """
-            )
+            template.add(type_mobility, "AND")
 
-        self._query_select = f"{self._query_select} {self._query_external};"
+        self._query_select, self._query_args = template.compile()
@@ -23,14 +23,15 @@ Data Extraction models
 """
 
 # Standard Library
-from typing import Optional
+from typing import List, Optional
 
 # Third Party
-from pydantic import confloat
+from pydantic import confloat, conint
 
 # Internal
 from ...track import (
     RequestType,
+    StreamFormat,
     DetectionType,
     MobilityType,
     AggregationType,
@@ -89,5 +90,18 @@ class InputJSONExtraction(OrjsonModel):
     type_aggregation: Optional[AggregationType] = None
     space_aggregation: Optional[int] = None
 
+    distance_buckets: Optional[List[int]] = None
+    """Edges in meters of the distance buckets of Inter_modality_space example=[5000, 10000]"""
+    duration_buckets: Optional[List[int]] = None
+    """Edges in seconds of the duration buckets of Inter_modality_time example=[900, 1800]"""
+
+    stream: Optional[StreamFormat] = None
+    """Stream All_Positions and Complete_Mobility as a JSON array or as NDJSON"""
+
+    page_size: Optional[conint(gt=0)] = None
+    """Journeys of a page of Partial_Mobility, Complete_Mobility and All_Positions example=100"""
+    page_cursor: Optional[str] = None
+    """Cursor of the next page returned with the previous one"""
+
 
 # --------------------------------------------------------------------------------------------------
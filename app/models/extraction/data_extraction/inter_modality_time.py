@@ -23,14 +23,16 @@ Inter_Modality_Time model
 """
 
 # Standard Library
-from typing import Optional
+from typing import List, Optional
 
 # Third Party
 from pydantic import PrivateAttr
 
 # Internal
+from ..buckets import DurationBucketsExtraction
 from ..company import CompanyExtraction
 from ..coordinates import StartCoordinatesExtraction, EndCoordinatesExtraction
+from ..template import QueryTemplate, SqlFragment
 from ..time import StartTimeExtraction, EndTimeExtraction
 
 # --------------------------------------------------------------------------------------------
@@ -42,34 +44,66 @@ class InterModalityTime(
     StartCoordinatesExtraction,
     EndCoordinatesExtraction,
     CompanyExtraction,
+    DurationBucketsExtraction,
 ):
-    _query_start_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_start_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_company_extraction: str = PrivateAttr("")
-    _query_select: str = PrivateAttr("")
+    _query_start_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_company_extraction: SqlFragment = PrivateAttr(SqlFragment(""))
+    _query_select: str = PrivateAttr(
+        """
+        SELECT aggregated.bucket,
+        aggregated.type,
+        aggregated.total,
+        aggregated.n_mobility_type::numeric / aggregated.n_journeys AS avg,
+        (aggregated.n_mobility_type / sum(aggregated.n_mobility_type)
+        FILTER (WHERE aggregated.total = 0) OVER (PARTITION BY aggregated.bucket)) * 100 AS perc
+        FROM
+        (
+        SELECT nested.bucket,
+        type,
+        GROUPING(type) AS total,
+        count(journey_id) AS n_mobility_type,
+        count(DISTINCT journey_id) AS n_journeys
+        FROM user_behaviours,
+        (
+        SELECT journey_id AS x, start_date AS w1, width_bucket(duration, {}) AS bucket
+        FROM user_data WHERE"""
+    )
+    _query_external: str = PrivateAttr(
+        """) AS nested WHERE journey_id = nested.x AND start_date = nested.w1
+        AND nested.bucket IS NOT NULL"""
+    )
+    _query_external_extra: str = PrivateAttr(
+        """GROUP BY GROUPING SETS ((nested.bucket), (nested.bucket, type))
+        ) AS aggregated ORDER BY aggregated.bucket, aggregated.type"""
+    )
+    _query_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_select"""
+    _duration_labels: List[str] = PrivateAttr([])
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._query_select = self._query_company_extraction
-
-        if self._query_start_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_time_extraction}"
-            )
-
-        if self._query_end_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_time_extraction}"
-            )
-
-        if self._query_start_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_coordinate_extraction}"
-            )
-
-        if self._query_end_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_coordinate_extraction}"
-            )
+        # Every bucket is aggregated in a single scan of the journeys
+        template = QueryTemplate().add(
+            SqlFragment(self._query_select, (self.duration_buckets,))
+        )
+        template.add(self._query_company_extraction)
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_start_radius_extraction,
+            self._query_end_radius_extraction,
+        ):
+            template.add(condition, "AND")
+
+        template.add(self._query_external)
+        template.add(self.start_time_partitions("user_behaviours"), "AND")
+        template.add(self.tenant_partitions("user_behaviours"), "AND")
+        template.add(self._query_external_extra)
+        self._query_select, self._query_args = template.compile()
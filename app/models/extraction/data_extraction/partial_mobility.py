@@ -23,7 +23,7 @@ Partial_Mobility models
 """
 
 # Standard Library
-from typing import Optional
+from typing import Optional, Tuple
 
 # Third Party
 from pydantic import validator, PrivateAttr
@@ -32,6 +32,9 @@ from pydantic import validator, PrivateAttr
 from ..company import CompanyExtraction
 from ..coordinates import StartCoordinatesExtraction, EndCoordinatesExtraction
 from ..detection import TypeDetectionExtraction
+from ..page import PageExtraction
+from ..radius import RadiusExtraction, RadiusFilter
+from ..template import QueryTemplate, SqlFragment
 from ..time import StartTimeExtraction, EndTimeExtraction
 from ...model import OrjsonModel
 from ...track import MobilityType, AggregationType
@@ -43,7 +46,7 @@ class PartialMobilityTypeExtraction(OrjsonModel):
     type_mobility: Optional[MobilityType] = None
     type_aggregation: Optional[AggregationType] = None
 
-    _query_type_mobility_extract: Optional[str] = None
+    _query_type_mobility_extract: Optional[SqlFragment] = None
 
     @validator("type_aggregation", always=True)
     def both_mobility_aggregation_must_be_set_or_none(cls, v, values):
@@ -54,13 +57,17 @@ class PartialMobilityTypeExtraction(OrjsonModel):
     def __init__(self, **data):
         super().__init__(**data)
         if self.type_mobility:
-            self._query_type_mobility_extract = f""" '{self.type_mobility}' = "type" """
+            self._query_type_mobility_extract = SqlFragment(
+                '{} = "type"', (self.type_mobility,)
+            )
 
 
 # --------------------------------------------------------------------------------------------
 
 
 class PartialMobility(
+    RadiusExtraction,
+    PageExtraction,
     StartTimeExtraction,
     EndTimeExtraction,
     StartCoordinatesExtraction,
@@ -69,13 +76,22 @@ class PartialMobility(
     TypeDetectionExtraction,
     PartialMobilityTypeExtraction,
 ):
-    _query_start_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_start_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_company_extraction: str = PrivateAttr("")
-    _query_type_detection_extraction: Optional[str] = PrivateAttr(None)
-    _query_type_mobility_extract: Optional[str] = PrivateAttr(None)
+    _query_start_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_company_extraction: SqlFragment = PrivateAttr(SqlFragment(""))
+    _query_type_detection_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_type_mobility_extract: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page_order: Optional[SqlFragment] = PrivateAttr(None)
+    _query_page: Optional[str] = PrivateAttr(None)
+    _query_page_args: tuple = PrivateAttr(())
+    _radius_filters: Tuple[RadiusFilter, ...] = PrivateAttr(())
+    _query_radius: Optional[str] = PrivateAttr(None)
+    _query_radius_args: tuple = PrivateAttr(())
     _query_select: str = PrivateAttr(
         """
         SELECT journey_id,
@@ -100,43 +116,29 @@ class PartialMobility(
         end_date AS w2
         FROM "user_data" WHERE"""
     )
-    _query_external: str = PrivateAttr(") AS nested WHERE nested.x = journey_id")
+    _query_external: str = PrivateAttr(
+        ") AS nested WHERE nested.x = journey_id AND nested.w1 = start_date"
+    )
+    _query_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_select"""
     # request: Literal[RequestType.partial_mobility] = ...
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._query_select = f"{self._query_select} {self._query_company_extraction}"
-        if self._query_start_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_time_extraction}"
-            )
-
-        if self._query_end_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_time_extraction}"
-            )
-
-        if self._query_start_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_coordinate_extraction}"
-            )
-
-        if self._query_end_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_coordinate_extraction}"
-            )
-
-        if self._query_type_mobility_extract and self._query_type_detection_extraction:
-            self._query_external = f"{self._query_external} AND {self._query_type_mobility_extract} AND {self._query_type_detection_extraction}"
-
-        elif self._query_type_mobility_extract:
-            self._query_external = (
-                f"{self._query_external} AND {self._query_type_mobility_extract}"
-            )
-
-        elif self._query_type_detection_extraction:
-            self._query_external = (
-                f"{self._query_external} AND {self._query_type_detection_extraction}"
-            )
-
-        self._query_select = f"{self._query_select} {self._query_external};"
+        template = QueryTemplate(self._query_select).add(self._query_company_extraction)
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_page_extraction,
+        ):
+            template.add(condition, "AND")
+
+        template.add(self._query_page_order)
+        template.add(self._query_external)
+        template.add(self.start_time_partitions('"user_behaviours"'), "AND")
+        template.add(self.tenant_partitions('"user_behaviours"'), "AND")
+        template.add(self._query_type_mobility_extract, "AND")
+        template.add(self._query_type_detection_extraction, "AND")
+        self._query_select, self._query_args = template.compile()
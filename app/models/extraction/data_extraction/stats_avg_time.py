@@ -32,6 +32,8 @@ from pydantic import PrivateAttr
 from ..company import CompanyExtraction
 from ..coordinates import StartCoordinatesExtraction, EndCoordinatesExtraction
 from ..detection import TypeDetectionExtraction
+from ..rollup import RollupExtraction
+from ..template import QueryTemplate, SqlFragment
 from ..time import StartTimeExtraction, EndTimeExtraction
 from ...track import MobilityType
 
@@ -39,6 +41,7 @@ from ...track import MobilityType
 
 
 class StatsAvgTime(
+    RollupExtraction,
     StartTimeExtraction,
     EndTimeExtraction,
     StartCoordinatesExtraction,
@@ -46,61 +49,82 @@ class StatsAvgTime(
     CompanyExtraction,
     TypeDetectionExtraction,
 ):
-    _query_start_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_start_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_company_extraction: str = PrivateAttr("")
-    _query_type_detection_extraction: Optional[str] = PrivateAttr(None)
-    _query_type_mobility_extract: Optional[str] = PrivateAttr(None)
+    _query_start_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_company_extraction: SqlFragment = PrivateAttr(SqlFragment(""))
+    _query_type_detection_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_type_mobility_extract: Optional[SqlFragment] = PrivateAttr(None)
     _query_select: str = PrivateAttr(
         """
         SELECT Distinct(type), avg((end_time - start_time)/60000), count(journey_id)
         FROM user_behaviours,
-        (SELECT journey_id as x FROM "user_data" WHERE
+        (SELECT journey_id as x, start_date AS w1 FROM "user_data" WHERE
         """
     )
-    _query_external: str = PrivateAttr(") AS nested WHERE journey_id=nested.x")
+    _query_rollup_select: str = PrivateAttr(
+        """
+        SELECT type, sum(minutes)::numeric / sum(behaviours) AS avg,
+        sum(behaviours)::bigint AS count
+        FROM "user_behaviours_rollup" WHERE
+        """
+    )
+    _query_external: str = PrivateAttr(
+        ") AS nested WHERE journey_id=nested.x AND start_date=nested.w1"
+    )
     _query_external_extra: str = PrivateAttr("GROUP BY type")
+    _query_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_select"""
+    _rollup: bool = PrivateAttr(False)
+    _query_rollup_day_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_rollup: Optional[str] = PrivateAttr(None)
+    """Query of the rollups, None if the filters can't be expressed at their grain"""
+    _query_rollup_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_rollup"""
 
     type_mobility: Optional[MobilityType] = None
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._query_select = f"{self._query_select} {self._query_company_extraction}"
-
-        if self._query_start_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_time_extraction}"
-            )
-
-        if self._query_end_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_time_extraction}"
-            )
-
-        if self._query_start_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_coordinate_extraction}"
-            )
-
-        if self._query_end_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_coordinate_extraction}"
-            )
-
+        template = QueryTemplate(self._query_select).add(self._query_company_extraction)
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_start_radius_extraction,
+            self._query_end_radius_extraction,
+        ):
+            template.add(condition, "AND")
+
+        template.add(self._query_external)
+        template.add(self.start_time_partitions("user_behaviours"), "AND")
+        template.add(self.tenant_partitions("user_behaviours"), "AND")
+        type_mobility = SqlFragment('{} = "type"', (self.type_mobility,))
         if self.type_mobility and self._query_type_detection_extraction:
-            self._query_external = f"""{self._query_external} AND '{self.type_mobility}' = "type" AND {self._query_type_detection_extraction}"""
+            template.add(type_mobility, "AND")
+            template.add(self._query_type_detection_extraction, "AND")
 
         elif self.type_mobility:
-            self._query_external = (
-                f"""{self._query_external} AND '{self.type_mobility}' = "type" """
-            )
+            template.add(type_mobility, "AND")
 
         elif self._query_type_detection_extraction:
-            self._query_external = (
-                f"{self._query_external} AND {self._query_type_detection_extraction}"
+            template.add(self._query_type_detection_extraction, "AND")
+
+        template.add(self._query_external_extra)
+        self._query_select, self._query_args = template.compile()
+
+        if self._rollup:
+            template = (
+                QueryTemplate(self._query_rollup_select)
+                .add(self._query_company_extraction)
+                .add(self._query_rollup_day_extraction, "AND")
             )
-        self._query_select = (
-            f"{self._query_select} {self._query_external} {self._query_external_extra};"
-        )
+            if self.type_mobility:
+                template.add(type_mobility, "AND")
+            template.add(self._query_type_detection_extraction, "AND")
+            template.add(self._query_external_extra)
+            self._query_rollup, self._query_rollup_args = template.compile()
@@ -33,6 +33,8 @@ from ..aggregation import AggregationType
 from ..company import CompanyExtraction
 from ..coordinates import StartCoordinatesExtraction, EndCoordinatesExtraction
 from ..detection import TypeDetectionExtraction
+from ..rollup import RollupExtraction
+from ..template import QueryTemplate, SqlFragment
 from ..time import StartTimeExtraction, EndTimeExtraction
 from ...track import MobilityType
 
@@ -40,6 +42,7 @@ from ...track import MobilityType
 
 
 class StatsNumTracks(
+    RollupExtraction,
     StartTimeExtraction,
     EndTimeExtraction,
     StartCoordinatesExtraction,
@@ -47,13 +50,15 @@ class StatsNumTracks(
     CompanyExtraction,
     TypeDetectionExtraction,
 ):
-    _query_start_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_time_extraction: Optional[str] = PrivateAttr(None)
-    _query_start_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_end_coordinate_extraction: Optional[str] = PrivateAttr(None)
-    _query_company_extraction: str = PrivateAttr("")
-    _query_type_detection_extraction: Optional[str] = PrivateAttr(None)
-    _query_type_mobility_extract: Optional[str] = PrivateAttr(None)
+    _query_start_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_time_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_coordinate_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_start_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_end_radius_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_company_extraction: SqlFragment = PrivateAttr(SqlFragment(""))
+    _query_type_detection_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_type_mobility_extract: Optional[SqlFragment] = PrivateAttr(None)
     _query_select: str = PrivateAttr("")
     _query_select_main_type_time = PrivateAttr(
         """
@@ -69,9 +74,23 @@ class StatsNumTracks(
         FROM "user_data" WHERE
         """
     )
+    _query_rollup_select: str = PrivateAttr(
+        """
+        SELECT main_type_{0}, sum(tracks)::bigint AS count
+        FROM "user_data_rollup" WHERE
+        """
+    )
     _query_external: str = PrivateAttr("")
     _query_external_main_type_time: str = PrivateAttr("GROUP BY main_type_time")
     _query_external_main_type_space: str = PrivateAttr("GROUP BY main_type_space")
+    _query_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_select"""
+    _rollup: bool = PrivateAttr(False)
+    _query_rollup_day_extraction: Optional[SqlFragment] = PrivateAttr(None)
+    _query_rollup: Optional[str] = PrivateAttr(None)
+    """Query of the rollups, None if the filters can't be expressed at their grain"""
+    _query_rollup_args: tuple = PrivateAttr(())
+    """Arguments bound to _query_rollup"""
 
     type_aggregation: AggregationType = ...
     type_mobility: Optional[MobilityType] = None
@@ -79,43 +98,47 @@ class StatsNumTracks(
     def __init__(self, **data):
         super().__init__(**data)
         if self.type_aggregation == AggregationType.time:
-            self._query_select = (
-                f"{self._query_select_main_type_time} {self._query_company_extraction}"
-            )
+            self._query_select = self._query_select_main_type_time
             self._query_external = self._query_external_main_type_time
         else:
-            self._query_select = (
-                f"{self._query_select_main_type_space} {self._query_company_extraction}"
-            )
+            self._query_select = self._query_select_main_type_space
             self._query_external = self._query_external_main_type_space
 
-        if self._query_start_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_time_extraction}"
-            )
-
-        if self._query_end_time_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_time_extraction}"
-            )
-
-        if self._query_start_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_start_coordinate_extraction}"
-            )
-
-        if self._query_end_coordinate_extraction:
-            self._query_select = (
-                f"{self._query_select} AND {self._query_end_coordinate_extraction}"
-            )
-
+        template = QueryTemplate(self._query_select).add(self._query_company_extraction)
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_start_radius_extraction,
+            self._query_end_radius_extraction,
+        ):
+            template.add(condition, "AND")
+
+        type_mobility = SqlFragment(
+            f'{{}} = "main_type_{self.type_aggregation}"', (self.type_mobility,)
+        )
         if self.type_mobility and self._query_type_detection_extraction:
-            self._query_external = f""" AND '{self.type_mobility}' = "main_type_{self.type_aggregation}" AND {self._query_type_detection_extraction} {self._query_external}"""
+            template.add(type_mobility, "AND")
+            template.add(self._query_type_detection_extraction, "AND")
 
         elif self.type_mobility:
-            self._query_external = f""" AND '{self.type_mobility}' = "main_type_{self.type_aggregation}" {self._query_external}"""
+            template.add(type_mobility, "AND")
 
         elif self._query_type_detection_extraction:
-            self._query_external = f" AND {self._query_type_detection_extraction} AND {self._query_external}"
+            template.add(self._query_type_detection_extraction, "AND")
+
+        template.add(self._query_external)
+        self._query_select, self._query_args = template.compile()
 
-        self._query_select = f"{self._query_select} {self._query_external};"
+        # The tracks don't have a detection mode, so it isn't a key of their rollup
+        if self._rollup and not self._query_type_detection_extraction:
+            template = (
+                QueryTemplate(self._query_rollup_select.format(self.type_aggregation))
+                .add(self._query_company_extraction)
+                .add(self._query_rollup_day_extraction, "AND")
+            )
+            if self.type_mobility:
+                template.add(type_mobility, "AND")
+            template.add(self._query_external)
+            self._query_rollup, self._query_rollup_args = template.compile()
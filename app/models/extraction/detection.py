@@ -26,6 +26,7 @@ Detection Model
 from typing import Optional
 
 # Internal
+from .template import SqlFragment
 from ..model import OrjsonModel
 from ..track import DetectionType
 
@@ -35,12 +36,12 @@ from ..track import DetectionType
 class TypeDetectionExtraction(OrjsonModel):
     type_detection: Optional[DetectionType] = None
 
-    _query_type_detection_extraction: Optional[str] = None
+    _query_type_detection_extraction: Optional[SqlFragment] = None
     """Query detection_type"""
 
     def __init__(self, **data):
         super().__init__(**data)
         if self.type_detection:
-            self._query_type_detection_extraction = (
-                f""" '{self.type_detection}' = "mode" """
+            self._query_type_detection_extraction = SqlFragment(
+                '{} = "mode"', (self.type_detection,)
             )
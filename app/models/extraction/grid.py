@@ -0,0 +1,102 @@
+"""
+Grid cells module
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import math
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# --------------------------------------------------------------------------------------------
+
+GRID_LEVELS = (10, 12, 14, 16)
+"""
+Resolutions of the grid, a level splits latitude and longitude in 2^level parts:
+from about 20 Km to 300 m of latitude. The grid_cells function of the database
+computes the same cells to backfill the journeys stored before them
+"""
+
+MAX_COVER_CELLS = 16
+"""Cells of the finest cover of a box"""
+
+
+def grid_row(lat: float, level: int) -> int:
+    """
+    :param lat: latitude
+    :param level: resolution of the grid
+    :return: row of the grid of the latitude
+    """
+    cells = 1 << level
+    return min(max(math.floor((lat + 90) / 180 * cells), 0), cells - 1)
+
+
+def grid_column(lon: float, level: int) -> int:
+    """
+    :param lon: longitude
+    :param level: resolution of the grid
+    :return: column of the grid of the longitude
+    """
+    cells = 1 << level
+    return min(max(math.floor((lon + 180) / 360 * cells), 0), cells - 1)
+
+
+def grid_cell(level: int, row: int, column: int) -> int:
+    """
+    :return: id of the cell, unique among every resolution
+    """
+    return level << 48 | row << 24 | column
+
+
+def grid_cells(lat: Optional[float], lon: Optional[float]) -> Optional[List[int]]:
+    """
+    :param lat: latitude of a point
+    :param lon: longitude of a point
+    :return: cell of the point at every resolution, None without a point
+    """
+    if lat is None or lon is None:
+        return None
+    return [
+        grid_cell(level, grid_row(lat, level), grid_column(lon, level))
+        for level in GRID_LEVELS
+    ]
+
+
+@lru_cache(maxsize=4096)
+def grid_cover(lat0: float, lat1: float, lon0: float, lon1: float) -> Tuple[int, ...]:
+    """
+    Cells of the finest resolution that covers a box with at most MAX_COVER_CELLS,
+    the coarsest resolution covers the boxes too big for every other one
+
+    :param lat0: lowest latitude of the box
+    :param lat1: highest latitude of the box
+    :param lon0: lowest longitude of the box
+    :param lon1: highest longitude of the box
+    :return: cells that cover the box
+    """
+    for level in reversed(GRID_LEVELS):
+        rows = range(grid_row(lat0, level), grid_row(lat1, level) + 1)
+        columns = range(grid_column(lon0, level), grid_column(lon1, level) + 1)
+        if len(rows) * len(columns) <= MAX_COVER_CELLS or level == GRID_LEVELS[0]:
+            return tuple(
+                grid_cell(level, row, column) for row in rows for column in columns
+            )
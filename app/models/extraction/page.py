@@ -0,0 +1,95 @@
+"""
+Page Model
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from typing import Optional, Tuple
+
+# Third Party
+from pydantic import conint, validator
+
+# Internal
+from .template import QueryTemplate, SqlFragment
+from ..model import OrjsonModel
+
+# --------------------------------------------------------------------------------------------
+
+PAGE_ORDER = "ORDER BY start_date, journey_id"
+"""Order of the journeys of the pages, journey_id breaks the ties of start_date"""
+
+
+class PageExtraction(OrjsonModel):
+    """
+    Extraction returned a page of journeys at a time, to be combined with the time
+    and coordinates extractions. Every page follows the start_date and journey_id
+    of the last journey of the previous one, so it is a range scan of the index of
+    the journeys instead of an OFFSET that reads every previous page again
+    """
+
+    page_size: Optional[conint(gt=0)] = None
+    """Journeys of the page"""
+    page_after: Optional[Tuple[int, str]] = None
+    """start_date and journey_id of the last journey of the previous page"""
+
+    _query_page_extraction: Optional[SqlFragment] = None
+    """Query of the journeys that follow the previous page"""
+    _query_page_order: Optional[SqlFragment] = None
+    """Order and size of the page"""
+    _query_page_select: str = """SELECT start_date, journey_id FROM "user_data" WHERE"""
+    _query_page: Optional[str] = None
+    """Keys of the journeys of the page and of the first journey of the next one"""
+    _query_page_args: tuple = ()
+    """Arguments bound to _query_page"""
+
+    @validator("page_after", always=True)
+    def page_after_needs_page_size(cls, v, values):
+        if v and not values.get("page_size"):
+            raise ValueError("page_size must be set to follow a page")
+        return v
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if not self.page_size:
+            return
+
+        if self.page_after:
+            self._query_page_extraction = SqlFragment(
+                "(start_date, journey_id) > ({}, {})", tuple(self.page_after)
+            )
+        self._query_page_order = SqlFragment(
+            f"{PAGE_ORDER} LIMIT {{}}", (self.page_size,)
+        )
+
+        template = QueryTemplate(self._query_page_select).add(
+            self._query_company_extraction
+        )
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_page_extraction,
+        ):
+            template.add(condition, "AND")
+        template.add(SqlFragment(f"{PAGE_ORDER} LIMIT {{}}", (self.page_size + 1,)))
+        self._query_page, self._query_page_args = template.compile()
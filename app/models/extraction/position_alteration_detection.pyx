@@ -19,8 +19,15 @@ Simplified Reversed Haversine function
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-# Standard c++ library
-from libc.math cimport cos, sqrt, pi
+# Cython
+cimport cython
+from cpython cimport array
+
+# Standard C library
+from libc.math cimport asin, cos, fmin, isnan, pi, sin, sqrt
+
+# Standard Library
+import array
 from typing import Tuple
 
 
@@ -31,19 +38,102 @@ cdef int R
 
 R = 6378137
 
+cdef array.array DOUBLE_TEMPLATE = array.array("d")
+cdef array.array MASK_TEMPLATE = array.array("B")
+
 # -------------------------------------------------------------------------------------------
 
 
 def reversed_haversine(double lat, double lon, int start_radius) -> Tuple[float, float, float, float]:
-    cdef double dn, de, dLat, dLon, lat_input, lon_input
+    """
+    Box that contains the circle of radius start_radius meters around a point,
+    the points of the box outside the circle are discarded by within_radius
+
+    :return: lowest and highest latitude, lowest and highest longitude
+    """
+    cdef double dLat, dLon, angle
+
+    angle = start_radius / <double>R
+    dLat = angle
+    # Widest longitude of the circle, at a latitude a bit closer to the pole
+    dLon = asin(fmin(sin(angle) / cos(pi * lat / 180), 1.0))
+
+    return lat - dLat * 180 / pi, lat + dLat * 180 / pi, lon - dLon * 180 / pi, lon + dLon * 180 / pi
+
+
+# -------------------------------------------------------------------------------------------
+
+
+cdef inline double haversine(double lat0, double lon0, double lat1, double lon1) nogil:
+    """Great-circle distance in meters between two points in degrees"""
+    cdef double rad = pi / 180
+    cdef double a = (
+        sin((lat1 - lat0) * rad / 2) ** 2
+        + cos(lat0 * rad) * cos(lat1 * rad) * sin((lon1 - lon0) * rad / 2) ** 2
+    )
+    return 2 * R * asin(fmin(sqrt(a), 1.0))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def haversine_distances(
+    const double[:] lats, const double[:] lons, double lat, double lon
+) -> array.array:
+    """
+    Great-circle distance in meters of every point from a center, computed
+    without the GIL
+
+    :param lats: latitudes of the points
+    :param lons: longitudes of the points
+    :param lat: latitude of the center
+    :param lon: longitude of the center
+    :return: array of doubles
+    :raise ValueError: if the columns don't have the same length
+    """
+    cdef Py_ssize_t i, points = lats.shape[0]
+    cdef array.array distances
+    cdef double[:] out
+
+    if lons.shape[0] != points:
+        raise ValueError("The columns of the points must have the same length")
+
+    distances = array.clone(DOUBLE_TEMPLATE, points, zero=False)
+    out = distances
+    with nogil:
+        for i in range(points):
+            out[i] = haversine(lat, lon, lats[i], lons[i])
+    return distances
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def within_radius(
+    const double[:] lats, const double[:] lons, double lat, double lon, double radius
+) -> array.array:
+    """
+    Flag the points within radius meters of a center, computed without the GIL.
+    NaN coordinates are never within the radius
 
-    lat_input = lat
-    lon_input = lon
-    dn = start_radius / sqrt(2)
-    de = dn
-    dLat = dn / R
-    dLon = de / (R * cos(pi * lat_input / 180))
+    :param lats: latitudes of the points
+    :param lons: longitudes of the points
+    :param lat: latitude of the center
+    :param lon: longitude of the center
+    :param radius: radius in meters
+    :return: array of unsigned chars, 1 if the point is within the radius
+    :raise ValueError: if the columns don't have the same length
+    """
+    cdef Py_ssize_t i, points = lats.shape[0]
+    cdef array.array mask
+    cdef unsigned char[:] out
+    cdef double distance
 
-    return lat_input - dLat * 180 / pi, lat_input + dLat * 180 / pi, lon_input - dLon * 180 / pi, lon_input + dLon * 180 / pi
+    if lons.shape[0] != points:
+        raise ValueError("The columns of the points must have the same length")
 
-# -------------------------------------------------------------------------------------------
\ No newline at end of file
+    mask = array.clone(MASK_TEMPLATE, points, zero=False)
+    out = mask
+    with nogil:
+        for i in range(points):
+            distance = haversine(lat, lon, lats[i], lons[i])
+            out[i] = not isnan(distance) and distance <= radius
+    return mask
@@ -0,0 +1,94 @@
+"""
+Radius Model
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from typing import NamedTuple, Optional, Tuple
+
+# Internal
+from .template import QueryTemplate
+from ..model import OrjsonModel
+
+# --------------------------------------------------------------------------------------------
+
+
+class RadiusFilter(NamedTuple):
+    """Circle that must contain the starting or the ending point of the journeys"""
+
+    point: str
+    """start or end"""
+    lat: float
+    lon: float
+    radius: float
+    """Meters"""
+
+
+class RadiusExtraction(OrjsonModel):
+    """
+    Extraction whose journeys are filtered by the exact circles of start_radius and
+    end_radius, to be combined with the time, coordinates and page extractions.
+    The query selects the journeys within the boxes of the circles, then the points
+    of the journeys of _query_radius are checked against the circles to discard the
+    journeys in the corners of the boxes
+    """
+
+    _radius_filters: Tuple[RadiusFilter, ...] = ()
+    """Circles of the extraction"""
+    _query_radius_select: str = """
+        SELECT journey_id, start_lat, start_lon, end_lat, end_lon
+        FROM "user_data" WHERE"""
+    _query_radius: Optional[str] = None
+    """Points of the journeys within the boxes of the circles"""
+    _query_radius_args: tuple = ()
+    """Arguments bound to _query_radius"""
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        filters = []
+        # check only one arguments cause if one is set, every other is also set
+        if self.start_lat:
+            filters.append(
+                RadiusFilter("start", self.start_lat, self.start_lon, self.start_radius)
+            )
+        if self.end_lat:
+            filters.append(
+                RadiusFilter("end", self.end_lat, self.end_lon, self.end_radius)
+            )
+        if not filters:
+            return
+
+        self._radius_filters = tuple(filters)
+        template = QueryTemplate(self._query_radius_select).add(
+            self._query_company_extraction
+        )
+        for condition in (
+            self._query_start_time_extraction,
+            self._query_end_time_extraction,
+            self._query_start_coordinate_extraction,
+            self._query_end_coordinate_extraction,
+            self._query_page_extraction,
+        ):
+            template.add(condition, "AND")
+        # The same journeys of the page
+        template.add(self._query_page_order)
+        self._query_radius, self._query_radius_args = template.compile()
@@ -0,0 +1,67 @@
+"""
+Rollup Model
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from typing import Optional
+
+# Internal
+from .template import SqlFragment
+from ..model import OrjsonModel
+
+# --------------------------------------------------------------------------------------------
+
+ROLLUP_DAY = 86_400_000
+"""Milliseconds of a day, the time grain of the rollups"""
+
+
+class RollupExtraction(OrjsonModel):
+    """
+    Extraction that can be answered by the rollups, to be combined with the time
+    and coordinates extractions. The rollups aggregate the journeys by day of the
+    start_date, so they can't express the coordinates, the end_time and a
+    start_time window that doesn't cover whole UTC days
+    """
+
+    _rollup: bool = False
+    """Flag that indicates that the filters can be expressed at the grain of the rollups"""
+    _query_rollup_day_extraction: Optional[SqlFragment] = None
+    """Query of the days of the start_time window"""
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._rollup = (
+            self._query_end_time_extraction is None
+            and self._query_start_coordinate_extraction is None
+            and self._query_end_coordinate_extraction is None
+        )
+        if self._rollup and self.start_time:
+            # start_date BETWEEN is inclusive, the window ends with the last ms of a day
+            low = self.start_time
+            high = self.start_time + self.start_time_high_threshold + 1
+            if low % ROLLUP_DAY or high % ROLLUP_DAY:
+                self._rollup = False
+            else:
+                self._query_rollup_day_extraction = SqlFragment(
+                    "day >= {} AND day < {}", (low, high)
+                )
@@ -0,0 +1,79 @@
+"""
+Query template package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+# --------------------------------------------------------------------------------------------
+
+
+class SqlFragment(NamedTuple):
+    """SQL with a {} in place of every argument bound to the query"""
+
+    sql: str
+    args: tuple = ()
+
+
+class QueryTemplate:
+    """
+    Compile SQL fragments in a query whose values are bound as $n arguments.
+    The text of the query depends only on which filters are requested, so
+    every shape is parsed and planned once per connection and then reused
+    """
+
+    def __init__(self, sql: str = ""):
+        self.fragments: List[str] = [sql] if sql else []
+        self.args: list = []
+
+    def add(
+        self, fragment: Optional[Union[str, SqlFragment]], conjunction: str = ""
+    ) -> "QueryTemplate":
+        """
+        Append a fragment numbering its arguments after the ones already bound
+
+        :param fragment: SQL to append, nothing is appended if None
+        :param conjunction: SQL that precedes the fragment, like AND
+        """
+        if fragment is None:
+            return self
+        if isinstance(fragment, str):
+            fragment = SqlFragment(fragment)
+
+        sql = fragment.sql
+        if fragment.args:
+            first = len(self.args) + 1
+            sql = sql.format(
+                *(f"${number}" for number in range(first, first + len(fragment.args)))
+            )
+            self.args.extend(fragment.args)
+
+        self.fragments.append(f"{conjunction} {sql}" if conjunction else sql)
+        return self
+
+    def compile(self, end: str = ";") -> Tuple[str, tuple]:
+        """
+        :param end: SQL that ends the query
+        :return: text of the query and its arguments
+        """
+        return f"{' '.join(self.fragments)}{end}", tuple(self.args)
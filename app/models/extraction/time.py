@@ -29,6 +29,7 @@ from typing import Optional
 from pydantic import validator
 
 # Internal
+from .template import SqlFragment
 from ..model import OrjsonModel
 
 # --------------------------------------------------------------------------------------------
@@ -62,7 +63,7 @@ class StartTimeExtraction(OrjsonModel):
     start_time_high_threshold: Optional[int] = None
     """Right boundary of the starting time example=3600_000"""
 
-    _query_start_time_extraction: Optional[str] = None
+    _query_start_time_extraction: Optional[SqlFragment] = None
 
     @validator("start_time_high_threshold", always=True)
     def both_start_time_must_be_set_or_none(cls, v, values):
@@ -76,7 +77,28 @@ class StartTimeExtraction(OrjsonModel):
         super().__init__(**data)
         # check only one arguments cause if one is set, every other is also set
         if self.start_time:
-            self._query_start_time_extraction = f"start_date BETWEEN {self.start_time} AND {self.start_time + self.start_time_high_threshold}"
+            self._query_start_time_extraction = SqlFragment(
+                "start_date BETWEEN {} AND {}",
+                (self.start_time, self.start_time + self.start_time_high_threshold),
+            )
+
+    def start_time_partitions(self, *tables: str) -> Optional[SqlFragment]:
+        """
+        Condition on the start_date of the rows joined with the journeys, the same
+        of their journey, so only the partitions of the months of the starting
+        time are read. Every table binds the same two arguments
+
+        :param tables: tables or aliases joined with the journeys
+        :return: condition, None without a starting time
+        """
+        if not self.start_time:
+            return None
+        return SqlFragment(
+            " AND ".join(
+                f"{table}.start_date BETWEEN {{0}} AND {{1}}" for table in tables
+            ),
+            (self.start_time, self.start_time + self.start_time_high_threshold),
+        )
 
 
 # --------------------------------------------------------------------------------------------------
@@ -88,7 +110,7 @@ class EndTimeExtraction(OrjsonModel):
     end_time_high_threshold: Optional[int] = None
     """Right boundary of the ending time example=3600_000"""
 
-    _query_end_time_extraction: Optional[str] = None
+    _query_end_time_extraction: Optional[SqlFragment] = None
 
     @validator("end_time_high_threshold", always=True)
     def both_end_time_must_be_set_or_none(cls, v, values):
@@ -102,4 +124,7 @@ class EndTimeExtraction(OrjsonModel):
         super().__init__(**data)
         # check only one arguments cause if one is set, every other is also set
         if self.end_time:
-            self._query_end_time_extraction = f"end_date BETWEEN {self.end_time} AND {self.end_time + self.end_time_high_threshold}"
+            self._query_end_time_extraction = SqlFragment(
+                "end_date BETWEEN {} AND {}",
+                (self.end_time, self.end_time + self.end_time_high_threshold),
+            )
@@ -72,6 +72,13 @@ class RequestType(str, Enum):
     inter_modality_space = "Inter_modality_space"
 
 
+class StreamFormat(str, Enum):
+    """Format of an extraction streamed a chunk at a time"""
+
+    json = "json"
+    ndjson = "ndjson"
+
+
 class TypeDay(str, Enum):
     """Type of day"""
 
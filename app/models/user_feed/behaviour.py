@@ -23,7 +23,7 @@ Behaviour models package
 """
 
 # Standard Library
-from typing import List, Optional
+from typing import List
 
 # Third Party
 from pydantic import Field
@@ -38,19 +38,19 @@ from ..track import TrackSegments
 class Behaviour(OrjsonModel):
     """User Behaviour"""
 
-    app_defined: List[Optional[TrackSegments]] = Field(
+    app_defined: List[TrackSegments] = Field(
         ...,
         title="Application Defined Behaviour",
         description="Mobile application standalone detection of mobility types and the segments within the journey",
         example=[],
     )
-    tpv_defined: List[Optional[TrackSegments]] = Field(
+    tpv_defined: List[TrackSegments] = Field(
         ...,
         title="Third Party Defined Behaviour",
         description="Autonomous detection of mobility types and the segments within the journey",
         example=[],
     )
-    user_defined: List[Optional[TrackSegments]] = Field(
+    user_defined: List[TrackSegments] = Field(
         ...,
         title="User Defined Behaviour",
         description="""The users specify through the mobile app the type of mobility
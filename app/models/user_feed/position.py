@@ -22,10 +22,17 @@ Position models
     limitations under the License.
 """
 
+# Standard Library
+from array import array
+from typing import Iterable, Iterator, Tuple
+
 # Third Party
-from pydantic import Field
+from pydantic import Field, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import ListError, ListMinLengthError
 
 # Internal
+from .trace_codec import decode_trace, encode_trace
 from ..security import Authenticity
 from ..model import OrjsonModel
 
@@ -61,3 +68,184 @@ class PositionObject(OrjsonModel):
 
 
 # --------------------------------------------------------------------------------------------
+
+
+def position_values(position: object) -> Tuple[int, int, float, float, int]:
+    """
+    Validate a decoded position.
+    The values that already have the right type are used as they are, any other
+    value is validated and converted by PositionObject
+
+    :param position: decoded position
+    :return: time, authenticity, lat, lon and partialDistance of the position
+    :raise ValidationError: if the position isn't valid
+    """
+    if type(position) is dict:
+        authenticity = position.get("authenticity")
+        lat = position.get("lat")
+        lon = position.get("lon")
+        partial_distance = position.get("partialDistance")
+        time = position.get("time")
+        if (
+            type(authenticity) is int
+            and -1 <= authenticity <= 1
+            and type(lat) is float
+            and type(lon) is float
+            and type(partial_distance) is int
+            and type(time) is int
+        ):
+            return time, authenticity, lat, lon, partial_distance
+
+    if not isinstance(position, PositionObject):
+        position = PositionObject.parse_obj(position)
+    return (
+        position.time,
+        position.authenticity,
+        position.lat,
+        position.lon,
+        position.partialDistance,
+    )
+
+
+class TraceInformation:
+    """
+    Positions of a journey stored column by column in typed arrays,
+    a position costs 33 bytes instead of a PositionObject and its values
+    """
+
+    __slots__ = ("time", "authenticity", "lat", "lon", "partialDistance")
+
+    def __init__(self):
+        self.time = array("q")
+        self.authenticity = array("b")
+        self.lat = array("d")
+        self.lon = array("d")
+        self.partialDistance = array("q")
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, index: int) -> PositionObject:
+        """Build the PositionObject of a position, use the columns when possible"""
+        return PositionObject.construct(
+            authenticity=Authenticity(self.authenticity[index]),
+            lat=self.lat[index],
+            lon=self.lon[index],
+            partialDistance=self.partialDistance[index],
+            time=self.time[index],
+        )
+
+    def __iter__(self) -> Iterator[PositionObject]:
+        return (self[index] for index in range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TraceInformation):
+            return NotImplemented
+        return all(
+            getattr(self, column) == getattr(other, column) for column in self.__slots__
+        )
+
+    def extend(self, positions: Iterable[tuple]) -> None:
+        """
+        Append already validated positions
+
+        :param positions: time, authenticity, lat, lon and partialDistance of every position
+        """
+        for time, authenticity, lat, lon, partial_distance in positions:
+            self.time.append(time)
+            self.authenticity.append(authenticity)
+            self.lat.append(lat)
+            self.lon.append(lon)
+            self.partialDistance.append(partial_distance)
+
+    def encode(self) -> bytes:
+        """Positions compressed in the blob stored in user_traces"""
+        return encode_trace(
+            self.time, self.authenticity, self.lat, self.lon, self.partialDistance
+        )
+
+    @classmethod
+    def decode(cls, blob: bytes) -> "TraceInformation":
+        """
+        Positions of a blob stored in user_traces
+
+        :raise ValueError: if the blob is corrupted
+        """
+        trace = cls()
+        (
+            trace.time,
+            trace.authenticity,
+            trace.lat,
+            trace.lon,
+            trace.partialDistance,
+        ) = decode_trace(blob)
+        return trace
+
+    def to_list(self) -> list:
+        """Positions as a list of dict, as they were received"""
+        return [
+            {
+                "authenticity": authenticity,
+                "lat": lat,
+                "lon": lon,
+                "partialDistance": partial_distance,
+                "time": time,
+            }
+            for time, authenticity, lat, lon, partial_distance in zip(
+                self.time, self.authenticity, self.lat, self.lon, self.partialDistance
+            )
+        ]
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: dict) -> None:
+        field_schema.update(type="array", items=PositionObject.schema())
+
+    @classmethod
+    def validate(cls, value: object) -> "TraceInformation":
+        """
+        Fill the columns validating every position once
+
+        :param value: list of positions
+        :raise ValidationError: if a position isn't valid or there isn't any
+        """
+        if isinstance(value, cls):
+            return value
+        if not isinstance(value, (list, tuple)):
+            raise ListError()
+        # The journey starts and ends at its first and last positions
+        if not value:
+            raise ListMinLengthError(limit_value=1)
+
+        trace = cls()
+        append_time = trace.time.append
+        append_authenticity = trace.authenticity.append
+        append_lat = trace.lat.append
+        append_lon = trace.lon.append
+        append_partial_distance = trace.partialDistance.append
+        errors = []
+
+        for index, position in enumerate(value):
+            try:
+                time, authenticity, lat, lon, partial_distance = position_values(
+                    position
+                )
+                append_time(time)
+                append_partial_distance(partial_distance)
+            except (ValidationError, OverflowError) as err:
+                # The columns are discarded, they don't need to stay aligned
+                errors.append(ErrorWrapper(err, loc=index))
+                continue
+            append_authenticity(authenticity)
+            append_lat(lat)
+            append_lon(lon)
+
+        if errors:
+            raise ValidationError(errors, PositionObject)
+        return trace
+
+
+# --------------------------------------------------------------------------------------------
@@ -23,7 +23,8 @@ Sensor models
 """
 
 # Standard Library
-from typing import Union
+from enum import IntEnum
+from typing import Tuple, Union
 
 # Third Party
 from pydantic import Field
@@ -60,3 +61,86 @@ class SensorInformation(OrjsonModel):
     time: int = Field(
         ..., description="UTC timestamp expressed in ms", example=1611820537461
     )
+
+
+# --------------------------------------------------------------------------------------------
+
+
+class SensorKind(IntEnum):
+    """Kind of sensor data, stored in the typed columns of user_sensors"""
+
+    position = 1
+    orientation = 2
+
+
+SENSOR_DATA_FIELDS = {
+    SensorKind.position: ("x", "y", "z"),
+    SensorKind.orientation: ("azimut", "pitch", "roll"),
+}
+"""Fields of the sensor data stored in the columns v1, v2 and v3"""
+
+
+def sensor_values(
+    sensor: object,
+) -> Tuple[int, str, SensorKind, float, float, float]:
+    """
+    Validate a decoded sensor information.
+    The values that already have the right type are used as they are, any other
+    value is validated and converted by SensorInformation
+
+    :param sensor: decoded sensor information
+    :return: time, name, kind of data and the 3 values of the data
+    :raise ValidationError: if the sensor information isn't valid
+    """
+    if type(sensor) is dict:
+        data = sensor.get("data")
+        name = sensor.get("name")
+        time = sensor.get("time")
+        if type(data) is dict and type(name) is str and type(time) is int:
+            # Same choice of the Union: the first model that validates the data
+            x, y, z = data.get("x"), data.get("y"), data.get("z")
+            if type(x) is float and type(y) is float and type(z) is float:
+                return time, name, SensorKind.position, x, y, z
+
+            azimut, pitch, roll = (
+                data.get("azimut"),
+                data.get("pitch"),
+                data.get("roll"),
+            )
+            if (
+                x is None
+                and type(azimut) is float
+                and type(pitch) is float
+                and type(roll) is float
+            ):
+                return time, name, SensorKind.orientation, azimut, pitch, roll
+
+    if not isinstance(sensor, SensorInformation):
+        sensor = SensorInformation.parse_obj(sensor)
+    if isinstance(sensor.data, SensorDataPosition):
+        return (
+            sensor.time,
+            sensor.name,
+            SensorKind.position,
+            sensor.data.x,
+            sensor.data.y,
+            sensor.data.z,
+        )
+    return (
+        sensor.time,
+        sensor.name,
+        SensorKind.orientation,
+        sensor.data.azimut,
+        sensor.data.pitch,
+        sensor.data.roll,
+    )
+
+
+def sensor_data_decode(kind: int, v1: float, v2: float, v3: float) -> dict:
+    """
+    Rebuild the data of a sensor information stored in the typed columns
+
+    :param kind: kind of data
+    :return: data as they were received
+    """
+    return dict(zip(SENSOR_DATA_FIELDS[SensorKind(kind)], (v1, v2, v3)))
@@ -0,0 +1,324 @@
+#!python
+#cython: language_level=3, boundscheck=False, wraparound=False
+
+"""
+Codec of the compressed traces stored in user_traces
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+..
+    Copyright 2021 LINKS Foundation
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+        https://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+A trace is stored column by column:
+
+    version     1 byte
+    flags       1 byte, FIXED_LAT and FIXED_LON
+    points      varint
+    time        zigzag varint of the delta with the previous position
+    authenticity 1 byte per position
+    lat, lon    zigzag varint of the delta of the value in 1e-7 degrees if every
+                value of the column is exactly represented with 7 decimals,
+                otherwise the raw little endian doubles
+    partial distance zigzag varint of the delta with the previous position
+
+Every delta is computed modulo 2**64, so any int64 value is encoded losslessly
+"""
+# Cython
+from cpython cimport array
+from cpython.bytes cimport PyBytes_FromStringAndSize
+
+# Standard C library
+from libc.math cimport fabs, llround
+from libc.stdint cimport int8_t, int64_t, uint8_t, uint64_t
+from libc.string cimport memcpy
+
+# Standard Library
+import array
+from typing import Tuple
+
+
+# -------------------------------------------------------------------------------------------
+
+# CONSTANTS
+DEF VERSION = 1
+DEF FIXED_LAT = 1
+DEF FIXED_LON = 2
+DEF SCALE = 1e7
+DEF MAX_FIXED = 1e11
+DEF MAX_VARINT = 10
+
+cdef array.array INT64_TEMPLATE = array.array("q")
+cdef array.array INT8_TEMPLATE = array.array("b")
+cdef array.array DOUBLE_TEMPLATE = array.array("d")
+
+# -------------------------------------------------------------------------------------------
+
+
+cdef inline Py_ssize_t write_varint(uint8_t* out, Py_ssize_t pos, uint64_t value):
+    while value >= 0x80:
+        out[pos] = <uint8_t>(value | 0x80)
+        value >>= 7
+        pos += 1
+    out[pos] = <uint8_t>value
+    return pos + 1
+
+
+cdef inline uint64_t zigzag(int64_t value):
+    return (<uint64_t>value << 1) ^ <uint64_t>(value >> 63)
+
+
+cdef inline int64_t unzigzag(uint64_t value):
+    return <int64_t>((value >> 1) ^ (~(value & 1) + 1))
+
+
+cdef Py_ssize_t write_deltas(uint8_t* out, Py_ssize_t pos, const int64_t[:] values):
+    cdef Py_ssize_t i
+    cdef uint64_t previous = 0
+    for i in range(values.shape[0]):
+        pos = write_varint(out, pos, zigzag(<int64_t>(<uint64_t>values[i] - previous)))
+        previous = <uint64_t>values[i]
+    return pos
+
+
+cdef bint is_fixed(const double[:] values):
+    cdef Py_ssize_t i
+    cdef double value
+    for i in range(values.shape[0]):
+        value = values[i]
+        # Also false for NaN
+        if not fabs(value) < MAX_FIXED:
+            return False
+        if <double>llround(value * SCALE) / SCALE != value:
+            return False
+    return True
+
+
+cdef Py_ssize_t write_coordinates(
+    uint8_t* out, Py_ssize_t pos, const double[:] values, bint fixed
+):
+    cdef Py_ssize_t i
+    cdef int64_t value
+    cdef uint64_t previous = 0
+    if not fixed:
+        if values.shape[0]:
+            memcpy(&out[pos], &values[0], values.shape[0] * sizeof(double))
+        return pos + values.shape[0] * sizeof(double)
+
+    for i in range(values.shape[0]):
+        value = llround(values[i] * SCALE)
+        pos = write_varint(out, pos, zigzag(<int64_t>(<uint64_t>value - previous)))
+        previous = <uint64_t>value
+    return pos
+
+
+def encode_trace(
+    const int64_t[:] time,
+    const int8_t[:] authenticity,
+    const double[:] lat,
+    const double[:] lon,
+    const int64_t[:] partial_distance,
+) -> bytes:
+    """
+    Encode the columns of a trace in a blob
+
+    :return: the encoded trace
+    :raise ValueError: if the columns don't have the same length
+    """
+    cdef Py_ssize_t points = time.shape[0]
+    cdef Py_ssize_t pos = 0
+    cdef Py_ssize_t i
+    cdef uint8_t flags = 0
+    cdef bytearray buffer
+    cdef uint8_t* out
+
+    if not (
+        authenticity.shape[0] == lat.shape[0] == lon.shape[0]
+        == partial_distance.shape[0] == points
+    ):
+        raise ValueError("The columns of the trace must have the same length")
+
+    if is_fixed(lat):
+        flags |= FIXED_LAT
+    if is_fixed(lon):
+        flags |= FIXED_LON
+
+    # Worst case: every varint needs MAX_VARINT bytes
+    buffer = bytearray(2 + MAX_VARINT + points * (1 + 4 * MAX_VARINT))
+    out = buffer
+
+    out[0] = VERSION
+    out[1] = flags
+    pos = write_varint(out, 2, points)
+    pos = write_deltas(out, pos, time)
+    for i in range(points):
+        out[pos + i] = <uint8_t>authenticity[i]
+    pos += points
+    pos = write_coordinates(out, pos, lat, flags & FIXED_LAT)
+    pos = write_coordinates(out, pos, lon, flags & FIXED_LON)
+    pos = write_deltas(out, pos, partial_distance)
+
+    return PyBytes_FromStringAndSize(<char*>out, pos)
+
+
+# -------------------------------------------------------------------------------------------
+
+
+cdef class Reader:
+    """Bounds checked reader of a blob"""
+
+    cdef const uint8_t[:] blob
+    cdef Py_ssize_t pos
+
+    def __init__(self, const uint8_t[:] blob):
+        self.blob = blob
+        self.pos = 0
+
+    cdef uint64_t varint(self) except? 0:
+        cdef uint64_t value = 0
+        cdef int shift = 0
+        cdef uint8_t byte
+        while True:
+            if self.pos >= self.blob.shape[0] or shift > 63:
+                raise ValueError("Corrupted trace")
+            byte = self.blob[self.pos]
+            self.pos += 1
+            value |= <uint64_t>(byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    cdef void deltas(self, int64_t[:] values) except *:
+        cdef Py_ssize_t i
+        cdef uint64_t previous = 0
+        for i in range(values.shape[0]):
+            previous += <uint64_t>unzigzag(self.varint())
+            values[i] = <int64_t>previous
+
+    cdef void coordinates(self, double[:] values, bint fixed) except *:
+        cdef Py_ssize_t i
+        cdef Py_ssize_t size = values.shape[0] * sizeof(double)
+        cdef uint64_t previous = 0
+        if not fixed:
+            if self.pos + size > self.blob.shape[0]:
+                raise ValueError("Corrupted trace")
+            if size:
+                memcpy(&values[0], &self.blob[self.pos], size)
+            self.pos += size
+            return
+
+        for i in range(values.shape[0]):
+            previous += <uint64_t>unzigzag(self.varint())
+            values[i] = <double><int64_t>previous / SCALE
+
+
+def decode_trace(const uint8_t[:] blob) -> Tuple[array.array, ...]:
+    """
+    Decode a blob encoded by encode_trace
+
+    :return: time, authenticity, lat, lon and partial distance columns
+    :raise ValueError: if the blob is corrupted
+    """
+    cdef Reader reader = Reader(blob)
+    cdef Py_ssize_t points, i
+    cdef uint8_t flags
+    cdef array.array time, authenticity, lat, lon, partial_distance
+    cdef int8_t[:] authenticity_view
+
+    if blob.shape[0] < 2 or blob[0] != VERSION:
+        raise ValueError("Unsupported trace")
+    flags = blob[1]
+    reader.pos = 2
+    points = <Py_ssize_t>reader.varint()
+    # Every position needs at least 5 bytes, a bigger count is corrupted
+    if points < 0 or points > blob.shape[0]:
+        raise ValueError("Corrupted trace")
+
+    time = array.clone(INT64_TEMPLATE, points, False)
+    authenticity = array.clone(INT8_TEMPLATE, points, False)
+    lat = array.clone(DOUBLE_TEMPLATE, points, False)
+    lon = array.clone(DOUBLE_TEMPLATE, points, False)
+    partial_distance = array.clone(INT64_TEMPLATE, points, False)
+
+    reader.deltas(time)
+    if reader.pos + points > blob.shape[0]:
+        raise ValueError("Corrupted trace")
+    authenticity_view = authenticity
+    for i in range(points):
+        authenticity_view[i] = <int8_t>blob[reader.pos + i]
+    reader.pos += points
+    reader.coordinates(lat, flags & FIXED_LAT)
+    reader.coordinates(lon, flags & FIXED_LON)
+    reader.deltas(partial_distance)
+
+    if reader.pos != blob.shape[0]:
+        raise ValueError("Corrupted trace")
+    return time, authenticity, lat, lon, partial_distance
+
+
+def trace_positions(
+    const uint8_t[:] blob,
+    str journey_id,
+    list types,
+    list modes,
+    list start_times,
+    list end_times,
+) -> list:
+    """
+    Decode a blob in the positions of every behaviour of the journey, with the
+    same fields of the positions extracted from user_positions
+
+    :param blob: encoded trace of the journey
+    :param journey_id: id of the journey
+    :param types: type of every behaviour
+    :param modes: mode of every behaviour
+    :param start_times: start time of every behaviour
+    :param end_times: end time of every behaviour
+    :return: positions between the start and end time of every behaviour
+    :raise ValueError: if the blob is corrupted
+    """
+    cdef const int64_t[:] time_view
+    cdef const double[:] lat_view
+    cdef const double[:] lon_view
+    cdef const int64_t[:] partial_distance_view
+    cdef Py_ssize_t behaviour, i
+    cdef int64_t start, end
+    cdef list positions = []
+
+    time, _, lat, lon, partial_distance = decode_trace(blob)
+    time_view = time
+    lat_view = lat
+    lon_view = lon
+    partial_distance_view = partial_distance
+
+    for behaviour in range(len(types)):
+        # Like the comparison in SQL, a missing time doesn't match any position
+        if start_times[behaviour] is None or end_times[behaviour] is None:
+            continue
+        start = start_times[behaviour]
+        end = end_times[behaviour]
+        for i in range(time_view.shape[0]):
+            if start <= time_view[i] <= end:
+                positions.append(
+                    {
+                        "journey_id": journey_id,
+                        "type": types[behaviour],
+                        "mode": modes[behaviour],
+                        "lat": lat_view[i],
+                        "lon": lon_view[i],
+                        "time": time_view[i],
+                        "partial_distance": partial_distance_view[i],
+                    }
+                )
+    return positions
+
+# -------------------------------------------------------------------------------------------
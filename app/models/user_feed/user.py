@@ -23,7 +23,8 @@ User models package
 """
 
 # Standard Library
-from typing import List
+import re
+from typing import List, Optional
 
 # Third Party
 from fastuuid import uuid4
@@ -31,13 +32,19 @@ from pydantic import Field
 
 # Internal
 from .behaviour import Behaviour
-from .position import PositionObject
+from .position import TraceInformation
 from .sensor import SensorInformation
 from ..track import TypeOfTrack
 from ..model import OrjsonModel
 
 # ------------------------------------------------------------------------------------------------------
 
+ELAPSED_TIME = re.compile(r"([0-9]+):([0-5]?[0-9]):([0-5]?[0-9])(\.[0-9]+)?")
+"""Format of elapsedTime, hours:minutes:seconds"""
+
+DURATION_MAX = 2**31 - 1
+"""Longest duration in seconds stored by the integer column"""
+
 
 class UserFeedBase(OrjsonModel):
     """Base Model for UserFeed"""
@@ -94,6 +101,23 @@ class UserFeedBase(OrjsonModel):
         example=1611820537452,
     )
 
+    @property
+    def duration(self) -> Optional[int]:
+        """
+        Seconds elapsed during the journey, from elapsedTime or from its dates
+        if elapsedTime isn't hours:minutes:seconds, None if they are longer
+        than DURATION_MAX. The same rules of BACKFILL_USER_DATA_DURATION_QUERY
+        """
+        elapsed_time = ELAPSED_TIME.fullmatch(self.elapsedTime)
+        if elapsed_time:
+            hours, minutes, seconds, _ = elapsed_time.groups()
+            duration = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+        elif self.endDate >= self.startDate:
+            duration = (self.endDate - self.startDate) // 1000
+        else:
+            return None
+        return duration if duration <= DURATION_MAX else None
+
 
 class UserFeedInternal(UserFeedBase):
     """UserFeed Input model"""
@@ -101,7 +125,24 @@ class UserFeedInternal(UserFeedBase):
     sensors_information: List[SensorInformation] = Field(
         ..., description="List of sensors information"
     )
-    trace_information: List[PositionObject] = Field(
+    trace_information: TraceInformation = Field(
+        ...,
+        title="Trace Information",
+        description="list of position objects, collected through the Galileo navigation system",
+    )
+
+    class Config:
+        json_encoders = {TraceInformation: TraceInformation.to_list}
+
+
+class UserFeedStream(UserFeedBase):
+    """
+    UserFeed Input model whose sensors and positions are kept as decoded json,
+    they are validated while they are converted in rows
+    """
+
+    sensors_information: list = Field(..., description="List of sensors information")
+    trace_information: list = Field(
         ...,
         title="Trace Information",
         description="list of position objects, collected through the Galileo navigation system",
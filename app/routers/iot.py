@@ -22,12 +22,16 @@ IoTFeed router package
     limitations under the License.
 """
 
+# Standard Library
+from typing import List
+
 # Third Party
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Depends
 from fastapi.responses import ORJSONResponse
 
 # Internal
-from ..internals.iot_feed import store_iot_feed, extract_iot_info
+from ..dependencies.batch_reader import IotFeedBatchReader
+from ..internals.iot_feed import store_iot_feed, store_iot_feed_batch, extract_iot_info
 from ..models.extraction.data_extraction.iot import ExtractIoT
 from ..models.iot_feed.iot import IotInput
 
@@ -35,6 +39,7 @@ from ..models.iot_feed.iot import IotInput
 
 # Instantiate router
 router = APIRouter(prefix="/ipt_anonymizer/api/v1/iot", tags=["IoT"])
+batch_reader = IotFeedBatchReader()
 
 
 @router.post(
@@ -50,6 +55,20 @@ async def store(iot_feed: IotInput = Body(...)):
     return await store_iot_feed(iot_feed)
 
 
+@router.post(
+    "/store/batch",
+    response_class=ORJSONResponse,
+    summary="Store a batch of IoT data",
+    response_description="Outcome of every observation of the batch",
+)
+async def store_batch(iot_feeds: List[IotInput] = Depends(batch_reader)):
+    """
+    This endpoint collects a JSON array or a NDJSON stream of iot information and
+    store them in the database with a single statement
+    """
+    return await store_iot_feed_batch(iot_feeds)
+
+
 @router.post(
     "/extract",
     response_class=ORJSONResponse,
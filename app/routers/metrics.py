@@ -0,0 +1,48 @@
+"""
+Metrics router package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Third Party
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+# Internal
+from ..internals.metrics import collect_metrics
+
+# --------------------------------------------------------------------------------------------
+
+# Instantiate router
+router = APIRouter(prefix="/ipt_anonymizer/api/v1/metrics", tags=["Metrics"])
+
+
+@router.get(
+    "",
+    response_class=ORJSONResponse,
+    summary="Worker metrics",
+    response_description="Metrics of the worker that answered",
+)
+async def metrics():
+    """
+    This endpoint exposes the metrics of the worker components
+    """
+    return collect_metrics()
@@ -23,20 +23,39 @@ UserFeed router package
 """
 
 # Third Party
-from fastapi import APIRouter, Body, Depends
-from fastapi.responses import ORJSONResponse
+from fastapi import APIRouter, Body, Depends, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 # Internal
+from ..config import get_ingest_settings
+from ..dependencies.batch_reader import UserFeedBatchReader, UserFeedBatch
 from ..dependencies.query_builder import QueryBuilder, Query
-from ..internals.user_feed import store_user_feed, extract_user_info, extract_statistics
-from ..models.user_feed.user import UserFeedInternal
-from ..models.track import RequestType
+from ..dependencies.stream_reader import UserFeedStreamReader
+from ..internals.extraction_cache import get_extraction_cache
+from ..internals.user_feed import (
+    store_user_feed,
+    enqueue_user_feed,
+    store_user_feed_batch,
+    store_user_feed_stream,
+    extract_data,
+    extract_data_cached,
+    extract_data_stream,
+)
+from ..models.track import StreamFormat
+from ..models.user_feed.user import UserFeedInternal, UserFeedStream
 
 # --------------------------------------------------------------------------------------------
 
 # Instantiate
 router = APIRouter(prefix="/ipt_anonymizer/api/v1/user", tags=["User"])
 query_builder = QueryBuilder()
+batch_reader = UserFeedBatchReader()
+stream_reader = UserFeedStreamReader()
+stream_media_types = {
+    StreamFormat.json: "application/json",
+    StreamFormat.ndjson: "application/x-ndjson",
+}
+"""Media type of every format of the streamed extractions"""
 
 
 @router.post(
@@ -45,13 +64,47 @@ query_builder = QueryBuilder()
     summary="Store User data",
     response_description="Resource Stored",
 )
-async def store(user_feed: UserFeedInternal = Body(...)):
+async def store(response: Response, user_feed: UserFeedInternal = Body(...)):
     """
-    This endpoint anonymize user information and store them in the database
+    This endpoint anonymize user information and store them in the database.
+    In write-behind mode the information are stored in background
     """
+    if get_ingest_settings().write_behind:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return enqueue_user_feed(user_feed)
+
     return await store_user_feed(user_feed)
 
 
+@router.post(
+    "/store/batch",
+    response_class=ORJSONResponse,
+    summary="Store a batch of User data",
+    response_description="Outcome of every journey of the batch",
+)
+async def store_batch(batch: UserFeedBatch = Depends(batch_reader)):
+    """
+    This endpoint anonymize the information of many journeys, sent as a JSON array
+    or as a NDJSON stream, and store them in the database
+    """
+    return await store_user_feed_batch(batch)
+
+
+@router.post(
+    "/store/stream",
+    response_class=ORJSONResponse,
+    summary="Store a large journey of User data",
+    response_description="Resource Stored",
+)
+async def store_stream(user_feed: UserFeedStream = Depends(stream_reader)):
+    """
+    This endpoint anonymize user information and store them in the database,
+    converting positions and sensors information in rows chunk by chunk to bound
+    the memory needed by journeys with many points
+    """
+    return await store_user_feed_stream(user_feed)
+
+
 @router.post(
     "/extract",
     response_class=ORJSONResponse,
@@ -60,12 +113,24 @@ async def store(user_feed: UserFeedInternal = Body(...)):
 )
 async def extract(extraction: Query = Depends(query_builder)):
     """
-    This endpoints extracts user info
+    This endpoints extracts user info.
+    The results are cached until new journeys of the same source_app and
+    company_code are stored. All_Positions and Complete_Mobility can be streamed
+    a chunk at a time as a JSON array or as NDJSON, bypassing the cache.
+    Partial_Mobility, Complete_Mobility and All_Positions can be returned
+    page_size journeys at a time, as the data of the page with the
+    next_page_cursor to pass as page_cursor to obtain the next one
     """
-    if extraction.request in (
-        RequestType.inter_modality_space,
-        RequestType.inter_modality_time,
-    ):
-        return await extract_statistics(extraction.request, extraction.query)
+    if extraction.stream:
+        return StreamingResponse(
+            await extract_data_stream(extraction),
+            media_type=stream_media_types[extraction.stream],
+        )
+
+    if get_extraction_cache().running:
+        return Response(
+            await extract_data_cached(extraction),
+            media_type=ORJSONResponse.media_type,
+        )
 
-    return await extract_user_info(extraction.request, extraction.query)
+    return await extract_data(extraction)
@@ -0,0 +1,168 @@
+"""
+Benchmark of the formats of the extractions
+
+Compare the time and the peak memory allocated by the formats of
+Partial_Mobility and of All_Positions and Complete_Mobility with the previous
+ones, that converted every record in a dict before grouping them. The records
+are generated by the database with the columns of the extractions.
+
+    python3 -m benchmarks.extraction_formats --rows 100000 1000000
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+import tracemalloc
+from typing import List
+
+# Third Party
+from fastuuid import uuid4
+
+# Internal
+from app.internals.database import partial_mobility_format
+from app.internals.pseudonyms import JourneyPseudonyms
+from .utils import open_connection, timer
+
+# ---------------------------------------------------------------------------------------------
+
+PARTIAL_MOBILITY_QUERY = """
+    SELECT md5((row / 4)::text) AS journey_id,
+    (ARRAY['walk', 'bicycle', 'bus', 'car'])[row % 4 + 1] AS type,
+    'user_defined' AS mode,
+    1611819619151 + row AS start_time,
+    1611819719151 + row AS end_time,
+    45.07 AS start_lat,
+    7.47 AS start_lon,
+    45.08 AS end_lat,
+    7.48 AS end_lon,
+    1000 AS meters
+    FROM generate_series(1, $1) AS row"""
+"""Rows of Partial_Mobility, 4 behaviours for every journey"""
+
+ALL_POSITIONS_QUERY = """
+    SELECT md5((row / 100)::text) AS journey_id,
+    'walk' AS type,
+    'user_defined' AS mode,
+    45.07 + row / 1e7 AS lat,
+    7.47 + row / 1e7 AS lon,
+    row * 10 AS partial_distance,
+    1611819619151 + row * 1000 AS time
+    FROM generate_series(1, $1) AS row"""
+"""Rows of All_Positions, 100 positions for every journey"""
+
+
+def previous_partial_mobility_format(record_list: List[dict]) -> list:
+    """partial_mobility_format before the single pass"""
+    journey_id = record_list[0]["journey_id"]
+    del record_list[0]["journey_id"]
+
+    temp_obj = {journey_id: record_list[0]}
+    temp_obj[journey_id]["type"] = [temp_obj[journey_id]["type"]]
+
+    for pos in range(1, len(record_list)):
+
+        if record_list[pos]["journey_id"] in temp_obj.keys():
+            temp_obj[record_list[pos]["journey_id"]]["type"].append(
+                record_list[pos]["type"]
+            )
+        else:
+            journey_id = record_list[pos]["journey_id"]
+            object_to_add = record_list[pos]
+            del object_to_add["journey_id"]
+
+            temp_obj[journey_id] = object_to_add
+            temp_obj[journey_id]["type"] = [temp_obj[journey_id]["type"]]
+
+    return [temp_obj[key] for key in temp_obj.keys()]
+
+
+def previous_all_positions_format(record_list: List[dict]) -> list:
+    """all_positions_and_complete_mobility_format, a uuid4 for every row"""
+    journey_id = record_list[0]["journey_id"]
+    record_list[0]["journey_id"] = str(uuid4())
+    temp_obj = {journey_id: record_list[0]}
+
+    for pos in range(1, len(record_list)):
+
+        if record_list[pos]["journey_id"] in temp_obj.keys():
+            journey_id = record_list[pos]["journey_id"]
+            record_list[pos]["journey_id"] = temp_obj[journey_id]["journey_id"]
+            temp_obj[str(uuid4())] = record_list[pos]
+        else:
+            journey_id = record_list[pos]["journey_id"]
+            record_list[pos]["journey_id"] = str(uuid4())
+            temp_obj[journey_id] = record_list[pos]
+
+    return [temp_obj[key] for key in temp_obj.keys()]
+
+
+def measure(title: str, format_records, records: list) -> None:
+    """Format the records measuring the wall time and the peak of allocated memory"""
+    tracemalloc.start()
+    with timer() as elapsed:
+        rows = format_records(records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{title:<40} {len(records):>10} records {len(rows):>10} rows "
+        f"{elapsed[0]:>8.3f} s {peak / 2 ** 20:>8.1f} MiB peak"
+    )
+
+
+async def main(rows: List[int]) -> None:
+    conn = await open_connection()
+    try:
+        for size in rows:
+            for title, query, previous, current in (
+                (
+                    "partial mobility",
+                    PARTIAL_MOBILITY_QUERY,
+                    previous_partial_mobility_format,
+                    partial_mobility_format,
+                ),
+                (
+                    "all positions",
+                    ALL_POSITIONS_QUERY,
+                    previous_all_positions_format,
+                    lambda record_list: JourneyPseudonyms(b"benchmark")(record_list),
+                ),
+            ):
+                records = await conn.fetch(query, size)
+                measure(
+                    f"{title} previous",
+                    lambda record_list: previous(
+                        [dict(record) for record in record_list]
+                    ),
+                    records,
+                )
+                measure(f"{title} single pass", current, records)
+                del records
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
@@ -0,0 +1,125 @@
+"""
+Benchmark of the extraction queries
+
+Compare the latency of the extraction queries with the values written in the
+text of the query, so every request is parsed and planned, against the same
+queries with the values bound as arguments, so every shape is prepared once
+per connection and then reused.
+
+    python3 -m benchmarks.extraction_queries --requests 2000
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+import random
+import re
+from typing import List, Tuple
+
+# Internal
+from app.db.statements import StatementStats
+from app.models.extraction.data_extraction.complete_mobility import CompleteMobility
+from app.models.extraction.data_extraction.partial_mobility import PartialMobility
+from app.models.extraction.data_extraction.stats_avg_space import StatsAvgSpace
+from .utils import open_connection, timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+
+def generate_request() -> Tuple[str, tuple]:
+    """
+    Generate an extraction query with random values and one of a few shapes
+    """
+    start_time = random.randint(1_600_000_000_000, 1_700_000_000_000)
+    extraction = {
+        "source_app": random.choice(("travis", "bench")),
+        "company_code": f"COMPANY-{random.randint(0, 100)}",
+        "start_time": start_time,
+        "start_time_high_threshold": random.randint(1, 3600_000),
+        "type_mobility": random.choice(("walk", "bicycle", "bus")),
+        "type_aggregation": "space",
+    }
+    if random.random() < 0.5:
+        extraction["start_lat"] = random.uniform(-90, 90)
+        extraction["start_lon"] = random.uniform(-180, 180)
+        extraction["start_radius"] = random.randint(100, 10_000)
+    model = random.choice((CompleteMobility, PartialMobility, StatsAvgSpace))
+    data = model.parse_obj(extraction)
+    # noinspection PyProtectedMember
+    return data._query_select, data._query_args
+
+
+def literal(query: str, args: tuple) -> str:
+    """
+    Write the arguments in the text of the query
+    """
+
+    def value(match: re.Match) -> str:
+        argument = args[int(match.group(1)) - 1]
+        if isinstance(argument, str):
+            return "'{}'".format(argument.replace("'", "''"))
+        if isinstance(argument, tuple):
+            return f"ARRAY{list(argument)}::bigint[]"
+        return repr(argument)
+
+    return re.sub(r"\$(\d+)", value, query)
+
+
+async def run(conn, requests: List[Tuple[str, tuple]], title: str) -> None:
+    stats = StatementStats(cache_size=1024)
+    pid = conn.get_server_pid()
+    with timer() as elapsed:
+        for query, args in requests:
+            with timer() as latency:
+                await conn.fetch(query, *args)
+            stats.record(pid, title, query, latency[0])
+    report(title, len(requests), elapsed[0], "queries")
+
+    metrics = stats.stats()
+    print(
+        f"{'':<40} hit rate {metrics['hit_rate']:.3f}, "
+        f"prepared avg {metrics['prepared_latency_ms']['avg']:.3f} ms, "
+        f"reused avg {metrics['reused_latency_ms']['avg']:.3f} ms"
+    )
+
+
+async def main(requests: int) -> None:
+    generated = [generate_request() for _ in range(requests)]
+
+    conn = await open_connection()
+    try:
+        await run(
+            conn,
+            [(literal(query, args), ()) for query, args in generated],
+            "literal values",
+        )
+        await run(conn, generated, "bound arguments")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,109 @@
+"""
+Benchmark of the engines used to store multiple rows
+
+Compare the rows/s reached by executemany and by the COPY protocol while storing
+user_positions, user_sensors and user_behaviours.
+
+    python3 -m benchmarks.insert_engine --journeys 20 --points 5000 --sensors 5000
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+
+# Internal
+from app.db.postgresql import DataBase
+from app.internals.database import (
+    user_positions_generation,
+    user_sensors_generation,
+    user_behaviours_generation,
+)
+from app.models.user_feed.user import UserFeedInternal
+from .utils import generate_user_feed, open_connection, clean_up, timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def main(journeys: int, points: int, sensors: int) -> None:
+    conn = await open_connection()
+    try:
+        for engine in ("executemany", "copy"):
+            user_feeds = [
+                UserFeedInternal.parse_obj(generate_user_feed(points, sensors))
+                for _ in range(journeys)
+            ]
+            tables = {
+                "user_positions": [
+                    user_positions_generation(
+                        user_feed.trace_information,
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                    )
+                    for user_feed in user_feeds
+                ],
+                "user_sensors": [
+                    user_sensors_generation(
+                        user_feed.sensors_information,
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                    )
+                    for user_feed in user_feeds
+                ],
+                "user_behaviours": [
+                    user_behaviours_generation(
+                        user_feed.behaviour,
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                        user_feed.source_app,
+                    )
+                    for user_feed in user_feeds
+                ],
+            }
+
+            for table_name, journeys_rows in tables.items():
+                with timer() as elapsed:
+                    for rows in journeys_rows:
+                        if engine == "copy":
+                            await DataBase.copy_multiple_rows(rows, conn, table_name)
+                        else:
+                            await conn.executemany(
+                                DataBase._store_multiple_rows[table_name], rows
+                            )
+                report(
+                    f"{engine} {table_name}",
+                    sum(len(rows) for rows in journeys_rows),
+                    elapsed[0],
+                )
+
+            await clean_up(conn, [user_feed.journey_id for user_feed in user_feeds])
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=20)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--sensors", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.points, args.sensors))
@@ -0,0 +1,99 @@
+"""
+Benchmark of the IoT ingest
+
+Compare the stored observations/s of concurrent /iot/store requests, stored one
+by one or micro-batched, and of /iot/store/batch requests.
+
+    python3 -m benchmarks.iot_ingest --observations 5000 --concurrency 64
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+from typing import List
+
+# Internal
+from app.config import get_ingest_settings
+from app.db.postgresql import DataBase
+from app.internals.iot_micro_batch import get_iot_micro_batcher
+from app.models.iot_feed.iot import IotInput
+from .utils import generate_iot_feed, open_connection, clean_up, timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def run(store, iot_feeds: List[IotInput], concurrency: int) -> None:
+    """Store every observation with at most concurrency requests at the same time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def store_one(iot_feed: IotInput):
+        async with semaphore:
+            await store(iot_feed)
+
+    await asyncio.gather(*(store_one(iot_feed) for iot_feed in iot_feeds))
+
+
+async def main(observations: int, concurrency: int, batch: int) -> None:
+    conn = await open_connection()
+    await DataBase.connect()
+    micro_batcher = get_iot_micro_batcher()
+    get_ingest_settings().iot_micro_batch = True
+    await micro_batcher.start()
+
+    async def store_batches(iot_feeds: List[IotInput]):
+        for start in range(0, len(iot_feeds), batch):
+            await DataBase.store_iot_batch(iot_feeds[start : start + batch])
+
+    try:
+        for title, store in (
+            (
+                "/iot/store one by one",
+                lambda feeds: run(DataBase.store_iot, feeds, concurrency),
+            ),
+            (
+                "/iot/store micro-batched",
+                lambda feeds: run(micro_batcher.store, feeds, concurrency),
+            ),
+            (f"/iot/store/batch of {batch}", store_batches),
+        ):
+            iot_feeds = [
+                IotInput.parse_obj(generate_iot_feed()) for _ in range(observations)
+            ]
+            with timer() as elapsed:
+                await store(iot_feeds)
+            report(title, observations, elapsed[0], "observations")
+
+            await clean_up(conn, [])
+    finally:
+        await micro_batcher.stop()
+        await DataBase.disconnect()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--observations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.observations, args.concurrency, args.batch))
@@ -0,0 +1,166 @@
+"""
+Benchmark of the Inter_modality statistics
+
+Compare the latency of the statistics computed with two queries, so two scans of
+the journeys, for every bucket against the statistics of every bucket
+aggregated by a single scan. The time buckets per query parse elapsed_time as
+they used to, the single scan reads the stored duration.
+
+    python3 -m benchmarks.mobility_statistics --journeys 100000 --repeat 10
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+import random
+import time
+
+# Third Party
+from asyncpg import Connection
+
+# Internal
+from app.db.postgresql import DataBase
+from app.models.extraction.data_extraction.inter_modality_space import (
+    InterModalitySpace,
+)
+from app.models.extraction.data_extraction.inter_modality_time import (
+    InterModalityTime,
+)
+from app.models.track import RequestType
+from app.models.user_feed.user import UserFeedInternal
+from .utils import (
+    generate_user_feed,
+    open_connection,
+    clean_up,
+    timer,
+    report,
+    SOURCE_APP,
+)
+
+# ---------------------------------------------------------------------------------------------
+
+SPACE_BUCKETS = (
+    "distance < 5000",
+    "distance >= 5000 AND distance < 10000",
+    "distance >= 10000",
+)
+
+TIME_BUCKETS = (
+    "elapsed_time::interval < '15 minutes'::interval",
+    "elapsed_time::interval >= '15 minutes'::interval "
+    "AND elapsed_time::interval < '30 minutes'::interval",
+    "elapsed_time::interval >= '30 minutes'::interval",
+)
+
+
+async def statistics_per_bucket(
+    conn: Connection, buckets: tuple, conditions: str, args: tuple
+) -> list:
+    """Statistics computed with two scans for every bucket"""
+    rows = []
+    for bucket in buckets:
+        total = await conn.fetchrow(
+            f"""Select avg(aggregated.n_mobility_type),sum(aggregated.n_mobility_type)
+            from (Select count(journey_id) as n_mobility_type
+            from user_behaviours,
+            (select journey_id as x
+            from user_data
+            where {bucket} and {conditions} ) as nested
+            where journey_id = nested.x group by journey_id) as aggregated;""",
+            *args,
+        )
+        types = []
+        if total["sum"] is not None:
+            types = await conn.fetch(
+                f"""Select distinct(aggregated.type),
+                ((sum(aggregated.n_mobility_type)/${len(args) + 1})*100) as perc
+                from
+                (
+                Select count(journey_id) as n_mobility_type, type
+                from user_behaviours,
+                (
+                select journey_id as x
+                from user_data
+                where {bucket} and {conditions} ) as nested
+                where journey_id = nested.x group by type) as aggregated
+                group by aggregated.type;""",
+                *args,
+                total["sum"],
+            )
+        rows.append((total["avg"], types))
+    return rows
+
+
+async def main(journeys: int, repeat: int) -> None:
+    conn = await open_connection()
+    await DataBase.connect()
+    journey_ids = []
+    try:
+        for _ in range(0, journeys, 1000):
+            user_feeds = []
+            for _ in range(1000):
+                user_feed = generate_user_feed(2, 0, 2)
+                user_feed["distance"] = random.randint(0, 30000)
+                user_feed["elapsedTime"] = time.strftime(
+                    "%H:%M:%S", time.gmtime(random.randint(0, 3600))
+                )
+                user_feeds.append(UserFeedInternal.parse_obj(user_feed))
+            await DataBase.store_user_batch(user_feeds)
+            journey_ids.extend(user_feed.journey_id for user_feed in user_feeds)
+        await conn.execute('ANALYZE "user_data"; ANALYZE "user_behaviours";')
+
+        conditions = "source_app = $1 AND company_code = $2"
+        args = (SOURCE_APP, "BENCHMARK")
+        for title, buckets, model in (
+            ("space", SPACE_BUCKETS, InterModalitySpace),
+            ("time", TIME_BUCKETS, InterModalityTime),
+        ):
+            with timer() as elapsed:
+                for _ in range(repeat):
+                    await statistics_per_bucket(conn, buckets, conditions, args)
+            report(f"{title} statistics per bucket", repeat, elapsed[0], "requests")
+
+            extraction = model(source_app=SOURCE_APP, company_code="BENCHMARK")
+            # noinspection PyProtectedMember
+            query, query_args = extraction._query_select, extraction._query_args
+            with timer() as elapsed:
+                for _ in range(repeat):
+                    await DataBase.extract_mobility_statistics(
+                        RequestType(f"Inter_modality_{title}"),
+                        query,
+                        query_args,
+                        [""] * (len(query_args[0]) + 1),
+                    )
+            report(f"{title} statistics single scan", repeat, elapsed[0], "requests")
+    finally:
+        await clean_up(conn, journey_ids)
+        await DataBase.disconnect()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.repeat))
@@ -0,0 +1,130 @@
+"""
+Benchmark of the radius filter
+
+Compare the cost of checking the journeys within the box of a circle against the
+circle with a Python loop and with the within_radius kernel, both on the columns
+alone and on the records returned by the radius query. The points are uniform in the box, so
+about a fifth of them are in its corners, outside the circle.
+
+    python3 -m benchmarks.radius_filter --points 1000000 --repeat 5
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import math
+import random
+from array import array
+from typing import List
+
+# Internal
+from app.internals.database import journeys_within_radius
+from app.models.extraction.position_alteration_detection import (
+    reversed_haversine,
+    within_radius,
+)
+from app.models.extraction.radius import RadiusFilter
+from .utils import timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+LAT = 45.07
+LON = 7.67
+RADIUS = 5000
+
+
+def python_within_radius(
+    lats: List[float], lons: List[float], lat: float, lon: float, radius: float
+) -> List[bool]:
+    """Same check of within_radius, a point at a time"""
+    rad = math.pi / 180
+    mask = []
+    for point_lat, point_lon in zip(lats, lons):
+        a = (
+            math.sin((point_lat - lat) * rad / 2) ** 2
+            + math.cos(lat * rad)
+            * math.cos(point_lat * rad)
+            * math.sin((point_lon - lon) * rad / 2) ** 2
+        )
+        mask.append(2 * 6378137 * math.asin(min(math.sqrt(a), 1)) <= radius)
+    return mask
+
+
+def main(points: int, repeat: int) -> None:
+    lat0, lat1, lon0, lon1 = reversed_haversine(LAT, LON, RADIUS)
+    lats = [random.uniform(lat0, lat1) for _ in range(points)]
+    lons = [random.uniform(lon0, lon1) for _ in range(points)]
+    records = [
+        {
+            "journey_id": str(pos),
+            "start_lat": lat,
+            "start_lon": lon,
+            "end_lat": LAT,
+            "end_lon": LON,
+        }
+        for pos, (lat, lon) in enumerate(zip(lats, lons))
+    ]
+    circle = RadiusFilter("start", LAT, LON, RADIUS)
+
+    with timer() as elapsed:
+        for _ in range(repeat):
+            expected = python_within_radius(lats, lons, LAT, LON, RADIUS)
+    report("python loop", points * repeat, elapsed[0], "points")
+
+    columns = array("d", lats), array("d", lons)
+    with timer() as elapsed:
+        for _ in range(repeat):
+            mask = within_radius(*columns, LAT, LON, RADIUS)
+    report("within_radius kernel", points * repeat, elapsed[0], "points")
+    assert list(map(bool, mask)) == expected
+
+    with timer() as elapsed:
+        for _ in range(repeat):
+            journeys = {
+                record["journey_id"]
+                for record, within in zip(
+                    records,
+                    python_within_radius(
+                        [record["start_lat"] for record in records],
+                        [record["start_lon"] for record in records],
+                        LAT,
+                        LON,
+                        RADIUS,
+                    ),
+                )
+                if within
+            }
+    report("python loop on records", points * repeat, elapsed[0], "points")
+
+    with timer() as elapsed:
+        for _ in range(repeat):
+            assert journeys_within_radius(records, (circle,)) == journeys
+    report("journeys_within_radius on records", points * repeat, elapsed[0], "points")
+    print(f"within the circle {len(journeys) / points:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.points, args.repeat)
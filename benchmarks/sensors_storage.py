@@ -0,0 +1,97 @@
+"""
+Benchmark of the storage of the sensors information
+
+Compare the rows/s and the bytes/row of user_sensors stored in jsonb and in the
+typed columns.
+
+    python3 -m benchmarks.sensors_storage --journeys 20 --sensors 5000
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+
+# Internal
+from app.db.postgresql import DataBase
+from app.internals.database import (
+    user_sensors_generation,
+    user_sensors_typed_generation,
+)
+from app.models.user_feed.user import UserFeedInternal
+from .utils import generate_user_feed, open_connection, clean_up, timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def main(journeys: int, sensors: int) -> None:
+    conn = await open_connection()
+    # Add the typed columns to a database created by a previous version
+    await DataBase.connect()
+    try:
+        for table_name, sensors_generation in (
+            ("user_sensors", user_sensors_generation),
+            ("user_sensors_typed", user_sensors_typed_generation),
+        ):
+            user_feeds = [
+                UserFeedInternal.parse_obj(generate_user_feed(1, sensors))
+                for _ in range(journeys)
+            ]
+            journey_ids = [user_feed.journey_id for user_feed in user_feeds]
+
+            with timer() as elapsed:
+                journeys_rows = [
+                    sensors_generation(
+                        user_feed.sensors_information,
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                    )
+                    for user_feed in user_feeds
+                ]
+            report(f"generation {table_name}", journeys * sensors, elapsed[0])
+
+            with timer() as elapsed:
+                for rows in journeys_rows:
+                    await DataBase.copy_multiple_rows(rows, conn, table_name)
+            report(f"copy {table_name}", journeys * sensors, elapsed[0])
+
+            size = await conn.fetchval(
+                """SELECT sum(pg_column_size(s.*)) FROM "user_sensors" s
+                WHERE journey_id = ANY($1::text[]);""",
+                journey_ids,
+            )
+            print(
+                f"{'size ' + table_name:<40} {size / (journeys * sensors):>10.1f} bytes/row"
+            )
+
+            await clean_up(conn, journey_ids)
+    finally:
+        await DataBase.disconnect()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=20)
+    parser.add_argument("--sensors", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.sensors))
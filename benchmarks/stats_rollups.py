@@ -0,0 +1,155 @@
+"""
+Benchmark of the Stats_num_tracks, Stats_avg_space and Stats_avg_time rollups
+
+Compare the latency of the statistics computed scanning user_data and
+user_behaviours against the same statistics read from the rollups, checking
+that both return the same results, and the latency added to the stores by the
+maintenance of the rollups.
+
+    python3 -m benchmarks.stats_rollups --journeys 100000 --repeat 10
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+import random
+
+# Internal
+from app.db.postgresql import DataBase
+from app.internals.database import BEHAVIOUR_MODES, user_rollups_generation
+from app.models.extraction.data_extraction.stats_avg_space import StatsAvgSpace
+from app.models.extraction.data_extraction.stats_avg_time import StatsAvgTime
+from app.models.extraction.data_extraction.stats_num_tracks import StatsNumTracks
+from app.models.extraction.rollup import ROLLUP_DAY
+from app.models.user_feed.user import UserFeedInternal
+from .utils import (
+    generate_user_feed,
+    open_connection,
+    clean_up,
+    timer,
+    report,
+    SOURCE_APP,
+    START_DATE,
+)
+
+# ---------------------------------------------------------------------------------------------
+
+DAYS = 30
+"""Days covered by the generated journeys"""
+
+FIRST_DAY = START_DATE - START_DATE % ROLLUP_DAY
+
+
+def generate_journey() -> UserFeedInternal:
+    """Generate a journey of a random day, trip type and detection modes"""
+    user_feed = generate_user_feed(8, 0, 4)
+    shift = random.randrange(DAYS) * ROLLUP_DAY + random.randrange(ROLLUP_DAY // 2)
+    user_feed["startDate"] += shift
+    user_feed["endDate"] += shift
+    for segment in user_feed["behaviour"]["user_defined"]:
+        segment["start"] = {
+            **segment["start"],
+            "time": segment["start"]["time"] + shift,
+        }
+        segment["end"] = {
+            **segment["end"],
+            "time": segment["end"]["time"] + shift + random.randrange(3600_000),
+        }
+    behaviour = user_feed["behaviour"]
+    behaviour[random.choice(BEHAVIOUR_MODES)] = behaviour["user_defined"][:2]
+    user_feed["company_trip_type"] = random.choice(("private", "commuting"))
+    user_feed["mainTypeSpace"] = random.choice(("walk", "bicycle", "bus"))
+    user_feed["mainTypeTime"] = random.choice(("walk", "bicycle", "bus"))
+    return UserFeedInternal.parse_obj(user_feed)
+
+
+def extractions() -> list:
+    """Extractions of the benchmark, every one can be answered by the rollups"""
+    window = {
+        "start_time": FIRST_DAY + 7 * ROLLUP_DAY,
+        "start_time_high_threshold": 14 * ROLLUP_DAY - 1,
+    }
+    company = {"source_app": SOURCE_APP, "company_code": "BENCHMARK"}
+    return [
+        StatsNumTracks(**company, type_aggregation="space"),
+        StatsNumTracks(**company, **window, type_aggregation="time"),
+        StatsNumTracks(**company, type_aggregation="space", type_mobility="bus"),
+        StatsAvgSpace(**company),
+        StatsAvgSpace(**company, **window, company_trip_type="commuting"),
+        StatsAvgTime(**company, type_detection="user"),
+        StatsAvgTime(**company, **window, type_mobility="walk"),
+    ]
+
+
+def rows(records: list) -> list:
+    """Records sorted to be compared"""
+    return sorted((tuple(record) for record in records), key=repr)
+
+
+async def main(journeys: int, repeat: int) -> None:
+    conn = await open_connection()
+    await DataBase.connect()
+    journey_ids = []
+    try:
+        user_feeds = [generate_journey() for _ in range(journeys)]
+        for start in range(0, journeys, 1000):
+            await DataBase.store_user_batch(user_feeds[start : start + 1000])
+        journey_ids.extend(user_feed.journey_id for user_feed in user_feeds)
+        await conn.execute('ANALYZE "user_data"; ANALYZE "user_behaviours";')
+
+        # noinspection PyProtectedMember
+        queries = [
+            (
+                (extraction._query_select, extraction._query_args),
+                (extraction._query_rollup, extraction._query_rollup_args),
+            )
+            for extraction in extractions()
+        ]
+        for scan, rollup in queries:
+            assert rows(await conn.fetch(scan[0], *scan[1])) == rows(
+                await conn.fetch(rollup[0], *rollup[1])
+            ), f"different results of {scan[0]}"
+
+        for title, index in (("scanning the journeys", 0), ("reading the rollups", 1)):
+            with timer() as elapsed:
+                for _ in range(repeat):
+                    for query in queries:
+                        await conn.fetch(query[index][0], *query[index][1])
+            report(f"statistics {title}", repeat * len(queries), elapsed[0], "requests")
+
+        with timer() as elapsed:
+            for _ in range(repeat):
+                user_rollups_generation(user_feeds)
+        report("rollup rows generation", repeat * journeys, elapsed[0], "journeys")
+    finally:
+        await clean_up(conn, journey_ids)
+        await DataBase.disconnect()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.repeat))
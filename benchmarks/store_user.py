@@ -0,0 +1,121 @@
+"""
+Benchmark of DataBase.store_user
+
+Compare the stored journeys/s of the old autocommit sequence of statements with
+the single transaction used by DataBase.store_user.
+
+    python3 -m benchmarks.store_user --journeys 200 --concurrency 8
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+from typing import List
+
+# Internal
+from app.db.postgresql import DataBase
+from app.internals.database import (
+    user_data_generation,
+    user_positions_generation,
+    user_sensors_generation,
+    user_behaviours_generation,
+)
+from app.models.user_feed.user import UserFeedInternal
+from .utils import generate_user_feed, open_connection, clean_up, timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def store_user_autocommit(user_feed: UserFeedInternal) -> None:
+    """Store a journey with one autocommit per statement, as store_user used to do"""
+    async with DataBase.pool.acquire() as conn:
+        await DataBase.insert_single_row(
+            user_data_generation(user_feed), conn, "user_data"
+        )
+        await DataBase.insert_multiple_rows(
+            user_positions_generation(
+                user_feed.trace_information, user_feed.journey_id, user_feed.startDate
+            ),
+            conn,
+            "user_positions",
+        )
+        await DataBase.insert_multiple_rows(
+            user_sensors_generation(
+                user_feed.sensors_information, user_feed.journey_id, user_feed.startDate
+            ),
+            conn,
+            "user_sensors",
+        )
+        await DataBase.insert_multiple_rows(
+            user_behaviours_generation(
+                user_feed.behaviour,
+                user_feed.journey_id,
+                user_feed.startDate,
+                user_feed.source_app,
+            ),
+            conn,
+            "user_behaviours",
+        )
+
+
+async def run(store, user_feeds: List[UserFeedInternal], concurrency: int) -> None:
+    """Store every journey using at most concurrency connections at the same time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def store_one(user_feed: UserFeedInternal):
+        async with semaphore:
+            await store(user_feed)
+
+    await asyncio.gather(*(store_one(user_feed) for user_feed in user_feeds))
+
+
+async def main(journeys: int, points: int, sensors: int, concurrency: int) -> None:
+    conn = await open_connection()
+    await DataBase.connect()
+    try:
+        for title, store in (
+            ("autocommit per statement", store_user_autocommit),
+            ("store_user single transaction", DataBase.store_user),
+        ):
+            user_feeds = [
+                UserFeedInternal.parse_obj(generate_user_feed(points, sensors))
+                for _ in range(journeys)
+            ]
+            with timer() as elapsed:
+                await run(store, user_feeds, concurrency)
+            report(title, journeys, elapsed[0], "journeys")
+
+            await clean_up(conn, [user_feed.journey_id for user_feed in user_feeds])
+    finally:
+        await DataBase.disconnect()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=200)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--sensors", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.points, args.sensors, args.concurrency))
@@ -0,0 +1,133 @@
+"""
+Benchmark of the tenant partitions
+
+Compare the latency of the extractions of every source_app on the journeys of the
+current month partitioned by month only against the same journeys list partitioned
+by source_app too. One source_app stores most of the journeys, the extractions of
+the smaller ones are those that stop reading its rows. The database is left in the
+tenant layout.
+
+    python3 -m benchmarks.tenant_partitions --journeys 100000 --tenants 5 --repeat 20
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+import time
+from typing import List
+
+# Third Party
+from asyncpg import Connection
+
+# Internal
+from app.config import get_database_settings
+from app.db.postgresql import DataBase
+from app.models.extraction.data_extraction.partial_mobility import PartialMobility
+from app.models.user_feed.user import UserFeedInternal
+from .utils import (
+    generate_user_feed,
+    open_connection,
+    clean_up,
+    timer,
+    report,
+    SOURCE_APP,
+)
+
+# ---------------------------------------------------------------------------------------------
+
+LARGEST_SHARE = 0.8
+"""Share of the journeys stored by the largest source_app"""
+
+
+async def extract(conn: Connection, tenants: List[str], repeat: int, layout: str):
+    """Extract the journeys of the last hour of every source_app"""
+    now = int(time.time() * 1000)
+    for tenant in tenants:
+        extraction = PartialMobility(
+            source_app=tenant,
+            company_code="BENCHMARK",
+            start_time=now - 3600_000,
+            start_time_high_threshold=3600_000,
+        )
+        # noinspection PyProtectedMember
+        query, args = extraction._query_select, extraction._query_args
+        rows = len(await conn.fetch(query, *args))
+        with timer() as elapsed:
+            for _ in range(repeat):
+                await conn.fetch(query, *args)
+        report(f"{layout} {tenant} ({rows} rows)", repeat, elapsed[0], "requests")
+
+
+async def main(journeys: int, tenants: int, repeat: int) -> None:
+    settings = get_database_settings()
+    settings.tenant_partitions = False
+    apps = [f"{SOURCE_APP}-{tenant}" for tenant in range(tenants)]
+    shares = [LARGEST_SHARE] + [(1 - LARGEST_SHARE) / (tenants - 1)] * (tenants - 1)
+
+    conn = await open_connection()
+    await DataBase.connect()
+    journey_ids = []
+    try:
+        for app, share in zip(apps, shares):
+            for start in range(0, int(journeys * share), 1000):
+                user_feeds = []
+                for _ in range(min(1000, int(journeys * share) - start)):
+                    user_feed = generate_user_feed(2, 0, 2)
+                    user_feed["source_app"] = app
+                    user_feed["startDate"] = int(time.time() * 1000) - 60_000
+                    user_feeds.append(UserFeedInternal.parse_obj(user_feed))
+                await DataBase.store_user_batch(user_feeds)
+                journey_ids.extend(user_feed.journey_id for user_feed in user_feeds)
+        await conn.execute('ANALYZE "user_data"; ANALYZE "user_behaviours";')
+        await extract(conn, apps, repeat, "month partitions")
+
+        # The months are list partitioned by source_app, the first journey of
+        # every source_app moves its rows to its partitions
+        await DataBase.disconnect()
+        settings.tenant_partitions = True
+        await DataBase.connect()
+        for app in apps:
+            user_feed = generate_user_feed(2, 0, 2)
+            user_feed["source_app"] = app
+            user_feed["startDate"] = int(time.time() * 1000) - 60_000
+            await DataBase.store_user_batch([UserFeedInternal.parse_obj(user_feed)])
+            journey_ids.append(user_feed["journey_id"])
+        await conn.execute('ANALYZE "user_data"; ANALYZE "user_behaviours";')
+        await extract(conn, apps, repeat, "tenant partitions")
+    finally:
+        await clean_up(conn, journey_ids)
+        for table in ("user_data_rollup", "user_behaviours_rollup"):
+            await conn.execute(
+                f'DELETE FROM "{table}" WHERE source_app = ANY($1::text[]);', apps
+            )
+        await DataBase.disconnect()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=100000)
+    parser.add_argument("--tenants", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.tenants, args.repeat))
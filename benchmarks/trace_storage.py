@@ -0,0 +1,122 @@
+"""
+Benchmark of the storage of the positions
+
+Compare the bytes/point, including the indexes, and the extraction points/s of
+the positions stored in user_positions and in the compressed user_traces.
+
+    python3 -m benchmarks.trace_storage --journeys 50 --points 5000
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import asyncio
+
+# Internal
+from app.db.postgresql import DataBase
+from app.db.constants import USER_POSITIONS_COLUMNS
+from app.internals.database import user_positions_generation, user_traces_generation
+from app.models.user_feed.position import TraceInformation
+from app.models.user_feed.user import UserFeedInternal
+from .utils import generate_user_feed, open_connection, timer, report
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def main(journeys: int, points: int) -> None:
+    # Create user_traces in a database created by a previous version
+    await DataBase.connect()
+    await DataBase.disconnect()
+
+    conn = await open_connection()
+    try:
+        # Session copies of the tables, so their size is only the benchmark one
+        await conn.execute(
+            """CREATE TEMPORARY TABLE "bench_positions" (LIKE "user_positions" INCLUDING ALL);
+            CREATE INDEX ON "bench_positions" (time, lat, lon, partial_distance);
+            CREATE TEMPORARY TABLE "bench_traces" (LIKE "user_traces" INCLUDING ALL);"""
+        )
+        user_feeds = [
+            UserFeedInternal.parse_obj(generate_user_feed(points, 1))
+            for _ in range(journeys)
+        ]
+        journey_ids = [user_feed.journey_id for user_feed in user_feeds]
+        total = journeys * points
+
+        with timer() as elapsed:
+            for user_feed in user_feeds:
+                await conn.copy_records_to_table(
+                    "bench_positions",
+                    records=user_positions_generation(
+                        user_feed.trace_information,
+                        user_feed.journey_id,
+                        user_feed.startDate,
+                    ),
+                    columns=USER_POSITIONS_COLUMNS,
+                )
+        report("store user_positions", total, elapsed[0], "points")
+
+        with timer() as elapsed:
+            await conn.copy_records_to_table(
+                "bench_traces",
+                records=[
+                    user_traces_generation(
+                        user_feed.trace_information, user_feed.journey_id
+                    )
+                    for user_feed in user_feeds
+                ],
+            )
+        report("store user_traces", total, elapsed[0], "points")
+
+        for table in ("bench_positions", "bench_traces"):
+            await conn.execute(f'VACUUM ANALYZE "{table}";')
+            size = await conn.fetchval(f"SELECT pg_total_relation_size('{table}');")
+            print(f"{'size ' + table:<40} {size / total:>10.1f} bytes/point")
+
+        with timer() as elapsed:
+            rows = await conn.fetch(
+                """SELECT journey_id, time, authenticity, lat, lon, partial_distance
+                FROM "bench_positions" WHERE journey_id = ANY($1::text[]);""",
+                journey_ids,
+            )
+        report("extract user_positions", len(rows), elapsed[0], "points")
+
+        with timer() as elapsed:
+            traces = [
+                TraceInformation.decode(record["trace"])
+                for record in await conn.fetch(
+                    """SELECT trace FROM "bench_traces"
+                    WHERE journey_id = ANY($1::text[]);""",
+                    journey_ids,
+                )
+            ]
+        report("extract user_traces", sum(map(len, traces)), elapsed[0], "points")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=50)
+    parser.add_argument("--points", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.journeys, args.points))
@@ -0,0 +1,134 @@
+"""
+Benchmark of the parsing of a large journey
+
+Compare, for every request, the peak RSS and the CPU time needed to convert a
+journey in rows by /user/store, that builds a model for every position and
+sensor information, and by /user/store/stream, that converts them chunk by chunk.
+Every request is parsed in a new process, so its peak RSS isn't hidden by the
+previous ones.
+
+    python3 -m benchmarks.user_feed_parsing --points 50000 --sensors 50000
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+
+# Third Party
+import orjson
+
+# Internal
+from app.config import get_ingest_settings
+from app.dependencies.stream_reader import UserFeedStreamReader
+from app.internals.database import (
+    user_rows_generation,
+    user_data_stream_generation,
+    user_behaviours_generation,
+    rows_chunks_generation,
+    position_row_generation,
+    sensor_row_generation,
+)
+from app.models.user_feed.user import UserFeedInternal
+from .utils import generate_user_feed
+
+# ---------------------------------------------------------------------------------------------
+
+
+def parse_models(body: bytes) -> int:
+    """Decode the body as FastApi does and build the rows of the whole journey"""
+    user_feed = UserFeedInternal.parse_obj(json.loads(body))
+    user_rows = user_rows_generation([user_feed])
+    return sum(len(rows) for rows in user_rows.values())
+
+
+def parse_stream(body: bytes) -> int:
+    """Decode the body as /user/store/stream does and build the rows chunk by chunk"""
+    user_feed = UserFeedStreamReader.parse(orjson.loads(bytearray(body)))
+    chunk_rows = get_ingest_settings().stream_chunk_rows
+
+    user_data_stream_generation(user_feed)
+    rows = 1 + len(
+        user_behaviours_generation(
+            user_feed.behaviour,
+            user_feed.journey_id,
+            user_feed.startDate,
+            user_feed.source_app,
+        )
+    )
+    for elements, row_generation in (
+        (user_feed.trace_information, position_row_generation),
+        (user_feed.sensors_information, sensor_row_generation),
+    ):
+        for chunk in rows_chunks_generation(
+            elements,
+            row_generation,
+            user_feed.journey_id,
+            user_feed.startDate,
+            chunk_rows,
+            "benchmark",
+        ):
+            rows += len(chunk)
+    return rows
+
+
+def measure(parse, body: bytes, results: multiprocessing.Queue) -> None:
+    """Parse the body measuring CPU time and peak RSS"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_start = time.process_time()
+    rows = parse(body)
+    cpu = time.process_time() - cpu_start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    results.put((rows, cpu, rss * 1024))
+
+
+def main(points: int, sensors: int, requests: int) -> None:
+    body = orjson.dumps(generate_user_feed(points, sensors))
+    print(f"body {len(body) / 2 ** 20:.1f} MiB")
+
+    context = multiprocessing.get_context("fork")
+    for title, parse in (
+        ("/user/store models", parse_models),
+        ("/user/store/stream chunks", parse_stream),
+    ):
+        for _ in range(requests):
+            results = context.Queue()
+            process = context.Process(target=measure, args=(parse, body, results))
+            process.start()
+            rows, cpu, rss = results.get()
+            process.join()
+            print(
+                f"{title:<30} {rows:>10} rows {cpu:>8.3f} s CPU "
+                f"{rss / 2 ** 20:>8.1f} MiB peak RSS"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--points", type=int, default=50000)
+    parser.add_argument("--sensors", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=3)
+    args = parser.parse_args()
+    main(args.points, args.sensors, args.requests)
@@ -0,0 +1,212 @@
+"""
+Benchmarks utilities
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+# Third Party
+from asyncpg import connect, Connection
+from fastuuid import uuid4
+
+# Internal
+from app.config import get_database_settings
+from app.db.postgresql import get_database
+from app.internals.logger import get_logger
+
+# ---------------------------------------------------------------------------------------------
+
+START_DATE = 1611819619151
+"""UTC timestamp in ms of the first generated position"""
+
+SOURCE_APP = "benchmark"
+"""Source app of the generated journeys, used to clean up the database"""
+
+
+def generate_user_feed(
+    points: int = 1000, sensors: int = 1000, segments: int = 4
+) -> dict:
+    """
+    Generate a synthetic journey compatible with UserFeedInternal
+
+    :param points: number of positions in trace_information
+    :param sensors: number of samples in sensors_information
+    :param segments: number of user defined behaviours
+    :return: journey as a dict
+    """
+    trace_information = [
+        {
+            "authenticity": random.choice((-1, 0, 1)),
+            # GPS receivers report 7 decimals
+            "lat": round(45.07 + random.random() / 100, 7),
+            "lon": round(7.47 + random.random() / 100, 7),
+            "partialDistance": pos * 10,
+            "time": START_DATE + pos * 1000,
+        }
+        for pos in range(points)
+    ]
+    sensors_information = [
+        {
+            "data": {"x": random.random(), "y": random.random(), "z": random.random()}
+            if pos % 2
+            else {
+                "azimut": random.random(),
+                "pitch": random.random(),
+                "roll": random.random(),
+            },
+            "name": "accelerometer" if pos % 2 else "orientation",
+            "time": START_DATE + pos * 100,
+        }
+        for pos in range(sensors)
+    ]
+    step = max(points // segments, 1)
+    user_defined = [
+        {
+            "start": trace_information[pos],
+            "end": trace_information[min(pos + step, points) - 1],
+            "meters": step * 10,
+            "type": random.choice(("walk", "bicycle", "bus", "car")),
+        }
+        for pos in range(0, points, step)
+    ][:segments]
+
+    return {
+        "source_app": SOURCE_APP,
+        "journey_id": str(uuid4()),
+        "behaviour": {
+            "app_defined": [],
+            "tpv_defined": [],
+            "user_defined": user_defined,
+        },
+        "company_code": "BENCHMARK",
+        "company_trip_type": "private",
+        "distance": points * 10,
+        "elapsedTime": time.strftime("%H:%M:%S", time.gmtime(points)),
+        "endDate": START_DATE + points * 1000,
+        "id": str(uuid4()),
+        "mainTypeSpace": "bicycle",
+        "mainTypeTime": "bicycle",
+        "sensors_information": sensors_information,
+        "startDate": START_DATE,
+        "trace_information": trace_information,
+    }
+
+
+def generate_iot_feed() -> dict:
+    """
+    Generate a synthetic observation compatible with IotInput
+
+    :return: observation as a dict
+    """
+    result_time = time.strftime(
+        "%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(START_DATE / 1000 + random.random())
+    )
+    return {
+        "resultTime": result_time,
+        "Datastream": {"@iot.id": 5},
+        "FeatureOfInterest": {"@iot.id": 1},
+        "phenomenonTime": result_time,
+        "result": {
+            "authenticity": random.choice((-1, 0, 1)),
+            "valueType": "NO2",
+            "Position": {
+                "type": "Point",
+                "coordinate": [
+                    45.07 + random.random() / 100,
+                    7.47 + random.random() / 100,
+                ],
+            },
+            "response": {"value": random.random() * 100},
+        },
+        "observationGEPid": f"{SOURCE_APP}-{uuid4()}",
+    }
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+async def open_connection() -> Connection:
+    """
+    Make sure that the database exists and open a dedicated connection to it
+    """
+    get_logger().disabled = True
+    database = get_database()
+    await database.connect()
+    await database.disconnect()
+
+    settings = get_database_settings()
+    return await connect(
+        user=settings.postgres_user,
+        password=settings.postgres_pwd,
+        database=settings.postgres_db,
+        host=settings.postgres_host,
+        port=settings.postgres_port,
+    )
+
+
+async def clean_up(conn: Connection, journey_ids: List[str]) -> None:
+    """
+    Remove the journeys, their rollups and the observations stored by a benchmark
+
+    :param conn: connection to the database
+    :param journey_ids: journeys to remove
+    """
+    await conn.execute(
+        f"""DELETE FROM "iot_data" WHERE observation_gep_id LIKE '{SOURCE_APP}-%';"""
+    )
+    for table in ("user_positions", "user_sensors", "user_behaviours", "user_data"):
+        await conn.execute(
+            f'DELETE FROM "{table}" WHERE journey_id = ANY($1::text[]);', journey_ids
+        )
+    for table in ("user_data_rollup", "user_behaviours_rollup"):
+        await conn.execute(f'DELETE FROM "{table}" WHERE source_app = $1;', SOURCE_APP)
+
+
+@contextmanager
+def timer() -> Iterator[List[float]]:
+    """
+    Measure the wall time of the enclosed block, the result is appended to the
+    yielded list
+    """
+    elapsed = []
+    start = time.perf_counter()
+    yield elapsed
+    elapsed.append(time.perf_counter() - start)
+
+
+def report(title: str, rows: int, elapsed: float, unit: str = "rows") -> None:
+    """
+    Print the throughput of a benchmark
+
+    :param title: name of the benchmark
+    :param rows: number of processed elements
+    :param elapsed: seconds needed to process them
+    :param unit: name of the processed elements
+    """
+    print(
+        f"{title:<40} {rows:>10} {unit} {elapsed:>10.3f} s "
+        f"{rows / elapsed:>14.0f} {unit}/s"
+    )
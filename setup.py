@@ -1,6 +1,6 @@
 
 """
-Building app.utilities.haversine module
+Building app.utilities.haversine and app.models.user_feed.trace_codec modules
 
 :author: Angelo Cutaia
 :copyright: Copyright 2021, LINKS Foundation
@@ -30,7 +30,11 @@ ext_modules = [
     Extension(
         "app.models.extraction.position_alteration_detection",  # location of the resulting .so
         ["app/models/extraction/position_alteration_detection.pyx"],
-    )
+    ),
+    Extension(
+        "app.models.user_feed.trace_codec",
+        ["app/models/user_feed/trace_codec.pyx"],
+    ),
 ]
 
 
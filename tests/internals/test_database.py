@@ -0,0 +1,231 @@
+"""
+Test Database rows generation
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Test
+import pytest
+
+# Third Party
+from fastapi import HTTPException
+import orjson
+from pydantic import ValidationError
+
+# Internal
+from app.internals.database import (
+    partial_mobility_format,
+    position_row_generation,
+    sensor_row_generation,
+    sensor_typed_row_generation,
+    rows_chunks_generation,
+    user_sensors_generation,
+)
+from app.models.user_feed.position import PositionObject
+from app.models.user_feed.sensor import (
+    sensor_data_decode,
+    SensorInformation,
+    SensorKind,
+)
+
+# ----------------------------------------------------------------------------------------
+
+POSITIONS = [
+    {"authenticity": 1, "lat": 45.07, "lon": 7.47, "partialDistance": 10, "time": 1},
+    # Values converted by the model
+    {"authenticity": "0", "lat": 45, "lon": "7.47", "partialDistance": 1.0, "time": 2},
+    {
+        "authenticity": True,
+        "lat": 45.0,
+        "lon": 7.0,
+        "partialDistance": False,
+        "time": 3,
+    },
+    # Ignored extra values
+    {
+        "authenticity": -1,
+        "lat": 4.5,
+        "lon": 7.4,
+        "partialDistance": 1,
+        "time": 4,
+        "x": 1,
+    },
+]
+
+SENSORS = [
+    {"data": {"x": 0.5, "y": 1.5, "z": 8.5}, "name": "accelerometer", "time": 1},
+    {
+        "data": {"azimut": 0.5, "pitch": 1.5, "roll": 8.5},
+        "name": "orientation",
+        "time": 2,
+    },
+    # Values converted by the model
+    {
+        "data": {"x": 0, "y": "1", "z": 8.5, "roll": 1.0},
+        "name": "accelerometer",
+        "time": 3,
+    },
+    {
+        "data": {"x": None, "azimut": 1, "pitch": 1.5, "roll": 8.5},
+        "name": 5,
+        "time": "4",
+    },
+]
+
+
+class TestRowsGeneration:
+    def test_position_row_generation(self):
+        # The same rows of the models
+        assert [
+            position_row_generation(position, "journey", 7) for position in POSITIONS
+        ] == [
+            (
+                "journey",
+                7,
+                position.time,
+                position.authenticity,
+                position.lat,
+                position.lon,
+                position.partialDistance,
+            )
+            for position in map(PositionObject.parse_obj, POSITIONS)
+        ]
+
+        for position in (
+            None,
+            {
+                "authenticity": 2,
+                "lat": 45.07,
+                "lon": 7.47,
+                "partialDistance": 1,
+                "time": 1,
+            },
+            {
+                "authenticity": 1,
+                "lat": "north",
+                "lon": 7.47,
+                "partialDistance": 1,
+                "time": 1,
+            },
+            {"authenticity": 1, "lat": 45.07, "partialDistance": 1, "time": 1},
+        ):
+            with pytest.raises(ValidationError):
+                position_row_generation(position, "journey", 7)
+
+    def test_sensor_row_generation(self):
+        # The same rows of the models
+        assert [
+            sensor_row_generation(sensor, "journey", 7) for sensor in SENSORS
+        ] == user_sensors_generation(
+            [SensorInformation.parse_obj(sensor) for sensor in SENSORS], "journey", 7
+        )
+
+        for sensor in (
+            [],
+            {"data": {"x": 0.5, "y": 1.5}, "name": "accelerometer", "time": 1},
+            {"data": {"x": 0.5, "y": 1.5, "z": 8.5}, "name": "accelerometer"},
+        ):
+            with pytest.raises(ValidationError):
+                sensor_row_generation(sensor, "journey", 7)
+
+    def test_sensor_typed_row_generation(self):
+        rows = [sensor_typed_row_generation(sensor, "journey", 7) for sensor in SENSORS]
+        assert rows[0] == (
+            "journey",
+            7,
+            1,
+            "accelerometer",
+            SensorKind.position,
+            0.5,
+            1.5,
+            8.5,
+        )
+        assert rows[3] == (
+            "journey",
+            7,
+            4,
+            "5",
+            SensorKind.orientation,
+            1.0,
+            1.5,
+            8.5,
+        )
+
+        # Decoded as the jsonb rows
+        assert [
+            (
+                "journey",
+                7,
+                time,
+                name,
+                orjson.dumps(sensor_data_decode(*values)).decode(),
+            )
+            for _, _, time, name, *values in rows
+        ] == [sensor_row_generation(sensor, "journey", 7) for sensor in SENSORS]
+
+        with pytest.raises(ValidationError):
+            sensor_typed_row_generation(
+                {"data": {}, "name": "x", "time": 1}, "journey", 7
+            )
+
+    def test_rows_chunks_generation(self):
+        positions = list(POSITIONS)
+        chunks = list(
+            rows_chunks_generation(
+                positions, position_row_generation, "journey", 7, 3, "trace_information"
+            )
+        )
+        assert [len(chunk) for chunk in chunks] == [3, 1]
+        # The converted elements are released
+        assert positions == [None] * len(POSITIONS)
+
+        positions = [POSITIONS[0], {**POSITIONS[0], "lat": "north"}]
+        with pytest.raises(HTTPException) as error:
+            list(
+                rows_chunks_generation(
+                    positions,
+                    position_row_generation,
+                    "journey",
+                    7,
+                    3,
+                    "trace_information",
+                )
+            )
+        assert error.value.status_code == 422
+        assert error.value.detail[0]["loc"] == ("trace_information", 1, "lat")
+
+    def test_partial_mobility_format(self):
+        records = [
+            {"journey_id": "a", "type": "walk", "mode": 1, "meters": 10},
+            {"journey_id": "b", "type": "bus", "mode": 2, "meters": 20},
+            {"journey_id": "a", "type": "bicycle", "mode": 3, "meters": 10},
+        ]
+        assert partial_mobility_format(records) == [
+            {"type": ["walk", "bicycle"], "mode": 1, "meters": 10},
+            {"type": ["bus"], "mode": 2, "meters": 20},
+        ]
+        # The records aren't modified
+        assert records[0] == {
+            "journey_id": "a",
+            "type": "walk",
+            "mode": 1,
+            "meters": 10,
+        }
@@ -0,0 +1,127 @@
+"""
+Test extraction cache package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import time
+
+# Internal
+from app.dependencies.query_builder import Query
+from app.internals.extraction_cache import ExtractionCache
+from app.models.track import RequestType
+
+# ----------------------------------------------------------------------------------------
+
+TENANT = ("travis", "")
+OTHER_TENANT = ("travis", "COMPANY")
+
+
+def extraction(request: RequestType, args: tuple = ()) -> Query:
+    """Query of an extraction"""
+    return Query.construct(
+        request=request,
+        query="SELECT 1;",
+        args=args,
+        query_traces=None,
+        labels=None,
+    )
+
+
+def cache_with(budget: int, ttl: float = 60.0) -> ExtractionCache:
+    """Cache started without listening to the invalidations"""
+    cache = ExtractionCache()
+    cache.budget = budget
+    cache.ttl = ttl
+    return cache
+
+
+class TestExtractionCache:
+    def test_key(self):
+        key = ExtractionCache.key(extraction(RequestType.stats_num_tracks, ("a", 1)))
+        assert key == ExtractionCache.key(
+            extraction(RequestType.stats_num_tracks, ("a", 1))
+        )
+        assert key != ExtractionCache.key(
+            extraction(RequestType.stats_num_tracks, ("a", 2))
+        )
+        assert key != ExtractionCache.key(
+            extraction(RequestType.stats_avg_space, ("a", 1))
+        )
+
+    def test_lru(self):
+        cache = cache_with(budget=30)
+        for key in (b"a", b"b", b"c"):
+            cache.put(key, TENANT, b"012345678", cache.generation(TENANT))
+        assert cache.get(b"a") == b"012345678"
+
+        # b is the least recently used
+        cache.put(b"d", TENANT, b"012345678", cache.generation(TENANT))
+        assert cache.get(b"b") is None
+        assert cache.get(b"a") is not None
+        assert cache.size == 30
+
+        # An entry larger than the budget isn't cached
+        cache.put(b"e", TENANT, b"0" * 30, cache.generation(TENANT))
+        assert cache.get(b"e") is None
+
+        stats = cache.stats()
+        assert stats["entries"] == 3
+        assert stats["hits"] == 2
+        assert stats["misses"] == 2
+        assert stats["evictions"] == 1
+
+    def test_ttl(self):
+        cache = cache_with(budget=100, ttl=0.05)
+        cache.put(b"a", TENANT, b"result", cache.generation(TENANT))
+        assert cache.get(b"a") == b"result"
+
+        time.sleep(0.1)
+        assert cache.get(b"a") is None
+        assert cache.stats()["expirations"] == 1
+        assert cache.size == 0
+
+    def test_invalidate(self):
+        cache = cache_with(budget=100)
+        cache.put(b"a", TENANT, b"result", cache.generation(TENANT))
+        cache.put(b"b", TENANT, b"result", cache.generation(TENANT))
+        cache.put(b"c", OTHER_TENANT, b"result", cache.generation(OTHER_TENANT))
+
+        cache.invalidate([TENANT])
+        assert cache.get(b"a") is None
+        assert cache.get(b"b") is None
+        assert cache.get(b"c") == b"result"
+        assert cache.stats()["invalidations"] == 2
+
+        # A result extracted before an invalidation isn't cached
+        generation = cache.generation(TENANT)
+        cache.invalidate([TENANT])
+        cache.put(b"a", TENANT, b"stale", generation)
+        assert cache.get(b"a") is None
+        assert cache.stats()["discarded"] == 1
+
+        # Clearing the cache discards the results being extracted as well
+        generation = cache.generation(OTHER_TENANT)
+        cache.clear()
+        cache.put(b"c", OTHER_TENANT, b"stale", generation)
+        assert cache.get(b"c") is None
+        assert cache.size == 0
@@ -0,0 +1,50 @@
+"""
+Test page cursor package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Test
+import pytest
+
+# Internal
+from app.internals.page_cursor import decode_page_cursor, encode_page_cursor
+
+# ----------------------------------------------------------------------------------------
+
+KEY = (1611819579051, "journey-id")
+
+
+class TestPageCursor:
+    def test_round_trip(self):
+        cursor = encode_page_cursor(KEY)
+        assert decode_page_cursor(cursor) == KEY
+
+        # Opaque cursors, every one with its own nonce
+        assert "journey-id" not in cursor
+        assert encode_page_cursor(KEY) != cursor
+
+    def test_invalid_cursor(self):
+        cursor = encode_page_cursor(KEY)
+        tampered = cursor[:30] + ("A" if cursor[30] != "A" else "B") + cursor[31:]
+        for invalid in (tampered, cursor[:-4], "", "not a cursor", "AAAA"):
+            with pytest.raises(ValueError):
+                decode_page_cursor(invalid)
@@ -0,0 +1,105 @@
+"""
+Test pseudonyms package
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import uuid
+
+# Internal
+from app.config import get_pseudonym_settings, PseudonymScope
+from app.dependencies.query_builder import Query
+from app.internals.pseudonyms import (
+    extraction_pseudonym_key,
+    JourneyPseudonyms,
+    pseudonym_epoch,
+    pseudonym_key,
+)
+from app.models.track import RequestType
+
+# ----------------------------------------------------------------------------------------
+
+RECORDS = [
+    {"journey_id": "a", "time": 1},
+    {"journey_id": "b", "time": 2},
+    {"journey_id": "a", "time": 3},
+]
+
+
+def records() -> list:
+    return [dict(record) for record in RECORDS]
+
+
+def extraction(**fields) -> Query:
+    return Query(
+        **{
+            "request": RequestType.all_positions,
+            "query": "SELECT",
+            "args": ("travis", 1),
+            "source_app": "travis",
+            "company_code": "TEST",
+            **fields,
+        }
+    )
+
+
+class TestPseudonyms:
+    def test_journey_pseudonyms(self):
+        rows = JourneyPseudonyms(b"key")(records())
+        assert [row["time"] for row in rows] == [1, 2, 3]
+        # Every journey has its own pseudonym, formatted as a UUID
+        assert rows[0]["journey_id"] == rows[2]["journey_id"]
+        assert rows[0]["journey_id"] != rows[1]["journey_id"]
+        assert str(uuid.UUID(rows[0]["journey_id"])) == rows[0]["journey_id"]
+
+        # The same key derives the same pseudonyms, another key other ones
+        assert JourneyPseudonyms(b"key")(records()) == rows
+        assert JourneyPseudonyms(b"other")(records())[0] != rows[0]
+        # Without a key the pseudonyms are random
+        assert JourneyPseudonyms()(records()) != JourneyPseudonyms()(records())
+
+        # The following batches keep the pseudonyms
+        pseudonyms = JourneyPseudonyms(b"key")
+        assert pseudonyms(records()[:1]) + pseudonyms(records()[1:]) == rows
+
+    def test_extraction_pseudonym_key(self):
+        settings = get_pseudonym_settings()
+        scope, rotation = settings.pseudonym_scope, settings.pseudonym_rotation
+        try:
+            settings.pseudonym_scope = PseudonymScope.request
+            key = extraction_pseudonym_key(extraction())
+            assert key == extraction_pseudonym_key(extraction())
+            # Every request has its own key
+            assert key != extraction_pseudonym_key(extraction(args=("travis", 2)))
+            # The key rotates with the epoch
+            assert pseudonym_key(b"scope", 1) == pseudonym_key(b"scope", 1)
+            assert pseudonym_key(b"scope", 1) != pseudonym_key(b"scope", 2)
+
+            settings.pseudonym_scope = PseudonymScope.consumer
+            key = extraction_pseudonym_key(extraction())
+            assert key == extraction_pseudonym_key(extraction(args=("travis", 2)))
+            assert key != extraction_pseudonym_key(extraction(company_code="OTHER"))
+
+            settings.pseudonym_rotation = 0
+            assert pseudonym_epoch() == 0
+        finally:
+            settings.pseudonym_scope, settings.pseudonym_rotation = scope, rotation
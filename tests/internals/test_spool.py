@@ -0,0 +1,109 @@
+"""
+Test Spool
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import asyncio
+import os
+import zlib
+
+# Internal
+from app.config import get_ingest_settings
+from app.internals.spool import read_records, RecordKind, RECORD_HEADER, Spool
+
+# ----------------------------------------------------------------------------------------
+
+
+def record(kind: RecordKind, payload: bytes, appended_at: int = 0) -> bytes:
+    """Serialize a spool record"""
+    return (
+        RECORD_HEADER.pack(len(payload), zlib.crc32(payload), appended_at, kind)
+        + payload
+    )
+
+
+class TestSpool:
+    def test_read_records(self):
+        first = record(RecordKind.user, b'{"journey_id": "1"}', 1)
+        second = record(RecordKind.iot, b'{"observationGEPid": "2"}', 2)
+        segment = first + second
+
+        assert list(read_records(segment)) == [
+            (len(first), RecordKind.user, 1, b'{"journey_id": "1"}'),
+            (len(segment), RecordKind.iot, 2, b'{"observationGEPid": "2"}'),
+        ]
+        assert list(read_records(segment, len(first))) == [
+            (len(segment), RecordKind.iot, 2, b'{"observationGEPid": "2"}')
+        ]
+
+        # A truncated record ends the segment
+        assert len(list(read_records(segment[:-1]))) == 1
+        assert len(list(read_records(segment + second[:5]))) == 2
+
+        # A corrupted record ends the segment
+        corrupted = bytearray(segment)
+        corrupted[-1] ^= 0xFF
+        assert len(list(read_records(bytes(corrupted)))) == 1
+
+    def test_append(self, tmp_path):
+        settings = get_ingest_settings()
+        settings.spool = True
+        settings.spool_directory = str(tmp_path)
+        settings.spool_segment_size = 2 * RECORD_HEADER.size + 10
+        settings.spool_replay_interval = 3600
+
+        async def append():
+            spool = Spool()
+            other = Spool()
+            await spool.start()
+            await other.start()
+            # Every worker uses its own slot
+            assert spool.directory != other.directory
+
+            await asyncio.gather(
+                *(spool.append(RecordKind.user, b"%05d" % i) for i in range(3))
+            )
+            assert spool.stats()["appended_records"] == 3
+
+            await spool.stop()
+            await other.stop()
+            return spool.directory
+
+        try:
+            directory = asyncio.run(append())
+        finally:
+            settings.spool = False
+            settings.spool_directory = "spool"
+            settings.spool_segment_size = 64 * 1024 * 1024
+            settings.spool_replay_interval = 5.0
+
+        # Two records fit in a segment
+        segments = Spool.segments(directory)
+        assert segments == [0, 1]
+
+        payloads = []
+        for segment in segments:
+            with open(Spool.segment_path(directory, segment), "rb") as file:
+                payloads += [payload for *_, payload in read_records(file.read())]
+        assert payloads == [b"00000", b"00001", b"00002"]
+        assert sorted(os.listdir(tmp_path)) == ["worker-0", "worker-1"]
@@ -30,6 +30,7 @@ from pydantic import ValidationError
 
 # Internal
 from app.models.extraction.data_extraction.all_positions import AllPositions
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -47,10 +48,16 @@ class TestAllPositions:
             start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_start_time_extraction
-            == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+        assert data._query_start_time_extraction == SqlFragment(
+            "start_date BETWEEN {} AND {}",
+            (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
         )
+        # The rows of the journeys are read only from the partitions of the starting
+        # time, both queries bind the same arguments
+        assert "nested_pos.start_date BETWEEN $5 AND $6" in data._query_select
+        assert "nested_behaviour.start_date BETWEEN $5 AND $6" in data._query_select
+        assert "nested_behaviour.start_date BETWEEN $5 AND $6" in data._query_traces
+        assert data._query_args[-3:-1] == data._query_args[2:4]
         # Both value must be set or unset
         with pytest.raises(ValidationError):
             AllPositions(source_app="travis", start_time=START_TIME)
@@ -60,6 +67,15 @@ class TestAllPositions:
                 source_app="travis", start_time_high_threshold=START_TIME_HIGH_THRESHOLD
             )
 
+    def test_tenant_partitions(self):
+        data = AllPositions(source_app="travis", company_code=COMPANY_CODE)
+
+        # The behaviours are read only from the partitions of the source_app, both
+        # queries bind the same argument of the journeys
+        assert "nested_behaviour.source_app = $3" in data._query_select
+        assert "nested_behaviour.source_app = $3" in data._query_traces
+        assert data._query_args == ("travis", COMPANY_CODE, "travis")
+
     def test_end_time_extraction(self):
         data = AllPositions(
             source_app="travis",
@@ -67,9 +83,9 @@ class TestAllPositions:
             end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_end_time_extraction
-            == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+        assert data._query_end_time_extraction == SqlFragment(
+            "end_date BETWEEN {} AND {}",
+            (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -129,9 +145,9 @@ class TestAllPositions:
             company_code=COMPANY_CODE,
             company_trip_type=COMPANY_TRIP_TYPE,
         )
-        assert (
-            data._query_company_extraction
-            == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+        assert data._query_company_extraction == SqlFragment(
+            "source_app = {} AND company_code = {} AND company_trip_type = {}",
+            ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
         )
 
     def test_type_detection_extraction(self):
@@ -140,11 +156,13 @@ class TestAllPositions:
             type_mobility=TYPE_MOBILITY,
             type_detection=TYPE_DETECTION,
         )
-        assert f"""'{TYPE_MOBILITY}' = "type" AND """ in data._query_external
+        assert '= "type" AND $' in data._query_select
+        assert data._query_args[-3:-1] == (TYPE_MOBILITY, TYPE_DETECTION)
         assert data._query_type_detection_extraction
 
         data = AllPositions(source_app="travis", type_mobility=TYPE_MOBILITY)
-        assert f"""'{TYPE_MOBILITY}' = "type" """ in data._query_external
+        assert '= "type"' in data._query_select
+        assert data._query_args[-2] == TYPE_MOBILITY
         assert data._query_type_detection_extraction is None
 
         data = AllPositions(source_app="travis", type_detection=TYPE_DETECTION)
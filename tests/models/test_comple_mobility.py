@@ -30,6 +30,7 @@ from pydantic import ValidationError
 
 # Internal
 from app.models.extraction.data_extraction.complete_mobility import CompleteMobility
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -47,9 +48,9 @@ class TestCompleteMobility:
             start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_start_time_extraction
-            == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+        assert data._query_start_time_extraction == SqlFragment(
+            "start_date BETWEEN {} AND {}",
+            (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -67,9 +68,9 @@ class TestCompleteMobility:
             end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_end_time_extraction
-            == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+        assert data._query_end_time_extraction == SqlFragment(
+            "end_date BETWEEN {} AND {}",
+            (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -125,9 +126,9 @@ class TestCompleteMobility:
             company_code=COMPANY_CODE,
             company_trip_type=COMPANY_TRIP_TYPE,
         )
-        assert (
-            data._query_company_extraction
-            == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+        assert data._query_company_extraction == SqlFragment(
+            "source_app = {} AND company_code = {} AND company_trip_type = {}",
+            ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
         )
 
     def test_type_detection_extraction(self):
@@ -136,12 +137,41 @@ class TestCompleteMobility:
             type_mobility=TYPE_MOBILITY,
             type_detection=TYPE_DETECTION,
         )
-        assert f"""'{TYPE_MOBILITY}' = "type" AND """ in data._query_external
+        assert '= "type" AND $' in data._query_select
+        assert data._query_args[-2:] == (TYPE_MOBILITY, TYPE_DETECTION)
         assert data._query_type_detection_extraction
 
         data = CompleteMobility(source_app="travis", type_mobility=TYPE_MOBILITY)
-        assert f"""'{TYPE_MOBILITY}' = "type" """ in data._query_external
+        assert '= "type"' in data._query_select
+        assert data._query_args[-1] == TYPE_MOBILITY
         assert data._query_type_detection_extraction is None
 
         data = CompleteMobility(source_app="travis", type_detection=TYPE_DETECTION)
         assert data._query_type_detection_extraction
+
+    def test_page_extraction(self):
+        data = CompleteMobility(source_app="travis", page_size=10)
+        assert "ORDER BY start_date, journey_id LIMIT $3" in data._query_select
+        # The behaviours are read only from the partitions of the source_app
+        assert '"user_behaviours".source_app = $4' in data._query_select
+        assert data._query_args == ("travis", "", 10, "travis")
+        assert data._query_page_args == ("travis", "", 11)
+        assert data._query_page_extraction is None
+
+        data = CompleteMobility(
+            source_app="travis", page_size=10, page_after=(START_TIME, "journey")
+        )
+        assert data._query_page_extraction == SqlFragment(
+            "(start_date, journey_id) > ({}, {})", (START_TIME, "journey")
+        )
+        assert data._query_args == ("travis", "", START_TIME, "journey", 10, "travis")
+        assert data._query_page_args == ("travis", "", START_TIME, "journey", 11)
+
+        # Not paged
+        data = CompleteMobility(source_app="travis")
+        assert "LIMIT" not in data._query_select
+        assert data._query_page is None
+
+        # A page follows another only with its size
+        with pytest.raises(ValidationError):
+            CompleteMobility(source_app="travis", page_after=(START_TIME, "journey"))
@@ -0,0 +1,72 @@
+"""
+Test grid cells
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Internal
+from app.models.extraction.grid import (
+    grid_cells,
+    grid_cover,
+    GRID_LEVELS,
+    MAX_COVER_CELLS,
+)
+from app.models.extraction.position_alteration_detection import reversed_haversine
+from .constants import *
+
+# ----------------------------------------------------------------------------------------
+
+
+class TestGrid:
+    def test_cells(self):
+        cells = grid_cells(START_LAT, START_LON)
+        assert [cell >> 48 for cell in cells] == list(GRID_LEVELS)
+        # Every cell is inside the cell of the coarser levels
+        for (level, cell), (finer_level, finer_cell) in zip(
+            zip(GRID_LEVELS, cells), zip(GRID_LEVELS[1:], cells[1:])
+        ):
+            shift = finer_level - level
+            assert (finer_cell >> 24 & 0xFFFFFF) >> shift == cell >> 24 & 0xFFFFFF
+            assert (finer_cell & 0xFFFFFF) >> shift == cell & 0xFFFFFF
+
+        # The boundaries of the world are in the cells of the borders
+        assert grid_cells(90, 180) == grid_cells(89.9999999, 179.9999999)
+        assert grid_cells(None, START_LON) is None
+
+    def test_cover(self):
+        for radius in (100, 1000, START_RADIUS, 20000):
+            lat0, lat1, lon0, lon1 = reversed_haversine(START_LAT, START_LON, radius)
+            cover = grid_cover(lat0, lat1, lon0, lon1)
+            assert len(cover) <= MAX_COVER_CELLS
+            # The corners and the center of the box are covered
+            for lat, lon in (
+                (lat0, lon0),
+                (lat1, lon1),
+                (lat0, lon1),
+                (lat1, lon0),
+                (START_LAT, START_LON),
+            ):
+                assert set(grid_cells(lat, lon)) & set(cover)
+
+        # The smaller the box the finer the level
+        small = grid_cover(*reversed_haversine(START_LAT, START_LON, 100))
+        big = grid_cover(*reversed_haversine(START_LAT, START_LON, 20000))
+        assert small[0] >> 48 > big[0] >> 48
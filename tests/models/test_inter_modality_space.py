@@ -32,6 +32,7 @@ from pydantic import ValidationError
 from app.models.extraction.data_extraction.inter_modality_space import (
     InterModalitySpace,
 )
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -49,9 +50,9 @@ class TestInterModalitySpace:
             start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_start_time_extraction
-            == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+        assert data._query_start_time_extraction == SqlFragment(
+            "start_date BETWEEN {} AND {}",
+            (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -69,9 +70,9 @@ class TestInterModalitySpace:
             end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_end_time_extraction
-            == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+        assert data._query_end_time_extraction == SqlFragment(
+            "end_date BETWEEN {} AND {}",
+            (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -133,7 +134,34 @@ class TestInterModalitySpace:
             company_code=COMPANY_CODE,
             company_trip_type=COMPANY_TRIP_TYPE,
         )
-        assert (
-            data._query_company_extraction
-            == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+        assert data._query_company_extraction == SqlFragment(
+            "source_app = {} AND company_code = {} AND company_trip_type = {}",
+            ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
         )
+
+    def test_distance_buckets(self):
+        data = InterModalitySpace(source_app="travis")
+        assert data._distance_labels == ["< 5 Km", "5 Km - 10 Km", "> 10 Km"]
+        assert data._query_args[0] == [5000, 10000]
+
+        data = InterModalitySpace(source_app="travis", distance_buckets=[2500])
+        assert data._distance_labels == ["< 2.5 Km", "> 2.5 Km"]
+        assert data._query_args[0] == [2500]
+
+        # Large and small edges are labelled without exponent
+        data = InterModalitySpace(
+            source_app="travis", distance_buckets=[1, 1000000, 12345678]
+        )
+        assert data._distance_labels == [
+            "< 0.001 Km",
+            "0.001 Km - 1000 Km",
+            "1000 Km - 12345.678 Km",
+            "> 12345.678 Km",
+        ]
+
+        # The edges must be positive and strictly increasing
+        for distance_buckets in ([], [0, 100], [10000, 5000], [5000, 5000]):
+            with pytest.raises(ValidationError):
+                InterModalitySpace(
+                    source_app="travis", distance_buckets=distance_buckets
+                )
@@ -30,6 +30,7 @@ from pydantic import ValidationError
 
 # Internal
 from app.models.extraction.data_extraction.inter_modality_time import InterModalityTime
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -47,9 +48,9 @@ class TestInterModalityTime:
             start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_start_time_extraction
-            == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+        assert data._query_start_time_extraction == SqlFragment(
+            "start_date BETWEEN {} AND {}",
+            (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -67,9 +68,9 @@ class TestInterModalityTime:
             end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_end_time_extraction
-            == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+        assert data._query_end_time_extraction == SqlFragment(
+            "end_date BETWEEN {} AND {}",
+            (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -133,7 +134,27 @@ class TestInterModalityTime:
             company_code=COMPANY_CODE,
             company_trip_type=COMPANY_TRIP_TYPE,
         )
-        assert (
-            data._query_company_extraction
-            == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+        assert data._query_company_extraction == SqlFragment(
+            "source_app = {} AND company_code = {} AND company_trip_type = {}",
+            ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
         )
+
+    def test_duration_buckets(self):
+        data = InterModalityTime(source_app="travis")
+        assert data._duration_labels == ["< 15 min", "15 - 30 min", "> 30 min"]
+        assert data._query_args[0] == [900, 1800]
+
+        # Labelled without exponent
+        data = InterModalityTime(source_app="travis", duration_buckets=[50, 60000000])
+        assert data._duration_labels == [
+            "< 0.83 min",
+            "0.83 - 1000000 min",
+            "> 1000000 min",
+        ]
+
+        # The edges must be positive and strictly increasing
+        for duration_buckets in ([], [0, 100], [1800, 900]):
+            with pytest.raises(ValidationError):
+                InterModalityTime(
+                    source_app="travis", duration_buckets=duration_buckets
+                )
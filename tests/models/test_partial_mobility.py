@@ -30,6 +30,7 @@ from pydantic import ValidationError
 
 # Internal
 from app.models.extraction.data_extraction.partial_mobility import PartialMobility
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -47,9 +48,9 @@ class TestPartialMobility:
             start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_start_time_extraction
-            == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+        assert data._query_start_time_extraction == SqlFragment(
+            "start_date BETWEEN {} AND {}",
+            (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -67,9 +68,9 @@ class TestPartialMobility:
             end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_end_time_extraction
-            == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+        assert data._query_end_time_extraction == SqlFragment(
+            "end_date BETWEEN {} AND {}",
+            (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -131,9 +132,9 @@ class TestPartialMobility:
             company_code=COMPANY_CODE,
             company_trip_type=COMPANY_TRIP_TYPE,
         )
-        assert (
-            data._query_company_extraction
-            == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+        assert data._query_company_extraction == SqlFragment(
+            "source_app = {} AND company_code = {} AND company_trip_type = {}",
+            ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
         )
 
     def test_partial_mobility_type_extraction(self):
@@ -157,10 +158,11 @@ class TestPartialMobility:
             type_aggregation=TYPE_AGGREGATION,
             type_detection=TYPE_DETECTION,
         )
-        assert (
-            f"{data._query_type_mobility_extract} AND {data._query_type_detection_extraction}"
-            in data._query_external
+        assert data._query_type_mobility_extract == SqlFragment(
+            '{} = "type"', (TYPE_MOBILITY,)
         )
+        assert '= "type" AND $' in data._query_select
+        assert data._query_args[-2:] == (TYPE_MOBILITY, TYPE_DETECTION)
 
         data = PartialMobility(source_app="travis", type_detection=TYPE_DETECTION)
-        assert data._query_type_detection_extraction in data._query_external
+        assert data._query_args[-1] == TYPE_DETECTION
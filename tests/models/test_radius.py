@@ -0,0 +1,130 @@
+"""
+Test radius
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard Library
+import math
+from array import array
+
+# Test
+import pytest
+
+# Internal
+from app.internals.database import journeys_within_radius
+from app.models.extraction.data_extraction.complete_mobility import CompleteMobility
+from app.models.extraction.position_alteration_detection import (
+    haversine_distances,
+    reversed_haversine,
+    within_radius,
+)
+from app.models.extraction.radius import RadiusFilter
+from .constants import *
+
+# ----------------------------------------------------------------------------------------
+
+
+def haversine(lat0: float, lon0: float, lat1: float, lon1: float) -> float:
+    lat0, lon0, lat1, lon1 = map(math.radians, (lat0, lon0, lat1, lon1))
+    a = (
+        math.sin((lat1 - lat0) / 2) ** 2
+        + math.cos(lat0) * math.cos(lat1) * math.sin((lon1 - lon0) / 2) ** 2
+    )
+    return 2 * 6378137 * math.asin(min(math.sqrt(a), 1))
+
+
+class TestRadius:
+    def test_distances(self):
+        lats = array("d", [START_LAT, START_LAT + 0.01, START_LAT - 1, -START_LAT])
+        lons = array("d", [START_LON, START_LON, START_LON + 1, -START_LON])
+        distances = haversine_distances(lats, lons, START_LAT, START_LON)
+        assert distances[0] == 0
+        for distance, lat, lon in zip(distances, lats, lons):
+            assert distance == pytest.approx(haversine(START_LAT, START_LON, lat, lon))
+
+        with pytest.raises(ValueError):
+            haversine_distances(lats, lons[:1], START_LAT, START_LON)
+
+    def test_within_radius(self):
+        lat0, lat1, lon0, lon1 = reversed_haversine(START_LAT, START_LON, START_RADIUS)
+        north = START_LAT + (lat1 - START_LAT) * 0.999
+        lats = array("d", [START_LAT, north, lat1 + 0.001, lat1, float("nan")])
+        lons = array("d", [START_LON, START_LON, START_LON, lon1, START_LON])
+        mask = within_radius(lats, lons, START_LAT, START_LON, START_RADIUS)
+        # The box touches the circle, its corners are outside
+        assert list(mask) == [1, 1, 0, 0, 0]
+        assert len(within_radius(array("d"), array("d"), START_LAT, START_LON, 1)) == 0
+
+        with pytest.raises(ValueError):
+            within_radius(lats[:1], lons, START_LAT, START_LON, START_RADIUS)
+
+    def test_journeys_within_radius(self):
+        lat0, lat1, lon0, lon1 = reversed_haversine(START_LAT, START_LON, START_RADIUS)
+        records = [
+            {
+                "journey_id": "center",
+                "start_lat": START_LAT,
+                "start_lon": START_LON,
+                "end_lat": END_LAT,
+                "end_lon": END_LON,
+            },
+            {
+                "journey_id": "start_corner",
+                "start_lat": lat0,
+                "start_lon": lon0,
+                "end_lat": END_LAT,
+                "end_lon": END_LON,
+            },
+            {
+                "journey_id": "end_corner",
+                "start_lat": START_LAT,
+                "start_lon": START_LON,
+                "end_lat": lat1,
+                "end_lon": lon0,
+            },
+        ]
+        start = RadiusFilter("start", START_LAT, START_LON, START_RADIUS)
+        end = RadiusFilter("end", END_LAT, END_LON, END_RADIUS)
+        assert journeys_within_radius(records, (start,)) == {"center", "end_corner"}
+        assert journeys_within_radius(records, (start, end)) == {"center"}
+
+    def test_query(self):
+        data = CompleteMobility(source_app="travis")
+        # noinspection PyProtectedMember
+        assert data._query_radius is None
+
+        data = CompleteMobility(
+            source_app="travis",
+            start_lat=START_LAT,
+            start_lon=START_LON,
+            start_radius=START_RADIUS,
+            page_size=2,
+        )
+        # noinspection PyProtectedMember
+        assert data._radius_filters == (
+            RadiusFilter("start", START_LAT, START_LON, START_RADIUS),
+        )
+        # The points of the journeys of the same page
+        # noinspection PyProtectedMember
+        assert "start_cells &&" in data._query_radius
+        # noinspection PyProtectedMember
+        assert data._query_radius_args[-1] == 2
@@ -30,6 +30,8 @@ from pydantic import ValidationError
 
 # Internal
 from app.models.extraction.data_extraction.stats_avg_space import StatsAvgSpace
+from app.models.extraction.rollup import ROLLUP_DAY
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -47,9 +49,9 @@ class TestStatsAvgSpace:
             start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_start_time_extraction
-            == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+        assert data._query_start_time_extraction == SqlFragment(
+            "start_date BETWEEN {} AND {}",
+            (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -67,9 +69,9 @@ class TestStatsAvgSpace:
             end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
         )
 
-        assert (
-            data._query_end_time_extraction
-            == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+        assert data._query_end_time_extraction == SqlFragment(
+            "end_date BETWEEN {} AND {}",
+            (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
         )
         # Both value must be set or unset
         with pytest.raises(ValidationError):
@@ -129,9 +131,9 @@ class TestStatsAvgSpace:
             company_code=COMPANY_CODE,
             company_trip_type=COMPANY_TRIP_TYPE,
         )
-        assert (
-            data._query_company_extraction
-            == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+        assert data._query_company_extraction == SqlFragment(
+            "source_app = {} AND company_code = {} AND company_trip_type = {}",
+            ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
         )
 
     def test_type_detection_extraction(self):
@@ -140,12 +142,43 @@ class TestStatsAvgSpace:
             type_mobility=TYPE_MOBILITY,
             type_detection=TYPE_DETECTION,
         )
-        assert f"""'{TYPE_MOBILITY}' = "type" AND """ in data._query_external
+        assert '= "type" AND $' in data._query_select
+        assert data._query_args[-2:] == (TYPE_MOBILITY, TYPE_DETECTION)
         assert data._query_type_detection_extraction
 
         data = StatsAvgSpace(source_app="travis", type_mobility=TYPE_MOBILITY)
-        assert f"""'{TYPE_MOBILITY}' = "type" """ in data._query_external
+        assert '= "type"' in data._query_select
+        assert data._query_args[-1] == TYPE_MOBILITY
         assert data._query_type_detection_extraction is None
 
         data = StatsAvgSpace(source_app="travis", type_detection=TYPE_DETECTION)
         assert data._query_type_detection_extraction
+
+    def test_rollup(self):
+        data = StatsAvgSpace(
+            source_app="travis",
+            start_time=3 * ROLLUP_DAY,
+            start_time_high_threshold=2 * ROLLUP_DAY - 1,
+            type_mobility=TYPE_MOBILITY,
+            type_detection=TYPE_DETECTION,
+        )
+        assert '"user_behaviours_rollup"' in data._query_rollup
+        assert "day >= $3 AND day < $4" in data._query_rollup
+        assert data._query_rollup_args == (
+            "travis",
+            "",
+            3 * ROLLUP_DAY,
+            5 * ROLLUP_DAY,
+            TYPE_MOBILITY,
+            TYPE_DETECTION,
+        )
+
+        # The filters that can't be expressed at the grain of the rollups scan the journeys
+        for filters in (
+            dict(start_time=START_TIME, start_time_high_threshold=ROLLUP_DAY - 1),
+            dict(end_time=END_TIME, end_time_high_threshold=END_TIME_HIGH_THRESHOLD),
+            dict(start_lat=START_LAT, start_lon=START_LON, start_radius=START_RADIUS),
+            dict(end_lat=END_LAT, end_lon=END_LON, end_radius=END_RADIUS),
+        ):
+            data = StatsAvgSpace(source_app="travis", **filters)
+            assert data._query_rollup is None
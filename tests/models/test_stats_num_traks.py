@@ -30,6 +30,7 @@ from pydantic import ValidationError
 
 # Internal
 from app.models.extraction.data_extraction.stats_num_tracks import StatsNumTracks
+from app.models.extraction.template import SqlFragment
 from .constants import *
 
 # ----------------------------------------------------------------------------------------
@@ -51,9 +52,9 @@ class TestStatsNumTracks:
                 start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
             )
 
-            assert (
-                data._query_start_time_extraction
-                == f"start_date BETWEEN {START_TIME} AND {START_TIME + START_TIME_HIGH_THRESHOLD}"
+            assert data._query_start_time_extraction == SqlFragment(
+                "start_date BETWEEN {} AND {}",
+                (START_TIME, START_TIME + START_TIME_HIGH_THRESHOLD),
             )
             # Both value must be set or unset
             with pytest.raises(ValidationError):
@@ -79,9 +80,9 @@ class TestStatsNumTracks:
                 end_time_high_threshold=END_TIME_HIGH_THRESHOLD,
             )
 
-            assert (
-                data._query_end_time_extraction
-                == f"end_date BETWEEN {END_TIME} AND {END_TIME + END_TIME_HIGH_THRESHOLD}"
+            assert data._query_end_time_extraction == SqlFragment(
+                "end_date BETWEEN {} AND {}",
+                (END_TIME, END_TIME + END_TIME_HIGH_THRESHOLD),
             )
             # Both value must be set or unset
             with pytest.raises(ValidationError):
@@ -189,9 +190,9 @@ class TestStatsNumTracks:
                 company_code=COMPANY_CODE,
                 company_trip_type=COMPANY_TRIP_TYPE,
             )
-            assert (
-                data._query_company_extraction
-                == f"source_app = 'travis' AND company_code = '{COMPANY_CODE}' AND company_trip_type = '{COMPANY_TRIP_TYPE}'"
+            assert data._query_company_extraction == SqlFragment(
+                "source_app = {} AND company_code = {} AND company_trip_type = {}",
+                ("travis", COMPANY_CODE, COMPANY_TRIP_TYPE),
             )
 
     def test_type_detection_extraction(self):
@@ -202,10 +203,8 @@ class TestStatsNumTracks:
                 type_mobility=TYPE_MOBILITY,
                 type_detection=TYPE_DETECTION,
             )
-            assert (
-                f"""'{TYPE_MOBILITY}' = "main_type_{type_aggregation}" AND """
-                in data._query_external
-            )
+            assert f'= "main_type_{type_aggregation}" AND $' in data._query_select
+            assert data._query_args[-2:] == (TYPE_MOBILITY, TYPE_DETECTION)
             assert data._query_type_detection_extraction
 
             data = StatsNumTracks(
@@ -213,10 +212,8 @@ class TestStatsNumTracks:
                 type_aggregation=type_aggregation,
                 type_mobility=TYPE_MOBILITY,
             )
-            assert (
-                f"""'{TYPE_MOBILITY}' = "main_type_{type_aggregation}" """
-                in data._query_external
-            )
+            assert f'= "main_type_{type_aggregation}"' in data._query_select
+            assert data._query_args[-1] == TYPE_MOBILITY
             assert data._query_type_detection_extraction is None
 
             data = StatsNumTracks(
@@ -225,3 +222,20 @@ class TestStatsNumTracks:
                 type_detection=TYPE_DETECTION,
             )
             assert data._query_type_detection_extraction
+
+    def test_rollup(self):
+        for type_aggregation in ("space", "time"):
+            data = StatsNumTracks(
+                source_app="travis",
+                type_aggregation=type_aggregation,
+                type_mobility=TYPE_MOBILITY,
+            )
+            assert f"SELECT main_type_{type_aggregation}," in data._query_rollup
+            assert '"user_data_rollup"' in data._query_rollup
+            assert data._query_rollup_args == ("travis", "", TYPE_MOBILITY)
+
+        # The tracks don't have a detection mode
+        data = StatsNumTracks(
+            source_app="travis", type_aggregation="space", type_detection=TYPE_DETECTION
+        )
+        assert data._query_rollup is None
@@ -0,0 +1,83 @@
+"""
+Test Query Template
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Internal
+from app.db.statements import StatementStats
+from app.models.extraction.data_extraction.complete_mobility import CompleteMobility
+from app.models.extraction.template import QueryTemplate, SqlFragment
+from .constants import *
+
+# ----------------------------------------------------------------------------------------
+
+
+class TestQueryTemplate:
+    def test_compile(self):
+        query, args = (
+            QueryTemplate("SELECT * FROM user_data WHERE")
+            .add(SqlFragment("source_app = {}", ("travis",)))
+            .add(None, "AND")
+            .add(SqlFragment("start_date BETWEEN {} AND {}", (1, 2)), "AND")
+            .add(") AS nested")
+            .compile()
+        )
+        assert query == (
+            "SELECT * FROM user_data WHERE source_app = $1 "
+            "AND start_date BETWEEN $2 AND $3 ) AS nested;"
+        )
+        assert args == ("travis", 1, 2)
+
+    def test_same_shape(self):
+        first = CompleteMobility(
+            source_app="travis",
+            start_time=START_TIME,
+            start_time_high_threshold=START_TIME_HIGH_THRESHOLD,
+            type_mobility=TYPE_MOBILITY,
+        )
+        second = CompleteMobility(
+            source_app="other",
+            start_time=END_TIME + 1,
+            start_time_high_threshold=END_TIME_HIGH_THRESHOLD,
+            type_mobility="bus",
+        )
+        # The values don't change the text of the query
+        assert first._query_select == second._query_select
+        assert first._query_args != second._query_args
+        assert "travis" not in first._query_select
+
+        # Another shape is another statement
+        third = CompleteMobility(source_app="travis", type_mobility=TYPE_MOBILITY)
+        assert first._query_select != third._query_select
+
+    def test_statement_stats(self):
+        stats = StatementStats(cache_size=2)
+        for query in ("a", "a", "b", "c", "a"):
+            stats.record(1, "request", query, 0.001)
+        # Another connection prepares its own statements
+        stats.record(2, "request", "a", 0.001)
+
+        metrics = stats.stats()
+        assert metrics["executions"] == 6
+        # "a" was evicted by "c"
+        assert metrics["reused"] == 1
+        assert metrics["requests"]["request"]["prepared"] == 5
@@ -0,0 +1,116 @@
+"""
+Test Trace Information Model
+
+:author: Angelo Cutaia
+:copyright: Copyright 2021, LINKS Foundation
+:version: 1.0.0
+
+..
+
+    Copyright 2021 LINKS Foundation
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Test
+import pytest
+
+# Third Party
+from pydantic import ValidationError
+
+# Internal
+from app.models.security import Authenticity
+from app.models.user_feed.position import PositionObject, TraceInformation
+from app.models.user_feed.user import UserFeedInternal
+from ..constants import USER_INPUT_DATA
+
+# ----------------------------------------------------------------------------------------
+
+
+class TestTraceInformation:
+    def test_columns(self):
+        positions = USER_INPUT_DATA["trace_information"]
+        trace = TraceInformation.validate(positions)
+
+        assert len(trace) == len(positions)
+        assert list(trace.time) == [position["time"] for position in positions]
+        assert list(trace.lat) == [position["lat"] for position in positions]
+        assert trace[-1] == PositionObject.parse_obj(positions[-1])
+        assert list(trace) == [PositionObject.parse_obj(pos) for pos in positions]
+        assert trace.to_list() == positions
+
+        # Values converted by PositionObject
+        trace = TraceInformation.validate(
+            [
+                {
+                    "authenticity": "1",
+                    "lat": 45,
+                    "lon": 7,
+                    "partialDistance": 1,
+                    "time": 1,
+                }
+            ]
+        )
+        assert trace[0].authenticity is Authenticity.authentic
+        assert type(trace.lat[0]) is float
+
+    def test_validation(self):
+        positions = list(USER_INPUT_DATA["trace_information"])
+        positions[1] = {**positions[1], "lat": "north"}
+        positions[3] = {**positions[3], "time": 2**70}
+
+        with pytest.raises(ValidationError) as error:
+            UserFeedInternal.parse_obj(
+                {**USER_INPUT_DATA, "trace_information": positions}
+            )
+        assert [err["loc"] for err in error.value.errors()] == [
+            ("trace_information", 1, "lat"),
+            ("trace_information", 3),
+        ]
+
+        with pytest.raises(ValidationError):
+            UserFeedInternal.parse_obj({**USER_INPUT_DATA, "trace_information": {}})
+
+    def test_json(self):
+        user_feed = UserFeedInternal.parse_obj(USER_INPUT_DATA)
+        assert isinstance(user_feed.trace_information, TraceInformation)
+        assert UserFeedInternal.parse_raw(user_feed.json()) == user_feed
+
+    def test_encode(self):
+        trace = TraceInformation.validate(USER_INPUT_DATA["trace_information"])
+        blob = trace.encode()
+        assert TraceInformation.decode(blob) == trace
+        # Coordinates with 7 decimals are stored in 1e-7 degrees, the blob is
+        # smaller than the raw lat and lon
+        assert len(blob) < len(trace) * 2 * 8
+
+        # Any other value is stored as it is
+        trace = TraceInformation()
+        trace.extend(
+            [
+                (-(2**63), -1, 45.123456789, float("nan"), 2**63 - 1),
+                (2**63 - 1, 0, -0.0, 1e300, -(2**63)),
+                (0, 1, 90.0, float("inf"), 0),
+            ]
+        )
+        decoded = TraceInformation.decode(trace.encode())
+        assert list(decoded.time) == list(trace.time)
+        assert list(decoded.partialDistance) == list(trace.partialDistance)
+        assert list(decoded.lat) == list(trace.lat)
+        assert repr(list(decoded.lon)) == repr(list(trace.lon))
+
+        assert len(TraceInformation.decode(TraceInformation().encode())) == 0
+
+        for corrupted in (blob[:-1], blob + b"\x00", b"\x02" + blob[1:], b""):
+            with pytest.raises(ValueError):
+                TraceInformation.decode(corrupted)
@@ -22,16 +22,47 @@ Test app
     limitations under the License.
 """
 
+# Standard Library
+import asyncio
+import time
+from datetime import date, datetime, timezone
+
 # Test
 from fastapi.testclient import TestClient
 from fastuuid import uuid4
+import pytest
 
 # Third Party
 from fastapi import status
+from fastapi.encoders import jsonable_encoder
 import orjson
 
 # Internal
+from app.config import (
+    get_cache_settings,
+    get_database_settings,
+    get_ingest_settings,
+    get_pseudonym_settings,
+    get_retention_settings,
+    InsertEngine,
+    PseudonymScope,
+    SensorsStorage,
+    TraceStorage,
+)
+from app.db.migrations import migrate, migrate_offline, MIGRATIONS
+from app.db.partitions import add_months, drop_partitions, month_start
+from app.db.partitions import PARTITIONED_TABLES, TENANT_PARTITIONED_TABLES
+from app.db.postgresql import get_database
+from app.dependencies.query_builder import QueryBuilder
+from app.internals.database import user_rollups_generation
+from app.internals.iot_micro_batch import get_iot_micro_batcher
+from app.internals.retention import get_retention_job
+from app.internals.spool import get_spool, RecordKind
 from app.main import app
+from app.models.extraction.data_extraction.partial_mobility import PartialMobility
+from app.models.extraction.grid import grid_cells
+from app.models.extraction.position_alteration_detection import reversed_haversine
+from app.models.iot_feed.iot import IotInput
 from app.models.track import RequestType
 from .constants import IoT_INPUT_DATA, USER_INPUT_DATA
 from .logger import disable_logger
@@ -65,6 +96,127 @@ class TestIoT:
             )
             assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
 
+    def test_store_batch(self):
+        """Test the behaviour of store a batch of IoT data"""
+
+        clear_test()
+        observation_gep_ids = [str(uuid4()) for _ in range(3)]
+
+        with TestClient(app) as client:
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/iot/store/batch",
+                json=[
+                    {**IoT_INPUT_DATA, "observationGEPid": observation_gep_id}
+                    for observation_gep_id in (
+                        *observation_gep_ids,
+                        IoT_INPUT_DATA["observationGEPid"],
+                        observation_gep_ids[0],
+                    )
+                ],
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [
+                observation["status"] for observation in response.json()["observations"]
+            ] == ["Stored", "Stored", "Stored", "Already stored", "Already stored"]
+
+            # An invalid observation invalidates the batch
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/iot/store/batch",
+                json=[IoT_INPUT_DATA, {**IoT_INPUT_DATA, "result": None}],
+            )
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+            # A NDJSON stream
+            observation_gep_id = str(uuid4())
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/iot/store/batch",
+                data=orjson.dumps(
+                    {**IoT_INPUT_DATA, "observationGEPid": observation_gep_id}
+                ),
+                headers={"content-type": "application/x-ndjson"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["observations"] == [
+                {"observation_gep_id": observation_gep_id, "status": "Stored"}
+            ]
+
+    def test_store_batch_too_large(self):
+        """Test the behaviour of store a batch of IoT data larger than allowed"""
+
+        clear_test()
+        settings = get_ingest_settings()
+        settings.batch_max_observations = 2
+
+        try:
+            with TestClient(app) as client:
+                # Refused before validating the observations
+                for data, content_type in (
+                    (orjson.dumps([{}, {}, {}]), "application/json"),
+                    (b"{}\n{}\n{}\n", "application/x-ndjson"),
+                ):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/iot/store/batch",
+                        data=data,
+                        headers={"content-type": content_type},
+                    )
+                    assert (
+                        response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                    )
+        finally:
+            settings.batch_max_observations = 5000
+
+    def test_store_micro_batch(self):
+        """Test the behaviour of store IoT data micro-batching the requests"""
+
+        clear_test()
+        settings = get_ingest_settings()
+        settings.iot_micro_batch = True
+        iot_input_data = {**IoT_INPUT_DATA, "observationGEPid": str(uuid4())}
+
+        try:
+            with TestClient(app) as client:
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/iot/store",
+                    json=iot_input_data,
+                )
+                assert response.status_code == status.HTTP_200_OK
+                assert response.json() == {"resource": "IOT", "status": "Stored"}
+
+                # try to store again the same data
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/iot/store",
+                    json=iot_input_data,
+                )
+                assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+                response = client.get("http://localhost/ipt_anonymizer/api/v1/metrics")
+                assert response.json()["iot_micro_batch"]["observations"] == 2
+
+                # The observation of a caller gone before the flush isn't stored
+                cancelled = {**IoT_INPUT_DATA, "observationGEPid": str(uuid4())}
+
+                async def store_cancelled():
+                    micro_batcher = get_iot_micro_batcher()
+                    store = asyncio.ensure_future(
+                        micro_batcher.store(IotInput.parse_obj(cancelled))
+                    )
+                    await asyncio.sleep(0)
+                    store.cancel()
+                    return await micro_batcher.store(
+                        IotInput.parse_obj(
+                            {**IoT_INPUT_DATA, "observationGEPid": str(uuid4())}
+                        )
+                    )
+
+                assert client.portal.call(store_cancelled)["status"] == "Stored"
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/iot/extract",
+                    json={"observationGEPid": cancelled["observationGEPid"]},
+                )
+                assert response.status_code == status.HTTP_404_NOT_FOUND
+        finally:
+            settings.iot_micro_batch = False
+
     def test_extract(self):
         """Test the behaviour of extract IoT data"""
         clear_test()
@@ -121,6 +273,740 @@ class TestUser:
             )
             assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
 
+    def test_store_batch(self):
+        """Test the behaviour of store a batch of User data"""
+
+        clear_test()
+
+        valid = {**USER_INPUT_DATA, "journey_id": str(uuid4())}
+        invalid = {**USER_INPUT_DATA, "journey_id": str(uuid4())}
+        del invalid["trace_information"]
+
+        with TestClient(app) as client:
+            # Store a JSON array
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store/batch",
+                json=[valid, invalid, valid],
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [journey["status"] for journey in response.json()["journeys"]] == [
+                "Stored",
+                "Invalid",
+                "Duplicated",
+            ]
+
+            # Store a NDJSON stream, the first journey is already stored
+            new_valid = {**USER_INPUT_DATA, "journey_id": str(uuid4())}
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store/batch",
+                data=b"\n".join(
+                    (orjson.dumps(valid), b"{not json", orjson.dumps(new_valid))
+                ),
+                headers={"content-type": "application/x-ndjson"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [journey["status"] for journey in response.json()["journeys"]] == [
+                "Something went wrong storing the data",
+                "Invalid",
+                "Stored",
+            ]
+
+            # The batch must be an array
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store/batch",
+                json=valid,
+            )
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_store_malformed(self, monkeypatch):
+        """Test the behaviour of store User data that no row can be generated from"""
+
+        clear_test()
+        valid = {**USER_INPUT_DATA, "journey_id": str(uuid4())}
+        empty_trace = {**USER_INPUT_DATA, "trace_information": []}
+        null_segment = {
+            **USER_INPUT_DATA,
+            "behaviour": {**USER_INPUT_DATA["behaviour"], "app_defined": [None]},
+        }
+
+        with TestClient(app) as client:
+            for invalid in (empty_trace, null_segment):
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={**invalid, "journey_id": str(uuid4())},
+                )
+                assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store/batch",
+                json=[
+                    valid,
+                    {**empty_trace, "journey_id": str(uuid4())},
+                    {**null_segment, "journey_id": str(uuid4())},
+                ],
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [journey["status"] for journey in response.json()["journeys"]] == [
+                "Stored",
+                "Invalid",
+                "Invalid",
+            ]
+
+            # Any other error generating the rows fails only its journey
+            broken = str(uuid4())
+
+            def rollups(user_feeds):
+                if any(user_feed.journey_id == broken for user_feed in user_feeds):
+                    raise IndexError("list index out of range")
+                return user_rollups_generation(user_feeds)
+
+            monkeypatch.setattr("app.db.postgresql.user_rollups_generation", rollups)
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store/batch",
+                json=[
+                    {**USER_INPUT_DATA, "journey_id": broken},
+                    {**USER_INPUT_DATA, "journey_id": str(uuid4())},
+                ],
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [journey["status"] for journey in response.json()["journeys"]] == [
+                "Something went wrong storing the data",
+                "Stored",
+            ]
+
+    def test_store_out_of_range(self):
+        """Test the behaviour of store User data that the database can't contain"""
+
+        clear_test()
+        settings = get_database_settings()
+
+        try:
+            for insert_engine in InsertEngine:
+                settings.insert_engine = insert_engine
+                valid = {**USER_INPUT_DATA, "journey_id": str(uuid4())}
+                # distance is an int4 column
+                invalid = {**USER_INPUT_DATA, "distance": 2**31}
+
+                with TestClient(app) as client:
+                    for url in ("store", "store/stream"):
+                        response = client.post(
+                            f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                            json={**invalid, "journey_id": str(uuid4())},
+                        )
+                        assert (
+                            response.status_code
+                            == status.HTTP_500_INTERNAL_SERVER_ERROR
+                        )
+
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store/batch",
+                        json=[valid, {**invalid, "journey_id": str(uuid4())}],
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+                    assert [
+                        journey["status"] for journey in response.json()["journeys"]
+                    ] == ["Stored", "Something went wrong storing the data"]
+        finally:
+            settings.insert_engine = InsertEngine.copy
+
+    def test_store_stream(self):
+        """Test the behaviour of store User data converting them chunk by chunk"""
+
+        clear_test()
+        settings = get_ingest_settings()
+        settings.stream_chunk_rows = 2
+        journey_id = str(uuid4())
+        trace_information = USER_INPUT_DATA["trace_information"]
+
+        try:
+            with TestClient(app) as client:
+                # An invalid position found while storing rolls back the journey
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store/stream",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": journey_id,
+                        "trace_information": [
+                            *trace_information[:3],
+                            {**trace_information[3], "lat": "north"},
+                            *trace_information[4:],
+                        ],
+                    },
+                )
+                assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+                assert response.json()["detail"][0]["loc"] == [
+                    "trace_information",
+                    3,
+                    "lat",
+                ]
+
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store/stream",
+                    json={**USER_INPUT_DATA, "journey_id": journey_id},
+                )
+                assert response.status_code == status.HTTP_200_OK
+                assert response.json() == {"resource": "USER", "status": "Stored"}
+
+                # Try to store again the same journey
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store/stream",
+                    json={**USER_INPUT_DATA, "journey_id": journey_id},
+                )
+                assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+                # Invalid journeys
+                for body in (
+                    [USER_INPUT_DATA],
+                    {**USER_INPUT_DATA, "trace_information": []},
+                    {**USER_INPUT_DATA, "sensors_information": None},
+                ):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store/stream",
+                        json=body,
+                    )
+                    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        finally:
+            settings.stream_chunk_rows = 5000
+
+    def test_store_sensors_typed(self):
+        """Test the behaviour of store User data with the sensors in typed columns"""
+
+        clear_test()
+        settings = get_database_settings()
+        settings.sensors_storage = SensorsStorage.typed
+        journey_ids = [str(uuid4()) for _ in range(2)]
+
+        try:
+            with TestClient(app) as client:
+                for url, journey_id in zip(("store", "store/stream"), journey_ids):
+                    response = client.post(
+                        f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                        json={**USER_INPUT_DATA, "journey_id": journey_id},
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+
+                rows = client.portal.call(
+                    get_database().pool.fetch,
+                    """SELECT s.data, s.kind, d.data AS decoded
+                    FROM "user_sensors" s JOIN "user_sensors_decoded" d
+                    USING (journey_id, time, name) WHERE journey_id = ANY($1)""",
+                    journey_ids,
+                )
+        finally:
+            settings.sensors_storage = SensorsStorage.jsonb
+
+        assert len(rows) == 2
+        for row in rows:
+            # Stored in the typed columns and decoded as they were stored in jsonb
+            assert row["data"] is None
+            assert row["kind"] == 1
+            assert orjson.loads(row["decoded"]) == {"x": 0.0, "y": 1.0, "z": 8.0}
+
+    def test_store_duration(self):
+        """Test the duration stored with User data and backfilled by its migration"""
+
+        clear_test()
+        journey_ids = [str(uuid4()) for _ in range(2)]
+
+        with TestClient(app) as client:
+            for url, journey_id in zip(("store", "store/stream"), journey_ids):
+                response = client.post(
+                    f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                    json={**USER_INPUT_DATA, "journey_id": journey_id},
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+            rows = client.portal.call(
+                get_database().pool.fetch,
+                """SELECT duration FROM "user_data" WHERE journey_id = ANY($1)""",
+                journey_ids,
+            )
+            # 0:16:15
+            assert [row["duration"] for row in rows] == [975, 975]
+
+            # Rows stored before the duration, one without a valid elapsed_time
+            client.portal.call(
+                get_database().pool.execute,
+                """UPDATE "user_data" SET duration = NULL,
+                elapsed_time = CASE WHEN journey_id = $1 THEN 'unknown'
+                ELSE elapsed_time END WHERE journey_id = ANY($2)""",
+                journey_ids[0],
+                journey_ids,
+            )
+            client.portal.call(
+                get_database().pool.execute,
+                """DELETE FROM "schema_migrations" WHERE name = 'user_data_duration'""",
+            )
+
+        # The duration is backfilled by the migration at the next startup
+        with TestClient(app) as client:
+            rows = client.portal.call(
+                get_database().pool.fetch,
+                """SELECT journey_id, duration FROM "user_data"
+                WHERE journey_id = ANY($1)""",
+                journey_ids,
+            )
+
+        durations = {row["journey_id"]: row["duration"] for row in rows}
+        assert durations == {
+            journey_ids[0]: (USER_INPUT_DATA["endDate"] - USER_INPUT_DATA["startDate"])
+            // 1000,
+            journey_ids[1]: 975,
+        }
+
+    def test_store_duration_bounds(self):
+        """Test the duration of User data whose elapsedTime is out of range"""
+
+        clear_test()
+        start_date = USER_INPUT_DATA["startDate"]
+        dates_duration = (USER_INPUT_DATA["endDate"] - start_date) // 1000
+        journeys = {
+            # elapsedTime, endDate: duration
+            ("0:59:59.9", None): 3599,
+            ("0:75:00", None): dates_duration,
+            ("1:00:75", None): dates_duration,
+            ("596523:14:07", None): 2**31 - 1,
+            ("596523:14:08", None): None,
+            ("9" * 30 + ":00:00", None): None,
+            ("unknown", start_date + 2**31 * 1000): None,
+        }
+        journey_ids = {str(uuid4()): journey for journey in journeys}
+
+        with TestClient(app) as client:
+            for journey_id, (elapsed_time, end_date) in journey_ids.items():
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": journey_id,
+                        "elapsedTime": elapsed_time,
+                        "endDate": end_date or USER_INPUT_DATA["endDate"],
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+            stored = client.portal.call(
+                get_database().pool.fetch,
+                """SELECT journey_id, duration FROM "user_data"
+                WHERE journey_id = ANY($1)""",
+                list(journey_ids),
+            )
+            client.portal.call(
+                get_database().pool.execute,
+                """UPDATE "user_data" SET duration = NULL WHERE journey_id = ANY($1)""",
+                list(journey_ids),
+            )
+            client.portal.call(
+                get_database().pool.execute,
+                """DELETE FROM "schema_migrations" WHERE name = 'user_data_duration'""",
+            )
+
+        # The migration backfills the same durations
+        with TestClient(app) as client:
+            backfilled = client.portal.call(
+                get_database().pool.fetch,
+                """SELECT journey_id, duration FROM "user_data"
+                WHERE journey_id = ANY($1)""",
+                list(journey_ids),
+            )
+
+        expected = {
+            journey_id: journeys[journey] for journey_id, journey in journey_ids.items()
+        }
+        assert {row["journey_id"]: row["duration"] for row in stored} == expected
+        assert {row["journey_id"]: row["duration"] for row in backfilled} == expected
+
+    def test_store_cells(self):
+        """Test the grid cells stored with User data and backfilled by their migration"""
+
+        clear_test()
+        source_app = str(uuid4())
+        journey_ids = [str(uuid4()) for _ in range(2)]
+        first, last = (
+            USER_INPUT_DATA["trace_information"][0],
+            USER_INPUT_DATA["trace_information"][-1],
+        )
+        extraction = {
+            "request": RequestType.complete_mobility,
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+        }
+
+        with TestClient(app) as client:
+            for url, journey_id in zip(("store", "store/stream"), journey_ids):
+                response = client.post(
+                    f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": journey_id,
+                        "source_app": source_app,
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+            rows = client.portal.call(
+                get_database().pool.fetch,
+                """SELECT start_cells, end_cells, grid_cells(start_lat, start_lon)
+                AS start_function FROM "user_data" WHERE journey_id = ANY($1)""",
+                journey_ids,
+            )
+            for row in rows:
+                assert row["start_cells"] == grid_cells(first["lat"], first["lon"])
+                assert row["end_cells"] == grid_cells(last["lat"], last["lon"])
+                # The function of the database computes the same cells
+                assert row["start_function"] == row["start_cells"]
+
+            # The journeys around the points are found, the others aren't
+            for lat, lon, status_code in (
+                (first["lat"], first["lon"], status.HTTP_200_OK),
+                (first["lat"] + 1, first["lon"], status.HTTP_404_NOT_FOUND),
+            ):
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        **extraction,
+                        "start_lat": lat,
+                        "start_lon": lon,
+                        "start_radius": 100,
+                        "end_lat": last["lat"],
+                        "end_lon": last["lon"],
+                        "end_radius": 20000,
+                    },
+                )
+                assert response.status_code == status_code
+
+            # Rows stored before the cells
+            client.portal.call(
+                get_database().pool.execute,
+                """UPDATE "user_data" SET start_cells = NULL, end_cells = NULL
+                WHERE journey_id = ANY($1)""",
+                journey_ids,
+            )
+            client.portal.call(
+                get_database().pool.execute,
+                """DELETE FROM "schema_migrations" WHERE name = 'user_data_cells'""",
+            )
+
+        # The cells are backfilled by the migration at the next startup
+        with TestClient(app) as client:
+            rows = client.portal.call(
+                get_database().pool.fetch,
+                """SELECT start_cells, end_cells FROM "user_data"
+                WHERE journey_id = ANY($1)""",
+                journey_ids,
+            )
+        assert [tuple(row) for row in rows] == [
+            (
+                grid_cells(first["lat"], first["lon"]),
+                grid_cells(last["lat"], last["lon"]),
+            )
+        ] * 2
+
+    def test_store_rollups(self):
+        """Test the statistics answered by the rollups maintained by the stores"""
+
+        clear_test()
+        company_code = str(uuid4())
+        extractions = [
+            {"request": RequestType.stats_num_tracks, "type_aggregation": "space"},
+            {"request": RequestType.stats_num_tracks, "type_aggregation": "time"},
+            {"request": RequestType.stats_avg_space},
+            {"request": RequestType.stats_avg_time, "type_mobility": "walk"},
+        ]
+
+        def extract(client: TestClient) -> list:
+            statistics = []
+            for extraction in extractions:
+                extraction = {
+                    **extraction,
+                    "source_app": USER_INPUT_DATA["source_app"],
+                    "company_code": company_code,
+                }
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json=extraction,
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+                # The same statistics scanning the journeys
+                model = QueryBuilder.query_select[extraction["request"]](**extraction)
+                records = client.portal.call(
+                    get_database().pool.fetch, model._query_select, *model._query_args
+                )
+                assert response.json() == jsonable_encoder(records)
+                statistics.append(response.json())
+            return statistics
+
+        with TestClient(app) as client:
+            for url in ("store", "store/stream", "store/batch"):
+                journey = {
+                    **USER_INPUT_DATA,
+                    "journey_id": str(uuid4()),
+                    "company_code": company_code,
+                }
+                response = client.post(
+                    f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                    json=[journey] if url == "store/batch" else journey,
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+            statistics = extract(client)
+            assert statistics[0] == [{"main_type_space": "bicycle", "count": 3}]
+
+            # Rollups created by a database that already stored the journeys
+            client.portal.call(
+                get_database().pool.execute,
+                """DROP TABLE "user_data_rollup"; DROP TABLE "user_behaviours_rollup";
+                DELETE FROM "schema_migrations" WHERE name = 'rollups';""",
+            )
+
+        with TestClient(app) as client:
+            assert extract(client) == statistics
+
+    def test_store_trace_blob(self):
+        """Test the behaviour of store and extract User data with compressed traces"""
+
+        clear_test()
+        settings = get_database_settings()
+        source_app = str(uuid4())
+        extraction = {
+            "request": RequestType.all_positions,
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+        }
+
+        def positions(response) -> list:
+            assert response.status_code == status.HTTP_200_OK
+            return sorted(
+                tuple(position[key] for key in sorted(position) if key != "journey_id")
+                for position in response.json()
+            )
+
+        try:
+            with TestClient(app) as client:
+                # A journey stored in user_positions
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": str(uuid4()),
+                        "source_app": source_app,
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+                rows = positions(
+                    client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json=extraction,
+                    )
+                )
+                assert rows
+
+                # The same journeys stored in user_traces, by both the endpoints
+                settings.trace_storage = TraceStorage.blob
+                for url in ("store", "store/stream"):
+                    response = client.post(
+                        f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                        json={
+                            **USER_INPUT_DATA,
+                            "journey_id": str(uuid4()),
+                            "source_app": source_app,
+                        },
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+
+                # Journeys of both the storages are extracted
+                blobs = positions(
+                    client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json=extraction,
+                    )
+                )
+                assert blobs == sorted(rows * 3)
+        finally:
+            settings.trace_storage = TraceStorage.rows
+
+    def test_store_write_behind(self):
+        """Test the behaviour of store User data in write-behind mode"""
+
+        clear_test()
+        settings = get_ingest_settings()
+        settings.write_behind = True
+
+        try:
+            with TestClient(app) as client:
+                for _ in range(3):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store",
+                        json={**USER_INPUT_DATA, "journey_id": str(uuid4())},
+                    )
+                    assert response.status_code == status.HTTP_202_ACCEPTED
+
+                response = client.get("http://localhost/ipt_anonymizer/api/v1/metrics")
+                assert response.status_code == status.HTTP_200_OK
+                assert response.json()["write_behind"]["accepted_journeys"] == 3
+
+            # The shutdown stores every accepted journey
+            with TestClient(app) as client:
+                response = client.get("http://localhost/ipt_anonymizer/api/v1/metrics")
+                assert response.json()["write_behind"]["stored_journeys"] == 3
+        finally:
+            settings.write_behind = False
+
+    def test_store_write_behind_failure(self, monkeypatch):
+        """Test the behaviour of write-behind mode when the database refuses the data"""
+
+        clear_test()
+        settings = get_ingest_settings()
+        settings.write_behind = True
+        settings.write_behind_flush_interval = 1.0
+        refused = str(uuid4())
+        store = get_database().store_user_batch
+
+        async def store_user_batch(user_feeds):
+            if any(user_feed.journey_id == refused for user_feed in user_feeds):
+                raise ValueError("refused")
+            return await store(user_feeds)
+
+        monkeypatch.setattr(get_database(), "store_user_batch", store_user_batch)
+        try:
+            with TestClient(app) as client:
+                response = client.get("http://localhost/ipt_anonymizer/api/v1/metrics")
+                stored = response.json()["write_behind"]["stored_journeys"]
+                for journey_id in (refused, str(uuid4())):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store",
+                        json={**USER_INPUT_DATA, "journey_id": journey_id},
+                    )
+                    assert response.status_code == status.HTTP_202_ACCEPTED
+
+                # Only the journey refused is dropped instead of being retried forever
+                for _ in range(50):
+                    response = client.get(
+                        "http://localhost/ipt_anonymizer/api/v1/metrics"
+                    )
+                    if response.json()["write_behind"]["failed_journeys"]:
+                        break
+                    time.sleep(0.1)
+                write_behind = response.json()["write_behind"]
+                assert write_behind["failed_journeys"] == 1
+                assert write_behind["stored_journeys"] == stored + 1
+                assert write_behind["queue_depth"] == 0
+        finally:
+            settings.write_behind = False
+            settings.write_behind_flush_interval = 0.5
+
+    def test_store_spool(self, tmp_path, monkeypatch):
+        """Test the behaviour of store User and IoT data while the database is too slow"""
+
+        clear_test()
+        settings = get_ingest_settings()
+        settings.spool = True
+        settings.spool_directory = str(tmp_path)
+        settings.spool_replay_interval = 0.1
+        settings.spool_latency_budget = 0
+        journey = {**USER_INPUT_DATA, "journey_id": str(uuid4())}
+        observation_gep_id = str(uuid4())
+
+        try:
+            with TestClient(app) as client:
+                # Every store exceeds the latency budget
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json=journey,
+                )
+                assert response.status_code == status.HTTP_202_ACCEPTED
+                assert response.json() == {"resource": "USER", "status": "Spooled"}
+
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/iot/store",
+                    json={**IoT_INPUT_DATA, "observationGEPid": observation_gep_id},
+                )
+                assert response.status_code == status.HTTP_202_ACCEPTED
+                assert response.json() == {"resource": "IOT", "status": "Spooled"}
+
+                # The replay stores the spooled data
+                for _ in range(50):
+                    response = client.get(
+                        "http://localhost/ipt_anonymizer/api/v1/metrics"
+                    )
+                    if response.json()["spool"]["replayed_records"] == 2:
+                        break
+                    time.sleep(0.1)
+
+                spool = response.json()["spool"]
+                assert spool["appended_records"] == 2
+                assert spool["replayed_records"] == 2
+                assert spool["size_bytes"] == 0
+
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/iot/extract",
+                    json={"observationGEPid": observation_gep_id},
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+                # Malformed records are dropped, the records after them are replayed
+                for kind, payload in (
+                    (RecordKind.user, b'{"journey_id": "malformed"}'),
+                    (RecordKind.iot, b"not json"),
+                    (RecordKind.user, orjson.dumps(journey)),
+                ):
+                    client.portal.call(get_spool().append, kind, payload)
+                for _ in range(50):
+                    response = client.get(
+                        "http://localhost/ipt_anonymizer/api/v1/metrics"
+                    )
+                    if response.json()["spool"]["size_bytes"] == 0:
+                        break
+                    time.sleep(0.1)
+
+                spool = response.json()["spool"]
+                assert spool["appended_records"] == 5
+                assert spool["replayed_records"] == 3
+                assert spool["dropped_records"] == 2
+                assert client.portal.call(
+                    get_database().stored_journeys, [journey["journey_id"]]
+                ) == {journey["journey_id"]}
+
+                # A journey refused by the database drops only itself
+                refused, accepted = str(uuid4()), str(uuid4())
+                store = get_database().store_user_batch
+
+                async def store_user_batch(user_feeds):
+                    if any(user_feed.journey_id == refused for user_feed in user_feeds):
+                        raise ValueError("refused")
+                    return await store(user_feeds)
+
+                async def append_journeys():
+                    for journey_id in (refused, accepted):
+                        await get_spool().append(
+                            RecordKind.user,
+                            orjson.dumps({**journey, "journey_id": journey_id}),
+                        )
+
+                monkeypatch.setattr(
+                    get_database(), "store_user_batch", store_user_batch
+                )
+                client.portal.call(append_journeys)
+                for _ in range(50):
+                    response = client.get(
+                        "http://localhost/ipt_anonymizer/api/v1/metrics"
+                    )
+                    if response.json()["spool"]["size_bytes"] == 0:
+                        break
+                    time.sleep(0.1)
+
+                spool = response.json()["spool"]
+                assert spool["replayed_records"] == 4
+                assert spool["dropped_records"] == 3
+                assert client.portal.call(
+                    get_database().stored_journeys, [refused, accepted]
+                ) == {accepted}
+        finally:
+            settings.spool = False
+            settings.spool_latency_budget = 5.0
+            settings.spool_replay_interval = 5.0
+
     def test_extract(self):
         """Test the behaviour of extract User data"""
         clear_test()
@@ -212,3 +1098,889 @@ class TestUser:
                         element["mob_type_per_journey"] == 0
                     ), "no data should be find"
                     assert element["mob_type"] == [], "no data should be find"
+
+            # The buckets can be chosen by the request
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                json={
+                    "request": RequestType.inter_modality_space,
+                    "company_code": USER_INPUT_DATA["company_code"],
+                    "source_app": USER_INPUT_DATA["source_app"],
+                    "distance_buckets": [1000, 2500, 20000],
+                },
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [row["distance"] for row in orjson.loads(response.content)] == [
+                "< 1 Km",
+                "1 Km - 2.5 Km",
+                "2.5 Km - 20 Km",
+                "> 20 Km",
+            ]
+
+            # Every extraction query is tracked by the statement metrics
+            response = client.get("http://localhost/ipt_anonymizer/api/v1/metrics")
+            statements = orjson.loads(response.content)["statements"]
+            assert statements["executions"] == (
+                statements["prepared"] + statements["reused"]
+            )
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                json={
+                    "request": RequestType.inter_modality_time,
+                    "company_code": USER_INPUT_DATA["company_code"],
+                    "source_app": USER_INPUT_DATA["source_app"],
+                    "duration_buckets": [90, 3600],
+                },
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert [row["time"] for row in orjson.loads(response.content)] == [
+                "< 1.5 min",
+                "1.5 - 60 min",
+                "> 60 min",
+            ]
+
+            # Every bucket is aggregated by a single query
+            assert (
+                statements["requests"][RequestType.inter_modality_space]["executions"]
+                == 3
+            )
+
+    def test_extract_cache(self):
+        """Test the behaviour of extract User data with the extraction cache"""
+        clear_test()
+        settings = get_cache_settings()
+        settings.extraction_cache = True
+        extraction = {
+            "request": RequestType.stats_num_tracks,
+            "source_app": USER_INPUT_DATA["source_app"],
+            "company_code": USER_INPUT_DATA["company_code"],
+            "type_aggregation": "space",
+        }
+
+        try:
+            with TestClient(app) as client:
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={**USER_INPUT_DATA, "journey_id": str(uuid4())},
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+                first = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json=extraction,
+                )
+                assert first.status_code == status.HTTP_200_OK
+
+                # The same request, with fields ignored by the query, is a hit
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={**extraction, "space_aggregation": 5},
+                )
+                assert response.status_code == status.HTTP_200_OK
+                assert response.content == first.content
+                assert response.headers["content-type"] == "application/json"
+
+                response = client.get("http://localhost/ipt_anonymizer/api/v1/metrics")
+                cache = response.json()["extraction_cache"]
+                assert cache["enabled"]
+                assert (cache["hits"], cache["misses"]) == (1, 1)
+
+                # A journey of the same source_app and company_code invalidates it
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={**USER_INPUT_DATA, "journey_id": str(uuid4())},
+                )
+                assert response.status_code == status.HTTP_200_OK
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json=extraction,
+                )
+                assert response.status_code == status.HTTP_200_OK
+                assert response.content != first.content
+
+                # The notifications of both stores reach the listener as well
+                for _ in range(50):
+                    response = client.get(
+                        "http://localhost/ipt_anonymizer/api/v1/metrics"
+                    )
+                    cache = response.json()["extraction_cache"]
+                    if cache["notifications"] == 2:
+                        break
+                    time.sleep(0.1)
+                assert cache["notifications"] == 2
+                assert cache["invalidations"] >= 1
+                assert (cache["hits"], cache["misses"]) == (1, 2)
+        finally:
+            settings.extraction_cache = False
+
+    def test_extract_stream(self):
+        """Test the behaviour of extract User data streamed a chunk at a time"""
+
+        clear_test()
+        settings = get_database_settings()
+        chunk_rows = settings.cursor_chunk_rows
+        source_app = str(uuid4())
+        extraction = {
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+        }
+
+        def rows(positions: list) -> list:
+            return sorted(
+                tuple(position[key] for key in sorted(position) if key != "journey_id")
+                for position in positions
+            )
+
+        try:
+            # Few rows at a time to stream many chunks
+            settings.cursor_chunk_rows = 2
+            with TestClient(app) as client:
+                # Nothing to stream yet
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        **extraction,
+                        "request": RequestType.all_positions,
+                        "stream": "json",
+                    },
+                )
+                assert response.status_code == status.HTTP_404_NOT_FOUND
+
+                # Journeys stored both as rows and as compressed traces
+                for trace_storage in (TraceStorage.rows, TraceStorage.blob):
+                    settings.trace_storage = trace_storage
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store",
+                        json={
+                            **USER_INPUT_DATA,
+                            "journey_id": str(uuid4()),
+                            "source_app": source_app,
+                        },
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+
+                for request in (
+                    RequestType.all_positions,
+                    RequestType.complete_mobility,
+                ):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json={**extraction, "request": request},
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+                    expected = response.json()
+                    assert len(expected) > settings.cursor_chunk_rows
+
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json={**extraction, "request": request, "stream": "json"},
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+                    assert response.headers["content-type"] == "application/json"
+                    streamed = response.json()
+                    assert rows(streamed) == rows(expected)
+                    # Every journey keeps the same pseudonym across the chunks
+                    assert len({row["journey_id"] for row in streamed}) == len(
+                        {row["journey_id"] for row in expected}
+                    )
+
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json={**extraction, "request": request, "stream": "ndjson"},
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+                    assert response.headers["content-type"] == "application/x-ndjson"
+                    lines = response.content.splitlines()
+                    assert rows(orjson.loads(line) for line in lines) == rows(expected)
+
+                # The statistics can't be streamed
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        **extraction,
+                        "request": RequestType.stats_num_tracks,
+                        "type_aggregation": "space",
+                        "stream": "json",
+                    },
+                )
+                assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        finally:
+            settings.cursor_chunk_rows = chunk_rows
+            settings.trace_storage = TraceStorage.rows
+
+    def test_extract_page(self):
+        """Test the behaviour of extract User data a page of journeys at a time"""
+
+        clear_test()
+        settings = get_database_settings()
+        source_app = str(uuid4())
+        extraction = {
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+        }
+
+        def rows(data: list) -> list:
+            return sorted(
+                orjson.dumps({key: row[key] for key in row if key != "journey_id"})
+                for row in data
+            )
+
+        try:
+            with TestClient(app) as client:
+                # Journeys stored both as rows and as compressed traces
+                for trace_storage in (TraceStorage.rows,) * 4 + (TraceStorage.blob,):
+                    settings.trace_storage = trace_storage
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store",
+                        json={
+                            **USER_INPUT_DATA,
+                            "journey_id": str(uuid4()),
+                            "source_app": source_app,
+                        },
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+
+                for request in (
+                    RequestType.partial_mobility,
+                    RequestType.complete_mobility,
+                    RequestType.all_positions,
+                ):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json={**extraction, "request": request},
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+                    expected = response.json()
+
+                    # 5 journeys in pages of 2
+                    pages = []
+                    cursor = None
+                    while True:
+                        response = client.post(
+                            "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                            json={
+                                **extraction,
+                                "request": request,
+                                "page_size": 2,
+                                "page_cursor": cursor,
+                            },
+                        )
+                        assert response.status_code == status.HTTP_200_OK
+                        page = response.json()
+                        pages.append(page["data"])
+                        cursor = page["next_page_cursor"]
+                        if cursor is None:
+                            break
+
+                    assert len(pages) == 3
+                    assert rows(sum(pages, [])) == rows(expected)
+                    if request == RequestType.partial_mobility:
+                        assert [len(page) for page in pages] == [2, 2, 1]
+
+                # Invalid pages
+                for page, status_code in (
+                    ({"page_size": 2, "page_cursor": "invalid"}, 422),
+                    ({"page_cursor": cursor or "invalid"}, 422),
+                    ({"page_size": 100_000}, 422),
+                    ({"page_size": 0}, 422),
+                    ({"page_size": 2, "stream": "json"}, 422),
+                ):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json={
+                            **extraction,
+                            "request": RequestType.all_positions,
+                            **page,
+                        },
+                    )
+                    assert response.status_code == status_code
+
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        **extraction,
+                        "request": RequestType.stats_num_tracks,
+                        "type_aggregation": "space",
+                        "page_size": 2,
+                    },
+                )
+                assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+                # Nothing to page
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        **extraction,
+                        "source_app": str(uuid4()),
+                        "request": RequestType.all_positions,
+                        "page_size": 2,
+                    },
+                )
+                assert response.status_code == status.HTTP_404_NOT_FOUND
+        finally:
+            settings.trace_storage = TraceStorage.rows
+
+    def test_extract_pseudonyms(self):
+        """Test the pseudonyms of the journeys of the extractions"""
+
+        clear_test()
+        settings = get_pseudonym_settings()
+        source_app = str(uuid4())
+        journey_id = str(uuid4())
+        extraction = {
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+        }
+
+        def pseudonyms(request: RequestType) -> set:
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                json={**extraction, "request": request},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            return {row["journey_id"] for row in response.json()}
+
+        try:
+            with TestClient(app) as client:
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": journey_id,
+                        "source_app": source_app,
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+                # The identical requests obtain the same pseudonyms
+                complete_mobility = pseudonyms(RequestType.complete_mobility)
+                assert len(complete_mobility) == 1
+                assert journey_id not in complete_mobility
+                assert pseudonyms(RequestType.complete_mobility) == complete_mobility
+                assert pseudonyms(RequestType.all_positions) != complete_mobility
+
+                # The requests of the same consumer obtain the same pseudonyms
+                settings.pseudonym_scope = PseudonymScope.consumer
+                complete_mobility = pseudonyms(RequestType.complete_mobility)
+                assert pseudonyms(RequestType.all_positions) == complete_mobility
+        finally:
+            settings.pseudonym_scope = PseudonymScope.request
+
+    def test_extract_radius(self):
+        """Test the journeys in the corners of the boxes of the circles"""
+
+        clear_test()
+        source_app = str(uuid4())
+        first = USER_INPUT_DATA["trace_information"][0]
+        radius = 1000
+        lat0, lat1, lon0, lon1 = reversed_haversine(first["lat"], first["lon"], radius)
+        extraction = {
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+            "type_aggregation": "space",
+            # The starting point is in the corner of the box of the circle
+            "start_lat": first["lat"] - (lat1 - first["lat"]) * 0.9,
+            "start_lon": first["lon"] - (lon1 - first["lon"]) * 0.9,
+        }
+
+        with TestClient(app) as client:
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store",
+                json={
+                    **USER_INPUT_DATA,
+                    "journey_id": str(uuid4()),
+                    "source_app": source_app,
+                },
+            )
+            assert response.status_code == status.HTTP_200_OK
+
+            for request, extra in (
+                (RequestType.complete_mobility, {}),
+                (RequestType.partial_mobility, {"type_mobility": "bicycle"}),
+                (RequestType.all_positions, {"stream": "json"}),
+                (RequestType.stats_num_tracks, {}),
+            ):
+                for start_radius, status_code in (
+                    (radius, status.HTTP_404_NOT_FOUND),
+                    (radius * 1.5, status.HTTP_200_OK),
+                ):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                        json={
+                            **extraction,
+                            **extra,
+                            "request": request,
+                            "start_radius": start_radius,
+                        },
+                    )
+                    assert response.status_code == status_code
+
+            # The journeys of a page outside the circles don't leave it empty
+            for start_radius, status_code in (
+                (radius, status.HTTP_404_NOT_FOUND),
+                (radius * 1.5, status.HTTP_200_OK),
+            ):
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        **extraction,
+                        "request": RequestType.complete_mobility,
+                        "start_radius": start_radius,
+                        "page_size": 2,
+                    },
+                )
+                assert response.status_code == status_code
+
+    def test_extract_radius_page(self):
+        """Test the pages refilled past the journeys outside the circles"""
+
+        clear_test()
+        source_app = str(uuid4())
+        first = USER_INPUT_DATA["trace_information"][0]
+        radius = 1000
+        lat0, lat1, lon0, lon1 = reversed_haversine(first["lat"], first["lon"], radius)
+        center = {
+            "lat": first["lat"] - (lat1 - first["lat"]) * 0.9,
+            "lon": first["lon"] - (lon1 - first["lon"]) * 0.9,
+        }
+        extraction = {
+            "source_app": source_app,
+            "company_code": USER_INPUT_DATA["company_code"],
+            "request": RequestType.complete_mobility,
+            "start_lat": center["lat"],
+            "start_lon": center["lon"],
+            "start_radius": radius,
+            "page_size": 2,
+        }
+
+        def moved(value):
+            """Journey moved to start at the center of the circle"""
+            if isinstance(value, list):
+                return [moved(item) for item in value]
+            if not isinstance(value, dict):
+                return value
+            return {
+                key: item + center[key] - first[key] if key in center else moved(item)
+                for key, item in value.items()
+            }
+
+        # The journeys in the order of the pages, only 3 of them within the circle
+        journey_ids = sorted(str(uuid4()) for _ in range(6))
+        with TestClient(app) as client:
+            for index, journey_id in enumerate(journey_ids):
+                data = USER_INPUT_DATA if index in (0, 2, 3) else moved(USER_INPUT_DATA)
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={**data, "journey_id": journey_id, "source_app": source_app},
+                )
+                assert response.status_code == status.HTTP_200_OK
+
+            pages = []
+            cursor = None
+            while True:
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={**extraction, "page_cursor": cursor},
+                )
+                assert response.status_code == status.HTTP_200_OK
+                page = response.json()
+                pages.append({row["journey_id"] for row in page["data"]})
+                cursor = page["next_page_cursor"]
+                if cursor is None:
+                    break
+
+            assert [len(page) for page in pages] == [2, 1]
+
+
+class TestMigrations:
+    """Test the migrations of the schema"""
+
+    def test_migrate(self):
+        """Test the migrations applied to a database created by a previous version"""
+
+        clear_test()
+        versions = [migration.version for migration in MIGRATIONS]
+
+        with TestClient(app) as client:
+            pool = get_database().pool
+            rows = client.portal.call(
+                pool.fetch, 'SELECT version FROM "schema_migrations" ORDER BY version'
+            )
+            assert [row["version"] for row in rows] == versions
+
+            # Indexes of a database created before the filters indexes
+            client.portal.call(
+                pool.execute,
+                """DROP INDEX user_data_end;
+                CREATE INDEX user_data_source_app on "user_data" USING hash (source_app);
+                DELETE FROM "schema_migrations" WHERE name = 'filters_indexes';""",
+            )
+
+            # Many workers migrate together, only one of them applies the migration
+            async def migrate_together() -> list:
+                connections = [await pool.acquire() for _ in range(3)]
+                try:
+                    return await asyncio.gather(
+                        *(migrate(connection) for connection in connections)
+                    )
+                finally:
+                    for connection in connections:
+                        await pool.release(connection)
+
+            assert sorted(client.portal.call(migrate_together)) == [
+                [],
+                [],
+                [7],
+            ]
+
+            indexes = client.portal.call(
+                pool.fetch,
+                """SELECT indexrelid::regclass::text AS name, indisvalid
+                FROM pg_index WHERE indrelid = 'user_data'::regclass""",
+            )
+            indexes = {row["name"]: row["indisvalid"] for row in indexes}
+            assert indexes["user_data_end"]
+            assert "user_data_source_app" not in indexes
+            assert "user_data_index_b_tree" not in indexes
+
+            # The migrations applied offline, before deploying the workers
+            client.portal.call(
+                pool.execute,
+                """DELETE FROM "schema_migrations" WHERE name = 'filters_indexes';""",
+            )
+            assert client.portal.call(migrate_offline) == [7]
+            assert client.portal.call(migrate_offline) == []
+
+            # The workers refuse to move the rows of the journeys at startup
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/store",
+                json={**USER_INPUT_DATA, "journey_id": str(uuid4())},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            client.portal.call(
+                pool.execute,
+                """DELETE FROM "schema_migrations" WHERE name = 'time_partitions';""",
+            )
+
+            async def migrate_worker():
+                async with pool.acquire() as connection:
+                    return await migrate(connection)
+
+            try:
+                with pytest.raises(RuntimeError, match="python -m app.db.migrations"):
+                    client.portal.call(migrate_worker)
+            finally:
+                client.portal.call(
+                    pool.execute,
+                    """INSERT INTO "schema_migrations"(version, name)
+                    VALUES (8, 'time_partitions');""",
+                )
+
+    def test_partitions(self):
+        """Test the journeys stored in the partitions of their month"""
+
+        clear_test()
+        journey_ids = [str(uuid4()) for _ in range(2)]
+        # A month without a partition
+        month = date(2001, 1, 1)
+        start_date = month_start(month) + 60000
+
+        async def partitions(pool) -> set:
+            rows = []
+            for table in PARTITIONED_TABLES:
+                rows += await pool.fetch(
+                    f"""SELECT DISTINCT tableoid::regclass::text AS name
+                    FROM "{table}" WHERE journey_id = ANY($1)""",
+                    journey_ids,
+                )
+            return {row["name"] for row in rows}
+
+        async def drop(pool, before: int) -> list:
+            async with pool.acquire() as connection:
+                return await drop_partitions(connection, before)
+
+        with TestClient(app) as client:
+            pool = get_database().pool
+            # The partitions of the next months are created at startup
+            current = datetime.now(timezone.utc).date().replace(day=1)
+            for months in range(get_database_settings().partition_months_ahead + 1):
+                for table in PARTITIONED_TABLES:
+                    assert client.portal.call(
+                        pool.fetchval,
+                        "SELECT to_regclass($1) IS NOT NULL",
+                        f"{table}_{add_months(current, months):%Y%m}",
+                    )
+
+            for url, journey_id in zip(("store", "store/stream"), journey_ids):
+                response = client.post(
+                    f"http://localhost/ipt_anonymizer/api/v1/user/{url}",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": journey_id,
+                        "startDate": start_date,
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+            assert client.portal.call(partitions, pool) == {
+                f"{table}_default" for table in PARTITIONED_TABLES
+            }
+
+            # The partition of the month takes the rows of the default partition
+            for table in PARTITIONED_TABLES:
+                assert client.portal.call(
+                    pool.fetchval, "SELECT create_month_partition($1, $2)", table, month
+                )
+            assert client.portal.call(partitions, pool) == {
+                f"{table}_200101" for table in PARTITIONED_TABLES
+            }
+
+            # The extractions of the month read only its partitions
+            extraction = PartialMobility(
+                source_app=USER_INPUT_DATA["source_app"],
+                company_code=USER_INPUT_DATA["company_code"],
+                start_time=start_date,
+                start_time_high_threshold=60000,
+            )
+            plan = "\n".join(
+                row[0]
+                for row in client.portal.call(
+                    pool.fetch,
+                    f"EXPLAIN {extraction._query_select}",
+                    *extraction._query_args,
+                )
+            )
+            assert "user_data_200101" in plan
+            assert "user_behaviours_200101" in plan
+            assert "default" not in plan
+
+            response = client.post(
+                "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                json={
+                    "request": RequestType.partial_mobility,
+                    "source_app": USER_INPUT_DATA["source_app"],
+                    "company_code": USER_INPUT_DATA["company_code"],
+                    "start_time": start_date,
+                    "start_time_high_threshold": 60000,
+                    "type_aggregation": "space",
+                    "type_mobility": "bicycle",
+                },
+            )
+            assert response.status_code == status.HTTP_200_OK
+
+            # The whole month is dropped with its partitions
+            assert sorted(
+                client.portal.call(drop, pool, month_start(add_months(month, 1)))
+            ) == sorted(f"{table}_200101" for table in PARTITIONED_TABLES)
+            assert client.portal.call(partitions, pool) == set()
+
+    def test_tenant_partitions(self):
+        """Test the journeys stored in the partitions of their source_app"""
+
+        clear_test()
+        settings = get_database_settings()
+        source_app = str(uuid4())
+        journey_id = str(uuid4())
+        month = f"{datetime.now(timezone.utc):%Y%m}"
+        start_date = int(time.time() * 1000)
+
+        async def partitions(pool) -> set:
+            rows = []
+            for table in TENANT_PARTITIONED_TABLES:
+                rows += await pool.fetch(
+                    f"""SELECT DISTINCT tableoid::regclass::text AS name
+                    FROM "{table}" WHERE journey_id = $1""",
+                    journey_id,
+                )
+            return {row["name"] for row in rows}
+
+        try:
+            settings.tenant_partitions = True
+            with TestClient(app) as client:
+                pool = get_database().pool
+                # The months created at startup are list partitioned by source_app
+                for table in TENANT_PARTITIONED_TABLES:
+                    assert (
+                        client.portal.call(
+                            pool.fetchval,
+                            "SELECT relkind::text FROM pg_class WHERE oid = to_regclass($1)",
+                            f"{table}_{month}",
+                        )
+                        == "p"
+                    )
+
+                # The first journey of a source_app creates its partitions
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/store",
+                    json={
+                        **USER_INPUT_DATA,
+                        "journey_id": journey_id,
+                        "source_app": source_app,
+                        "startDate": start_date,
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+                tenant = client.portal.call(
+                    pool.fetchval,
+                    'SELECT id FROM "partition_tenants" WHERE source_app = $1',
+                    source_app,
+                )
+                assert client.portal.call(partitions, pool) == {
+                    f"{table}_{month}_t{tenant}" for table in TENANT_PARTITIONED_TABLES
+                }
+
+                # The extractions of the source_app read only its partitions
+                extraction = PartialMobility(
+                    source_app=source_app,
+                    company_code=USER_INPUT_DATA["company_code"],
+                    start_time=start_date,
+                    start_time_high_threshold=60000,
+                )
+                plan = "\n".join(
+                    row[0]
+                    for row in client.portal.call(
+                        pool.fetch,
+                        f"EXPLAIN {extraction._query_select}",
+                        *extraction._query_args,
+                    )
+                )
+                assert f"user_data_{month}_t{tenant}" in plan
+                assert f"user_behaviours_{month}_t{tenant}" in plan
+                assert "default" not in plan
+
+                response = client.post(
+                    "http://localhost/ipt_anonymizer/api/v1/user/extract",
+                    json={
+                        "request": RequestType.partial_mobility,
+                        "source_app": source_app,
+                        "company_code": USER_INPUT_DATA["company_code"],
+                        "start_time": start_date,
+                        "start_time_high_threshold": 60000,
+                        "type_aggregation": "space",
+                        "type_mobility": "bicycle",
+                    },
+                )
+                assert response.status_code == status.HTTP_200_OK
+                assert response.json()
+        finally:
+            settings.tenant_partitions = False
+
+
+class TestRetention:
+    """Test the retention of the data"""
+
+    def test_retention(self):
+        """Test the data deleted once their retention expires"""
+
+        clear_test()
+        settings = get_retention_settings()
+        source_app = str(uuid4())
+        # A month without a partition, one with a partition and the current one
+        month = date(2002, 2, 1)
+        start_dates = [
+            month_start(add_months(month, -1)),
+            month_start(month),
+            int(time.time() * 1000),
+        ]
+        journey_ids = [str(uuid4()) for _ in start_dates]
+
+        async def rows(pool, table: str) -> list:
+            records = await pool.fetch(
+                f"""SELECT DISTINCT journey_id FROM "{table}"
+                WHERE journey_id = ANY($1)""",
+                journey_ids,
+            )
+            return sorted(record["journey_id"] for record in records)
+
+        async def run(pool) -> dict:
+            async with pool.acquire() as connection:
+                return await get_retention_job().run(connection)
+
+        try:
+            settings.retention = True
+            settings.retention_sensors_days = 30
+            with TestClient(app) as client:
+                pool = get_database().pool
+                # The worker is elected and runs the job at startup
+                for _ in range(50):
+                    response = client.get(
+                        "http://localhost/ipt_anonymizer/api/v1/metrics"
+                    )
+                    retention = response.json()["retention"]
+                    if retention["runs"]:
+                        break
+                    time.sleep(0.1)
+                assert retention["enabled"]
+                assert retention["elected"]
+                assert list(retention["last_run"]) == ["user_sensors"]
+
+                for table in PARTITIONED_TABLES:
+                    assert client.portal.call(
+                        pool.fetchval,
+                        "SELECT create_month_partition($1, $2)",
+                        table,
+                        month,
+                    )
+                for journey_id, start_date in zip(journey_ids, start_dates):
+                    response = client.post(
+                        "http://localhost/ipt_anonymizer/api/v1/user/store",
+                        json={
+                            **USER_INPUT_DATA,
+                            "journey_id": journey_id,
+                            "source_app": source_app,
+                            "startDate": start_date,
+                        },
+                    )
+                    assert response.status_code == status.HTTP_200_OK
+
+                # The expired sensors are dropped with their month or deleted
+                report = client.portal.call(run, pool)
+                assert report["user_sensors"]["partitions"] == ["user_sensors_200202"]
+                assert report["user_sensors"]["rows"] >= len(
+                    USER_INPUT_DATA["sensors_information"]
+                )
+                assert report["user_sensors"]["bytes_reclaimed"] > 0
+                assert isinstance(report["user_sensors"]["size_bytes"], int)
+                assert report["user_sensors"]["completed"]
+                assert client.portal.call(rows, pool, "user_sensors") == journey_ids[2:]
+                assert client.portal.call(rows, pool, "user_positions") == sorted(
+                    journey_ids
+                )
+
+                # The rest of the data of the journeys never outlives them
+                settings.retention_journeys_days = 30
+                report = client.portal.call(run, pool)
+                assert list(report) == [
+                    "user_sensors",
+                    "user_positions",
+                    "user_traces",
+                    "user_behaviours",
+                    "user_data",
+                ]
+                for table in PARTITIONED_TABLES:
+                    assert client.portal.call(rows, pool, table) == journey_ids[2:]
+                    if table != "user_sensors":
+                        assert report[table]["partitions"] == [f"{table}_200202"]
+                        assert report[table]["rows"]
+                        assert report[table]["bytes_reclaimed"] > 0
+
+                # The rollups keep the statistics of the journeys deleted, unless
+                # they have their own retention
+                for rollups_days, tracks in ((0, len(journey_ids)), (30, 1)):
+                    settings.retention_rollups_days = rollups_days
+                    report = client.portal.call(run, pool)
+                    for table in ("user_behaviours_rollup", "user_data_rollup"):
+                        assert (table in report) == bool(rollups_days)
+                    assert (
+                        client.portal.call(
+                            pool.fetchval,
+                            """SELECT sum(tracks) FROM "user_data_rollup"
+                            WHERE source_app = $1""",
+                            source_app,
+                        )
+                        == tracks
+                    )
+        finally:
+            settings.retention = False
+            settings.retention_sensors_days = 0
+            settings.retention_journeys_days = 0
+            settings.retention_rollups_days = 0